@@ -10,7 +10,8 @@ import {
   ScheduleRequest,
   HealthResponse,
   EmailCheckResponse,
-  UpcomingScheduleResponse
+  UpcomingScheduleResponse,
+  RefreshTokenResponse
 } from '@/types/api';
 import axios, {
   AxiosInstance,
@@ -133,20 +134,82 @@ class ApiClient {
           error: error.response?.data
         });
 
-        if (error.response?.status === 401) {
-          console.log('Unauthorized, clearing tokens');
-          this.clearTokens();
+        const originalRequest = error.config;
+        const isAuthRoute = originalRequest?.url?.startsWith('/api/auth/') &&
+          !originalRequest.url.startsWith('/api/auth/me') &&
+          !originalRequest.url.startsWith('/api/auth/update-profile');
+
+        if (error.response?.status === 401 && originalRequest && !originalRequest._retry && !isAuthRoute &&
+            this.getRefreshToken()) {
+          // Access token ngắn hạn hết hạn: đổi refresh token lấy cặp mới rồi gửi lại request
+          originalRequest._retry = true;
+
+          if (this.isRefreshing) {
+            return new Promise((resolve, reject) => {
+              this.failedRequests.push({
+                resolve: (token: string) => {
+                  originalRequest.headers.Authorization = `Bearer ${token}`;
+                  resolve(this.instance(originalRequest));
+                },
+                reject,
+              });
+            });
+          }
 
-          if (typeof window !== 'undefined') {
-            window.location.href = '/auth/login';
+          this.isRefreshing = true;
+          try {
+            const token = await this.refreshTokens();
+            this.failedRequests.forEach(({ resolve }) => resolve(token));
+            originalRequest.headers.Authorization = `Bearer ${token}`;
+            return this.instance(originalRequest);
+          } catch (refreshError) {
+            this.failedRequests.forEach(({ reject }) => reject(refreshError));
+            this.redirectToLogin();
+            return Promise.reject(refreshError);
+          } finally {
+            this.failedRequests = [];
+            this.isRefreshing = false;
           }
         }
 
+        if (error.response?.status === 401 && !isAuthRoute) {
+          this.redirectToLogin();
+        }
+
         return Promise.reject(error);
       }
     );
   }
 
+  private redirectToLogin(): void {
+    console.log('Unauthorized, clearing tokens');
+    this.clearTokens();
+
+    if (typeof window !== 'undefined') {
+      window.location.href = '/auth/login';
+    }
+  }
+
+  private async refreshTokens(): Promise<string> {
+    // Gọi thẳng axios để request này không đi qua interceptor 401 ở trên
+    const response = await axios.post<RefreshTokenResponse>(
+      `${this.instance.defaults.baseURL}/api/auth/refresh`,
+      { refresh_token: this.getRefreshToken() },
+      { headers: { 'Content-Type': 'application/json' }, withCredentials: true }
+    );
+    this.setTokens(response.data as AuthTokens);
+    return response.data.access_token;
+  }
+
+  private storeTokens(responseData: any): void {
+    this.setTokens({
+      access_token: responseData.access_token || responseData.token,
+      refresh_token: responseData.refresh_token,
+      token_type: responseData.token_type || 'bearer',
+      expires_in: responseData.expires_in
+    });
+  }
+
   public async request<T>(config: AxiosRequestConfig): Promise<ApiResponse<T>> {
     try {
       const response: AxiosResponse<ApiResponse<T>> = await this.instance(config);
@@ -186,10 +249,7 @@ class ApiClient {
       const responseData = response.data;
 
       if (responseData.success && responseData.token && responseData.user) {
-        this.setTokens({
-          access_token: responseData.token,
-          token_type: 'bearer'
-        });
+        this.storeTokens(responseData);
         this.setUser(responseData.user);
       }
 
@@ -214,10 +274,7 @@ class ApiClient {
       const responseData = response.data;
 
       if (responseData.success && responseData.token && responseData.user) {
-        this.setTokens({
-          access_token: responseData.token,
-          token_type: 'bearer'
-        });
+        this.storeTokens(responseData);
         this.setUser(responseData.user);
       }
 
@@ -237,13 +294,15 @@ class ApiClient {
 
   public async logout(): Promise<any> {
     try {
-      // const response = await this.instance.post('/api/auth/logout');
+      const response = await this.instance.post('/api/auth/logout', {
+        refresh_token: this.getRefreshToken()
+      });
       this.clearTokens();
 
-      // return {
-      //   success: response.data.success || false,
-      //   message: response.data.message,
-      // };
+      return {
+        success: response.data.success || false,
+        message: response.data.message,
+      };
     } catch (error: any) {
       console.error('Logout error:', error);
       this.clearTokens();
@@ -285,6 +344,10 @@ class ApiClient {
       if (responseData.success && responseData.user) {
         this.setUser(responseData.user);
       }
+      // Đổi mật khẩu thu hồi mọi token cũ; server trả cặp token mới cho phiên này
+      if (responseData.success && responseData.access_token) {
+        this.storeTokens(responseData);
+      }
 
       return {
         success: responseData.success || false,
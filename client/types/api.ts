@@ -34,6 +34,9 @@ export interface ScheduleListResponse {
   success: boolean;
   schedules: Schedule[];
   count: number;
+  // Lỗi máy chủ giữa chừng khi đang stream: danh sách chưa đầy đủ
+  truncated?: boolean;
+  error?: string;
   [key: string]: any;
 }
 export interface HealthResponse {
@@ -103,6 +106,7 @@ export interface RefreshTokenResponse {
   access_token: string;
   refresh_token?: string;
   token_type: string;
+  expires_in?: number;
 }
 
 export interface VerifyTokenResponse {
@@ -3,24 +3,77 @@ import json
 from typing import Dict, Any, List, Optional
 import logging
 from models import ScheduleModel
-import requests
 import re
+import time
+import llm_backends
+import llm_batching
+import metrics
+import profiling
+from request_context import RequestContext
+import slot_extraction
+import temporal
 
 logger = logging.getLogger(__name__)
 
+# Các trường schedule_data theo thứ tự trong prompt: (tên, hướng dẫn trích xuất, kiểu trong JSON mẫu)
+SCHEDULE_FIELDS = [
+    ('event', 'Sự kiện/chủ đề (VD: "họp nhóm", "báo thức dậy")', '"string"'),
+    ('description', 'Mô tả thêm (nếu có)', '"string"'),
+    ('datetime', 'Thời gian bắt đầu (format: YYYY-MM-DD HH:MM:SS)', '"YYYY-MM-DD HH:MM:SS"'),
+    ('end_time', None, '"YYYY-MM-DD HH:MM:SS" or null'),
+    ('location', 'Địa điểm (nếu có)', '"string"'),
+    ('reminder_minutes', 'Số phút nhắc nhở trước (tìm từ "trước X phút/phút/giờ", mặc định null)',
+     'number (số phút nhắc trước, VD: 15)'),
+    ('category', 'Phân loại (alarm|meeting|personal|work|general)', '"alarm|meeting|personal|work|general"'),
+    ('priority', 'Ưu tiên (low|medium|high)', '"low|medium|high"'),
+]
+
+# Ví dụ few-shot; datetime được tính lại từ chính câu ví dụ mỗi lần tạo prompt
+INTENT_EXAMPLES = [
+    ('nhắc tôi họp lúc 9h sáng mai trước 15 phút', {
+        'is_schedule_related': True,
+        'intent': 'schedule',
+        'confidence': 0.9,
+        'schedule_data': {'event': 'họp', 'datetime': None, 'reminder_minutes': 15,
+                          'category': 'meeting', 'priority': 'medium'}
+    }),
+    ('đặt báo thức 7h sáng mai', {
+        'is_schedule_related': True,
+        'intent': 'schedule',
+        'confidence': 0.9,
+        'schedule_data': {'event': 'Báo thức dậy', 'datetime': None, 'reminder_minutes': None,
+                          'category': 'alarm', 'priority': 'high'}
+    }),
+    ('họp nhóm tại phòng 302 lúc 14:30 chiều nay', {
+        'is_schedule_related': True,
+        'intent': 'schedule',
+        'confidence': 0.9,
+        'schedule_data': {'event': 'họp nhóm', 'datetime': None, 'location': 'phòng 302',
+                          'reminder_minutes': None, 'category': 'meeting', 'priority': 'medium'}
+    }),
+    ('chào bạn', {
+        'is_schedule_related': False,
+        'intent': 'conversation',
+        'confidence': 0.8,
+        'response': 'Xin chào! Tôi có thể giúp gì cho bạn?'
+    }),
+]
+
 class PersonalAssistant:
     def __init__(self, config, db_manager):
         self.config = config
         self.db = db_manager
         self.schedule_model = ScheduleModel(db_manager)
-        self.ollama_url = getattr(config, 'OLLAMA_URL', 'http://localhost:11434')
-        self.ollama_model = getattr(config, 'OLLAMA_MODEL', 'mistral')
+        self.llm = llm_backends.create_backend(config)
+        self.batcher = llm_batching.create_batcher(config, self.llm)
+        self.timezone = temporal.get_timezone(getattr(config, 'DEFAULT_TIMEZONE', None))
+        self.hybrid_extraction = getattr(config, 'HYBRID_EXTRACTION', True)
     
-    def process_message(self, user_id: int, message: str) -> Dict[str, Any]:
-        logger.info(f"Processing message from user {user_id}: '{message}'")
+    def process_message(self, context: RequestContext, message: str) -> Dict[str, Any]:
+        logger.info(f"Processing message from user {context.user_id}: '{message}'")
         
         try:
-            ollama_response = self._call_ollama_for_intent(message, user_id)
+            ollama_response = self._call_ollama_for_intent(message, context)
             
             if not ollama_response.get('success', True):
                 return ollama_response
@@ -28,7 +81,7 @@ class PersonalAssistant:
             logger.info(f"Ollama raw response: {json.dumps(ollama_response, indent=2, ensure_ascii=False)}")
             
             if ollama_response.get('is_schedule_related', False):
-                response = self._handle_schedule_with_ollama(user_id, ollama_response, message)
+                response = self._handle_schedule_with_ollama(context, ollama_response, message)
             else:
                 response = {
                     'success': True,
@@ -44,34 +97,24 @@ class PersonalAssistant:
             logger.error(f"Critical error in process_message: {e}")
             return self._handle_critical_error(e, message)
     
-    def _call_ollama_for_intent(self, message: str, user_id: int) -> Dict[str, Any]:
+    def _call_ollama_for_intent(self, message: str, context: RequestContext) -> Dict[str, Any]:
         try:
-            existing_schedules = self._get_user_schedules_context(user_id)
-            
-            prompt = self._create_intent_analysis_prompt(message, user_id, existing_schedules)
-            
-            base_url = self.ollama_url.rstrip('/')
-            if base_url.endswith('/api/generate'):
-                base_url = base_url[:-13]
-            url = f"{base_url}/api/generate"
-            
-            payload = {
-                "model": self.ollama_model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.3,
-                    "top_p": 0.9,
-                    "max_tokens": 2000
-                }
-            }
+            existing_schedules = self._get_user_schedules_context(context)
+            
+            now = temporal.now_in(self.timezone)
+            prefilled = self._prefill_schedule_fields(message, now) if self.hybrid_extraction else {}
             
-            logger.info(f"Calling Ollama at: {url}")
-            response = requests.post(url, json=payload, timeout=300)
-            response.raise_for_status()
+            prompt = self._create_intent_analysis_prompt(message, context.user_id, existing_schedules, prefilled, now)
             
-            result = response.json()
-            generated_text = result.get('response', '').strip()
+            logger.info(f"Calling LLM backend {self.llm.name} ({self.llm.model})")
+            started = time.perf_counter()
+            with profiling.timed('ollama_http'):
+                if self.batcher:
+                    result = self.batcher.generate(prompt)
+                else:
+                    result = self.llm.generate(prompt)
+            metrics.observe_llm_result(self.llm.name, result, time.perf_counter() - started)
+            generated_text = result.text
             
             if not generated_text:
                 return {
@@ -80,23 +123,33 @@ class PersonalAssistant:
                     'type': 'ollama_error'
                 }
             
-            logger.info(f"Ollama response received: {len(generated_text)} characters")
+            logger.info(f"LLM response received: {len(generated_text)} characters")
             
-            return self._parse_ollama_response(generated_text, message)
+            parsed = self._parse_ollama_response(generated_text, message)
+            if parsed.get('success'):
+                self._merge_prefilled_fields(parsed, prefilled)
+            return parsed
             
-        except requests.exceptions.ConnectionError as e:
-            logger.error(f"Cannot connect to Ollama: {e}")
-            return {
-                'success': False,
-                'message': 'Không thể kết nối đến Ollama service. Vui lòng kiểm tra kết nối.',
-                'type': 'connection_error'
-            }
-        except requests.exceptions.Timeout as e:
-            logger.error(f"Ollama request timeout after 5 minutes: {e}")
+        except llm_backends.LLMError as e:
+            if e.kind == 'connection_error':
+                logger.error(f"Cannot connect to LLM backend: {e}")
+                return {
+                    'success': False,
+                    'message': 'Không thể kết nối đến Ollama service. Vui lòng kiểm tra kết nối.',
+                    'type': 'connection_error'
+                }
+            if e.kind == 'timeout_error':
+                logger.error(f"LLM request timeout after {self.llm.timeout}s: {e}")
+                return {
+                    'success': False,
+                    'message': 'Ollama xử lý quá lâu. Vui lòng thử lại với câu hỏi ngắn hơn.',
+                    'type': 'timeout_error'
+                }
+            logger.error(f"LLM backend error: {e}")
             return {
                 'success': False,
-                'message': 'Ollama xử lý quá lâu. Vui lòng thử lại với câu hỏi ngắn hơn.',
-                'type': 'timeout_error'
+                'message': f'Lỗi khi xử lý yêu cầu: {str(e)}',
+                'type': 'unknown_error'
             }
         except Exception as e:
             logger.error(f"Error calling Ollama for intent: {e}")
@@ -106,9 +159,9 @@ class PersonalAssistant:
                 'type': 'unknown_error'
             }
     
-    def _get_user_schedules_context(self, user_id: int) -> List[Dict[str, Any]]:
+    def _get_user_schedules_context(self, context: RequestContext) -> List[Dict[str, Any]]:
         try:
-            schedules = self.schedule_model.get_user_schedules(user_id)
+            schedules = context.schedules(self.schedule_model.get_user_schedules)
             context_schedules = []
             
             for schedule in schedules:
@@ -162,8 +215,68 @@ class PersonalAssistant:
             logger.error(f"Error getting schedules context: {e}")
             return []
     
-    def _create_intent_analysis_prompt(self, message: str, user_id: int, existing_schedules: List[Dict]) -> str:
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    def _prefill_schedule_fields(self, message: str, now: datetime) -> Dict[str, Any]:
+        """Thời gian và nhắc trước mà rule xác định được chắc chắn; LLM chỉ cần trích phần còn lại."""
+        slots = slot_extraction.extract(message)
+        prefilled = {}
+        
+        # Từ chỉ buổi trong tên sự kiện ("đổi tên lịch 5 thành ăn tối") không phải là thời gian
+        resolved = slots.temporal.resolve(now) if slots.temporal and slots.temporal.is_explicit else None
+        if resolved:
+            prefilled['datetime'] = temporal.format_datetime(resolved[0])
+            if resolved[1]:
+                prefilled['end_time'] = temporal.format_datetime(resolved[1])
+        
+        if slots.reminder_minutes is not None:
+            prefilled['reminder_minutes'] = slots.reminder_minutes
+        
+        # category/priority theo từ khóa chỉ là đoán ("họp" trong "hủy họp" không phải lịch họp mới):
+        # để LLM quyết định, rule chỉ dùng làm mặc định khi LLM bỏ trống
+        return prefilled
+    
+    def _merge_prefilled_fields(self, data: Dict, prefilled: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Giá trị rule đã xác định được ghi đè lên kết quả LLM cho intent tạo/sửa lịch.
+        Sửa lịch chỉ nhận các trường LLM báo là người dùng muốn đổi (changed_fields
+        hoặc có trong schedule_data), để đổi tên lịch không dời luôn giờ của lịch.
+        """
+        intent = data.get('intent')
+        if not prefilled or intent not in ('schedule', 'update'):
+            return data
+        
+        if not isinstance(data.get('schedule_data'), dict):
+            data['schedule_data'] = {}
+        if intent == 'update':
+            changed = data.get('changed_fields')
+            changed = set(changed if isinstance(changed, list) else ()) | set(data['schedule_data'])
+            if 'datetime' in changed:
+                changed.add('end_time')
+            prefilled = {name: value for name, value in prefilled.items() if name in changed}
+            if not prefilled:
+                return data
+        data['schedule_data'].update(prefilled)
+        data['prefilled_fields'] = sorted(prefilled)
+        return data
+    
+    def _format_intent_examples(self, now: datetime, skip_fields) -> str:
+        examples = []
+        for i, (example_message, example) in enumerate(INTENT_EXAMPLES, 1):
+            example = dict(example)
+            if 'schedule_data' in example:
+                schedule_data = {k: v for k, v in example['schedule_data'].items() if k not in skip_fields}
+                if 'datetime' in schedule_data:
+                    start = slot_extraction.extract(example_message).resolve_datetime(now)
+                    schedule_data['datetime'] = temporal.format_datetime(start)
+                example['schedule_data'] = schedule_data
+            examples.append(f'{i}. "{example_message}" -> {json.dumps(example, ensure_ascii=False, indent=2)}')
+        return '\n\n'.join(examples)
+    
+    def _create_intent_analysis_prompt(self, message: str, user_id: int, existing_schedules: List[Dict],
+                                       prefilled: Optional[Dict[str, Any]] = None,
+                                       now: Optional[datetime] = None) -> str:
+        prefilled = prefilled or {}
+        now = now or temporal.now_in(self.timezone)
+        current_time = now.strftime('%Y-%m-%d %H:%M:%S')
         
         schedules_context = ""
         if existing_schedules:
@@ -179,6 +292,24 @@ class PersonalAssistant:
                 
                 schedules_context += f"{i}. ID {schedule['id']}: {schedule['event']} - {start_time}{reminder_text} ({schedule['category']})\n"
         
+        residual_fields = [field for field in SCHEDULE_FIELDS if field[0] not in prefilled]
+        extraction_rules = "\n".join(
+            f"{i}. {name}: {description}"
+            for i, (name, description, _) in enumerate(
+                [field for field in residual_fields if field[1]], 1
+            )
+        )
+        schedule_schema = ",\n".join(f'        "{name}": {schema}' for name, _, schema in residual_fields)
+        
+        prefilled_context = ""
+        if prefilled:
+            prefilled_context = "\nTHÔNG TIN ĐÃ ĐƯỢC HỆ THỐNG XÁC ĐỊNH (KHÔNG trả về các trường này):\n"
+            prefilled_context += "\n".join(f"- {name}: {value}" for name, value in prefilled.items())
+            prefilled_context += ('\nVới intent "update": thêm "changed_fields": [tên các trường trên mà người dùng '
+                                  'muốn đổi], [] nếu không đổi trường nào\n')
+        
+        examples = self._format_intent_examples(now, prefilled)
+        
         return f"""Bạn là trợ lý AI thông minh cho ứng dụng quản lý lịch trình. Phân tích tin nhắn người dùng và xác định intent.
 
 QUAN TRỌNG: Luôn trả về kết quả dưới dạng JSON hợp lệ.
@@ -194,14 +325,8 @@ QUY TẮC PHÂN TÍCH INTENT:
 - Các câu chào hỏi, hỏi đáp thông thường -> intent: "conversation"
 
 TRÍCH XUẤT THÔNG TIN LỊCH TRÌNH:
-1. event: Sự kiện/chủ đề (VD: "họp nhóm", "báo thức dậy")
-2. datetime: Thời gian bắt đầu (format: YYYY-MM-DD HH:MM:SS)
-3. reminder_minutes: Số phút nhắc nhở trước (tìm từ "trước X phút/phút/giờ", mặc định null)
-4. location: Địa điểm (nếu có)
-5. description: Mô tả thêm (nếu có)
-6. category: Phân loại (alarm|meeting|personal|work|general)
-7. priority: Ưu tiên (low|medium|high)
-
+{extraction_rules}
+{prefilled_context}
 THÔNG TIN CONTEXT:
 - Thời gian hiện tại: {current_time}
 - User ID: {user_id}
@@ -214,14 +339,7 @@ THÔNG TIN CONTEXT:
     "confidence": 0.0-1.0,
     "response": "string (chỉ cho hội thoại thông thường)",
     "schedule_data": {{
-        "event": "string",
-        "description": "string", 
-        "datetime": "YYYY-MM-DD HH:MM:SS",
-        "end_time": "YYYY-MM-DD HH:MM:SS" or null,
-        "location": "string",
-        "reminder_minutes": number (số phút nhắc trước, VD: 15),
-        "category": "alarm|meeting|personal|work|general",
-        "priority": "low|medium|high"
+{schedule_schema}
     }},
     "query_scope": "today|tomorrow|week|all",
     "schedule_id": number,
@@ -229,52 +347,7 @@ THÔNG TIN CONTEXT:
 }}
 
 VÍ DỤ JSON ĐÚNG:
-1. "nhắc tôi họp lúc 9h sáng mai trước 15 phút" -> {{
-  "is_schedule_related": true,
-  "intent": "schedule",
-  "confidence": 0.9,
-  "schedule_data": {{
-    "event": "họp",
-    "datetime": "{datetime.now().date()} 09:00:00",
-    "reminder_minutes": 15,
-    "category": "meeting",
-    "priority": "medium"
-  }}
-}}
-
-2. "đặt báo thức 7h sáng mai" -> {{
-  "is_schedule_related": true,
-  "intent": "schedule",
-  "confidence": 0.9,
-  "schedule_data": {{
-    "event": "Báo thức dậy",
-    "datetime": "{datetime.now().date()} 07:00:00",
-    "reminder_minutes": null,
-    "category": "alarm",
-    "priority": "high"
-  }}
-}}
-
-3. "họp nhóm tại phòng 302 lúc 14:30 chiều nay" -> {{
-  "is_schedule_related": true,
-  "intent": "schedule", 
-  "confidence": 0.9,
-  "schedule_data": {{
-    "event": "họp nhóm",
-    "datetime": "{datetime.now().date()} 14:30:00",
-    "location": "phòng 302",
-    "reminder_minutes": null,
-    "category": "meeting",
-    "priority": "medium"
-  }}
-}}
-
-4. "chào bạn" -> {{
-  "is_schedule_related": false,
-  "intent": "conversation", 
-  "confidence": 0.8,
-  "response": "Xin chào! Tôi có thể giúp gì cho bạn?"
-}}
+{examples}
 
 Tin nhắn cần phân tích: "{message}"
 
@@ -320,8 +393,10 @@ Kết quả JSON:"""
             }
     
     def _validate_ollama_response(self, data: Dict, original_message: str) -> Dict[str, Any]:
+        slots = slot_extraction.extract(original_message)
+        
         if 'is_schedule_related' not in data:
-            data['is_schedule_related'] = self._auto_detect_schedule_related(original_message)
+            data['is_schedule_related'] = slots.is_schedule_related
         
         if 'intent' not in data:
             data['intent'] = 'conversation'
@@ -330,7 +405,7 @@ Kết quả JSON:"""
             data['confidence'] = 0.7
         
         if data.get('intent') == 'query' and 'query_scope' not in data:
-            data['query_scope'] = self._detect_query_scope(original_message)
+            data['query_scope'] = slots.query_scope
         
         if data.get('is_schedule_related') and data.get('intent') == 'schedule':
             if 'schedule_data' not in data:
@@ -339,7 +414,7 @@ Kết quả JSON:"""
             schedule_data = data['schedule_data']
             
             if 'reminder_minutes' not in schedule_data:
-                schedule_data['reminder_minutes'] = self._extract_reminder_minutes(original_message)
+                schedule_data['reminder_minutes'] = slots.reminder_minutes
             
             if 'location' not in schedule_data:
                 schedule_data['location'] = self._extract_location(original_message)
@@ -348,13 +423,17 @@ Kết quả JSON:"""
                 schedule_data['event'] = self._extract_fallback_event(original_message)
             
             if 'datetime' not in schedule_data:
-                schedule_data['datetime'] = self._get_default_datetime()
+                resolved = slots.resolve_datetime(temporal.now_in(self.timezone))
+                if resolved:
+                    schedule_data['datetime'] = temporal.format_datetime(resolved)
+                else:
+                    schedule_data['datetime'] = self._get_default_datetime()
             
             if 'category' not in schedule_data:
-                schedule_data['category'] = self._detect_category(original_message)
+                schedule_data['category'] = slots.category
             
             if 'priority' not in schedule_data:
-                schedule_data['priority'] = self._detect_priority(original_message)
+                schedule_data['priority'] = slots.priority
         
         data['original_message'] = original_message
         data['method'] = 'ollama_analysis'
@@ -362,26 +441,7 @@ Kết quả JSON:"""
         return data
     
     def _extract_reminder_minutes(self, message: str) -> Optional[int]:
-        message_lower = message.lower()
-        
-        patterns = [
-            r'trước\s+(\d+)\s+phút',
-            r'trước\s+(\d+)\s+giờ',
-            r'nhắc\s+trước\s+(\d+)\s+phút',
-            r'nhắc\s+trước\s+(\d+)\s+giờ',
-            r'(\d+)\s+phút\s+trước',
-            r'(\d+)\s+giờ\s+trước'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, message_lower)
-            if match:
-                value = int(match.group(1))
-                if 'giờ' in pattern:
-                    return value * 60
-                return value
-        
-        return None
+        return slot_extraction.extract(message).reminder_minutes
     
     def _extract_location(self, message: str) -> Optional[str]:
         location_keywords = ['tại', 'ở', 'chỗ', 'địa điểm', 'phòng', 'nhà', 'công ty', 'văn phòng']
@@ -399,21 +459,10 @@ Kết quả JSON:"""
         return None
     
     def _auto_detect_schedule_related(self, message: str) -> bool:
-        message_lower = message.lower()
-        schedule_keywords = ['lịch', 'báo thức', 'nhắc', 'hẹn', 'sự kiện', 'cuộc họp', 'đặt', 'tạo', 'xem', 'xóa', 'sửa']
-        return any(keyword in message_lower for keyword in schedule_keywords)
+        return slot_extraction.extract(message).is_schedule_related
     
     def _detect_query_scope(self, message: str) -> str:
-        message_lower = message.lower()
-        
-        if any(word in message_lower for word in ['mai', 'ngày mai']):
-            return 'tomorrow'
-        elif any(word in message_lower for word in ['hôm nay', 'hôm nay']):
-            return 'today'
-        elif any(word in message_lower for word in ['tuần', 'tuần này']):
-            return 'week'
-        else:
-            return 'all'
+        return slot_extraction.extract(message).query_scope
     
     def _extract_fallback_event(self, message: str) -> str:
         words = message.split()
@@ -427,34 +476,16 @@ Kết quả JSON:"""
         return "Sự kiện mới"
     
     def _detect_category(self, message: str) -> str:
-        message_lower = message.lower()
-        
-        if any(word in message_lower for word in ['báo thức', 'thức dậy', 'dậy', 'alarm']):
-            return 'alarm'
-        elif any(word in message_lower for word in ['họp', 'meeting', 'cuộc họp', 'hội họp']):
-            return 'meeting'
-        elif any(word in message_lower for word in ['cá nhân', 'riêng', 'personal']):
-            return 'personal'
-        elif any(word in message_lower for word in ['công việc', 'work', 'làm việc']):
-            return 'work'
-        else:
-            return 'general'
+        return slot_extraction.extract(message).category
     
     def _detect_priority(self, message: str) -> str:
-        message_lower = message.lower()
-        
-        if any(word in message_lower for word in ['quan trọng', 'gấp', 'khẩn cấp', 'urgent', 'high']):
-            return 'high'
-        elif any(word in message_lower for word in ['bình thường', 'normal', 'trung bình', 'medium']):
-            return 'medium'
-        else:
-            return 'low'
+        return slot_extraction.extract(message).priority
     
     def _get_default_datetime(self) -> str:
-        default_time = datetime.now() + timedelta(hours=1)
-        return default_time.strftime('%Y-%m-%d %H:%M:%S')
+        default_time = temporal.now_in(self.timezone) + timedelta(hours=1)
+        return temporal.format_datetime(default_time)
     
-    def _handle_schedule_with_ollama(self, user_id: int, ollama_data: Dict, original_message: str) -> Dict[str, Any]:
+    def _handle_schedule_with_ollama(self, context: RequestContext, ollama_data: Dict, original_message: str) -> Dict[str, Any]:
         intent = ollama_data.get('intent', 'conversation')
         
         logger.info(f"Handling schedule intent: {intent}")
@@ -462,13 +493,13 @@ Kết quả JSON:"""
         
         try:
             if intent == 'schedule':
-                return self._handle_schedule_creation(user_id, ollama_data)
+                return self._handle_schedule_creation(context, ollama_data)
             elif intent == 'query':
-                return self._handle_schedule_query(user_id, ollama_data)
+                return self._handle_schedule_query(context, ollama_data)
             elif intent == 'update':
-                return self._handle_schedule_update(user_id, ollama_data)
+                return self._handle_schedule_update(context, ollama_data)
             elif intent == 'delete':
-                return self._handle_schedule_deletion(user_id, ollama_data)
+                return self._handle_schedule_deletion(context, ollama_data)
             else:
                 logger.error(f"Unknown schedule intent: {intent}")
                 return self._create_error_response('Không hiểu yêu cầu về lịch trình')
@@ -477,11 +508,8 @@ Kết quả JSON:"""
             logger.error(f"Error handling schedule intent: {e}")
             return self._create_error_response('Có lỗi khi xử lý lịch trình')
     
-    def _handle_schedule_creation(self, user_id: int, ollama_data: Dict) -> Dict[str, Any]:
+    def _handle_schedule_creation(self, context: RequestContext, ollama_data: Dict) -> Dict[str, Any]:
         try:
-            if not self._check_user_exists(user_id):
-                return self._create_error_response('Người dùng không tồn tại.')
-            
             schedule_data = ollama_data.get('schedule_data', {})
             
             event = schedule_data.get('event', '').strip()
@@ -495,7 +523,8 @@ Kết quả JSON:"""
             
             prepared_data = self._prepare_schedule_data(schedule_data)
             
-            schedule_id = self.schedule_model.create_schedule(user_id, prepared_data)
+            schedule_id = self.schedule_model.create_schedule(context.user_id, prepared_data)
+            context.invalidate_schedules()
             
             return self._create_schedule_success_response(prepared_data, schedule_id)
             
@@ -514,7 +543,8 @@ Kết quả JSON:"""
         try:
             start_time = datetime.strptime(datetime_str, '%Y-%m-%d %H:%M:%S')
         except ValueError:
-            start_time = datetime.now() + timedelta(hours=1)
+            # Giờ lưu trong DB là giờ địa phương không kèm múi giờ, như datetime do temporal trả về
+            start_time = temporal.now_in(self.timezone).replace(tzinfo=None) + timedelta(hours=1)
         
         end_time_str = schedule_data.get('end_time')
         if end_time_str:
@@ -579,15 +609,16 @@ Kết quả JSON:"""
             }
         }
     
-    def _handle_schedule_query(self, user_id: int, ollama_data: Dict) -> Dict[str, Any]:
+    def _handle_schedule_query(self, context: RequestContext, ollama_data: Dict) -> Dict[str, Any]:
         try:
-            if not self._check_user_exists(user_id):
-                return self._create_error_response('Người dùng không tồn tại.')
-            
             query_scope = ollama_data.get('query_scope', 'all')
             target_date = self._calculate_target_date(query_scope)
             
-            schedules = self.schedule_model.get_user_schedules(user_id, target_date)
+            if target_date:
+                schedules = self.schedule_model.get_user_schedules(context.user_id, target_date)
+            else:
+                # Cùng truy vấn đã chạy để dựng prompt, dùng lại kết quả
+                schedules = context.schedules(self.schedule_model.get_user_schedules)
             
             if schedules:
                 return self._create_schedule_list_response(schedules, query_scope)
@@ -599,7 +630,7 @@ Kết quả JSON:"""
             return self._create_error_response('Có lỗi khi truy vấn lịch trình')
     
     def _calculate_target_date(self, query_scope: str) -> Optional[str]:
-        now = datetime.now()
+        now = temporal.now_in(self.timezone)
         
         if query_scope == 'today':
             return now.strftime('%Y-%m-%d')
@@ -725,11 +756,8 @@ Kết quả JSON:"""
             'schedule_ids': []
         }
     
-    def _handle_schedule_update(self, user_id: int, ollama_data: Dict) -> Dict[str, Any]:
+    def _handle_schedule_update(self, context: RequestContext, ollama_data: Dict) -> Dict[str, Any]:
         try:
-            if not self._check_user_exists(user_id):
-                return self._create_error_response('Người dùng không tồn tại.')
-            
             schedule_id = ollama_data.get('schedule_id')
             schedule_data = ollama_data.get('schedule_data', {})
             
@@ -749,9 +777,10 @@ Kết quả JSON:"""
             if not update_data:
                 return self._create_error_response('Vui lòng cung cấp thông tin cần cập nhật')
             
-            success = self.schedule_model.update_schedule(schedule_id, update_data)
+            updated = self.schedule_model.update_owned_schedule(schedule_id, context.user_id, update_data)
+            context.invalidate_schedules()
             
-            if success:
+            if updated:
                 return {
                     'success': True,
                     'message': f' Đã cập nhật lịch trình ID {schedule_id}',
@@ -759,23 +788,21 @@ Kết quả JSON:"""
                     'type': 'schedule_updated'
                 }
             else:
-                return self._create_error_response('Không thể cập nhật lịch trình')
+                return self._create_error_response(f'Không tìm thấy lịch trình ID {schedule_id} để cập nhật')
                 
         except Exception as e:
             logger.error(f"Error updating schedule: {e}")
             return self._create_error_response('Có lỗi khi sửa lịch trình')
     
-    def _handle_schedule_deletion(self, user_id: int, ollama_data: Dict) -> Dict[str, Any]:
+    def _handle_schedule_deletion(self, context: RequestContext, ollama_data: Dict) -> Dict[str, Any]:
         try:
-            if not self._check_user_exists(user_id):
-                return self._create_error_response('Người dùng không tồn tại.')
-            
             schedule_id = ollama_data.get('schedule_id')
             event_keyword = ollama_data.get('event_keyword', '').strip()
             
             if schedule_id:
-                success = self.schedule_model.delete_schedule(schedule_id)
-                if success:
+                deleted = self.schedule_model.delete_owned_schedule(schedule_id, context.user_id)
+                context.invalidate_schedules()
+                if deleted:
                     return {
                         'success': True,
                         'message': f' Đã xóa lịch trình ID {schedule_id}',
@@ -786,7 +813,7 @@ Kết quả JSON:"""
                     return self._create_error_response('Không tìm thấy lịch trình để xóa')
             
             elif event_keyword:
-                all_schedules = self.schedule_model.get_user_schedules(user_id)
+                all_schedules = context.schedules(self.schedule_model.get_user_schedules)
                 matching_schedules = []
                 
                 for schedule in all_schedules:
@@ -798,14 +825,16 @@ Kết quả JSON:"""
                     schedule_to_delete = matching_schedules[0]
                     schedule_id_to_delete = self._get_schedule_id(schedule_to_delete)
                     
-                    success = self.schedule_model.delete_schedule(schedule_id_to_delete)
-                    if success:
+                    deleted = self.schedule_model.delete_owned_schedule(schedule_id_to_delete, context.user_id)
+                    context.invalidate_schedules()
+                    if deleted:
                         return {
                             'success': True,
                             'message': f' Đã xóa lịch trình "{self._get_schedule_event(schedule_to_delete)}"',
                             'schedule_id': schedule_id_to_delete,
                             'type': 'schedule_deleted'
                         }
+                    return self._create_error_response('Không tìm thấy lịch trình để xóa')
                 elif len(matching_schedules) > 1:
                     return self._handle_multiple_matches(matching_schedules, "xóa")
                 else:
@@ -904,12 +933,3 @@ Kết quả JSON:"""
             'message': message,
             'type': 'error'
         }
-    
-    def _check_user_exists(self, user_id: int) -> bool:
-        try:
-            query = "SELECT id FROM users WHERE id = %s"
-            result = self.db.execute_query(query, (user_id,), fetch=True)
-            return len(result) > 0
-        except Exception as e:
-            logger.error(f"Error checking user: {e}")
-            return False
\ No newline at end of file
@@ -1,5 +1,6 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 import logging
 from config import config
 import time
@@ -8,9 +9,30 @@ from ai_assistant import PersonalAssistant
 import jwt
 import datetime
 from functools import wraps
-import hashlib
+import hmac
+import os
 import re
+import threading
 from models import UserModel
+from request_context import RequestContext
+from cache import calendar_cache
+from stats import schedule_stats
+from schedule_jobs import calendar_cache_key
+import metrics
+import profiling
+import jobs
+import streaming
+import schedule_io
+import temporal
+import schedule_jobs
+import shared_state
+from health import health_monitor
+import ratelimit
+from ratelimit import rate_limit
+import passwords
+from passwords import PasswordHasherBusy
+import tokens
+from tokens import TokenRevoked, token_service
 
 
 logging.basicConfig(level=logging.INFO)
@@ -18,43 +40,179 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+# Được create_app() gán; import module không mở kết nối hay nạp model nào
+app_config = None
+db_manager = None
+assistant = None
+_assistant_retry_at = 0.0
+_assistant_lock = threading.Lock()
+_background_pid = None
+_background_lock = threading.Lock()
 
-try:
-    app_config = config['development']
-    app.config.from_object(app_config)
-    logger.info("Configuration loaded successfully")
-except Exception as e:
-    logger.error(f"Failed to load configuration: {e}")
-    app_config = None
-
-app.config['JWT_SECRET_KEY'] = app.config.get('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = datetime.timedelta(hours=24)
-CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True)
 
+def create_app(config_name: str = None, start_background: bool = True) -> Flask:
+    """
+    Cấu hình app và tạo các service. Không chạm tới MySQL hay LLM: pool được
+    tạo ở request đầu tiên cần DB (thử lại nếu MySQL chưa lên), assistant ở
+    request chat đầu tiên. Gọi lại nhiều lần chỉ cấu hình một lần.
 
-# init variable
+    start_background=False khi process này sẽ fork ra worker (gunicorn
+    preload_app): thread nền không sống qua fork, nên mỗi worker tự chạy
+    start_background_services() trong hook post_fork, hoặc ở request đầu tiên.
+    """
+    global app_config, db_manager
+    if app_config is not None:
+        if start_background:
+            start_background_services()
+        return app
 
-db_manager = None
-assistant = None
+    try:
+        app_config = config.get(config_name or os.getenv('FLASK_ENV', 'development'), config['default'])
+        app.config.from_object(app_config)
+        logger.info("Configuration loaded successfully")
+    except Exception as e:
+        logger.error(f"Failed to load configuration: {e}")
+        app_config = None
 
-try:
+    app.config['JWT_SECRET_KEY'] = app.config.get('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
+    CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True)
     if app_config:
-        db_manager = DatabaseManager(app_config)
-        logger.info("DatabaseManager initialized successfully")
-    else:
-        logger.error("Cannot initialize DatabaseManager: app_config is None")
-except Exception as e:
-    logger.error(f"Failed to initialize DatabaseManager: {e}")
-
-try:
-    if app_config and db_manager:
-        assistant = PersonalAssistant(app_config, db_manager)
-        logger.info("PersonalAssistant initialized successfully")
-        logger.info(f"Using Ollama model: {getattr(app_config, 'OLLAMA_MODEL', 'llama2')}")
-    else:
-        logger.warning("Cannot initialize PersonalAssistant due to missing dependencies")
-except Exception as e:
-    logger.error(f"Failed to initialize PersonalAssistant: {e}")
+        metrics.configure(app_config)
+    metrics.init_app(app, is_admin_request)
+    if app_config:
+        profiling.configure(app_config)
+    profiling.init_app(app, is_admin_request)
+
+    try:
+        if app_config:
+            shared_state.configure(app_config)
+    except Exception as e:
+        logger.error(f"Failed to configure shared state, using in-process memory: {e}")
+
+    try:
+        if app_config:
+            ratelimit.configure(app_config)
+    except Exception as e:
+        logger.error(f"Failed to configure rate limiting, requests are not limited: {e}")
+
+    try:
+        if app_config:
+            passwords.configure(app_config)
+    except Exception as e:
+        logger.error(f"Failed to configure password hashing, using defaults: {e}")
+
+    try:
+        if app_config:
+            tokens.configure(app_config)
+    except Exception as e:
+        logger.error(f"Failed to configure tokens: {e}")
+
+    try:
+        if app_config:
+            db_manager = DatabaseManager(app_config)
+            logger.info("DatabaseManager initialized successfully")
+        else:
+            logger.error("Cannot initialize DatabaseManager: app_config is None")
+    except Exception as e:
+        logger.error(f"Failed to initialize DatabaseManager: {e}")
+
+    if start_background:
+        start_background_services()
+    return app
+
+
+def start_background_services():
+    """Job queue, đối soát thống kê, theo dõi replica: một lần cho mỗi process (worker)."""
+    global _background_pid
+    if not db_manager or _background_pid == os.getpid():
+        return
+    with _background_lock:
+        if _background_pid == os.getpid():
+            return
+        _background_pid = os.getpid()
+        from models import ScheduleModel
+        schedule_stats.start_reconciler(
+            ScheduleModel(db_manager),
+            getattr(app_config, 'STATS_RECONCILE_INTERVAL', 900)
+        )
+        try:
+            jobs.configure(app_config)
+            schedule_jobs.register(db_manager)
+            jobs.job_queue.start()
+        except Exception as e:
+            logger.error(f"Failed to start job queue: {e}")
+        db_manager.start_replica_monitor()
+        token_service.start_sync(db_manager)
+        metrics.snapshots.start()
+        register_health_checks()
+        health_monitor.start()
+
+
+def register_health_checks():
+    health_monitor.interval = getattr(app_config, 'HEALTH_CHECK_INTERVAL', 10)
+
+    def database_check():
+        return {'ok': db_manager.check_connection(), 'pool': db_manager.pool_status(),
+                'replicas': db_manager.replica_status()}
+
+    def llm_check():
+        # Tạo assistant ở đây (thread nền) thay vì ở request chat đầu tiên
+        current = get_assistant()
+        if current is None:
+            return {'ok': False, 'error': 'assistant not initialized'}
+        return {'ok': current.llm.health(), 'backend': current.llm.name, 'model': current.llm.model}
+
+    def queues_check():
+        current = assistant
+        return {
+            'ok': jobs.job_queue.running,
+            'jobs_pending': jobs.job_queue.store.pending(),
+            'llm_queued': current.batcher.stats()['queued'] if current and current.batcher else 0
+        }
+
+    health_monitor.register('database', database_check)
+    health_monitor.register('llm', llm_check, critical=False)
+    health_monitor.register('queues', queues_check, critical=False)
+    def token_revocations_check():
+        synced_at = token_service.revocations.synced_at
+        age = time.time() - synced_at if synced_at else None
+        return {'ok': age is not None and age < token_service.sync_interval * 3,
+                'synced_seconds_ago': round(age, 1) if age is not None else None,
+                **token_service.revocations.size()}
+
+    health_monitor.register('token_revocations', token_revocations_check, critical=False)
+    health_monitor.register('shared_state', lambda: {'ok': shared_state.shared.ping(),
+                                                     'backend': shared_state.shared.backend.name}, critical=False)
+
+
+@app.before_request
+def _ensure_background_services():
+    # Server WSGI không có hook post_fork: khởi động ở request đầu tiên của worker
+    if _background_pid != os.getpid():
+        start_background_services()
+
+
+def get_assistant():
+    """PersonalAssistant, tạo ở lần đầu cần; lỗi khởi tạo được thử lại sau 30 giây."""
+    global assistant, _assistant_retry_at
+    if assistant is not None or not (app_config and db_manager) or time.monotonic() < _assistant_retry_at:
+        return assistant
+    with _assistant_lock:
+        if assistant is None and time.monotonic() >= _assistant_retry_at:
+            try:
+                assistant = PersonalAssistant(app_config, db_manager)
+                logger.info("PersonalAssistant initialized successfully")
+                logger.info(f"Using LLM backend: {assistant.llm.name} ({assistant.llm.model})")
+            except Exception as e:
+                logger.error(f"Failed to initialize PersonalAssistant: {e}")
+                _assistant_retry_at = time.monotonic() + 30
+    return assistant
+
+
+def is_admin_request() -> bool:
+    admin_token = app_config.ADMIN_TOKEN if app_config else ''
+    provided = request.headers.get('X-Admin-Token', '')
+    return bool(admin_token) and hmac.compare_digest(provided, admin_token)
 
 def validate_email(email: str) -> bool:
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -86,76 +244,77 @@ def token_required(f):
                 'message': 'Token là bắt buộc'
             }), 401
         
-        try:
+        with profiling.timed('auth'):
+            try:
          
-            data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=["HS256"])
-            current_user_id = data['user_id']
+                # Chữ ký, hạn và bộ thu hồi trong bộ nhớ: không truy vấn DB
+                data = token_service.decode(token)
+                current_user_id = data['user_id']
             
             
-            if not db_manager:
-                return jsonify({
-                    'success': False,
-                    'message': 'Database service unavailable'
-                }), 503
+                if not db_manager:
+                    return jsonify({
+                        'success': False,
+                        'message': 'Database service unavailable'
+                    }), 503
                 
-            user_model = UserModel(db_manager)
-            current_user = user_model.get_user_by_id(current_user_id)
+         
+                request.user_id = current_user_id
+                request.token_claims = data
+                request.context = RequestContext(current_user_id)
             
-            if not current_user:
+            except jwt.ExpiredSignatureError:
                 return jsonify({
                     'success': False,
-                    'message': 'Người dùng không tồn tại'
+                    'message': 'Token đã hết hạn'
                 }), 401
-                
-         
-            request.user_id = current_user_id
-            request.current_user = current_user
-            
-        except jwt.ExpiredSignatureError:
-            return jsonify({
-                'success': False,
-                'message': 'Token đã hết hạn'
-            }), 401
-        except jwt.InvalidTokenError as e:
-            logger.error(f"Invalid token error: {e}")
-            return jsonify({
-                'success': False,
-                'message': 'Token không hợp lệ'
-            }), 401
-        except Exception as e:
-            logger.error(f"Token validation error: {e}")
+            except TokenRevoked:
+                return jsonify({
+                    'success': False,
+                    'message': 'Token đã bị thu hồi'
+                }), 401
+            except jwt.InvalidTokenError as e:
+                logger.error(f"Invalid token error: {e}")
+                return jsonify({
+                    'success': False,
+                    'message': 'Token không hợp lệ'
+                }), 401
+            except Exception as e:
+                logger.error(f"Token validation error: {e}")
+                return jsonify({
+                    'success': False,
+                    'message': 'Lỗi xác thực token'
+                }), 500
+        
+        # Câu ghi trong request đánh dấu user; câu đọc sau đó của user đi primary một lúc
+        with db_manager.bind_user(current_user_id):
+            return f(*args, **kwargs)
+    
+    return decorated
+
+def admin_required(f):
+    
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not is_admin_request():
             return jsonify({
                 'success': False,
-                'message': 'Lỗi xác thực token'
-            }), 500
+                'message': 'Không có quyền truy cập'
+            }), 403
         
         return f(*args, **kwargs)
     
     return decorated
 
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def verify_password(password: str, hashed_password: str) -> bool:
-    return hash_password(password) == hashed_password
-
-def generate_token(user_id: int) -> str:
-    try:
-        payload = {
-            'user_id': user_id,
-            'exp': datetime.datetime.now(datetime.timezone.utc) + app.config['JWT_ACCESS_TOKEN_EXPIRES']
-        }
-        
-        token = jwt.encode(payload, app.config['JWT_SECRET_KEY'], algorithm="HS256")
-        
-      
-        if isinstance(token, bytes):
-            token = token.decode('utf-8')
-            
-        return token
-    except Exception as e:
-        logger.error(f"Token generation error: {e}")
-        raise
+def password_busy_response():
+    # Pool băm mật khẩu đã đầy (đợt login dồn dập): báo client thử lại thay vì giữ thread chờ
+    response = jsonify({
+        'success': False,
+        'message': 'Hệ thống đang bận, vui lòng thử lại sau'
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
 
 def check_db_connection():
   
@@ -165,6 +324,7 @@ def check_db_connection():
     return True
 
 @app.route('/api/auth/register', methods=['POST'])
+@rate_limit('auth')
 def register():
   
     try:
@@ -209,30 +369,26 @@ def register():
             }), 400
         
         user_model = UserModel(db_manager)
-
-  
-        if user_model.get_user_by_email(email):
-            return jsonify({
-                'success': False,
-                'message': 'Email đã được đăng ký'
-            }), 400
-
-
-        hashed_password = hash_password(password)
         
-    
-        user_id = user_model.create_user(
-            email=email,
-            password=hashed_password,
-            fullname=fullname
-        )
+        # Băm mật khẩu trước khi mở transaction để không giữ kết nối trong lúc băm
+        hashed_password = passwords.hash_password(password)
         
-        if user_id:
-            
-            token = generate_token(user_id)
-            
+        # Kiểm tra email, INSERT và đọc lại user trên cùng một kết nối
+        with db_manager.transaction():
+            if user_model.get_user_by_email(email):
+                return jsonify({
+                    'success': False,
+                    'message': 'Email đã được đăng ký'
+                }), 400
             
-            user = user_model.get_user_by_id(user_id)
+            user_id = user_model.create_user(
+                email=email,
+                password=hashed_password,
+                fullname=fullname
+            )
+            user = user_model.get_user_by_id(user_id) if user_id else None
+        
+        if user_id:
             
             if user:
                 return jsonify({
@@ -243,7 +399,7 @@ def register():
                         'email': user.email,
                         'fullname': user.fullname
                     },
-                    'token': token
+                    **token_service.issue(user_id)
                 })
             else:
                 logger.error(f"User created but not found: {user_id}")
@@ -257,6 +413,8 @@ def register():
                 'message': 'Đăng ký thất bại'
             }), 500
         
+    except PasswordHasherBusy:
+        return password_busy_response()
     except Exception as e:
         logger.error(f"Registration error: {e}")
         return jsonify({
@@ -265,6 +423,7 @@ def register():
         }), 500
 
 @app.route('/api/auth/login', methods=['POST'])
+@rate_limit('auth')
 def login():
    
     try:
@@ -306,21 +465,28 @@ def login():
         user = user_model.get_user_by_email(email)
         
         if not user:
+            # Vẫn chạy KDF để thời gian trả lời không lộ email nào đã đăng ký
+            passwords.hasher.burn(password)
             return jsonify({
                 'success': False,
                 'message': 'Email hoặc mật khẩu không đúng'
             }), 401
         
      
-        if not verify_password(password, user.password):
+        valid, needs_rehash = passwords.verify_password(password, user.password)
+        if not valid:
             return jsonify({
                 'success': False,
                 'message': 'Email hoặc mật khẩu không đúng'
             }), 401
 
-      
-        token = generate_token(user.id)
-       
+        # Hash SHA-256 cũ hoặc cost scrypt đã đổi: băm lại ngay khi có mật khẩu gốc
+        if needs_rehash:
+            try:
+                user_model.update_user(user.id, {'password': passwords.hash_password(password)})
+            except Exception as e:
+                logger.warning(f"Password rehash failed for user {user.id}: {e}")
+
         return jsonify({
             'success': True,
             'message': 'Đăng nhập thành công',
@@ -330,9 +496,11 @@ def login():
                 'fullname': user.fullname,
                 'created_at': user.created_at.isoformat() if hasattr(user.created_at, 'isoformat') else str(user.created_at)
             },
-            'token': token
+            **token_service.issue(user.id)
         })
         
+    except PasswordHasherBusy:
+        return password_busy_response()
     except Exception as e:
         logger.error(f"Login error: {e}")
         return jsonify({
@@ -342,6 +510,7 @@ def login():
 
 @app.route('/api/auth/me', methods=['GET'])
 @token_required
+@rate_limit('crud')
 def get_current_user():
     
     try:
@@ -380,6 +549,7 @@ def get_current_user():
 
 @app.route('/api/auth/update-profile', methods=['PUT'])
 @token_required
+@rate_limit('crud')
 def update_profile():
     try:
         if not check_db_connection():
@@ -412,18 +582,12 @@ def update_profile():
                 }), 400
 
 
-            existing_user = user_model.get_user_by_email(email)
-            if existing_user and existing_user.id != request.user_id:
-                return jsonify({
-                    'success': False,
-                    'message': 'Email đã được sử dụng'
-                }), 400
             update_data['email'] = email
 
  
         if 'current_password' in data and 'new_password' in data:
             user = user_model.get_user_by_id(request.user_id)
-            if not verify_password(data['current_password'], user.password):
+            if not user or not passwords.verify_password(data['current_password'], user.password)[0]:
                 return jsonify({
                     'success': False,
                     'message': 'Mật khẩu hiện tại không đúng'
@@ -435,15 +599,25 @@ def update_profile():
                     'message': 'Mật khẩu mới phải có ít nhất 6 ký tự'
                 }), 400
             
-            update_data['password'] = hash_password(data['new_password'])
+            update_data['password'] = passwords.hash_password(data['new_password'])
         
         
         if update_data:
-            success = user_model.update_user(request.user_id, update_data)
+            # Kiểm tra email trùng, cập nhật và đọc lại trong cùng một transaction
+            with db_manager.transaction():
+                if 'email' in update_data:
+                    existing_user = user_model.get_user_by_email(update_data['email'])
+                    if existing_user and existing_user.id != request.user_id:
+                        return jsonify({
+                            'success': False,
+                            'message': 'Email đã được sử dụng'
+                        }), 400
+
+                success = user_model.update_user(request.user_id, update_data)
+                updated_user = user_model.get_user_by_id(request.user_id) if success else None
             
             if success:
-                updated_user = user_model.get_user_by_id(request.user_id)
-                return jsonify({
+                result = {
                     'success': True,
                     'message': 'Cập nhật thông tin thành công',
                     'user': {
@@ -451,7 +625,13 @@ def update_profile():
                         'email': updated_user.email,
                         'fullname': updated_user.fullname
                     }
-                })
+                }
+                # Đổi mật khẩu: đăng xuất mọi phiên khác, phiên hiện tại nhận cặp token mới
+                if 'password' in update_data:
+                    if not token_service.revoke_user(db_manager, request.user_id):
+                        logger.error(f"Could not persist token revocation for user {request.user_id}")
+                    result.update(token_service.issue(request.user_id))
+                return jsonify(result)
             else:
                 return jsonify({
                     'success': False,
@@ -463,6 +643,8 @@ def update_profile():
                 'message': 'Không có dữ liệu để cập nhật'
             }), 400
         
+    except PasswordHasherBusy:
+        return password_busy_response()
     except Exception as e:
         logger.error(f"Update profile error: {e}")
         return jsonify({
@@ -470,16 +652,96 @@ def update_profile():
             'message': 'Có lỗi xảy ra khi cập nhật thông tin'
         }), 500
 
+@app.route('/api/auth/refresh', methods=['POST'])
+@rate_limit('auth')
+def refresh_token():
+    try:
+        if not check_db_connection():
+            return jsonify({
+                'success': False,
+                'message': 'Database service unavailable'
+            }), 503
+
+        data = request.get_json(silent=True) or {}
+        if not data.get('refresh_token'):
+            return jsonify({
+                'success': False,
+                'message': 'Thiếu trường bắt buộc: refresh_token'
+            }), 400
+
+        issued = token_service.refresh(db_manager, data['refresh_token'])
+        if issued is None:
+            return jsonify({
+                'success': False,
+                'message': 'Database service unavailable'
+            }), 503
+
+        return jsonify({
+            'success': True,
+            'message': 'Làm mới token thành công',
+            **issued
+        })
+
+    except jwt.ExpiredSignatureError:
+        return jsonify({
+            'success': False,
+            'message': 'Refresh token đã hết hạn'
+        }), 401
+    except jwt.InvalidTokenError:
+        return jsonify({
+            'success': False,
+            'message': 'Refresh token không hợp lệ'
+        }), 401
+    except Exception as e:
+        logger.error(f"Refresh token error: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Có lỗi xảy ra khi làm mới token'
+        }), 500
+
+@app.route('/api/auth/logout', methods=['POST'])
+@token_required
+@rate_limit('crud')
+def logout():
+    try:
+        revoked = token_service.revoke(db_manager, request.token_claims)
+
+        # Thu hồi luôn refresh token của phiên này nếu client gửi lên
+        data = request.get_json(silent=True) or {}
+        if data.get('refresh_token'):
+            try:
+                claims = token_service.decode(data['refresh_token'], tokens.REFRESH)
+                if claims['user_id'] == request.user_id:
+                    revoked = token_service.revoke(db_manager, claims) and revoked
+            except jwt.InvalidTokenError:
+                pass
+
+        if not revoked:
+            logger.error(f"Could not persist token revocation for user {request.user_id}")
+        return jsonify({
+            'success': True,
+            'message': 'Đăng xuất thành công'
+        })
+
+    except Exception as e:
+        logger.error(f"Logout error: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Có lỗi xảy ra khi đăng xuất'
+        }), 500
+
 
 
 # chat controller
 @app.route('/api/chat', methods=['POST'])
 @token_required
+@rate_limit('chat')
 def chat_endpoint():
   
     start_time = time.time()
     
     try:
+        assistant = get_assistant()
         if not assistant:
             return jsonify({
                 'success': False,
@@ -505,7 +767,7 @@ def chat_endpoint():
         logger.info(f"Processing message from user {user_id}: '{message}'")
         
       
-        response = assistant.process_message(user_id, message)
+        response = assistant.process_message(request.context, message)
         
         processing_time = time.time() - start_time
         logger.info(f"Request processed in {processing_time:.2f} seconds")
@@ -528,6 +790,7 @@ def chat_endpoint():
 
 @app.route('/api/schedules', methods=['GET'])
 @token_required
+@rate_limit('crud')
 def get_schedules():
     try:
         if not check_db_connection():
@@ -541,60 +804,8 @@ def get_schedules():
         
         from models import ScheduleModel
         schedule_model = ScheduleModel(db_manager)
-        schedules = schedule_model.get_user_schedules(user_id, date)
-        
-        schedule_list = []
-        for schedule in schedules:
-            if isinstance(schedule, dict):
-                schedule_info = {
-                    'id': schedule.get('id'),
-                    'event': schedule.get('event', ''),
-                    'description': schedule.get('description', ''),
-                    'start_time': schedule.get('start_time'),
-                    'end_time': schedule.get('end_time'),
-                    'location': schedule.get('location'),
-                    'reminder_minutes': schedule.get('reminder_minutes'),
-                    'status': schedule.get('status', 'scheduled'),
-                    'priority': schedule.get('priority', 'medium'),
-                    'category': schedule.get('category', 'general'),
-                    'created_at': schedule.get('created_at'),
-                    'updated_at': schedule.get('updated_at')
-                }
-            else:
-                schedule_info = {
-                    'id': schedule.id,
-                    'event': schedule.event,
-                    'description': schedule.description,
-                    'start_time': schedule.start_time.isoformat() if hasattr(schedule.start_time, 'isoformat') else str(schedule.start_time),
-                    'end_time': schedule.end_time.isoformat() if schedule.end_time and hasattr(schedule.end_time, 'isoformat') else (str(schedule.end_time) if schedule.end_time else None),
-                    'location': schedule.location,
-                    'reminder_minutes': schedule.reminder_minutes,
-                    'status': schedule.status,
-                    'priority': schedule.priority,
-                    'category': schedule.category,
-                    'created_at': schedule.created_at.isoformat() if hasattr(schedule.created_at, 'isoformat') else str(schedule.created_at),
-                    'updated_at': schedule.updated_at.isoformat() if hasattr(schedule.updated_at, 'isoformat') else str(schedule.updated_at)
-                }
-            
-            if schedule_info['start_time'] and hasattr(schedule_info['start_time'], 'isoformat'):
-                schedule_info['start_time'] = schedule_info['start_time'].isoformat()
-            
-            if schedule_info['end_time'] and hasattr(schedule_info['end_time'], 'isoformat'):
-                schedule_info['end_time'] = schedule_info['end_time'].isoformat()
-            
-            if schedule_info.get('created_at') and hasattr(schedule_info['created_at'], 'isoformat'):
-                schedule_info['created_at'] = schedule_info['created_at'].isoformat()
-            
-            if schedule_info.get('updated_at') and hasattr(schedule_info['updated_at'], 'isoformat'):
-                schedule_info['updated_at'] = schedule_info['updated_at'].isoformat()
-            
-            schedule_list.append(schedule_info)
-        
-        return jsonify({
-            'success': True,
-            'schedules': schedule_list,
-            'count': len(schedule_list)
-        })
+        # Ghi dần từng batch từ cursor không buffer, không dựng cả danh sách trong bộ nhớ
+        return streaming.list_response(schedule_model.iter_user_schedules(user_id, date), 'schedules')
         
     except Exception as e:
         logger.error(f"Get schedules error: {e}")
@@ -607,6 +818,7 @@ def get_schedules():
 
 @app.route('/api/schedules/upcoming', methods=['GET'])
 @token_required
+@rate_limit('crud')
 def get_upcoming_schedules():
     try:
         if not check_db_connection():
@@ -658,6 +870,7 @@ def get_upcoming_schedules():
 
 @app.route('/api/schedules', methods=['POST'])
 @token_required
+@rate_limit('crud')
 def create_schedule():
     try:
         if not check_db_connection():
@@ -698,12 +911,14 @@ def create_schedule():
             'status': data.get('status', 'scheduled')
         }
         
-        schedule_id = schedule_model.create_schedule(
-            user_id,
-            data_template
-        )
-        
-        new_schedule = schedule_model.get_schedule_by_id_with_user(schedule_id, user_id)
+        # INSERT và đọc lại dùng chung một kết nối, commit một lần
+        with db_manager.transaction():
+            schedule_id = schedule_model.create_schedule(
+                user_id,
+                data_template
+            )
+            
+            new_schedule = schedule_model.get_schedule_by_id_with_user(schedule_id, user_id)
         
         return jsonify({
             'success': True,
@@ -723,6 +938,7 @@ def create_schedule():
 
 @app.route('/api/schedules/<int:schedule_id>', methods=['PUT'])
 @token_required
+@rate_limit('crud')
 def update_schedule(schedule_id):
     try:
         if not check_db_connection():
@@ -751,39 +967,29 @@ def update_schedule(schedule_id):
         from models import ScheduleModel
         schedule_model = ScheduleModel(db_manager)
         
-        existing_schedule = schedule_model.get_schedule_by_id_with_user(schedule_id, user_id)
-        if not existing_schedule:
-            return jsonify({
-                'success': False,
-                'message': 'Lịch trình không tồn tại'
-            }), 404
-        
+        # Trường không gửi lên giữ nguyên giá trị cũ (riêng end_time được ghi đè như trước)
         update_data = {
             'event': data['event'],
-            'description': data.get('description', existing_schedule.get('description', '')),
             'start_time': data['start_time'],
-            'end_time': data.get('end_time'),
-            'location': data.get('location', existing_schedule.get('location')),
-            'reminder_minutes': data.get('reminder_minutes', existing_schedule.get('reminder_minutes')),
-            'priority': data.get('priority', existing_schedule.get('priority', 'medium')),
-            'category': data.get('category', existing_schedule.get('category', 'general')),
-            'status': data.get('status', existing_schedule.get('status', 'scheduled'))
+            'end_time': data.get('end_time')
         }
+        for field in ('description', 'location', 'reminder_minutes', 'priority', 'category', 'status'):
+            if field in data:
+                update_data[field] = data[field]
         
-        success = schedule_model.update_schedule(schedule_id, update_data)
+        updated_schedule = schedule_model.update_owned_schedule(schedule_id, user_id, update_data)
         
-        if success:
-            updated_schedule = schedule_model.get_schedule_by_id_with_user(schedule_id, user_id)
-            return jsonify({
-                'success': True,
-                'message': 'Cập nhật lịch trình thành công',
-                'schedule': updated_schedule
-            })
-        else:
+        if not updated_schedule:
             return jsonify({
                 'success': False,
-                'message': 'Không thể cập nhật lịch trình'
-            }), 500
+                'message': 'Lịch trình không tồn tại'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'message': 'Cập nhật lịch trình thành công',
+            'schedule': updated_schedule
+        })
         
     except Exception as e:
         logger.error(f"Update schedule error: {e}")
@@ -796,6 +1002,7 @@ def update_schedule(schedule_id):
 
 @app.route('/api/schedules/<int:schedule_id>', methods=['DELETE'])
 @token_required
+@rate_limit('crud')
 def delete_schedule(schedule_id):
     try:
         if not check_db_connection():
@@ -809,35 +1016,27 @@ def delete_schedule(schedule_id):
         from models import ScheduleModel
         schedule_model = ScheduleModel(db_manager)
         
-        existing_schedule = schedule_model.get_schedule_by_id_with_user(schedule_id, user_id)
-        if not existing_schedule:
-            return jsonify({
-                'success': False,
-                'message': f'Lịch trình không tồn tại hoặc bạn không có quyền xóa'
-            }), 404
-        
-
         delete_option = request.args.get('option', 'delete')
         
         if delete_option == 'cancel':
-            success = schedule_model.update_schedule(schedule_id, {'status': 'cancelled'})
+            schedule = schedule_model.update_owned_schedule(schedule_id, user_id, {'status': 'cancelled'})
             message = f'Đã hủy lịch trình ID {schedule_id}'
         else:
-            success = schedule_model.delete_schedule(schedule_id)
+            schedule = schedule_model.delete_owned_schedule(schedule_id, user_id)
             message = f'Đã xóa lịch trình ID {schedule_id}'
         
-        if success:
-            return jsonify({
-                'success': True,
-                'message': message,
-                'schedule_id': schedule_id,
-                'option': delete_option
-            })
-        else:
+        if not schedule:
             return jsonify({
                 'success': False,
-                'message': f'Không thể xóa/hủy lịch trình ID {schedule_id}'
-            }), 500
+                'message': f'Lịch trình không tồn tại hoặc bạn không có quyền xóa'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'message': message,
+            'schedule_id': schedule_id,
+            'option': delete_option
+        })
             
     except Exception as e:
         logger.error(f"Delete schedule error: {e}")
@@ -850,6 +1049,7 @@ def delete_schedule(schedule_id):
 
 @app.route('/api/schedules/search', methods=['GET'])
 @token_required
+@rate_limit('search')
 def search_schedules():
     """
     Tìm kiếm lịch trình
@@ -893,6 +1093,7 @@ def search_schedules():
 
 @app.route('/api/schedules/<int:schedule_id>', methods=['GET'])
 @token_required
+@rate_limit('crud')
 def get_schedule_detail(schedule_id):
     """
     Lấy chi tiết một lịch trình cụ thể
@@ -935,8 +1136,10 @@ def get_schedule_detail(schedule_id):
 # test ollama
 @app.route('/api/test/ollama', methods=['POST'])
 @token_required
+@rate_limit('chat')
 def test_ollama():
     try:
+        assistant = get_assistant()
         if not assistant:
             return jsonify({
                 'success': False,
@@ -948,7 +1151,7 @@ def test_ollama():
         
         logger.info(f"Testing Ollama with message: '{test_message}'")
         
-        response = assistant._call_ollama_for_intent(test_message, request.user_id)
+        response = assistant._call_ollama_for_intent(test_message, request.context)
         
         return jsonify({
             'success': True,
@@ -965,6 +1168,7 @@ def test_ollama():
 
 @app.route('/api/schedules/cursor', methods=['GET'])
 @token_required
+@rate_limit('crud')
 def get_schedules_cursor():
     
     try:
@@ -1042,35 +1246,42 @@ def get_schedules_cursor():
             'message': f'Lỗi khi lấy lịch trình: {str(e)}'
         }), 500
 
+@app.route('/livez', methods=['GET'])
+def liveness():
+    """Process còn phục vụ request; không chạm tới MySQL, LLM hay khóa nào."""
+    return jsonify({'success': True, 'status': 'alive'})
+
+
+@app.route('/readyz', methods=['GET'])
+def readiness():
+    """Kết quả health check nền gần nhất; 503 khi một check critical lỗi hoặc quá cũ."""
+    ready, checks = health_monitor.snapshot()
+    return jsonify({
+        'success': ready,
+        'status': 'ready' if ready else 'not ready',
+        'checks': checks
+    }), 200 if ready else 503
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    try:
-        health_status = {
-            'api': 'running',
-            'database': 'connected' if db_manager and db_manager.check_connection() else 'disconnected',
-            'ai_assistant': 'available' if assistant else 'unavailable',
-            'timestamp': datetime.datetime.now().isoformat()
-        }
-        
-        status_code = 200 if health_status['database'] == 'connected' else 503
-        
-        return jsonify({
-            'success': health_status['database'] == 'connected',
-            'status': health_status
-        }), status_code
-    except Exception as e:
-        logger.error(f"Health check error: {e}")
-        return jsonify({
-            'success': False,
-            'status': {
-                'api': 'error',
-                'error': str(e)
-            }
-        }), 500
-    
+    # Giữ định dạng cũ cho client, nhưng đọc từ kết quả nền như /readyz
+    ready, checks = health_monitor.snapshot()
+    llm = checks.get('llm', {})
+    health_status = {
+        'api': 'running',
+        'database': 'connected' if checks.get('database', {}).get('ok') else 'disconnected',
+        'ai_assistant': 'available' if llm.get('ok') else ('unavailable' if 'checked_at' in llm else 'not loaded'),
+        'timestamp': datetime.datetime.now().isoformat()
+    }
+    return jsonify({
+        'success': health_status['database'] == 'connected',
+        'status': health_status
+    }), 200 if health_status['database'] == 'connected' else 503
 
 @app.route('/api/schedules/range', methods=['GET'])
 @token_required
+@rate_limit('crud')
 def get_schedules_in_range():
     try:
         if not check_db_connection():
@@ -1092,59 +1303,319 @@ def get_schedules_in_range():
         from models import ScheduleModel
         schedule_model = ScheduleModel(db_manager)
 
-        query = """
-            SELECT * FROM schedules 
-            WHERE user_id = %s 
-            AND DATE(start_time) BETWEEN %s AND %s
-            ORDER BY start_time
-        """
-        
-        schedules = schedule_model.db.execute_query(query, (user_id, start_date, end_date), fetch=True)
-        
-        schedule_list = []
-        for schedule in schedules:
-            schedule_info = {
-                'id': schedule['id'],
-                'event': schedule['event'],
-                'description': schedule['description'],
-                'start_time': schedule['start_time'].isoformat() if hasattr(schedule['start_time'], 'isoformat') else str(schedule['start_time']),
-                'end_time': schedule['end_time'].isoformat() if hasattr(schedule['end_time'], 'isoformat') else str(schedule['end_time']),
-                'reminder_minutes':schedule['reminder_minutes'],
-                'location': schedule['location'],
-                'status': schedule['status'],
-                'priority': schedule['priority'],
-                'category': schedule['category'],
-                'user_id': schedule['user_id'],
-                'created_at': schedule['created_at'].isoformat() if hasattr(schedule['created_at'], 'isoformat') else str(schedule['created_at']),
-                'updated_at': schedule['updated_at'].isoformat() if hasattr(schedule['updated_at'], 'isoformat') else str(schedule['updated_at'])
-            }
-            schedule_list.append(schedule_info)
+        schedules = schedule_model.iter_schedules_in_range(user_id, start_date, end_date)
+        return streaming.list_response(schedules, 'schedules')
         
+    except Exception as e:
+        logger.error(f"Get schedules in range error: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Lỗi khi lấy lịch trình'
+        }), 500
+
+def upload_too_large_response(imported: int):
+    limit_mb = (app.config.get('MAX_CONTENT_LENGTH') or 0) / (1024 * 1024)
+    return jsonify({
+        'success': False,
+        'message': f'File quá lớn (tối đa {limit_mb:.3g} MB)' + (
+            f', {imported} lịch trình trước đó đã được lưu' if imported else ''),
+        'imported': imported
+    }), 413
+
+@app.route('/api/schedules/import', methods=['POST'])
+@token_required
+@rate_limit('bulk')
+def import_schedules():
+    """
+    Nhập lịch từ file .ics hoặc .csv: multipart (trường 'file') hoặc body thô
+    với Content-Type text/calendar / text/csv. Định dạng lấy từ ?format=, đuôi
+    file hoặc Content-Type. File được đọc từng dòng và ghi theo batch.
+    """
+    try:
+        if not check_db_connection():
+            return jsonify({
+                'success': False,
+                'message': 'Database service unavailable'
+            }), 503
+
+        upload = request.files.get('file') if request.mimetype == 'multipart/form-data' else None
+        fmt = schedule_io.detect_format(request.args.get('format'),
+                                        upload.filename if upload else None,
+                                        upload.mimetype if upload else request.mimetype)
+        if fmt is None:
+            return jsonify({
+                'success': False,
+                'message': 'Định dạng file không hỗ trợ (chỉ nhận .ics hoặc .csv)'
+            }), 400
+
+        from models import ScheduleModel
+        importer = schedule_io.ScheduleImporter(
+            ScheduleModel(db_manager),
+            tz=temporal.get_timezone(getattr(app_config, 'DEFAULT_TIMEZONE', None)),
+            batch_size=getattr(app_config, 'IMPORT_BATCH_SIZE', 1000),
+            max_errors=getattr(app_config, 'IMPORT_MAX_ERRORS', 50),
+            max_line_length=getattr(app_config, 'IMPORT_MAX_LINE_LENGTH', schedule_io.MAX_LINE_LENGTH)
+        )
+        lines = schedule_io.text_lines(upload.stream if upload else request.stream, importer.max_line_length)
+
+        try:
+            report = importer.run(request.user_id, fmt, lines)
+        except RequestEntityTooLarge as e:  # body thô quá MAX_CONTENT_LENGTH, phát hiện khi đang đọc
+            return upload_too_large_response(getattr(e, 'imported', 0))
+        except ValueError as e:  # gồm cả UnicodeDecodeError
+            imported = getattr(e, 'imported', 0)
+            return jsonify({
+                'success': False,
+                'message': f'File không hợp lệ: {e}' + (
+                    f' ({imported} lịch trình trước đó đã được lưu)' if imported else ''),
+                'imported': imported
+            }), 400
+        except RuntimeError as e:
+            logger.error(f"Import schedules error: {e}")
+            return jsonify({
+                'success': False,
+                'message': 'Lỗi khi ghi lịch trình, các lịch trình trước đó đã được lưu',
+                'imported': getattr(e, 'imported', 0)
+            }), 500
+
         return jsonify({
             'success': True,
-            'schedules': schedule_list,
-            'count': len(schedule_list)
+            'message': f"Đã nhập {report['imported']} lịch trình",
+            **report
         })
-        
+
+    except RequestEntityTooLarge:  # multipart quá MAX_CONTENT_LENGTH, phát hiện khi đọc request.files
+        return upload_too_large_response(0)
     except Exception as e:
-        logger.error(f"Get schedules in range error: {e}")
+        logger.error(f"Import schedules error: {e}")
         return jsonify({
             'success': False,
-            'message': 'Lỗi khi lấy lịch trình'
+            'message': 'Lỗi khi nhập lịch trình'
+        }), 500
+
+@app.route('/api/schedules/export', methods=['GET'])
+@token_required
+@rate_limit('bulk')
+def export_schedules():
+    try:
+        if not check_db_connection():
+            return jsonify({
+                'success': False,
+                'message': 'Database service unavailable'
+            }), 503
+
+        fmt = (request.args.get('format') or 'ics').lower()
+        if fmt not in schedule_io.FORMATS:
+            return jsonify({
+                'success': False,
+                'message': 'Định dạng không hỗ trợ (ics hoặc csv)'
+            }), 400
+
+        from models import ScheduleModel
+        rows = ScheduleModel(db_manager).iter_export_rows(request.user_id)
+        if fmt == 'ics':
+            chunks = schedule_io.iter_ics(rows, temporal.get_timezone(getattr(app_config, 'DEFAULT_TIMEZONE', None)))
+        else:
+            chunks = schedule_io.iter_csv(rows)
+
+        return streaming.text_response(
+            chunks,
+            mimetype=schedule_io.MIMETYPES[fmt],
+            headers={'Content-Disposition': f'attachment; filename="schedules.{fmt}"'}
+        )
+
+    except Exception as e:
+        logger.error(f"Export schedules error: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Lỗi khi xuất lịch trình'
+        }), 500
+
+@app.route('/api/schedules/stats', methods=['GET'])
+@token_required
+@rate_limit('crud')
+def get_schedule_stats():
+    """
+    Thống kê lịch trình theo ngày, danh mục, độ ưu tiên và trạng thái.
+    Có thể lọc phần theo ngày bằng from/to (YYYY-MM-DD).
+    """
+    try:
+        if not check_db_connection():
+            return jsonify({
+                'success': False,
+                'message': 'Database service unavailable'
+            }), 503
+
+        from models import ScheduleModel
+        schedule_model = ScheduleModel(db_manager)
+
+        stats = schedule_model.get_schedule_stats(
+            request.user_id,
+            day_from=request.args.get('from'),
+            day_to=request.args.get('to')
+        )
+
+        if stats is None:
+            return jsonify({
+                'success': False,
+                'message': 'Không thể tính thống kê lịch trình'
+            }), 500
+
+        return jsonify({
+            'success': True,
+            'stats': stats
+        })
+
+    except Exception as e:
+        logger.error(f"Get schedule stats error: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Lỗi khi lấy thống kê lịch trình'
         }), 500
 
+@app.route('/api/schedules/calendar', methods=['GET'])
+@token_required
+@rate_limit('crud')
+def get_calendar_month():
+    """
+    Dữ liệu cho lưới lịch tháng: chỉ các trường cần hiển thị,
+    kèm tổng hợp theo ngày nếu truyền summary=true.
+    """
+    try:
+        if not check_db_connection():
+            return jsonify({
+                'success': False,
+                'message': 'Database service unavailable'
+            }), 503
+
+        user_id = request.user_id
+        month = request.args.get('month')
+        include_summary = request.args.get('summary', 'false').lower() in ('1', 'true', 'yes')
+        include_items = request.args.get('items', 'true').lower() in ('1', 'true', 'yes')
+
+        try:
+            month_start = datetime.datetime.strptime(month, '%Y-%m') if month else datetime.datetime.now().replace(day=1)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'Tham số month phải có dạng YYYY-MM'
+            }), 400
+
+        month_key = month_start.strftime('%Y-%m')
+        cache_key = calendar_cache_key(user_id, month_key, include_items, include_summary)
+        cached = calendar_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(cached)
+
+        from models import ScheduleModel
+        schedule_model = ScheduleModel(db_manager)
+        payload = schedule_model.get_calendar_month(user_id, month_start, include_items, include_summary)
+        if payload is None:
+            # Lỗi đọc không được cache, nếu không lịch trống sẽ hiện suốt TTL
+            return jsonify({
+                'success': False,
+                'message': 'Lỗi khi lấy lịch tháng'
+            }), 500
+
+        calendar_cache.set(cache_key, payload)
+
+        return jsonify(payload)
+
+    except Exception as e:
+        logger.error(f"Get calendar month error: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Lỗi khi lấy lịch tháng'
+        }), 500
+
+# admin controller
+@app.route('/api/admin/slow-queries', methods=['GET', 'DELETE'])
+@admin_required
+def slow_queries():
+    if not db_manager:
+        return jsonify({
+            'success': False,
+            'message': 'Database service unavailable'
+        }), 503
+
+    slow_log = db_manager.slow_query_log
+
+    if request.method == 'DELETE':
+        slow_log.clear()
+        return jsonify({
+            'success': True,
+            'message': 'Đã xóa slow query log'
+        })
+
+    limit = request.args.get('limit', type=int)
+    entries = slow_log.entries(limit)
+
+    return jsonify({
+        'success': True,
+        'threshold_ms': slow_log.threshold_ms,
+        'explain_enabled': slow_log.explain,
+        'queries': entries,
+        'count': len(entries)
+    })
+
+@app.route('/api/admin/replicas', methods=['GET'])
+@admin_required
+def replica_status():
+    return jsonify({
+        'success': True,
+        'max_lag_seconds': db_manager.replica_max_lag if db_manager else None,
+        'replicas': db_manager.replica_status() if db_manager else []
+    })
+
+@app.route('/api/admin/jobs', methods=['GET'])
+@admin_required
+def job_stats():
+    return jsonify({
+        'success': True,
+        'jobs': jobs.job_queue.stats()
+    })
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@admin_required
+def list_profiles():
+    limit = request.args.get('limit', type=int)
+    profiles = profiling.profiler.results(limit)
+
+    return jsonify({
+        'success': True,
+        'sample_rate': profiling.profiler.sample_rate,
+        'routes': sorted(profiling.profiler.routes),
+        'profiles': profiles,
+        'count': len(profiles)
+    })
+
+@app.route('/api/admin/profiles/<profile_id>/stacks', methods=['GET'])
+@admin_required
+def get_profile_stacks(profile_id):
+    folded = profiling.profiler.folded_stacks(profile_id)
+
+    if folded is None:
+        return jsonify({
+            'success': False,
+            'message': 'Profile không tồn tại'
+        }), 404
+
+    return Response(folded, mimetype='text/plain')
+
 if __name__ == '__main__':
+    create_app()
     logger.info("=" * 50)
     logger.info("Starting Personal Scheduler API with Ollama Integration")
     logger.info("=" * 50)
     
     if app_config:
+        logger.info(f"LLM Backend: {getattr(app_config, 'LLM_BACKEND', 'ollama')}")
         logger.info(f"Ollama URL: {getattr(app_config, 'OLLAMA_URL', 'http://localhost:11434')}")
-        logger.info(f"Ollama Model: {getattr(app_config, 'OLLAMA_MODEL', 'mistral')}")
+        logger.info(f"LLM Model: {getattr(app_config, 'LLM_MODEL', 'mistral')}")
     
     logger.info(f"JWT Authentication: Enabled")
     logger.info(f"Database Status: {'Connected' if db_manager else 'Disconnected'}")
-    logger.info(f"AI Assistant Status: {'Available' if assistant else 'Unavailable'}")
+    logger.info(f"AI Assistant Status: {'Available' if get_assistant() else 'Unavailable'}")
     logger.info("=" * 50)
     
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""
+Microbenchmark cho các hàm phân tích/tạo prompt của ai_assistant, chạy offline
+(không cần MySQL hay Ollama).
+
+    python -m benchmarks.bench_assistant
+    python -m benchmarks.bench_assistant --filter prompt --sizes 10,1000 --output benchmarks/baselines/assistant.json
+    python -m benchmarks.bench_assistant --compare benchmarks/baselines/assistant.json
+
+Mỗi mục báo cáo thời gian mỗi lần gọi (p50/p95/p99), cùng số block bộ nhớ còn
+giữ lại sau mỗi lần gọi và đỉnh bộ nhớ cấp phát, đo bằng tracemalloc trong một
+lượt chạy riêng (để không làm sai số thời gian).
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import compare, summarize, write_results
+from benchmarks import corpus
+from ai_assistant import PersonalAssistant
+from config import config
+from request_context import RequestContext
+
+
+class _ContextModel:
+    """Thay schedule_model để _get_user_schedules_context đọc từ corpus thay vì MySQL."""
+
+    def __init__(self, schedules):
+        self.schedules = schedules
+
+    def get_user_schedules(self, user_id, target_date=None):
+        return self.schedules
+
+
+def measure(func, inputs, min_time: float, min_rounds: int):
+    """Chạy func lần lượt trên inputs cho đến khi đủ min_time giây và min_rounds vòng."""
+    samples = []
+    rounds = 0
+    deadline = time.perf_counter() + min_time
+    while rounds < min_rounds or time.perf_counter() < deadline:
+        for args in inputs:
+            started = time.perf_counter()
+            func(*args)
+            samples.append(time.perf_counter() - started)
+        rounds += 1
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    for args in inputs:
+        func(*args)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, 'filename')
+    retained = sum(max(stat.count_diff, 0) for stat in stats)
+
+    result = summarize(samples)
+    result['retained_blocks_per_call'] = round(retained / len(inputs), 1)
+    result['peak_kib'] = round(peak / 1024, 1)
+    return result
+
+
+def build_cases(assistant: PersonalAssistant, sizes):
+    messages = [(m,) for m in corpus.all_messages()]
+    cases = {}
+
+    for group, group_messages in corpus.MESSAGES.items():
+        inputs = [(m,) for m in group_messages]
+        cases[f'extract_reminder_minutes[{group}]'] = (assistant._extract_reminder_minutes, inputs)
+        cases[f'extract_location[{group}]'] = (assistant._extract_location, inputs)
+
+    cases['detect_category'] = (assistant._detect_category, messages)
+    cases['detect_priority'] = (assistant._detect_priority, messages)
+    cases['detect_query_scope'] = (assistant._detect_query_scope, messages)
+    cases['auto_detect_schedule_related'] = (assistant._auto_detect_schedule_related, messages)
+    cases['extract_fallback_event'] = (assistant._extract_fallback_event, messages)
+
+    responses = [(text, corpus.MESSAGES['medium'][i % len(corpus.MESSAGES['medium'])])
+                 for i, text in enumerate(corpus.LLM_RESPONSES)]
+    cases['parse_ollama_response'] = (assistant._parse_ollama_response, responses)
+
+    parsed = [json.loads(text[text.index('{'):text.rindex('}') + 1]) for text, _ in responses]
+    # _validate_ollama_response sửa dict tại chỗ nên mỗi lần gọi cần một bản sao mới
+    cases['validate_ollama_response'] = (
+        lambda data, message: assistant._validate_ollama_response(json.loads(json.dumps(data)), message),
+        [(data, message) for data, (_, message) in zip(parsed, responses)]
+    )
+
+    for size in sizes:
+        schedules = corpus.make_schedules(size)
+        context_model = _ContextModel(schedules)
+
+        def context(user_id, model=context_model):
+            assistant.schedule_model = model
+            return assistant._get_user_schedules_context(RequestContext(user_id))
+
+        cases[f'get_user_schedules_context[{size}]'] = (context, [(1,)])
+
+        assistant.schedule_model = context_model
+        context_schedules = assistant._get_user_schedules_context(RequestContext(1))
+        cases[f'create_intent_analysis_prompt[{size}]'] = (
+            assistant._create_intent_analysis_prompt,
+            [(m, 1, context_schedules) for m in corpus.MESSAGES['medium'][:2]]
+        )
+
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline microbenchmarks for ai_assistant')
+    parser.add_argument('--sizes', default=','.join(str(n) for n in corpus.SCHEDULE_COUNTS),
+                        help='schedule counts for context/prompt benchmarks')
+    parser.add_argument('--filter', default='', help='only run cases containing this text')
+    parser.add_argument('--min-time', type=float, default=0.5, help='seconds per case')
+    parser.add_argument('--min-rounds', type=int, default=5)
+    parser.add_argument('--with-logging', action='store_true', help='keep INFO logging enabled')
+    parser.add_argument('--output', help='write results as JSON baseline')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+
+    if not args.with_logging:
+        logging.disable(logging.INFO)
+
+    sizes = [int(n) for n in args.sizes.split(',') if n]
+    assistant = PersonalAssistant(config['default'], None)
+    cases = build_cases(assistant, sizes)
+
+    results = {}
+    print(f"{'case':<48} {'p50 us':>10} {'p95 us':>10} {'p99 us':>10} {'blocks':>8} {'peak KiB':>9}")
+    for name, (func, inputs) in cases.items():
+        if args.filter and args.filter not in name:
+            continue
+        result = measure(func, inputs, args.min_time, args.min_rounds)
+        results[name] = result
+        print(f"{name:<48} {result['p50_ms'] * 1000:>10.1f} {result['p95_ms'] * 1000:>10.1f} "
+              f"{result['p99_ms'] * 1000:>10.1f} {result['retained_blocks_per_call']:>8} {result['peak_kib']:>9}")
+
+    params = {'sizes': sizes, 'min_time': args.min_time, 'with_logging': args.with_logging}
+    if args.output:
+        write_results(args.output, 'assistant', params, results)
+    if args.compare and not compare(args.compare, results, metric='p50_ms', tolerance=args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+So sánh các LLM backend trên cùng bộ prompt phân tích intent.
+
+    python -m benchmarks.bench_backends --backends stub
+    LLM_MODEL=qwen2.5:1.5b python -m benchmarks.bench_backends --backends ollama --threads 4
+    OPENAI_BASE_URL=http://localhost:8080/v1 python -m benchmarks.bench_backends --backends ollama,openai \\
+        --output benchmarks/baselines/backends.json
+
+Với mỗi backend đo:
+- latency tuần tự (p50/p95) và tốc độ sinh token
+- throughput khi --threads luồng gọi đồng thời
+- throughput của generate_batch nếu backend hỗ trợ batch
+- thời gian tới đoạn đầu tiên (TTFT) nếu backend hỗ trợ stream
+- tỉ lệ JSON hợp lệ, intent đúng và datetime đúng trên corpus.TEMPORAL_CASES (chế độ hybrid)
+
+Dùng kết quả để chọn model nhỏ nhất vẫn đạt ngưỡng chính xác trên máy chỉ có CPU.
+"""
+import argparse
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import compare, summarize, write_results
+from benchmarks import corpus
+from ai_assistant import PersonalAssistant
+from config import config
+import llm_backends
+
+# Intent mong đợi cho các câu trong corpus.MESSAGES
+EXPECTED_INTENTS = {
+    'chào bạn': 'conversation',
+    'xem lịch': 'query',
+    'mai có gì': 'query',
+    'xóa lịch 12': 'delete',
+    'nhắc tôi họp lúc 9h sáng mai trước 15 phút': 'schedule',
+    'đặt báo thức 7h sáng mai': 'schedule',
+    'họp nhóm tại phòng 302 lúc 14:30 chiều nay': 'schedule',
+    'xem lịch hôm nay có gì quan trọng không': 'query',
+    'sửa lịch 15 thành 10h sáng thứ 6': 'update',
+    'hủy cuộc họp với khách hàng chiều nay': 'delete',
+}
+
+
+def build_prompts(assistant: PersonalAssistant, anchor):
+    """[(message, prompt, prefilled, expected_intent, expected_datetime)]"""
+    cases = []
+    for message, intent in EXPECTED_INTENTS.items():
+        prefilled = assistant._prefill_schedule_fields(message, anchor)
+        prompt = assistant._create_intent_analysis_prompt(message, 1, [], prefilled, anchor)
+        cases.append((message, prompt, prefilled, intent, None))
+    for message, expected_start, _ in corpus.TEMPORAL_CASES:
+        prefilled = assistant._prefill_schedule_fields(message, anchor)
+        prompt = assistant._create_intent_analysis_prompt(message, 1, [], prefilled, anchor)
+        cases.append((message, prompt, prefilled, None, expected_start))
+    return cases
+
+
+def score(assistant: PersonalAssistant, case, text: str, quality):
+    message, _, prefilled, expected_intent, expected_datetime = case
+    parsed = assistant._parse_ollama_response(text, message)
+    if not parsed.get('success'):
+        return
+    quality['valid_json'] += 1
+    assistant._merge_prefilled_fields(parsed, prefilled)
+    if expected_intent is not None:
+        quality['intent_total'] += 1
+        quality['intent_correct'] += parsed.get('intent') == expected_intent
+    if expected_datetime is not None:
+        quality['datetime_total'] += 1
+        quality['datetime_correct'] += (parsed.get('schedule_data') or {}).get('datetime') == expected_datetime
+
+
+def bench_backend(assistant: PersonalAssistant, backend: llm_backends.LLMBackend, cases, args):
+    assistant.llm = backend
+    results = {}
+
+    samples = []
+    tokens = 0
+    generation_time = 0.0
+    quality = {'valid_json': 0, 'intent_total': 0, 'intent_correct': 0, 'datetime_total': 0, 'datetime_correct': 0}
+    errors = 0
+    sequential_started = time.perf_counter()
+    for case in cases:
+        started = time.perf_counter()
+        try:
+            result = backend.generate(case[1])
+        except llm_backends.LLMError as e:
+            logging.warning(f"{backend.name}: {e}")
+            errors += 1
+            continue
+        elapsed = time.perf_counter() - started
+        samples.append(elapsed)
+        tokens += result.output_tokens
+        generation_time += result.generation_seconds or elapsed
+        score(assistant, case, result.text, quality)
+
+    sequential = summarize(samples, time.perf_counter() - sequential_started, errors)
+    sequential['tokens_per_second'] = round(tokens / generation_time, 1) if generation_time else 0.0
+    sequential['valid_json_rate'] = round(quality['valid_json'] / len(cases), 3)
+    sequential['intent_accuracy'] = round(quality['intent_correct'] / quality['intent_total'], 3) \
+        if quality['intent_total'] else 0.0
+    sequential['datetime_accuracy'] = round(quality['datetime_correct'] / quality['datetime_total'], 3) \
+        if quality['datetime_total'] else 0.0
+    results[f'{backend.name}/sequential'] = sequential
+
+    if args.threads > 1:
+        prompts = [case[1] for case in cases]
+        concurrent_samples = []
+
+        def call(prompt):
+            started = time.perf_counter()
+            backend.generate(prompt)
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            for elapsed in pool.map(call, prompts):
+                concurrent_samples.append(elapsed)
+        results[f'{backend.name}/concurrent'] = summarize(concurrent_samples, time.perf_counter() - started)
+
+    if backend.supports_batching:
+        prompts = [case[1] for case in cases]
+        started = time.perf_counter()
+        backend.generate_batch(prompts)
+        duration = time.perf_counter() - started
+        batch = summarize([duration / len(prompts)] * len(prompts), duration)
+        batch['max_batch_size'] = backend.max_batch_size
+        results[f'{backend.name}/batch'] = batch
+
+    if backend.supports_streaming:
+        ttft = []
+        for case in cases[:args.stream_samples]:
+            started = time.perf_counter()
+            for _ in backend.stream(case[1]):
+                ttft.append(time.perf_counter() - started)
+                break
+        results[f'{backend.name}/stream_ttft'] = summarize(ttft)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark LLM backends on intent-analysis prompts')
+    parser.add_argument('--backends', default='stub', help=f"comma separated: {','.join(llm_backends.BACKENDS)}")
+    parser.add_argument('--threads', type=int, default=4, help='concurrent callers for the throughput run')
+    parser.add_argument('--stream-samples', type=int, default=5)
+    parser.add_argument('--output', help='write results as JSON baseline')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    assistant = PersonalAssistant(config['default'], None)
+    anchor = corpus.TEMPORAL_ANCHOR.replace(tzinfo=assistant.timezone)
+    cases = build_prompts(assistant, anchor)
+
+    results = {}
+    descriptions = {}
+    for name in [name for name in args.backends.split(',') if name]:
+        backend = llm_backends.create_backend(config['default'], name)
+        descriptions[name] = backend.describe()
+        if not backend.health():
+            print(f"{name}: backend not available, skipped", file=sys.stderr)
+            continue
+        try:
+            results.update(bench_backend(assistant, backend, cases, args))
+        finally:
+            backend.close()
+
+    print(f"\n{'name':<28} {'count':>6} {'rps':>8} {'p50 ms':>10} {'p95 ms':>10} {'tok/s':>8} "
+          f"{'json':>6} {'intent':>7} {'time':>6}")
+    for name, r in results.items():
+        print(f"{name:<28} {r['count']:>6} {r.get('throughput_rps', 0):>8.1f} {r['p50_ms']:>10.2f} "
+              f"{r['p95_ms']:>10.2f} {r.get('tokens_per_second', '-'):>8} {r.get('valid_json_rate', '-'):>6} "
+              f"{r.get('intent_accuracy', '-'):>7} {r.get('datetime_accuracy', '-'):>6}")
+
+    params = {'backends': descriptions, 'threads': args.threads, 'cases': len(cases)}
+    if args.output:
+        write_results(args.output, 'backends', params, results)
+    if args.compare and not compare(args.compare, results, metric='p50_ms', tolerance=args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Đo lợi ích của MicroBatcher khi nhiều người chat cùng lúc.
+
+    python -m benchmarks.bench_batching
+    python -m benchmarks.bench_batching --threads 32 --latency-ms 400 --per-item-ms 15 --windows 0,5,20,50
+    python -m benchmarks.bench_batching --backend openai --threads 16 --requests 10
+
+Mặc định dùng StubBackend mô phỏng chi phí một lời gọi = latency-ms cố định +
+per-item-ms cho mỗi prompt trong batch, xử lý tối đa --parallel lời gọi cùng
+lúc (gần đúng với một server inference theo batch trên GPU/CPU). Với
+--backend, gọi backend thật cấu hình bởi LLM_BACKEND/OPENAI_BASE_URL.
+Cửa sổ 0 nghĩa là gọi thẳng backend, không qua batcher.
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+
+from benchmarks.common import compare, summarize, write_results
+from benchmarks import corpus
+from ai_assistant import PersonalAssistant
+from config import config
+from llm_batching import MicroBatcher
+import llm_backends
+
+
+def run(generate, prompts, threads: int, requests_per_thread: int):
+    samples = []
+    errors = 0
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(index):
+        nonlocal errors
+        barrier.wait()
+        for i in range(requests_per_thread):
+            prompt = prompts[(index + i) % len(prompts)]
+            started = time.perf_counter()
+            try:
+                generate(prompt)
+                ok = True
+            except llm_backends.LLMError:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples.append(elapsed)
+                errors += not ok
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return summarize(samples, time.perf_counter() - started, errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark micro-batched intent inference')
+    parser.add_argument('--backend', help='use a configured backend instead of the stub')
+    parser.add_argument('--threads', type=int, default=16, help='concurrent chat requests')
+    parser.add_argument('--requests', type=int, default=20, help='requests per thread')
+    parser.add_argument('--latency-ms', type=float, default=200, help='stub: fixed cost per call')
+    parser.add_argument('--per-item-ms', type=float, default=10, help='stub: extra cost per prompt in a batch')
+    parser.add_argument('--parallel', type=int, default=1, help='stub: concurrent calls the model serves')
+    parser.add_argument('--windows', default='0,2,10,25', help='batch windows in ms (0 = no batching)')
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-inflight', type=int, default=2)
+    parser.add_argument('--output', help='write results as JSON baseline')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    if args.backend:
+        backend = llm_backends.create_backend(config['default'], args.backend)
+    else:
+        backend = llm_backends.StubBackend(max_batch_size=args.max_batch_size, latency_ms=args.latency_ms,
+                                           per_item_ms=args.per_item_ms, parallel=args.parallel)
+    if not backend.supports_batching:
+        print(f"backend {backend.name} does not support batching; only the direct run is meaningful",
+              file=sys.stderr)
+
+    assistant = PersonalAssistant(config['default'], None)
+    now = corpus.TEMPORAL_ANCHOR.replace(tzinfo=assistant.timezone)
+    prompts = [
+        assistant._create_intent_analysis_prompt(message, 1, [], assistant._prefill_schedule_fields(message, now), now)
+        for message in corpus.all_messages()
+    ]
+
+    results = {}
+    print(f"{'mode':<16} {'requests':>9} {'rps':>9} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'avg batch':>10}")
+    for window in [float(w) for w in args.windows.split(',') if w]:
+        if window <= 0:
+            name = 'direct'
+            result = run(backend.generate, prompts, args.threads, args.requests)
+        else:
+            name = f'window={window:g}ms'
+            batcher = MicroBatcher(backend, window_ms=window, max_batch_size=args.max_batch_size,
+                                   max_inflight=args.max_inflight)
+            try:
+                result = run(batcher.generate, prompts, args.threads, args.requests)
+            finally:
+                batcher.stop()
+            result.update({key: value for key, value in batcher.stats().items()
+                           if key in ('batches', 'average_batch', 'largest_batch')})
+        results[name] = result
+        print(f"{name:<16} {result['count']:>9} {result['throughput_rps']:>9.1f} {result['p50_ms']:>10.1f} "
+              f"{result['p95_ms']:>10.1f} {result['p99_ms']:>10.1f} {result.get('average_batch', 1):>10}")
+
+    backend.close()
+    params = {
+        'backend': backend.describe(),
+        'threads': args.threads,
+        'requests_per_thread': args.requests,
+        'latency_ms': args.latency_ms,
+        'per_item_ms': args.per_item_ms,
+        'parallel': args.parallel,
+        'max_batch_size': args.max_batch_size,
+        'max_inflight': args.max_inflight
+    }
+    if args.output:
+        write_results(args.output, 'batching', params, results)
+    if args.compare and not compare(args.compare, results, tolerance=args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Thông lượng nhập/xuất lịch trình dạng .ics và .csv (mặc định 100k sự kiện).
+
+    python -m benchmarks.bench_import_export
+    python -m benchmarks.bench_import_export --events 100000 --batch-size 1000 --memory
+
+Xuất: schedule_io.iter_ics/iter_csv trên các dòng sinh dần (như iter_rows).
+Nhập: chính file vừa xuất được đọc lại qua ScheduleImporter với ScheduleModel
+thật trên pool giả của bench_transactions, nên số round trip (một câu INSERT
+multi-row + commit mỗi batch) khớp với code thật. Trước đó kiểm tra file hỏng
+giữa chừng (byte không phải UTF-8, dòng quá dài) vẫn báo số lịch đã lưu. Thoát
+với mã 1 nếu kiểm tra sai hoặc số sự kiện nhập lại khác số đã xuất.
+"""
+import argparse
+import io
+import logging
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from benchmarks.bench_transactions import BenchDatabaseManager, RoundTrips
+from benchmarks.common import write_results
+from database import record_type
+from models import ScheduleModel
+import schedule_io
+
+_NOW = datetime(2026, 1, 5, 8, 0)
+_COLUMNS = ('id', 'event', 'description', 'start_time', 'end_time', 'location', 'reminder_minutes',
+            'category', 'priority', 'status', 'created_at', 'updated_at')
+_PRIORITIES = ('low', 'medium', 'high')
+
+
+def export_rows(count: int):
+    factory = record_type(_COLUMNS)
+    for i in range(count):
+        start = _NOW + timedelta(minutes=45 * i)
+        yield factory((i + 1, f'Họp dự án #{i}', 'Chuẩn bị báo cáo, slide; gửi trước 1 ngày' if i % 3 else '',
+                       start, start + timedelta(hours=1), 'Phòng họp tầng 3' if i % 2 else None,
+                       15 if i % 4 else None, 'meeting', _PRIORITIES[i % 3], 'pending', _NOW, _NOW))
+
+
+def run_export(fmt: str, count: int):
+    chunks = schedule_io.iter_ics(export_rows(count)) if fmt == 'ics' else schedule_io.iter_csv(export_rows(count))
+    output = io.BytesIO()
+    started = time.perf_counter()
+    for chunk in chunks:
+        output.write(chunk.encode('utf-8'))
+    return time.perf_counter() - started, output.getvalue()
+
+
+def run_import(fmt: str, payload: bytes, batch_size: int, trips: RoundTrips):
+    importer = schedule_io.ScheduleImporter(ScheduleModel(BenchDatabaseManager(trips)), batch_size=batch_size)
+    trips.count = trips.commits = 0
+    started = time.perf_counter()
+    report = importer.run(1, fmt, schedule_io.text_lines(io.BytesIO(payload)))
+    return time.perf_counter() - started, report
+
+
+def checks(trips: RoundTrips) -> bool:
+    results = []
+
+    def check(name, ok):
+        results.append(ok)
+        print(f"{'ok' if ok else 'FAIL':<5} {name}")
+
+    def import_error(payload: bytes, max_line_length: int = schedule_io.MAX_LINE_LENGTH):
+        importer = schedule_io.ScheduleImporter(ScheduleModel(BenchDatabaseManager(trips)), batch_size=100,
+                                                max_line_length=max_line_length)
+        try:
+            importer.run(1, 'csv', schedule_io.text_lines(io.BytesIO(payload), max_line_length))
+        except ValueError as e:
+            return e
+        return None
+
+    _, payload = run_export('csv', 1000)
+    error = import_error(payload + b'\xff\xfe,2026-01-05 10:00\r\n')
+    check('invalid UTF-8 after committed batches reports the imported count',
+          isinstance(error, UnicodeDecodeError) and error.imported > 0 and error.imported % 100 == 0)
+    error = import_error(payload + b'x' * 5000 + b',2026-01-05 10:00\r\n', max_line_length=4096)
+    check('an over-long line is rejected with the imported count', error is not None and error.imported == 1000)
+    folded = 'BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\nSUMMARY:x\r\n' + ' ' + 'y' * 70 + '\r\n'
+    try:
+        list(schedule_io.parse_ics(io.StringIO(folded + (' ' + 'y' * 70 + '\r\n') * 100), 4096))
+        check('folded .ics lines are bounded after unfolding', False)
+    except ValueError:
+        check('folded .ics lines are bounded after unfolding', True)
+    return all(results)
+
+
+def peak_kb(func, *args):
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Schedule import/export throughput')
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=1000, help='rows per multi-row INSERT')
+    parser.add_argument('--rtt-ms', type=float, default=0.5, help='simulated network round trip')
+    parser.add_argument('--memory', action='store_true', help='also report tracemalloc peak (slow)')
+    parser.add_argument('--output', help='write results as JSON baseline')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    trips = RoundTrips(args.rtt_ms / 1000.0)
+    results = {}
+    failed = not checks(trips)
+    print(f"{'case':<12} {'events':>8} {'seconds':>9} {'events/s':>10} {'MB':>8} {'round trips':>12}")
+    for fmt in schedule_io.FORMATS:
+        elapsed, payload = run_export(fmt, args.events)
+        results[f'export/{fmt}'] = {'seconds': round(elapsed, 3), 'events_per_s': round(args.events / elapsed),
+                                    'bytes': len(payload)}
+        print(f"{'export/' + fmt:<12} {args.events:>8} {elapsed:>9.2f} {args.events / elapsed:>10.0f} "
+              f"{len(payload) / 1e6:>8.1f} {'-':>12}")
+
+        elapsed, report = run_import(fmt, payload, args.batch_size, trips)
+        results[f'import/{fmt}'] = {'seconds': round(elapsed, 3), 'events_per_s': round(report['imported'] / elapsed),
+                                    'imported': report['imported'], 'skipped': report['skipped'],
+                                    'round_trips': trips.count}
+        print(f"{'import/' + fmt:<12} {report['imported']:>8} {elapsed:>9.2f} {report['imported'] / elapsed:>10.0f} "
+              f"{len(payload) / 1e6:>8.1f} {trips.count:>12}")
+        if report['imported'] != args.events or report['skipped']:
+            print(f"    expected {args.events} events, imported {report['imported']}, errors: {report['errors'][:3]}")
+            failed = True
+
+        if args.memory:
+            results[f'export/{fmt}']['peak_kb'] = peak_kb(lambda: sum(1 for _ in (
+                schedule_io.iter_ics(export_rows(args.events)) if fmt == 'ics'
+                else schedule_io.iter_csv(export_rows(args.events)))))
+            results[f'import/{fmt}']['peak_kb'] = peak_kb(run_import, fmt, payload, args.batch_size, trips)
+            print(f"    peak memory: export {results[f'export/{fmt}']['peak_kb']} KB, "
+                  f"import {results[f'import/{fmt}']['peak_kb']} KB")
+
+    if args.output:
+        write_results(args.output, 'import_export',
+                      {'events': args.events, 'batch_size': args.batch_size, 'rtt_ms': args.rtt_ms}, results)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
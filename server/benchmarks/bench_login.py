@@ -0,0 +1,202 @@
+"""
+Kiểm tra và đo POST /api/auth/login với scrypt trên pool băm mật khẩu
+(passwords.py), không cần MySQL.
+
+    python -m benchmarks.bench_login
+    python -m benchmarks.bench_login --concurrency 16 --logins 300 --workers 1 2 4 16
+
+App thật với DB giả một bảng users trong bộ nhớ, rate limit tắt. Kiểm tra:
+hash SHA-256 cũ đăng nhập được và được băm lại thành scrypt, sai mật khẩu và
+email không tồn tại đều 401, đổi cost scrypt thì hash được băm lại, pool đầy
+thì 503 kèm Retry-After. Sau đó --concurrency thread login liên tục với mỗi
+số worker của pool, trong lúc một thread khác gọi /livez: số worker bằng số
+thread login tương đương băm thẳng trong thread request. Thoát với mã 1 nếu
+có kiểm tra sai.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+from benchmarks.common import compare, summarize, write_results
+import app as app_module
+import passwords
+import ratelimit
+
+PASSWORD = 'benchmark123'
+
+
+class UserDB:
+    """Thay DatabaseManager cho route login: bảng users trong bộ nhớ."""
+
+    def __init__(self):
+        self.config = SimpleNamespace(AUTH_USER_CACHE_SECONDS=0)
+        self.users = {}
+        self.updates = 0
+        self._lock = threading.Lock()
+
+    def add(self, user_id: int, email: str, hashed: str):
+        self.users[email] = {'id': user_id, 'email': email, 'password': hashed, 'fullname': f'User {user_id}',
+                             'created_at': None, 'updated_at': None}
+
+    def fetch_one(self, statement, params=None):
+        if statement.name == 'user_by_email':
+            row = self.users.get(params[0])
+            return dict(row) if row else None
+        return None
+
+    def execute(self, statement, params=None):
+        # UPDATE users SET password = %s, updated_at = NOW() WHERE id = %s
+        with self._lock:
+            self.updates += 1
+            for row in self.users.values():
+                if row['id'] == params[-1]:
+                    row['password'] = params[0]
+                    return 1
+        return 0
+
+    def after_commit(self, callback):
+        callback()
+
+
+def use_pool(workers: int, n: int, max_pending: int = 64, pool: str = 'thread'):
+    passwords.configure(SimpleNamespace(PASSWORD_SCRYPT_N=n, PASSWORD_SCRYPT_R=8, PASSWORD_SCRYPT_P=1,
+                                        PASSWORD_HASH_WORKERS=workers, PASSWORD_HASH_MAX_PENDING=max_pending,
+                                        PASSWORD_HASH_POOL=pool))
+
+
+def login(client, email: str, password: str = PASSWORD):
+    return client.post('/api/auth/login', json={'email': email, 'password': password})
+
+
+def checks(client, db: UserDB, n: int) -> bool:
+    results = []
+
+    def check(name, ok):
+        results.append(ok)
+        print(f"{'ok' if ok else 'FAIL':<5} {name}")
+
+    use_pool(2, n)
+    db.add(1, 'legacy@example.com', hashlib.sha256(PASSWORD.encode()).hexdigest())
+    check('legacy sha256 hash logs in', login(client, 'legacy@example.com').status_code == 200)
+    stored = db.users['legacy@example.com']['password']
+    check('legacy hash is rehashed with scrypt', stored.startswith(f'scrypt${n}$'))
+    updates = db.updates
+    check('rehashed password still logs in without another rehash',
+          login(client, 'legacy@example.com').status_code == 200 and db.updates == updates)
+    check('wrong password is rejected', login(client, 'legacy@example.com', 'wrong-password').status_code == 401)
+    check('unknown email is rejected', login(client, 'nobody@example.com').status_code == 401)
+
+    use_pool(2, n * 2)
+    login(client, 'legacy@example.com')
+    check('changed scrypt cost triggers a rehash',
+          db.users['legacy@example.com']['password'].startswith(f'scrypt${n * 2}$'))
+
+    use_pool(1, n, max_pending=1)
+    passwords.hasher.wait_seconds = 0.05
+    passwords.hasher._slots.acquire()  # giữ chỗ duy nhất: pool đầy
+    try:
+        response = login(client, 'legacy@example.com')
+    finally:
+        passwords.hasher._slots.release()
+    check('full hashing pool answers 503 with Retry-After',
+          response.status_code == 503 and response.headers.get('Retry-After') == '1')
+    return all(results)
+
+
+def measure(client, db: UserDB, workers: int, n: int, concurrency: int, logins: int) -> dict:
+    use_pool(workers, n, max_pending=concurrency * 2)
+    emails = [f'bench+{i}@example.com' for i in range(concurrency)]
+    hashed = passwords.hash_password(PASSWORD)
+    for i, email in enumerate(emails):
+        db.add(100 + i, email, hashed)
+
+    samples, probe, errors = [], [], []
+    stop = threading.Event()
+    remaining = iter(range(logins))
+    lock = threading.Lock()
+
+    def run(email):
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            started = time.perf_counter()
+            status = login(client, email).status_code
+            elapsed = time.perf_counter() - started
+            with lock:
+                (samples if status == 200 else errors).append(elapsed)
+
+    def probe_livez():
+        while not stop.is_set():
+            started = time.perf_counter()
+            client.get('/livez')
+            probe.append(time.perf_counter() - started)
+            time.sleep(0.005)
+
+    prober = threading.Thread(target=probe_livez)
+    prober.start()
+    threads = [threading.Thread(target=run, args=(email,)) for email in emails]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+    stop.set()
+    prober.join()
+    return {'login': summarize(samples, duration, errors=len(errors)), 'livez': summarize(probe)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Login checks and throughput with pooled scrypt')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent login threads')
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='hashing pool sizes to compare (default: 1, 2, cpu count, concurrency)')
+    parser.add_argument('--n', type=int, default=16384, help='scrypt cost parameter N')
+    parser.add_argument('--output', help='write results as JSON baseline')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    app_module.create_app(start_background=False)
+    app_module._background_pid = os.getpid()  # không chạy job queue/health monitor cho DB giả
+    ratelimit.limiter.enabled = False
+    db = UserDB()
+    app_module.db_manager = db
+    client = app_module.app.test_client()
+
+    passed = checks(client, db, args.n)
+
+    workers = args.workers or sorted({1, 2, os.cpu_count() or 1, args.concurrency})
+    results = {}
+    print(f"\n{'workers':>8} {'logins/s':>9} {'login p50':>10} {'login p99':>10} {'livez p50':>10} {'livez p99':>10}")
+    for count in workers:
+        result = measure(client, db, count, args.n, args.concurrency, args.logins)
+        login_result, livez = result['login'], result['livez']
+        print(f"{count:>8} {login_result['throughput_rps']:>9.1f} {login_result['p50_ms']:>10.1f} "
+              f"{login_result['p99_ms']:>10.1f} {livez['p50_ms']:>10.2f} {livez['p99_ms']:>10.2f}")
+        results[f'login_workers_{count}'] = login_result
+        results[f'livez_workers_{count}'] = livez
+        if login_result['errors']:
+            print(f"FAIL  {login_result['errors']} logins failed with {count} workers")
+            passed = False
+    passwords.hasher.shutdown()
+
+    params = {'concurrency': args.concurrency, 'logins': args.logins, 'n': args.n, 'cpu_count': os.cpu_count()}
+    if args.output:
+        write_results(args.output, 'login', params, results)
+    if args.compare and not compare(args.compare, results, tolerance=args.tolerance):
+        passed = False
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Kiểm tra và đo shared state (shared_state.py) như khi chạy nhiều worker.
+
+    python -m benchmarks.bench_shared_state
+    python -m benchmarks.bench_shared_state --url redis://localhost:6379/15
+
+Không có --url thì chạy trên benchmarks.resp_stub trong process. Hai
+SharedState với backend riêng đóng vai hai worker: kiểm tra KV có TTL, tăng
+phiên bản lịch trình ở worker này thì worker kia thấy qua pub/sub và bỏ bộ
+đếm thống kê của user, cache user
+của bước xác thực bị xóa sau update_user, và backend mất kết nối không làm
+request lỗi. Sau đó đo độ trễ get/set so với backend memory. Thoát với mã 1
+nếu có kiểm tra sai.
+"""
+import argparse
+import logging
+import sys
+import time
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+from benchmarks import resp_stub
+from benchmarks.common import summarize
+from cache import ScheduleVersions
+from models import UserModel
+from shared_state import MemoryBackend, RespBackend, SharedState, shared
+from stats import ScheduleStats
+
+
+class UserDB:
+    """Thay DatabaseManager cho UserModel: một bảng users trong bộ nhớ, đếm số lần đọc."""
+
+    def __init__(self):
+        self.config = SimpleNamespace(AUTH_USER_CACHE_SECONDS=60)
+        now = datetime(2026, 1, 5, 10, 0)
+        self.row = {'id': 1, 'email': 'a@example.com', 'password': 'x', 'fullname': 'A',
+                    'created_at': now, 'updated_at': now}
+        self.reads = 0
+
+    def fetch_one(self, statement, params=None):
+        self.reads += 1
+        return dict(self.row)
+
+    def execute(self, statement, params=None):
+        # Kiểm tra chỉ đổi fullname: UPDATE users SET fullname = %s, ... WHERE id = %s
+        self.row['fullname'] = params[0]
+        return 1
+
+    def after_commit(self, callback):
+        callback()
+
+
+def wait_for(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return predicate()
+
+
+def checks(url: str, prefix: str):
+    worker_a = SharedState(RespBackend(url), prefix)
+    worker_b = SharedState(RespBackend(url), prefix)
+    results = []
+
+    def check(name, ok):
+        results.append(ok)
+        print(f"{'ok' if ok else 'FAIL':<5} {name}")
+
+    worker_a.set('k', 'v', ttl=0.2)
+    check('get sees value set by another worker', worker_b.get('k') == 'v')
+    time.sleep(0.25)
+    check('value expires after ttl', worker_b.get('k') is None)
+    worker_a.set_json('j', {'a': 1})
+    check('json round trip', worker_b.get_json('j') == {'a': 1})
+    worker_b.delete('j')
+    check('delete', worker_a.get_json('j') is None)
+
+    versions_a, versions_b = ScheduleVersions(worker_a), ScheduleVersions(worker_b)
+    user_id = 42
+    before = versions_b.get(user_id)
+    time.sleep(0.05)  # để SUBSCRIBE tới server trước lần publish đầu tiên
+    versions_a.bump(user_id)
+    check('schedule version bump reaches the other worker',
+          wait_for(lambda: versions_b.get(user_id) == before + 1))
+    versions_b.bump(user_id)
+    check('and back', wait_for(lambda: versions_a.get(user_id) == before + 2))
+    stats_b = ScheduleStats()
+    versions_b.on_remote_change(stats_b.forget)
+    stats_b.load(user_id, [{'start_time': '2026-01-05', 'category': 'work', 'count': 3}])
+    versions_b.bump(user_id)
+    kept = stats_b.is_loaded(user_id)
+    versions_a.bump(user_id)
+    check('schedule stats are dropped when another worker writes, kept on own writes',
+          kept and wait_for(lambda: not stats_b.is_loaded(user_id)))
+    fresh = ScheduleVersions(SharedState(RespBackend(url), prefix))
+    check('a newly started worker reads the current version', fresh.get(user_id) == before + 4)
+
+    own = []
+    worker_a.subscribe('echo', own.append)
+    other = []
+    worker_b.subscribe('echo', other.append)
+    time.sleep(0.05)
+    worker_a.publish('echo', 'hello')
+    check('fan-out to other workers only', wait_for(lambda: other == ['hello']) and own == [])
+
+    shared.use(RespBackend(url), prefix)
+    db = UserDB()
+    users = UserModel(db)
+    first, second = users.get_cached_user(1), users.get_cached_user(1)
+    check('auth user lookup is served from the shared cache',
+          db.reads == 1 and first == second and isinstance(second.created_at, datetime))
+    users.update_user(1, {'fullname': 'B'})
+    check('update_user invalidates the cached user', users.get_cached_user(1).fullname == 'B' and db.reads == 2)
+
+    down = SharedState(RespBackend('redis://127.0.0.1:1/0?timeout=0.2'), prefix)
+    started = time.perf_counter()
+    ok = down.get('k', 'fallback') == 'fallback' and not down.set('k', 'v') and down.incr('n') is None
+    check(f'backend down degrades without raising ({(time.perf_counter() - started) * 1000:.0f} ms)', ok)
+    down_versions = ScheduleVersions(down)
+    check('schedule versions still bump locally when backend is down',
+          down_versions.bump(7) == 1 and down_versions.get(7) == 1)
+
+    for state in (worker_a, worker_b, down, shared):
+        state.backend.close()
+    return all(results)
+
+
+def measure(state: SharedState, iterations: int):
+    results = {}
+    for name, op in (('set', lambda i: state.set(f'bench:{i % 100}', 'x' * 200, ttl=60)),
+                     ('get', lambda i: state.get(f'bench:{i % 100}')),
+                     ('incr', lambda i: state.incr('bench:counter'))):
+        samples = []
+        for i in range(iterations):
+            started = time.perf_counter()
+            op(i)
+            samples.append(time.perf_counter() - started)
+        results[name] = summarize(samples)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared state checks and latency')
+    parser.add_argument('--url', help='redis:// URL of a real server (default: in-process RESP stub)')
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    stub = None
+    url = args.url
+    if not url:
+        stub = resp_stub.start()
+        url = f'redis://127.0.0.1:{stub.server_address[1]}'
+    # Prefix riêng cho mỗi lần chạy để không đụng dữ liệu thật khi dùng --url
+    prefix = f'bench-{uuid.uuid4().hex[:8]}:'
+
+    print(f"shared state checks against {url}{' (stub)' if stub else ''}")
+    passed = checks(url, prefix)
+
+    print(f"\n{'backend':<10} {'op':<6} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, backend in (('memory', MemoryBackend()), ('redis', RespBackend(url))):
+        for op, result in measure(SharedState(backend, prefix), args.iterations).items():
+            print(f"{name:<10} {op:<6} {result['p50_ms']:>9.4f} {result['p99_ms']:>9.4f}")
+        backend.close()
+
+    if stub:
+        stub.shutdown()
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
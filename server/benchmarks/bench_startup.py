@@ -0,0 +1,78 @@
+"""
+Đo thời gian khởi động một worker: import module WSGI và request đầu tiên,
+mỗi lần chạy trong một process Python mới.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --module app --runs 5
+    python -m benchmarks.bench_startup --mysql-host 10.255.255.1   # MySQL không trả lời lúc boot
+
+Mặc định dùng LLM_BACKEND=stub và MYSQL_HOST trỏ vào một cổng đóng, để số
+đo không phụ thuộc MySQL/Ollama trên máy: với MySQL chết lúc boot, import
+không được chờ kết nối. Request đầu tiên là GET /livez nếu có, không thì một
+đường dẫn không tồn tại (chỉ đo chi phí dựng request của Flask).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.common import SERVER_DIR, compare, summarize, write_results
+
+_PROBE = r"""
+import importlib, json, sys, time
+started = time.perf_counter()
+module = importlib.import_module(sys.argv[1])
+imported = time.perf_counter()
+application = getattr(module, 'application', None) or getattr(module, 'app')
+paths = {rule.rule for rule in application.url_map.iter_rules()}
+response = application.test_client().get('/livez' if '/livez' in paths else '/__startup_probe__')
+first_request = time.perf_counter()
+print(json.dumps({'import': imported - started, 'first_request': first_request - imported,
+                  'status': response.status_code}))
+"""
+
+
+def run_once(module: str, env: dict) -> dict:
+    output = subprocess.run([sys.executable, '-c', _PROBE, module], cwd=SERVER_DIR, env=env,
+                            capture_output=True, text=True, timeout=300)
+    if output.returncode != 0:
+        raise RuntimeError(output.stderr.strip().splitlines()[-1] if output.stderr else 'probe failed')
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker startup time (import + first request)')
+    parser.add_argument('--module', default='wsgi', help='module exposing the WSGI app')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--mysql-host', default='127.0.0.1')
+    parser.add_argument('--mysql-port', default='1', help='closed port by default: MySQL down at boot')
+    parser.add_argument('--output', help='write results as JSON baseline')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    env = dict(os.environ, LLM_BACKEND=os.environ.get('LLM_BACKEND', 'stub'),
+               MYSQL_HOST=args.mysql_host, MYSQL_PORT=args.mysql_port, PYTHONDONTWRITEBYTECODE='1')
+    samples = {'import': [], 'first_request': [], 'total': []}
+    for _ in range(args.runs):
+        result = run_once(args.module, env)
+        samples['import'].append(result['import'])
+        samples['first_request'].append(result['first_request'])
+        samples['total'].append(result['import'] + result['first_request'])
+
+    results = {phase: summarize(values) for phase, values in samples.items()}
+    print(f"{'phase':<15} {'p50 ms':>10} {'max ms':>10}")
+    for phase, result in results.items():
+        print(f"{phase:<15} {result['p50_ms']:>10.1f} {result['max_ms']:>10.1f}")
+
+    params = {'module': args.module, 'runs': args.runs, 'mysql_host': args.mysql_host,
+              'mysql_port': args.mysql_port}
+    if args.output:
+        write_results(args.output, 'startup', params, results)
+    if args.compare and not compare(args.compare, results, tolerance=args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Bộ nhớ đỉnh (tracemalloc) của GET /api/schedules theo số lịch trình của user:
+đọc hết rồi jsonify (fetch_all) so với stream (iter_rows + streaming).
+
+    python -m benchmarks.bench_streaming
+    python -m benchmarks.bench_streaming --rows 1000 10000 50000
+
+Không cần MySQL: cursor giả trả từng trang theo LIMIT và khóa của câu keyset,
+nên chỉ đo phần nằm trong tiến trình Python (mapping dòng, dựng dict, encode
+JSON). Trước khi đo, kiểm tra kết nối được trả về pool giữa các trang và lỗi
+DB giữa chừng vẫn cho JSON hợp lệ có "truncated". Thoát với mã 1 nếu kiểm tra
+sai hoặc bộ nhớ của đường stream tăng theo số dòng (dòng lớn nhất vượt
+--max-growth lần dòng nhỏ nhất).
+"""
+import argparse
+import copy
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from flask import Flask, jsonify
+from mysql.connector import Error
+
+from benchmarks.common import write_results
+from config import config
+from database import DatabaseManager
+from models import ScheduleModel
+import streaming
+
+_NOW = datetime(2026, 1, 5, 10, 0)
+_COLUMNS = ('id', 'user_id', 'event', 'description', 'start_time', 'end_time', 'location',
+            'reminder_minutes', 'category', 'priority', 'status', 'created_at', 'updated_at')
+
+
+def _row(i):
+    start = _NOW + timedelta(minutes=30 * i)
+    return (i, 1, f'sự kiện {i}', 'mô tả ngắn', start, start + timedelta(hours=1), 'phòng họp',
+            15, 'meeting', 'medium', 'scheduled', _NOW, _NOW)
+
+
+class FakeCursor:
+    def __init__(self, pool):
+        self.pool = pool
+        self.rows = pool.rows
+        self.column_names = _COLUMNS
+        self.rowcount = -1
+        self.lastrowid = None
+        self._source = iter(())
+
+    def execute(self, query, params=None):
+        if 'LIMIT' not in query:
+            self._source = (_row(i) for i in range(self.rows))
+            return
+        # Trang keyset của schedule_pages_for_user (start_time DESC, id DESC): id tăng theo start_time
+        self.pool.pages += 1
+        if self.pool.fail_on_page == self.pool.pages:
+            raise Error(msg='Lost connection to MySQL server during query')
+        limit = params[-1]
+        before = params[-2] if len(params) > 2 else self.rows
+        self._source = (_row(i) for i in range(before - 1, max(before - limit, 0) - 1, -1))
+
+    def fetchall(self):
+        return list(self._source)
+
+    def fetchmany(self, size=1):
+        return [row for _, row in zip(range(size), self._source)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+        self.connection_id = 1
+        self.in_transaction = False
+        self.unread_result = False
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self.pool)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self.pool.checked_out -= 1
+
+
+class FakePool:
+    def __init__(self):
+        self.rows = 0
+        self.pages = 0
+        self.checked_out = 0
+        self.fail_on_page = None
+
+    def get_connection(self):
+        self.checked_out += 1
+        return FakeConnection(self)
+
+
+class BenchDatabaseManager(DatabaseManager):
+    def __init__(self):
+        self.fake_pool = FakePool()
+        bench_config = copy.copy(config['default'])
+        bench_config.SLOW_QUERY_THRESHOLD_MS = float('inf')
+        super().__init__(bench_config)
+
+    def _create_connection_pool(self):
+        self.connection_pool = self.fake_pool
+
+
+def buffered(model: ScheduleModel):
+    schedules = model.get_user_schedules(1)
+    return len(jsonify({'success': True, 'schedules': schedules, 'count': len(schedules)}).get_data())
+
+
+def streamed(model: ScheduleModel):
+    response = streaming.list_response(model.iter_user_schedules(1), 'schedules')
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    return size
+
+
+def checks(db, model: ScheduleModel) -> bool:
+    results = []
+
+    def check(name, ok):
+        results.append(ok)
+        print(f"{'ok' if ok else 'FAIL':<5} {name}")
+
+    pool = db.fake_pool
+    pool.rows, pool.pages = 1200, 0
+    response = streaming.list_response(model.iter_user_schedules(1), 'schedules')
+    chunks = iter(response.response)
+    next(chunks)
+    next(chunks)
+    check('no connection is held while the client reads a page', pool.checked_out == 0)
+    response.close()
+
+    pool.pages = 0
+    response = streaming.list_response(model.iter_user_schedules(1), 'schedules')
+    body = json.loads(''.join(response.response))
+    ids = [item['id'] for item in body['schedules']]
+    check('pages cover every row once, in order', ids == list(range(1199, -1, -1)) and pool.pages == 3)
+
+    pool.pages, pool.fail_on_page = 0, 2
+    response = streaming.list_response(model.iter_user_schedules(1), 'schedules')
+    body = json.loads(''.join(response.response))
+    check('a database error after the first page ends the JSON with a truncation marker',
+          body.get('truncated') is True and 0 < body['count'] == len(body['schedules']) < 1200
+          and 'error' in body)
+    pool.fail_on_page = None
+    check('every connection is back in the pool', pool.checked_out == 0)
+    return all(results)
+
+
+def measure(func, model):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = func(model)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'peak_kb': round(peak / 1024, 1), 'elapsed_ms': round(elapsed * 1000, 2), 'bytes': size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Peak memory of buffered vs streamed schedule listing')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--max-growth', type=float, default=2.0,
+                        help='allowed streamed peak ratio between the largest and smallest --rows')
+    parser.add_argument('--output', help='write results as JSON baseline')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    app = Flask(__name__)
+    db = BenchDatabaseManager()
+    model = ScheduleModel(db)
+
+    results = {}
+    print(f"{'rows':>8} {'mode':<10} {'peak KB':>10} {'ms':>9} {'bytes':>11}")
+    with app.app_context():
+        passed = checks(db, model)
+        for rows in args.rows:
+            db.fake_pool.rows = rows
+            for mode, func in (('buffered', buffered), ('streamed', streamed)):
+                result = measure(func, model)
+                results[f'{rows}/{mode}'] = result
+                print(f"{rows:>8} {mode:<10} {result['peak_kb']:>10} {result['elapsed_ms']:>9} {result['bytes']:>11}")
+
+    if args.output:
+        write_results(args.output, 'streaming', {'rows': args.rows}, results)
+
+    smallest = results[f'{min(args.rows)}/streamed']['peak_kb']
+    largest = results[f'{max(args.rows)}/streamed']['peak_kb']
+    if largest > smallest * args.max_growth:
+        print(f"streamed peak grew from {smallest} KB to {largest} KB")
+        passed = False
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""
+Kiểm tra access/refresh token và bộ thu hồi (tokens.py), đo chi phí xác thực
+mỗi request, không cần MySQL.
+
+    python -m benchmarks.bench_tokens
+    python -m benchmarks.bench_tokens --revoked 0 1000 100000
+
+App thật với DB giả (bảng users và token_revocations trong bộ nhớ), rate limit
+tắt. Kiểm tra: login trả cặp token, refresh token chỉ dùng được một lần,
+logout và đổi mật khẩu có hiệu lực ngay ở worker hiện tại, ở worker khác qua
+pub/sub, và ở worker mới qua đồng bộ từ DB; token 24h kiểu cũ bị từ chối. Sau
+đó đo token_required mới (giải mã + tra bộ thu hồi) so với cách cũ (giải mã +
+đọc user qua cache), với số token đã thu hồi khác nhau. Thoát với mã 1 nếu có
+kiểm tra sai.
+"""
+import argparse
+import contextlib
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+import jwt
+
+from benchmarks.common import summarize
+import app as app_module
+import passwords
+import ratelimit
+import shared_state
+from models import UserModel
+from tokens import RevocationSet, token_service
+
+PASSWORD = 'benchmark123'
+
+
+class AuthDB:
+    """Thay DatabaseManager: users và token_revocations trong bộ nhớ, đếm số câu SQL."""
+
+    def __init__(self):
+        self.config = SimpleNamespace(AUTH_USER_CACHE_SECONDS=60)
+        now = datetime(2026, 1, 5, 10, 0)
+        self.users = {
+            user_id: {'id': user_id, 'email': f'user{user_id}@example.com', 'fullname': f'User {user_id}',
+                      'password': hashlib.sha256(PASSWORD.encode()).hexdigest(),
+                      'created_at': now, 'updated_at': now}
+            for user_id in (1, 2)
+        }
+        self.revocations = []
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def fetch_one(self, statement, params=None):
+        self.queries += 1
+        if statement.name == 'user_by_id':
+            row = self.users.get(params[0])
+        elif statement.name == 'user_by_email':
+            row = next((row for row in self.users.values() if row['email'] == params[0]), None)
+        elif statement.name == 'token_user_cutoff':
+            cutoffs = [row['revoked_at'] for row in self.revocations
+                       if row['user_id'] == params[0] and row['jti'] is None]
+            row = {'revoked_at': max(cutoffs) if cutoffs else None}
+        else:
+            raise AssertionError(f'unexpected statement {statement.name}')
+        return dict(row) if row else None
+
+    def fetch_all(self, statement, params=None):
+        self.queries += 1
+        last_id, now = params
+        return [dict(row) for row in self.revocations
+                if row['id'] > last_id and row['expires_at'] > now
+                and (row['jti'] is None or row['token_type'] == 'access')]
+
+    def execute(self, statement, params=None):
+        self.queries += 1
+        with self._lock:
+            if statement.name == 'token_revoke':
+                user_id, jti, token_type, revoked_at, expires_at = params
+                if jti is not None and any(row['jti'] == jti for row in self.revocations):
+                    return 0  # INSERT IGNORE trên jti UNIQUE
+                self.revocations.append({'id': len(self.revocations) + 1, 'user_id': user_id, 'jti': jti,
+                                         'token_type': token_type, 'revoked_at': revoked_at,
+                                         'expires_at': expires_at})
+                return 1
+            if statement.name.startswith('user_update'):
+                # UPDATE users SET <cột> = %s, ..., updated_at = NOW() WHERE id = %s
+                fields = statement.name[len('user_update['):-1].split(',')
+                self.users[params[-1]].update(zip(fields, params))
+                return 1
+            if statement.name == 'token_revocations_purge':
+                return 0
+        raise AssertionError(f'unexpected statement {statement.name}')
+
+    def after_commit(self, callback):
+        callback()
+
+    def transaction(self, savepoint=True):
+        return contextlib.nullcontext(self)
+
+    def bind_user(self, user_id):
+        return contextlib.nullcontext()
+
+
+def checks(client, db: AuthDB) -> bool:
+    results = []
+
+    def check(name, ok):
+        results.append(ok)
+        print(f"{'ok' if ok else 'FAIL':<5} {name}")
+
+    def login(user_id=1, password=PASSWORD):
+        return client.post('/api/auth/login', json={'email': f'user{user_id}@example.com',
+                                                     'password': password}).get_json()
+
+    def me(access):
+        return client.get('/api/auth/me', headers={'Authorization': f'Bearer {access}'}).status_code
+
+    def refresh(token):
+        return client.post('/api/auth/refresh', json={'refresh_token': token})
+
+    # Hai worker khác trên cùng shared state: một nhận pub/sub, một chỉ đồng bộ từ DB
+    other_worker = RevocationSet(shared_state.SharedState(shared_state.shared.backend, shared_state.shared.prefix))
+
+    session = login()
+    check('login returns an access/refresh pair (token = access_token)',
+          session['token'] == session['access_token'] and session['refresh_token']
+          and session['expires_in'] == int(token_service.access_seconds))
+    queries = db.queries
+    check('access token authenticates without database queries', me(session['access_token']) == 200
+          and db.queries == queries + 1)  # câu duy nhất là SELECT user của chính route /me
+
+    rotated = refresh(session['refresh_token']).get_json()
+    check('refresh returns a new pair', rotated['success'] and rotated['refresh_token'] != session['refresh_token']
+          and me(rotated['access_token']) == 200)
+    check('a refresh token is single use', refresh(session['refresh_token']).status_code == 401)
+    check('access token from the original login still works', me(session['access_token']) == 200)
+
+    client.post('/api/auth/logout', headers={'Authorization': f"Bearer {rotated['access_token']}"},
+                json={'refresh_token': rotated['refresh_token']})
+    check('logout revokes the access token', me(rotated['access_token']) == 401)
+    check('logout revokes the refresh token', refresh(rotated['refresh_token']).status_code == 401)
+    claims = jwt.decode(rotated['access_token'], options={'verify_signature': False})
+    check('logout reaches other workers via pub/sub', other_worker.is_revoked(claims))
+    fresh_worker = RevocationSet(shared_state.SharedState())
+    fresh_worker.sync(db)
+    check('a new worker loads revocations from the database', fresh_worker.is_revoked(claims))
+
+    phone, laptop = login(), login()
+    response = client.put('/api/auth/update-profile', headers={'Authorization': f"Bearer {laptop['access_token']}"},
+                          json={'current_password': PASSWORD, 'new_password': 'new-password-1'}).get_json()
+    check('password change returns a new pair that works',
+          response['success'] and me(response['access_token']) == 200)
+    check('password change revokes other sessions', me(phone['access_token']) == 401
+          and refresh(phone['refresh_token']).status_code == 401 and me(laptop['access_token']) == 401)
+    claims = jwt.decode(phone['access_token'], options={'verify_signature': False})
+    fresh_worker = RevocationSet(shared_state.SharedState())
+    fresh_worker.sync(db)
+    check('password change reaches other workers', other_worker.is_revoked(claims)
+          and fresh_worker.is_revoked(claims))
+    check('other users are not affected', me(login(2)['access_token']) == 200)
+
+    # Hai logout song song: dòng id lớn commit trước, dòng id nhỏ commit sau lần đồng bộ
+    early, late = login(2), login(2)
+    for session in (early, late):
+        client.post('/api/auth/logout', headers={'Authorization': f"Bearer {session['access_token']}"})
+    late_row, early_row = db.revocations.pop(), db.revocations.pop()
+    db.revocations.append(late_row)
+    fresh_worker = RevocationSet(shared_state.SharedState())
+    fresh_worker.sync(db)
+    db.revocations.append(early_row)
+    fresh_worker.sync(db)
+    claims = jwt.decode(early['access_token'], options={'verify_signature': False})
+    check('sync picks up rows committed out of id order', fresh_worker.is_revoked(claims))
+
+    legacy = jwt.encode({'user_id': 1, 'exp': int(time.time()) + 86400}, token_service.secret, algorithm='HS256')
+    check('legacy 24h token without jti is rejected', me(legacy) == 401)
+    check('refresh token is not accepted as access token', me(login(2)['refresh_token']) == 401)
+    return all(results)
+
+
+def measure(db: AuthDB, revoked: int, iterations: int) -> dict:
+    revocations = token_service.revocations
+    expires = time.time() + 900
+    for _ in range(revoked - revocations.size()['tokens']):
+        revocations.add_token(uuid.uuid4().hex, expires, publish=False)
+    access = token_service.issue(2)['access_token']
+    users = UserModel(db)
+
+    samples = {'new': [], 'old': []}
+    for _ in range(iterations):
+        started = time.perf_counter()
+        token_service.decode(access)
+        samples['new'].append(time.perf_counter() - started)
+
+        # token_required trước đây: giải mã rồi đọc user (qua cache dùng chung)
+        started = time.perf_counter()
+        data = jwt.decode(access, token_service.secret, algorithms=["HS256"])
+        users.get_cached_user(data['user_id'])
+        samples['old'].append(time.perf_counter() - started)
+    return {name: summarize(values) for name, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Access/refresh token and revocation checks')
+    parser.add_argument('--revoked', type=int, nargs='+', default=[0, 10000, 100000],
+                        help='revoked access tokens held in memory while measuring')
+    parser.add_argument('--iterations', type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    app_module.create_app(start_background=False)
+    app_module._background_pid = os.getpid()  # không chạy job queue/health monitor cho DB giả
+    ratelimit.limiter.enabled = False
+    # Cost scrypt nhỏ: ở đây chỉ kiểm tra token, không đo băm mật khẩu
+    passwords.configure(SimpleNamespace(PASSWORD_SCRYPT_N=1024))
+    db = AuthDB()
+    app_module.db_manager = db
+    client = app_module.app.test_client()
+
+    passed = checks(client, db)
+
+    print(f"\n{'revoked':>8} {'new p50 us':>11} {'new p99 us':>11} {'old p50 us':>11} {'old p99 us':>11}")
+    for revoked in args.revoked:
+        result = measure(db, revoked, args.iterations)
+        print(f"{revoked:>8} {result['new']['p50_ms'] * 1000:>11.1f} {result['new']['p99_ms'] * 1000:>11.1f} "
+              f"{result['old']['p50_ms'] * 1000:>11.1f} {result['old']['p99_ms'] * 1000:>11.1f}")
+    print(f"access token lifetime {token_service.access_seconds / 60:.0f} min, "
+          f"refresh {token_service.refresh_seconds / 86400:.0f} days")
+
+    passwords.hasher.shutdown()
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+"""
+Đếm round trip tới MySQL cho các thao tác nhiều bước, chạy từng câu lệnh riêng
+(mỗi câu một lần lấy kết nối + commit) so với trong DatabaseManager.transaction().
+
+    python -m benchmarks.bench_transactions
+    python -m benchmarks.bench_transactions --rtt-ms 1.0 --bulk 50 --output benchmarks/baselines/transactions.json
+
+Không cần MySQL: DatabaseManager dùng một pool giả, mỗi round trip (reset
+session khi lấy kết nối, prepare, câu lệnh, commit/rollback) ngủ --rtt-ms để
+mô phỏng độ trễ mạng. Các thao tác gọi đúng method của models nên số câu lệnh
+khớp với code thật. --no-prepared đo lại với DB_PREPARED_STATEMENTS=false.
+"""
+import argparse
+import copy
+import itertools
+import logging
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.common import compare, summarize, write_results
+from config import config
+from database import DatabaseManager
+from models import ScheduleModel, UserModel
+
+_NOW = datetime(2026, 1, 5, 10, 0)
+_SCHEDULE_ROW = {
+    'id': 1, 'user_id': 1, 'event': 'họp nhóm', 'description': '', 'start_time': _NOW,
+    'end_time': _NOW, 'location': None, 'reminder_minutes': 15, 'category': 'meeting',
+    'priority': 'medium', 'status': 'pending', 'created_at': _NOW, 'updated_at': _NOW
+}
+_USER_ROW = {
+    'id': 1, 'email': 'bench@example.com', 'password': 'x', 'fullname': 'Bench',
+    'created_at': _NOW, 'updated_at': _NOW
+}
+
+
+class RoundTrips:
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.count = 0
+        self.checkouts = 0
+        self.commits = 0
+        self.prepares = 0
+        self._ids = itertools.count(100)
+
+    def hit(self):
+        self.count += 1
+        if self.rtt:
+            time.sleep(self.rtt)
+
+
+class FakeCursor:
+    def __init__(self, connection, dictionary=False, prepared=False):
+        self.connection = connection
+        self.trips = connection.trips
+        self.dictionary = dictionary
+        self.prepared = prepared
+        self.rowcount = 0
+        self.lastrowid = None
+        self.column_names = ()
+        self._rows = []
+        self._executed = None
+
+    def execute(self, query, params=None):
+        if self.prepared and query is not self._executed:
+            # COM_STMT_PREPARE, chỉ lần đầu cursor gặp câu lệnh này
+            self.trips.prepares += 1
+            self.trips.hit()
+        self._executed = query
+        self.trips.hit()
+        self.connection.in_transaction = True
+        statement = query.strip().lower()
+        self.rowcount = 1
+        if statement.startswith('insert'):
+            self.lastrowid = next(self.trips._ids)
+        if 'from users where email' in statement:
+            row = None
+        elif 'from users' in statement:
+            row = _USER_ROW
+        else:
+            row = _SCHEDULE_ROW
+        self.column_names = tuple(row) if row else ()
+        if row is None:
+            self._rows = []
+        elif self.dictionary:
+            self._rows = [dict(row)]
+        else:
+            self._rows = [tuple(row.values())]
+
+    def executemany(self, query, seq_params):
+        # mysql-connector gộp INSERT nhiều bộ tham số thành một câu multi-row
+        self.trips.hit()
+        self.rowcount = len(seq_params)
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, trips: RoundTrips):
+        self.trips = trips
+        self.connection_id = 1
+        self.in_transaction = False
+
+    def cursor(self, dictionary=False, prepared=False):
+        return FakeCursor(self, dictionary, prepared)
+
+    def commit(self):
+        self.trips.commits += 1
+        self.in_transaction = False
+        self.trips.hit()
+
+    def rollback(self):
+        self.in_transaction = False
+        self.trips.hit()
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, trips: RoundTrips, reset_session: bool):
+        self.trips = trips
+        self.reset_session = reset_session
+        self.connection = FakeConnection(trips)
+
+    def get_connection(self):
+        self.trips.checkouts += 1
+        if self.reset_session:
+            # pool_reset_session=True: mỗi lần lấy kết nối tốn một lệnh reset,
+            # và reset hủy mọi prepared statement của session
+            self.trips.hit()
+            self.connection.connection_id += 1
+        return self.connection
+
+
+class BenchDatabaseManager(DatabaseManager):
+    def __init__(self, trips: RoundTrips, prepared: bool = True):
+        self.trips = trips
+        bench_config = copy.copy(config['default'])
+        bench_config.DB_PREPARED_STATEMENTS = prepared
+        super().__init__(bench_config)
+
+    def _create_connection_pool(self):
+        self.connection_pool = FakePool(self.trips, reset_session=not self.prepare_statements)
+
+
+def operations(db: DatabaseManager, bulk: int):
+    schedules = ScheduleModel(db)
+    users = UserModel(db)
+    schedule = {'event': 'họp nhóm', 'start_time': _NOW, 'end_time': _NOW, 'category': 'meeting'}
+
+    def create_and_read():
+        schedule_id = schedules.create_schedule(1, schedule)
+        schedules.get_schedule_by_id_with_user(schedule_id, 1)
+
+    def register():
+        if users.get_user_by_email('new@example.com') is None:
+            user_id = users.create_user('new@example.com', 'hash', 'New')
+            users.get_user_by_id(user_id)
+
+    def bulk_insert():
+        for _ in range(bulk):
+            schedules.create_schedule(1, schedule)
+
+    def bulk_insert_batched():
+        query = ("INSERT INTO schedules (user_id, event, start_time, end_time, category, created_at, updated_at) "
+                 "VALUES (%s, %s, %s, %s, %s, NOW(), NOW())")
+        with db.transaction(savepoint=False) as uow:
+            uow.executemany(query, [(1, schedule['event'], _NOW, _NOW, 'meeting')] * bulk)
+
+    return {
+        'create_and_read': (create_and_read, create_and_read),
+        'register': (register, register),
+        f'bulk_insert[{bulk}]': (bulk_insert, bulk_insert_batched),
+    }
+
+
+def measure(db, trips: RoundTrips, func, transactional: bool, iterations: int):
+    samples = []
+    func()  # làm nóng cache prepared statement của kết nối
+    trips.count = trips.checkouts = trips.commits = trips.prepares = 0
+    for _ in range(iterations):
+        started = time.perf_counter()
+        if transactional:
+            with db.transaction():
+                func()
+        else:
+            func()
+        samples.append(time.perf_counter() - started)
+    result = summarize(samples)
+    result['round_trips'] = round(trips.count / iterations, 2)
+    result['checkouts'] = round(trips.checkouts / iterations, 2)
+    result['commits'] = round(trips.commits / iterations, 2)
+    result['prepares'] = round(trips.prepares / iterations, 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Round trips per multi-statement operation')
+    parser.add_argument('--rtt-ms', type=float, default=0.5, help='simulated network round trip')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--bulk', type=int, default=20, help='rows for the bulk insert case')
+    parser.add_argument('--prepared', action=argparse.BooleanOptionalAction, default=True,
+                        help='per-connection prepared statements (DB_PREPARED_STATEMENTS)')
+    parser.add_argument('--output', help='write results as JSON baseline')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    trips = RoundTrips(args.rtt_ms / 1000.0)
+    db = BenchDatabaseManager(trips, prepared=args.prepared)
+
+    results = {}
+    print(f"{'operation':<34} {'round trips':>12} {'checkouts':>10} {'commits':>8} {'prepares':>9} {'p50 ms':>9}")
+    for name, (plain, batched) in operations(db, args.bulk).items():
+        for mode, func, transactional in (('per-statement', plain, False), ('unit-of-work', batched, True)):
+            key = f'{name}/{mode}'
+            result = measure(db, trips, func, transactional, args.iterations)
+            results[key] = result
+            print(f"{key:<34} {result['round_trips']:>12} {result['checkouts']:>10} "
+                  f"{result['commits']:>8} {result['prepares']:>9} {result['p50_ms']:>9.2f}")
+
+    params = {'rtt_ms': args.rtt_ms, 'iterations': args.iterations, 'bulk': args.bulk,
+              'prepared': args.prepared}
+    if args.output:
+        write_results(args.output, 'transactions', params, results)
+    if args.compare and not compare(args.compare, results, tolerance=args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Tiện ích dùng chung cho các bộ benchmark: thống kê percentile, lưu và so sánh baseline."""
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def summarize(samples: List[float], duration: Optional[float] = None, errors: int = 0) -> Dict:
+    """Tóm tắt danh sách thời gian (giây) thành số liệu tính bằng mili giây."""
+    values = sorted(samples)
+    summary = {
+        'count': len(values),
+        'errors': errors,
+        'mean_ms': round(sum(values) / len(values) * 1000, 4) if values else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 4),
+        'p95_ms': round(percentile(values, 95) * 1000, 4),
+        'p99_ms': round(percentile(values, 99) * 1000, 4),
+        'max_ms': round(values[-1] * 1000, 4) if values else 0.0
+    }
+    if duration:
+        summary['throughput_rps'] = round(len(values) / duration, 2)
+    return summary
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                         cwd=SERVER_DIR, stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def write_results(path: str, suite: str, params: Dict, results: Dict):
+    payload = {
+        'suite': suite,
+        'environment': environment(),
+        'params': params,
+        'results': results
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {path}")
+
+
+def compare(baseline_path: str, results: Dict, metric: str = 'p95_ms', tolerance: float = 0.10) -> bool:
+    """
+    So sánh kết quả hiện tại với baseline. Trả về False nếu có mục nào chậm
+    hơn baseline quá `tolerance` (tỉ lệ) theo `metric`.
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+
+    ok = True
+    print(f"\n{'name':<40} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, current in sorted(results.items()):
+        base = baseline.get(name)
+        if not base or metric not in base or metric not in current:
+            print(f"{name:<40} {'-':>12} {current.get(metric, 0):>12.3f} {'new':>9}")
+            continue
+        before, after = base[metric], current[metric]
+        change = (after - before) / before if before else 0.0
+        flag = ''
+        if change > tolerance:
+            flag = '  REGRESSION'
+            ok = False
+        print(f"{name:<40} {before:>12.3f} {after:>12.3f} {change:>+8.1%}{flag}")
+    return ok
+
+
+def print_table(results: Dict):
+    print(f"\n{'name':<40} {'count':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'err':>5}")
+    for name, r in sorted(results.items()):
+        print(f"{name:<40} {r['count']:>7} {r.get('throughput_rps', 0):>9.1f} "
+              f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r.get('errors', 0):>5}")
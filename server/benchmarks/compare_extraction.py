@@ -0,0 +1,145 @@
+"""
+So sánh độ chính xác và độ trễ trích xuất thời gian giữa ba cách:
+
+- rules:  chỉ dùng parser temporal (offline)
+- llm:    prompt đầy đủ, LLM tự trích mọi trường
+- hybrid: rule điền trước datetime/nhắc/phân loại, LLM chỉ trích phần còn lại
+
+    python -m benchmarks.compare_extraction
+    python -m benchmarks.compare_extraction --modes rules,llm,hybrid
+    python -m benchmarks.compare_extraction --modes rules,llm,hybrid --backend openai --output benchmarks/baselines/extraction.json
+
+Mốc thời gian cố định (corpus.TEMPORAL_ANCHOR) được đưa vào prompt để đáp án
+không phụ thuộc ngày chạy. Chế độ llm/hybrid gọi backend cấu hình bởi
+LLM_BACKEND (hoặc --backend) và báo cáo số token prompt/sinh ra do backend trả về.
+"""
+import argparse
+import logging
+import sys
+import time
+
+from benchmarks.common import compare, summarize, write_results
+from benchmarks import corpus
+from ai_assistant import PersonalAssistant
+from config import config
+import llm_backends
+import slot_extraction
+import temporal
+
+
+def evaluate(mode_results, expected_start, expected_end, start, end):
+    mode_results['total'] += 1
+    if start == expected_start and (expected_end is None or end == expected_end):
+        mode_results['correct'] += 1
+        return True
+    return False
+
+
+def run_rules(anchor, rounds: int):
+    results = {'total': 0, 'correct': 0, 'failures': []}
+    samples = []
+    for _ in range(rounds):
+        for message, expected_start, expected_end in corpus.TEMPORAL_CASES:
+            text = slot_extraction.normalize(message)
+            started = time.perf_counter()
+            # Gọi bản không cache để đo đúng chi phí phân tích
+            expression = temporal.parse_expression.__wrapped__(text)
+            resolved = expression.resolve(anchor) if expression else None
+            samples.append(time.perf_counter() - started)
+
+            start = temporal.format_datetime(resolved[0]) if resolved else None
+            end = temporal.format_datetime(resolved[1]) if resolved and resolved[1] else None
+            if not evaluate(results, expected_start, expected_end, start, end) and len(results['failures']) < 20:
+                results['failures'].append({'message': message, 'expected': expected_start, 'got': start})
+
+    results['total'] //= rounds
+    results['correct'] //= rounds
+    results['failures'] = results['failures'][:len(corpus.TEMPORAL_CASES)]
+    return samples, results
+
+
+def run_llm(assistant: PersonalAssistant, anchor, hybrid: bool):
+    results = {'total': 0, 'correct': 0, 'failures': [], 'prompt_chars': 0, 'prompt_tokens': 0, 'output_tokens': 0}
+    samples = []
+    for message, expected_start, expected_end in corpus.TEMPORAL_CASES:
+        prefilled = assistant._prefill_schedule_fields(message, anchor) if hybrid else {}
+        prompt = assistant._create_intent_analysis_prompt(message, 1, [], prefilled, anchor)
+
+        started = time.perf_counter()
+        try:
+            generation = assistant.llm.generate(prompt)
+        except llm_backends.LLMError as e:
+            samples.append(time.perf_counter() - started)
+            results['total'] += 1
+            results['failures'].append({'message': message, 'error': str(e)})
+            continue
+        parsed = assistant._parse_ollama_response(generation.text, message)
+        if parsed.get('success'):
+            assistant._merge_prefilled_fields(parsed, prefilled)
+        samples.append(time.perf_counter() - started)
+
+        results['prompt_chars'] += len(prompt)
+        results['prompt_tokens'] += generation.prompt_tokens
+        results['output_tokens'] += generation.output_tokens
+
+        schedule_data = parsed.get('schedule_data') or {}
+        start, end = schedule_data.get('datetime'), schedule_data.get('end_time')
+        if not evaluate(results, expected_start, expected_end, start, end):
+            results['failures'].append({'message': message, 'expected': expected_start, 'got': start})
+
+    count = max(len(corpus.TEMPORAL_CASES), 1)
+    for key in ('prompt_chars', 'prompt_tokens', 'output_tokens'):
+        results[f'avg_{key}'] = round(results.pop(key) / count, 1)
+    return samples, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare rule-based, LLM and hybrid datetime extraction')
+    parser.add_argument('--modes', default='rules', help='comma separated: rules,llm,hybrid')
+    parser.add_argument('--backend', help='LLM backend for llm/hybrid modes (default: LLM_BACKEND)')
+    parser.add_argument('--rounds', type=int, default=200, help='repetitions for the rules mode')
+    parser.add_argument('--show-failures', action='store_true')
+    parser.add_argument('--output', help='write results as JSON baseline')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    modes = [mode for mode in args.modes.split(',') if mode]
+
+    assistant = PersonalAssistant(config['default'], None)
+    if args.backend:
+        assistant.llm = llm_backends.create_backend(config['default'], args.backend)
+    anchor = corpus.TEMPORAL_ANCHOR.replace(tzinfo=assistant.timezone)
+
+    results = {}
+    print(f"{'mode':<8} {'accuracy':>9} {'p50 ms':>10} {'p95 ms':>10} {'prompt chars':>13} {'prompt tok':>11} {'output tok':>11}")
+    for mode in modes:
+        if mode == 'rules':
+            samples, detail = run_rules(anchor, args.rounds)
+        elif mode in ('llm', 'hybrid'):
+            samples, detail = run_llm(assistant, anchor, mode == 'hybrid')
+        else:
+            parser.error(f'unknown mode {mode}')
+
+        result = summarize(samples)
+        result['accuracy'] = round(detail['correct'] / detail['total'], 3) if detail['total'] else 0.0
+        result.update({key: value for key, value in detail.items() if key.startswith('avg_')})
+        results[mode] = result
+
+        print(f"{mode:<8} {result['accuracy']:>9.1%} {result['p50_ms']:>10.3f} {result['p95_ms']:>10.3f} "
+              f"{result.get('avg_prompt_chars', '-'):>13} {result.get('avg_prompt_tokens', '-'):>11} "
+              f"{result.get('avg_output_tokens', '-'):>11}")
+        if args.show_failures:
+            for failure in detail['failures']:
+                print(f"    {failure}")
+
+    params = {'modes': modes, 'backend': assistant.llm.describe(), 'cases': len(corpus.TEMPORAL_CASES)}
+    if args.output:
+        write_results(args.output, 'extraction', params, results)
+    if args.compare and not compare(args.compare, results, metric='p50_ms', tolerance=args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
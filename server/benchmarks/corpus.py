@@ -0,0 +1,106 @@
+"""Dữ liệu mẫu tiếng Việt cho microbenchmark: tin nhắn chat, phản hồi LLM và danh sách lịch trình."""
+import json
+import random
+from datetime import datetime, timedelta
+
+MESSAGES = {
+    'short': [
+        'chào bạn',
+        'xem lịch',
+        'mai có gì',
+        'xóa lịch 12',
+    ],
+    'medium': [
+        'nhắc tôi họp lúc 9h sáng mai trước 15 phút',
+        'đặt báo thức 7h sáng mai',
+        'họp nhóm tại phòng 302 lúc 14:30 chiều nay',
+        'xem lịch hôm nay có gì quan trọng không',
+        'sửa lịch 15 thành 10h sáng thứ 6',
+        'hủy cuộc họp với khách hàng chiều nay',
+    ],
+    'long': [
+        'ngày mai tôi có cuộc họp quan trọng với khách hàng tại văn phòng công ty lúc 2 giờ chiều, '
+        'nhắc tôi trước 30 phút và ghi chú là phải mang theo hợp đồng đã ký cùng bản báo giá mới nhất',
+        'tuần này tôi bận quá, cho tôi xem tất cả lịch trình hiện có, đặc biệt là các cuộc họp công việc '
+        'và những việc gấp cần làm trước cuối tuần để tôi sắp xếp lại thời gian cho hợp lý',
+        'đặt lịch tập thể dục ở phòng gym gần nhà lúc 6 giờ sáng mỗi ngày, nhắc trước 10 phút, '
+        'đây là việc cá nhân nhưng khá quan trọng với sức khỏe của tôi nên ưu tiên cao nhé',
+    ],
+}
+
+LLM_RESPONSES = [
+    # JSON sạch
+    json.dumps({
+        'is_schedule_related': True, 'intent': 'schedule', 'confidence': 0.9,
+        'schedule_data': {'event': 'họp', 'datetime': '2026-01-02 09:00:00', 'reminder_minutes': 15,
+                          'category': 'meeting', 'priority': 'medium'}
+    }, ensure_ascii=False),
+    # JSON kèm văn bản thừa trước/sau, như các model nhỏ hay trả về
+    'Dưới đây là kết quả phân tích:\n```json\n' + json.dumps({
+        'is_schedule_related': True, 'intent': 'query', 'confidence': 0.85, 'query_scope': 'tomorrow'
+    }, ensure_ascii=False) + '\n```\nHy vọng hữu ích!',
+    # Thiếu trường, cần bổ sung bằng rule
+    json.dumps({'is_schedule_related': True, 'intent': 'schedule', 'schedule_data': {}}, ensure_ascii=False),
+    # Hội thoại
+    json.dumps({'is_schedule_related': False, 'intent': 'conversation', 'confidence': 0.8,
+                'response': 'Xin chào! Tôi có thể giúp gì cho bạn?'}, ensure_ascii=False),
+]
+
+# Câu có thời gian kèm đáp án, tính từ mốc TEMPORAL_ANCHOR (thứ Hai 05/01/2026 10:00)
+TEMPORAL_ANCHOR = datetime(2026, 1, 5, 10, 0)
+TEMPORAL_CASES = [
+    ('nhắc tôi họp lúc 9h sáng mai trước 15 phút', '2026-01-06 09:00:00', None),
+    ('đặt báo thức 7h sáng mai', '2026-01-06 07:00:00', None),
+    ('họp nhóm tại phòng 302 lúc 14:30 chiều nay', '2026-01-05 14:30:00', None),
+    ('gặp khách hàng 3 giờ chiều thứ 6', '2026-01-09 15:00:00', None),
+    ('họp thứ 2 tuần sau lúc 9h', '2026-01-12 09:00:00', None),
+    ('khám răng ngày 20/1 lúc 8 giờ rưỡi', '2026-01-20 08:30:00', None),
+    ('sinh nhật mẹ ngày 14 tháng 2 lúc 7h tối', '2026-02-14 19:00:00', None),
+    ('2 tiếng nữa gọi điện cho khách', '2026-01-05 12:00:00', None),
+    ('nhắc tôi uống thuốc sau 30 phút', '2026-01-05 10:30:00', None),
+    ('học tiếng anh từ 8h đến 9h30 tối mai', '2026-01-06 20:00:00', '2026-01-06 21:30:00'),
+    ('đi chợ sáng chủ nhật', '2026-01-11 08:00:00', None),
+    ('review code 9 giờ kém 15 ngày mốt', '2026-01-07 08:45:00', None),
+    ('ăn trưa với bạn 12h trưa nay', '2026-01-05 12:00:00', None),
+    ('nộp báo cáo 3 ngày nữa lúc 17h', '2026-01-08 17:00:00', None),
+    ('đặt lịch tập gym 6h', '2026-01-06 06:00:00', None),
+    ('tối nay 8h xem phim', '2026-01-05 20:00:00', None),
+    ('xem bóng đá 12h đêm thứ 7', '2026-01-11 00:00:00', None),
+    ('đặt lịch 3h chiều đến 5h', '2026-01-05 15:00:00', '2026-01-05 17:00:00'),
+]
+
+EVENTS = ['Họp nhóm', 'Báo thức dậy', 'Gặp khách hàng', 'Tập thể dục', 'Học tiếng Anh',
+          'Đi chợ', 'Khám răng', 'Review code', 'Ăn trưa với bạn', 'Gọi điện cho mẹ']
+CATEGORIES = ['alarm', 'meeting', 'personal', 'work', 'general']
+
+SCHEDULE_COUNTS = (10, 100, 1000, 10000)
+
+
+def make_schedules(count: int, seed: int = 7):
+    """Danh sách lịch trình dạng dict giống ScheduleModel.get_user_schedules trả về."""
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1, 8, 0, 0)
+    schedules = []
+    for i in range(count):
+        start = now + timedelta(minutes=15 * rng.randint(-5000, 5000))
+        category = rng.choice(CATEGORIES)
+        schedules.append({
+            'id': i + 1,
+            'user_id': 1,
+            'event': rng.choice(EVENTS),
+            'description': '',
+            'start_time': start.isoformat(),
+            'end_time': (start + timedelta(hours=1)).isoformat(),
+            'location': rng.choice([None, 'phòng 302', 'công ty']),
+            'reminder_minutes': rng.choice([None, 15, 30]),
+            'category': category,
+            'priority': rng.choice(['low', 'medium', 'high']),
+            'status': 'pending',
+            'created_at': now.isoformat(),
+            'updated_at': now.isoformat()
+        })
+    return schedules
+
+
+def all_messages():
+    return [message for group in MESSAGES.values() for message in group]
@@ -0,0 +1,220 @@
+"""
+Load test end-to-end cho Flask API.
+
+Chuẩn bị:
+    python -m benchmarks.ollama_stub --port 11500 --latency-ms 800 &
+    OLLAMA_URL=http://localhost:11500/api/generate python app.py &
+    python -m benchmarks.seed --users 50 --schedules 500 --reset
+
+Chạy và lưu baseline:
+    python -m benchmarks.loadtest --threads 16 --duration 60 --output benchmarks/baselines/loadtest.json
+
+So sánh với baseline (exit code 1 nếu p95 của route nào tệ hơn quá --tolerance):
+    python -m benchmarks.loadtest --threads 16 --duration 60 --compare benchmarks/baselines/loadtest.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import requests
+
+from benchmarks.common import compare, print_table, summarize, write_results
+
+SEARCH_TERMS = ['họp', 'báo thức', 'khách hàng', 'review', 'phòng']
+CHAT_MESSAGES = [
+    'xem lịch hôm nay',
+    'mai có gì không',
+    'nhắc tôi họp lúc 9h sáng mai trước 15 phút',
+    'đặt báo thức 7h sáng mai',
+    'chào bạn',
+]
+
+# Trọng số mô phỏng lưu lượng thật: phần lớn là polling và đọc lịch
+DEFAULT_MIX = {
+    'upcoming': 40,
+    'range': 10,
+    'calendar': 10,
+    'list': 5,
+    'search': 10,
+    'crud': 15,
+    'chat': 10,
+}
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def record(self, name: str, elapsed: float, ok: bool):
+        with self.lock:
+            self.samples[name].append(elapsed)
+            if not ok:
+                self.errors[name] += 1
+
+
+class Client:
+    def __init__(self, base_url: str, recorder: Recorder, timeout: float):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def call(self, name: str, method: str, path: str, **kwargs):
+        started = time.perf_counter()
+        ok = False
+        body = None
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            ok = response.status_code < 400
+            if response.headers.get('Content-Type', '').startswith('application/json'):
+                body = response.json()
+        except requests.RequestException:
+            pass
+        self.recorder.record(name, time.perf_counter() - started, ok)
+        return body
+
+    def login(self, email: str, password: str) -> bool:
+        body = self.call('POST /api/auth/login', 'POST', '/api/auth/login',
+                         json={'email': email, 'password': password})
+        if not body or not body.get('token'):
+            return False
+        self.session.headers['Authorization'] = f"Bearer {body['token']}"
+        return True
+
+
+def run_scenario(client: Client, scenario: str, rng: random.Random):
+    today = datetime.now()
+
+    if scenario == 'upcoming':
+        client.call('GET /api/schedules/upcoming', 'GET', '/api/schedules/upcoming', params={'hours': 24})
+    elif scenario == 'range':
+        start = today.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        client.call('GET /api/schedules/range', 'GET', '/api/schedules/range',
+                    params={'start_date': start.strftime('%Y-%m-%d'), 'end_date': end.strftime('%Y-%m-%d')})
+    elif scenario == 'calendar':
+        month = (today + timedelta(days=31 * rng.randint(-2, 2))).strftime('%Y-%m')
+        client.call('GET /api/schedules/calendar', 'GET', '/api/schedules/calendar',
+                    params={'month': month, 'summary': 'true'})
+    elif scenario == 'list':
+        client.call('GET /api/schedules', 'GET', '/api/schedules')
+    elif scenario == 'search':
+        client.call('GET /api/schedules/search', 'GET', '/api/schedules/search',
+                    params={'q': rng.choice(SEARCH_TERMS)})
+    elif scenario == 'crud':
+        start = today + timedelta(days=rng.randint(1, 30), hours=rng.randint(0, 10))
+        payload = {
+            'event': 'Load test event',
+            'start_time': start.isoformat(),
+            'end_time': (start + timedelta(hours=1)).isoformat(),
+            'category': 'work',
+            'priority': 'medium'
+        }
+        body = client.call('POST /api/schedules', 'POST', '/api/schedules', json=payload)
+        schedule_id = body.get('schedule_id') if body else None
+        if schedule_id:
+            payload['event'] = 'Load test event (updated)'
+            client.call('PUT /api/schedules/<id>', 'PUT', f'/api/schedules/{schedule_id}', json=payload)
+            client.call('DELETE /api/schedules/<id>', 'DELETE', f'/api/schedules/{schedule_id}')
+    elif scenario == 'chat':
+        client.call('POST /api/chat', 'POST', '/api/chat', json={'message': rng.choice(CHAT_MESSAGES)})
+
+
+def worker(index: int, args, credentials, mix, recorder: Recorder, deadline: float, counter):
+    rng = random.Random(args.seed + index)
+    user = credentials[index % len(credentials)]
+    client = Client(args.base_url, recorder, args.timeout)
+    if not client.login(user['email'], user['password']):
+        print(f"worker {index}: login failed for {user['email']}", file=sys.stderr)
+        return
+
+    names, weights = zip(*mix.items())
+    while time.monotonic() < deadline:
+        if args.requests:
+            with counter['lock']:
+                if counter['done'] >= args.requests:
+                    return
+                counter['done'] += 1
+        run_scenario(client, rng.choices(names, weights)[0], rng)
+
+
+def parse_mix(value: str):
+    if not value:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in value.split(','):
+        name, weight = item.split('=')
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end load test for the scheduler API')
+    parser.add_argument('--base-url', default=os.getenv('API_URL', 'http://localhost:5000'))
+    parser.add_argument('--credentials', default=os.path.join('benchmarks', 'results', 'users.json'))
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30, help='seconds')
+    parser.add_argument('--requests', type=int, default=0, help='stop after N scenarios (0 = duration only)')
+    parser.add_argument('--mix', type=parse_mix, default=None,
+                        help='scenario weights, e.g. upcoming=50,chat=5 (default: built-in mix)')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write results as JSON baseline')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='allowed p95 regression ratio')
+    args = parser.parse_args()
+
+    with open(args.credentials, encoding='utf-8') as f:
+        credentials = json.load(f)
+    mix = args.mix or dict(DEFAULT_MIX)
+
+    recorder = Recorder()
+    counter = {'done': 0, 'lock': threading.Lock()}
+    started = time.monotonic()
+    deadline = started + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(i, args, credentials, mix, recorder, deadline, counter))
+        for i in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    results = {
+        name: summarize(samples, elapsed, recorder.errors[name])
+        for name, samples in recorder.samples.items()
+    }
+    all_samples = [value for samples in recorder.samples.values() for value in samples]
+    results['TOTAL'] = summarize(all_samples, elapsed, sum(recorder.errors.values()))
+
+    print_table(results)
+
+    params = {
+        'base_url': args.base_url,
+        'threads': args.threads,
+        'duration': args.duration,
+        'requests': args.requests,
+        'users': len(credentials),
+        'mix': mix,
+        'seed': args.seed
+    }
+    if args.output:
+        write_results(args.output, 'loadtest', params, results)
+    if args.compare and not compare(args.compare, results, tolerance=args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
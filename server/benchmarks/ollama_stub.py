@@ -0,0 +1,124 @@
+"""
+Ollama giả lập cho benchmark: trả lời /api/generate bằng JSON intent suy ra từ
+từ khóa trong tin nhắn, với độ trễ cấu hình được.
+
+    python -m benchmarks.ollama_stub --port 11500 --latency-ms 800 --jitter-ms 200
+
+Sau đó chạy server với OLLAMA_URL=http://localhost:11500/api/generate.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MESSAGE_PATTERN = re.compile(r'Tin nhắn cần phân tích: "(.*)"', re.DOTALL)
+
+
+def build_intent(message: str) -> dict:
+    text = message.lower()
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+
+    if any(word in text for word in ('xóa', 'hủy')):
+        match = re.search(r'\d+', text)
+        return {'is_schedule_related': True, 'intent': 'delete', 'confidence': 0.9,
+                'schedule_id': int(match.group()) if match else None, 'event_keyword': ''}
+    if any(word in text for word in ('sửa', 'đổi', 'cập nhật')):
+        match = re.search(r'\d+', text)
+        return {'is_schedule_related': True, 'intent': 'update', 'confidence': 0.9,
+                'schedule_id': int(match.group()) if match else None,
+                'schedule_data': {'event': 'Sự kiện đã sửa'}}
+    if 'xem' in text or 'có gì' in text:
+        scope = 'tomorrow' if 'mai' in text else 'today' if 'hôm nay' in text else 'all'
+        return {'is_schedule_related': True, 'intent': 'query', 'confidence': 0.9, 'query_scope': scope}
+    if any(word in text for word in ('đặt', 'tạo', 'nhắc', 'báo thức', 'họp')):
+        return {'is_schedule_related': True, 'intent': 'schedule', 'confidence': 0.9,
+                'schedule_data': {'event': 'Sự kiện benchmark', 'datetime': f'{tomorrow} 09:00:00',
+                                  'reminder_minutes': 15, 'category': 'meeting', 'priority': 'medium'}}
+    return {'is_schedule_related': False, 'intent': 'conversation', 'confidence': 0.8,
+            'response': 'Xin chào! Tôi có thể giúp gì cho bạn?'}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency_ms = 500.0
+    jitter_ms = 0.0
+    requests_served = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/api/tags':
+            self._send_json({'models': [{'name': 'stub'}]})
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/api/generate':
+            self._send_json({'error': 'not found'}, 404)
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        prompt = request.get('prompt', '')
+        match = MESSAGE_PATTERN.search(prompt)
+        message = match.group(1) if match else prompt[-200:]
+
+        delay = max(self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms), 0) / 1000.0
+        time.sleep(delay)
+
+        with StubHandler.lock:
+            StubHandler.requests_served += 1
+
+        # Chia độ trễ theo tỉ lệ gần giống Ollama thật: ~30% xử lý prompt, ~70% sinh token
+        prompt_tokens = len(prompt) // 4
+        self._send_json({
+            'model': request.get('model', 'stub'),
+            'response': json.dumps(build_intent(message), ensure_ascii=False),
+            'done': True,
+            'total_duration': int(delay * 1e9),
+            'prompt_eval_count': prompt_tokens,
+            'prompt_eval_duration': int(delay * 0.3 * 1e9),
+            'eval_count': 80,
+            'eval_duration': int(delay * 0.7 * 1e9)
+        })
+
+
+def serve(port: int, latency_ms: float, jitter_ms: float) -> ThreadingHTTPServer:
+    StubHandler.latency_ms = latency_ms
+    StubHandler.jitter_ms = jitter_ms
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Ollama stub with configurable latency')
+    parser.add_argument('--port', type=int, default=11500)
+    parser.add_argument('--latency-ms', type=float, default=500)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency_ms, args.jitter_ms)
+    print(f"Ollama stub listening on http://127.0.0.1:{args.port}/api/generate "
+          f"(latency {args.latency_ms}±{args.jitter_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
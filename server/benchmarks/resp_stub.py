@@ -0,0 +1,150 @@
+"""
+Server giả lập giao thức Redis (RESP2) cho benchmark shared state, khi máy
+không có redis-server. Chỉ hỗ trợ các lệnh shared_state.RespBackend dùng:
+PING, AUTH, SELECT, GET, SET [PX ms], DEL, INCR, PUBLISH, SUBSCRIBE.
+
+    python -m benchmarks.resp_stub --port 6390
+
+Sau đó chạy server với SHARED_STATE_URL=redis://localhost:6390.
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+def _encode(value) -> bytes:
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, list):
+        return b'*%d\r\n' % len(value) + b''.join(_encode(item) for item in value)
+    data = value if isinstance(value, bytes) else str(value).encode('utf-8')
+    return b'$%d\r\n%s\r\n' % (len(data), data)
+
+
+class RespStubServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, latency_ms: float = 0.0):
+        super().__init__(address, _Handler)
+        self.latency = latency_ms / 1000.0
+        self.data = {}
+        self.subscribers = {}
+        self.lock = threading.Lock()
+        self.commands = 0
+
+    def publish(self, channel: bytes, message: bytes) -> int:
+        with self.lock:
+            handlers = list(self.subscribers.get(channel, ()))
+        delivered = 0
+        for handler in handlers:
+            if handler.push(_encode([b'message', channel, message])):
+                delivered += 1
+        return delivered
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.write_lock = threading.Lock()
+        self.channels = set()
+
+    def push(self, payload: bytes) -> bool:
+        try:
+            with self.write_lock:
+                self.wfile.write(payload)
+                self.wfile.flush()
+            return True
+        except OSError:
+            return False
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        args = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        server = self.server
+        try:
+            while True:
+                args = self.read_command()
+                if args is None:
+                    break
+                server.commands += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                self.push(self.execute(args[0].upper(), args[1:]))
+        except (OSError, ValueError):
+            pass
+        finally:
+            with server.lock:
+                for channel in self.channels:
+                    server.subscribers.get(channel, set()).discard(self)
+
+    def execute(self, command: bytes, args) -> bytes:
+        server = self.server
+        if command == b'PING':
+            return b'+PONG\r\n'
+        if command in (b'AUTH', b'SELECT'):
+            return b'+OK\r\n'
+        if command == b'SUBSCRIBE':
+            replies = []
+            with server.lock:
+                for channel in args:
+                    self.channels.add(channel)
+                    server.subscribers.setdefault(channel, set()).add(self)
+                    replies.append(_encode([b'subscribe', channel, len(self.channels)]))
+            return b''.join(replies)
+        if command == b'PUBLISH':
+            return _encode(server.publish(args[0], args[1]))
+        with server.lock:
+            now = time.monotonic()
+            if command == b'GET':
+                entry = server.data.get(args[0])
+                if entry is None or (entry[0] is not None and entry[0] < now):
+                    return _encode(None)
+                return _encode(entry[1])
+            if command == b'SET':
+                expires_at = None
+                if len(args) >= 4 and args[2].upper() == b'PX':
+                    expires_at = now + int(args[3]) / 1000.0
+                server.data[args[0]] = (expires_at, args[1])
+                return b'+OK\r\n'
+            if command == b'DEL':
+                return _encode(sum(server.data.pop(key, None) is not None for key in args))
+            if command == b'INCR':
+                expires_at, value = server.data.get(args[0], (None, b'0'))
+                value = int(value) + 1
+                server.data[args[0]] = (expires_at, str(value).encode())
+                return _encode(value)
+        return b'-ERR unknown command\r\n'
+
+
+def start(port: int = 0, latency_ms: float = 0.0) -> RespStubServer:
+    """Chạy server trên một thread nền; port=0 để hệ điều hành chọn cổng trống."""
+    server = RespStubServer(('127.0.0.1', port), latency_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Minimal RESP server for shared state benchmarks')
+    parser.add_argument('--port', type=int, default=6390)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+    server = RespStubServer(('127.0.0.1', args.port), args.latency_ms)
+    print(f"RESP stub listening on 127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
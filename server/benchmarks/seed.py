@@ -0,0 +1,111 @@
+"""
+Tạo dữ liệu benchmark: N user, mỗi user M lịch trình, phân bố quanh thời điểm hiện tại.
+
+    python -m benchmarks.seed --users 50 --schedules 500 --credentials benchmarks/results/users.json
+
+Kết quả có thể tái lập với cùng --seed. Email có dạng bench+<i>@example.com nên
+--reset chỉ xóa dữ liệu benchmark cũ.
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+from config import config
+from database import DatabaseManager
+import passwords
+
+EMAIL_PATTERN = 'bench+{}@example.com'
+PASSWORD = 'benchmark123'
+
+EVENTS = ['Họp nhóm', 'Báo thức dậy', 'Gặp khách hàng', 'Tập thể dục', 'Học tiếng Anh',
+          'Đi chợ', 'Khám răng', 'Review code', 'Ăn trưa với bạn', 'Gọi điện cho mẹ']
+LOCATIONS = [None, 'phòng 302', 'công ty', 'nhà', 'quán cà phê', 'phòng họp A']
+CATEGORIES = ['alarm', 'meeting', 'personal', 'work', 'general']
+PRIORITIES = ['low', 'medium', 'high']
+STATUSES = ['pending', 'pending', 'pending', 'completed', 'cancelled']
+
+
+def reset(db):
+    db.execute_query("DELETE FROM users WHERE email LIKE %s", ('bench+%@example.com',), fetch=False)
+
+
+def seed(db, users: int, schedules: int, rng: random.Random, batch_size: int = 1000):
+    now = datetime.now().replace(second=0, microsecond=0)
+    # Một hash scrypt dùng chung cho mọi user benchmark: băm N lần thì seed rất chậm
+    password = passwords.hash_password(PASSWORD)
+    credentials = []
+
+    for i in range(users):
+        email = EMAIL_PATTERN.format(i)
+        user_id = db.execute_query(
+            "INSERT INTO users (email, password, fullname, created_at, updated_at) VALUES (%s, %s, %s, NOW(), NOW())",
+            (email, password, f'Bench User {i}'),
+            fetch=False
+        )
+        credentials.append({'id': user_id, 'email': email, 'password': PASSWORD})
+
+        rows = []
+        for _ in range(schedules):
+            start = now + timedelta(minutes=rng.randint(-60 * 24 * 90, 60 * 24 * 90))
+            start = start.replace(minute=(start.minute // 15) * 15)
+            category = rng.choice(CATEGORIES)
+            rows.append((
+                user_id,
+                rng.choice(EVENTS),
+                '',
+                start,
+                start + timedelta(minutes=15 if category == 'alarm' else 60),
+                rng.choice(LOCATIONS),
+                rng.choice([None, 5, 10, 15, 30]),
+                category,
+                rng.choice(PRIORITIES),
+                rng.choice(STATUSES)
+            ))
+        _insert_schedules(db, rows, batch_size)
+        print(f"user {i + 1}/{users}: {email} ({schedules} schedules)")
+
+    return credentials
+
+
+def _insert_schedules(db, rows, batch_size):
+    query = """
+    INSERT INTO schedules
+    (user_id, event, description, start_time, end_time, location,
+     reminder_minutes, category, priority, status, created_at, updated_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+    """
+    with db.get_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(query, rows[start:start + batch_size])
+            connection.commit()
+        finally:
+            cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed benchmark users and schedules')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--schedules', type=int, default=200, help='schedules per user')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='delete previous benchmark users first')
+    parser.add_argument('--credentials', default=os.path.join('benchmarks', 'results', 'users.json'))
+    args = parser.parse_args()
+
+    db = DatabaseManager(config['default'])
+    if args.reset:
+        reset(db)
+
+    credentials = seed(db, args.users, args.schedules, random.Random(args.seed))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.credentials)), exist_ok=True)
+    with open(args.credentials, 'w', encoding='utf-8') as f:
+        json.dump(credentials, f, indent=2)
+    print(f"Credentials written to {args.credentials}")
+
+
+if __name__ == '__main__':
+    main()
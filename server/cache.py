@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+import logging
+import metrics
+from shared_state import shared
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Cache LRU trong tiến trình, mỗi entry có thời hạn (giây)."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ScheduleVersions:
+    """
+    Bộ đếm phiên bản lịch trình theo user.
+
+    Mỗi lần lịch trình của user thay đổi thì phiên bản tăng lên, nên các cache
+    có key chứa phiên bản sẽ tự động bị bỏ qua mà không cần xóa từng entry.
+
+    Phiên bản được tăng trên shared state và phát qua kênh 'schedule_versions'
+    để cache ở các worker khác cũng bị bỏ qua; đọc chỉ dùng bản sao trong
+    process, chỉ hỏi shared state lần đầu gặp user. Trạng thái trong process
+    không gắn với phiên bản (VD: bộ đếm thống kê) đăng ký on_remote_change để
+    bỏ dữ liệu của user khi worker khác ghi.
+    """
+    channel = 'schedule_versions'
+
+    def __init__(self, state=shared):
+        self.state = state
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+        state.subscribe(self.channel, self._on_message)
+
+    def on_remote_change(self, callback):
+        """callback(user_id) khi lịch trình của user bị worker khác thay đổi."""
+        self._listeners.append(callback)
+
+    def get(self, user_id: int) -> int:
+        version = self._versions.get(user_id)
+        if version is None:
+            version = self._seen(user_id, int(self.state.get(self._key(user_id), 0)))
+        return version
+
+    def bump(self, user_id: int) -> int:
+        version = self.state.incr(self._key(user_id))
+        if version is None:
+            # Shared state không kết nối được: ít nhất cache của process này vẫn đúng
+            with self._lock:
+                version = self._versions.get(user_id, 0) + 1
+                self._versions[user_id] = version
+            return version
+        self._seen(user_id, version)
+        self.state.publish(self.channel, f'{user_id}:{version}')
+        return version
+
+    def _seen(self, user_id: int, version: int) -> int:
+        with self._lock:
+            version = max(version, self._versions.get(user_id, 0))
+            self._versions[user_id] = version
+            return version
+
+    def _on_message(self, message: str):
+        user_id, _, version = message.partition(':')
+        self._seen(int(user_id), int(version))
+        for callback in self._listeners:
+            try:
+                callback(int(user_id))
+            except Exception as e:
+                logger.error(f"Schedule version listener error: {e}")
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f'schedule_version:{user_id}'
+
+
+schedule_versions = ScheduleVersions()
+calendar_cache = TTLCache(max_entries=2048, ttl_seconds=300)
+metrics.register_cache('calendar', calendar_cache)
@@ -8,13 +8,114 @@ class Config:
         self.MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD', 'nguyenthuong01')
         self.MYSQL_DB = os.getenv('MYSQL_DB', 'personal_scheduler')
         self.MYSQL_PORT = int(os.getenv('MYSQL_PORT', 3306))
+        # Số process worker phục vụ app (gunicorn.conf.py đặt theo số worker thực tế; server dev: 1)
+        self.WORKERS = int(os.getenv('GUNICORN_WORKERS') or 1)
+        # Mỗi worker một pool; nên >= số thread của worker (gunicorn.conf.py tự đặt theo GUNICORN_THREADS)
+        self.DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+        # MySQL chưa sẵn sàng lúc tạo pool: thử tạo lại sau bao nhiêu giây
+        self.DB_CONNECT_RETRY_SECONDS = float(os.getenv('DB_CONNECT_RETRY_SECONDS', 5))
+        # Replica chỉ đọc, dạng host[:port] cách nhau bởi dấu phẩy (cùng user/password/database với primary)
+        self.MYSQL_REPLICAS = [host.strip() for host in os.getenv('MYSQL_REPLICAS', '').split(',') if host.strip()]
+        self.DB_REPLICA_POOL_SIZE = int(os.getenv('DB_REPLICA_POOL_SIZE', 5))
+        self.DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv('DB_REPLICA_MAX_LAG_SECONDS', 5))
+        self.DB_REPLICA_STICKY_SECONDS = float(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+        self.DB_REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', 5))
+        self.DB_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', 'true').lower() == 'true'
+        self.DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 64))
         
         self.OLLAMA_URL = os.getenv('OLLAMA_URL', 'http://localhost:11434/api/generate')  
         self.OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'mistral')  
 
         self.JWT_SECRET_KEY = os.getenv('SECRET_KEY', 'fdklajflkdsjalkfdsdlkl')
-        self.JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
+        # Access token ngắn hạn kiểm tra không cần DB; refresh token đổi lấy cặp mới ở /api/auth/refresh
+        self.JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', 15)))
+        self.JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.getenv('JWT_REFRESH_TOKEN_DAYS', 30)))
+        self.TOKEN_REVOCATION_SYNC_SECONDS = float(os.getenv('TOKEN_REVOCATION_SYNC_SECONDS', 30))
         self.OLLAMA_TIMEOUT = 10000
+
+        self.LLM_BACKEND = os.getenv('LLM_BACKEND', 'ollama')
+        self.LLM_MODEL = os.getenv('LLM_MODEL', self.OLLAMA_MODEL)
+        self.LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 300))
+        self.LLM_MAX_BATCH_SIZE = int(os.getenv('LLM_MAX_BATCH_SIZE', 8))
+        self.LLM_BATCH_WINDOW_MS = float(os.getenv('LLM_BATCH_WINDOW_MS', 0))
+        self.LLM_BATCH_MAX_INFLIGHT = int(os.getenv('LLM_BATCH_MAX_INFLIGHT', 2))
+        self.OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'http://localhost:8080/v1')
+        self.OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
+        self.LLAMA_CPP_MODEL_PATH = os.getenv('LLAMA_CPP_MODEL_PATH', '')
+        self.LLAMA_CPP_THREADS = int(os.getenv('LLAMA_CPP_THREADS', 0))
+        self.LLAMA_CPP_CONTEXT = int(os.getenv('LLAMA_CPP_CONTEXT', 4096))
+        self.STUB_LATENCY_MS = float(os.getenv('STUB_LATENCY_MS', 0))
+
+        self.DEFAULT_TIMEZONE = os.getenv('DEFAULT_TIMEZONE', 'Asia/Ho_Chi_Minh')
+        self.HYBRID_EXTRACTION = os.getenv('HYBRID_EXTRACTION', 'true').lower() == 'true'
+
+        # Chu kỳ health check nền cho /readyz (DB, LLM, hàng đợi)
+        self.HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', 10))
+
+        self.STATS_RECONCILE_INTERVAL = int(os.getenv('STATS_RECONCILE_INTERVAL', 900))
+
+        self.IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 1000))
+        self.IMPORT_MAX_ERRORS = int(os.getenv('IMPORT_MAX_ERRORS', 50))
+        self.IMPORT_MAX_LINE_LENGTH = int(os.getenv('IMPORT_MAX_LINE_LENGTH', 65536))
+        # Flask từ chối (413) body request lớn hơn giới hạn này, kể cả file nhập lịch
+        self.MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 32 * 1024 * 1024))
+
+        # Cache và pub/sub dùng chung giữa các worker: memory:// hoặc redis://[:password@]host:port/db
+        self.SHARED_STATE_URL = os.getenv('SHARED_STATE_URL', 'memory://')
+        self.SHARED_STATE_PREFIX = os.getenv('SHARED_STATE_PREFIX', 'scheduler:')
+        self.AUTH_USER_CACHE_SECONDS = float(os.getenv('AUTH_USER_CACHE_SECONDS', 60))
+
+        self.RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+        # Nhiều worker: bucket dùng chung qua shared state, nếu không giới hạn bị nhân theo số worker
+        self.RATE_LIMIT_STORE = os.getenv('RATE_LIMIT_STORE') or ('shared' if self.WORKERS > 1 else 'memory')
+        self.RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv('RATE_LIMIT_TRUSTED_PROXIES', 0))
+        # (nhóm route, giới hạn theo user, giới hạn theo IP); RATE_LIMIT_<NHÓM>="user,ip", vế trống = không giới hạn
+        self.RATE_LIMITS = [
+            (name, *(os.getenv(f'RATE_LIMIT_{name.upper()}', default) + ',').split(',')[:2])
+            for name, default in (
+                ('chat', '10/minute:3,30/minute:10'),
+                ('search', '60/minute:20,120/minute:40'),
+                ('bulk', '6/minute:2,12/minute:4'),
+                ('auth', ',10/minute:5'),
+                ('crud', '300/minute:60,600/minute:120'),
+            )
+        ]
+
+        # scrypt: mỗi lần băm tốn 128 * N * R byte bộ nhớ (16 MiB với mặc định); PASSWORD_HASH_POOL: thread | process
+        self.PASSWORD_SCRYPT_N = int(os.getenv('PASSWORD_SCRYPT_N', 16384))
+        self.PASSWORD_SCRYPT_R = int(os.getenv('PASSWORD_SCRYPT_R', 8))
+        self.PASSWORD_SCRYPT_P = int(os.getenv('PASSWORD_SCRYPT_P', 1))
+        self.PASSWORD_HASH_POOL = os.getenv('PASSWORD_HASH_POOL', 'thread')
+        self.PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+        self.PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 32))
+
+        self.JOB_STORE = os.getenv('JOB_STORE', 'memory')
+        self.JOB_SQLITE_PATH = os.getenv('JOB_SQLITE_PATH', 'jobs.sqlite3')
+        self.JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+        self.JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+        self.JOB_CLAIM_TIMEOUT = float(os.getenv('JOB_CLAIM_TIMEOUT', 300))
+
+        self.SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200))
+        self.SLOW_QUERY_LOG_SIZE = int(os.getenv('SLOW_QUERY_LOG_SIZE', 200))
+        self.SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'false').lower() == 'true'
+
+        self.ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+        self.METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1')
+        self.METRICS_DIR = os.getenv('METRICS_DIR', '')
+        self.METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+
+        self.PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.0))
+        self.PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+        self.PROFILE_BUFFER_SIZE = int(os.getenv('PROFILE_BUFFER_SIZE', 50))
+        self.PROFILE_ROUTES = [
+            '/api/chat',
+            '/api/schedules',
+            '/api/schedules/upcoming',
+            '/api/schedules/range',
+            '/api/schedules/calendar',
+            '/api/schedules/search',
+            '/api/schedules/cursor'
+        ]
         
     
         
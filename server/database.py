@@ -1,22 +1,454 @@
 import mysql.connector
 from mysql.connector import Error, pooling
+from mysql.connector.constants import ClientFlag
+from collections import OrderedDict, deque
 from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import lru_cache
+import hashlib
+import itertools
 import logging
+import os
+import re
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional, Tuple
+import metrics
+import profiling
+from shared_state import shared
+from statements import INSERT, Keyset, Statement
 
 logger = logging.getLogger(__name__)
 
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint_query(query: str):
+    """
+    Chuẩn hóa câu SQL (bỏ literal, gộp khoảng trắng) và trả về (fingerprint, câu đã chuẩn hóa).
+    Các câu lệnh trong models là chuỗi cố định nên kết quả được cache.
+    """
+    normalized = _WHITESPACE.sub(' ', query).strip()
+    normalized = _STRING_LITERAL.sub('?', normalized)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    normalized = _IN_LIST.sub('(...)', normalized)
+    fingerprint = hashlib.sha1(normalized.lower().encode('utf-8')).hexdigest()[:12]
+    return fingerprint, normalized
+
+
+def _params_shape(params):
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+class SlowQueryLog:
+    """Ring buffer các câu SQL chậm, kèm EXPLAIN cho lần đầu một fingerprint bị chậm."""
+
+    def __init__(self, threshold_ms: float = 200, size: int = 200, explain: bool = False):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self._entries = deque(maxlen=size)
+        self._explained = set()
+        self._lock = threading.Lock()
+
+    def is_slow(self, duration_ms: float) -> bool:
+        return self.threshold_ms >= 0 and duration_ms >= self.threshold_ms
+
+    def should_explain(self, fingerprint: str) -> bool:
+        if not self.explain:
+            return False
+        with self._lock:
+            if fingerprint in self._explained:
+                return False
+            self._explained.add(fingerprint)
+            return True
+
+    def record(self, fingerprint: str, statement: str, params, duration_ms: float, rows, plan=None):
+        entry = {
+            'fingerprint': fingerprint,
+            'statement': statement,
+            'params_shape': _params_shape(params),
+            'duration_ms': round(duration_ms, 2),
+            'rows': rows,
+            'timestamp': datetime.now().isoformat()
+        }
+        if plan is not None:
+            entry['explain'] = plan
+        with self._lock:
+            self._entries.append(entry)
+        logger.warning(f"Slow query ({duration_ms:.1f} ms, {rows} rows) [{fingerprint}]: {statement}")
+
+    def entries(self, limit: int = None):
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        return entries[:limit] if limit else entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class StatementCache:
+    """
+    Cursor prepared của một kết nối, theo Statement (LRU). Gắn lên chính đối
+    tượng kết nối nên sống cùng kết nối trong pool; prepared statement thuộc
+    về session nên cache bị bỏ khi connection_id đổi (kết nối được mở lại).
+    """
+
+    def __init__(self, connection_id, size: int):
+        self.connection_id = connection_id
+        self.size = size
+        self._cursors = OrderedDict()
+
+    def get(self, statement):
+        cursor = self._cursors.get(statement)
+        if cursor is not None:
+            self._cursors.move_to_end(statement)
+        return cursor
+
+    def put(self, statement, cursor):
+        self._cursors[statement] = cursor
+        while len(self._cursors) > self.size:
+            _, oldest = self._cursors.popitem(last=False)
+            _close_quietly(oldest)
+
+    def discard(self, statement):
+        cursor = self._cursors.pop(statement, None)
+        if cursor is not None:
+            _close_quietly(cursor)
+
+    def __len__(self):
+        return len(self._cursors)
+
+
+def _close_quietly(cursor):
+    try:
+        cursor.close()
+    except Error:
+        pass
+
+
+class Record(tuple):
+    """
+    Một dòng kết quả: giữ nguyên tuple từ driver, đọc theo tên cột như dict
+    (row['id'], row.get('location')) mà không tạo dict cho mỗi dòng.
+    """
+    __slots__ = ()
+    _columns: Dict[str, int] = {}
+
+    def __getitem__(self, key):
+        if type(key) is str:
+            return tuple.__getitem__(self, self._columns[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        index = self._columns.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self):
+        return self._columns.keys()
+
+    def items(self):
+        return zip(self._columns, self)
+
+    def __contains__(self, key):
+        return key in self._columns
+
+    def as_dict(self) -> Dict:
+        return dict(zip(self._columns, self))
+
+
+@lru_cache(maxsize=256)
+def record_type(columns: Tuple[str, ...]) -> type:
+    """Một lớp Record cho mỗi bộ cột, tạo một lần rồi dùng lại."""
+    return type('Record', (Record,), {'__slots__': (), '_columns': {name: i for i, name in enumerate(columns)}})
+
+
+def _to_records(cursor, rows):
+    factory = record_type(tuple(cursor.column_names))
+    return [factory(row) for row in rows]
+
+
+class UnitOfWork:
+    """
+    Một transaction gắn với một kết nối lấy từ pool. Mọi câu lệnh trong khối
+    DatabaseManager.transaction() (kể cả qua execute_query) chạy trên kết nối
+    này và chỉ commit một lần khi thoát khối.
+
+    Các method ở đây ném mysql.connector.Error; execute_query giữ nguyên hợp
+    đồng cũ (trả None khi lỗi) nhưng đánh dấu transaction để rollback.
+    """
+
+    def __init__(self, manager, connection):
+        self.manager = manager
+        self.connection = connection
+        self.statements = 0
+        self.rollback_only = False
+        self.on_commit = []
+        self._savepoints = itertools.count(1)
+
+    def _run(self, query, params, fetch: str):
+        if isinstance(query, Statement):
+            return self.run(query, params, fetch)
+
+        if fetch not in ('all', 'one'):
+            self.manager.mark_written()
+        fingerprint, normalized = fingerprint_query(query)
+        cursor = self.connection.cursor(dictionary=True)
+        started = time.perf_counter()
+        try:
+            cursor.execute(query, params or ())
+            self.statements += 1
+            if fetch == 'all':
+                result = cursor.fetchall()
+                rows = len(result)
+            elif fetch == 'one':
+                result = cursor.fetchone()
+                rows = 1 if result else 0
+            elif fetch == 'lastrowid':
+                result = cursor.lastrowid or cursor.rowcount
+                rows = cursor.rowcount
+            else:
+                result = rows = cursor.rowcount
+            self.manager._record_query(self.connection, fingerprint, normalized, query, params,
+                                       time.perf_counter() - started, rows)
+            return result
+        except Error:
+            metrics.db_query_errors.inc(fingerprint)
+            raise
+        finally:
+            cursor.close()
+
+    def run(self, statement: Statement, params, fetch: str):
+        """Chạy một Statement trong registry; dòng trả về là Record."""
+        if not statement.is_read:
+            self.manager.mark_written()
+        fingerprint, normalized = fingerprint_query(statement.sql)
+        cursor, cached = self.manager._statement_cursor(self.connection, statement)
+        started = time.perf_counter()
+        try:
+            cursor.execute(statement.sql, params or ())
+            self.statements += 1
+            if statement.is_read:
+                # Luôn đọc hết kết quả để cursor prepared dùng lại được cho lần sau
+                result = _to_records(cursor, cursor.fetchall())
+                rows = len(result)
+                if fetch == 'one':
+                    result = result[0] if result else None
+            elif statement.kind == INSERT:
+                result = cursor.lastrowid or cursor.rowcount
+                rows = cursor.rowcount
+            else:
+                result = rows = cursor.rowcount
+            self.manager._record_query(self.connection, fingerprint, normalized, statement.sql, params,
+                                       time.perf_counter() - started, rows)
+            return result
+        except Error:
+            metrics.db_query_errors.inc(fingerprint)
+            if cached:
+                self.manager._evict_statement(self.connection, statement)
+            raise
+        finally:
+            if not cached:
+                cursor.close()
+
+    def fetchall(self, query, params=None):
+        return self._run(query, params, 'all')
+
+    def fetchone(self, query, params=None):
+        return self._run(query, params, 'one')
+
+    def execute(self, query, params=None) -> int:
+        """Trả về rowcount (UPDATE/DELETE khớp bao nhiêu dòng)."""
+        return self._run(query, params, 'rowcount')
+
+    def insert(self, query, params=None) -> int:
+        """Trả về id vừa sinh, đọc từ gói OK của server nên không tốn thêm round trip."""
+        return self._run(query, params, 'lastrowid')
+
+    def executemany(self, query, seq_params) -> int:
+        """Gửi nhiều bộ tham số cho cùng một câu lệnh; INSERT được gộp thành một câu multi-row."""
+        if isinstance(query, Statement):
+            # executemany chỉ gộp được trên cursor thường, không qua cursor prepared
+            query = query.sql
+        fingerprint, normalized = fingerprint_query(query)
+        seq_params = list(seq_params)
+        if not seq_params:
+            return 0
+        self.manager.mark_written()
+        cursor = self.connection.cursor()
+        started = time.perf_counter()
+        try:
+            cursor.executemany(query, seq_params)
+            self.statements += 1
+            self.manager._record_query(self.connection, fingerprint, normalized, query, seq_params[0],
+                                       time.perf_counter() - started, cursor.rowcount)
+            return cursor.rowcount
+        except Error:
+            metrics.db_query_errors.inc(fingerprint)
+            raise
+        finally:
+            cursor.close()
+
+    @contextmanager
+    def savepoint(self):
+        """Khối con: lỗi bên trong chỉ hoàn tác phần việc của khối này."""
+        name = f"sp_{next(self._savepoints)}"
+        failed_before = self.rollback_only
+        callbacks_before = len(self.on_commit)
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(f"SAVEPOINT {name}")
+            try:
+                yield self
+            except Exception:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+                self.rollback_only = failed_before
+                del self.on_commit[callbacks_before:]
+                raise
+            if self.rollback_only and not failed_before:
+                # Câu lệnh lỗi đã bị execute_query nuốt: chỉ bỏ phần việc của khối con
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+                self.rollback_only = False
+                del self.on_commit[callbacks_before:]
+            else:
+                cursor.execute(f"RELEASE SAVEPOINT {name}")
+        finally:
+            cursor.close()
+
+
+class Replica:
+    """Một MySQL replica chỉ đọc với pool riêng; độ trễ do DatabaseManager.check_replicas cập nhật."""
+
+    def __init__(self, name: str, pool):
+        self.name = name
+        self.pool = pool
+        self.lag = None
+        self.healthy = False
+        self.checked_at = 0.0
+        self.error = None
+
+    def available(self, max_lag: float, stale_after: float) -> bool:
+        # Kết quả kiểm tra quá cũ (luồng kiểm tra dừng) thì coi như không dùng được
+        return (self.healthy and self.lag is not None and self.lag <= max_lag
+                and time.monotonic() - self.checked_at <= stale_after)
+
+    def mark_down(self, error):
+        self.healthy = False
+        self.error = str(error)
+
+    def status(self) -> Dict:
+        return {
+            'name': self.name,
+            'healthy': self.healthy,
+            'lag_seconds': self.lag,
+            'checked_seconds_ago': round(time.monotonic() - self.checked_at, 1) if self.checked_at else None,
+            'error': self.error
+        }
+
+
+# Một hook fork cho cả module: register_at_fork không gỡ đăng ký được, nên đăng
+# ký theo từng instance sẽ giữ mọi DatabaseManager (và pool của nó) tới hết process
+_managers: 'weakref.WeakSet[DatabaseManager]' = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    for manager in list(_managers):
+        manager._after_fork()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
 class DatabaseManager:
     def __init__(self, config):
         self.config = config
         self.connection_pool = None
-        self._create_connection_pool()
-    
+        self._unit_of_work = ContextVar(f'unit_of_work_{id(self)}', default=None)
+        self.prepare_statements = getattr(config, 'DB_PREPARED_STATEMENTS', True)
+        self.statement_cache_size = getattr(config, 'DB_STATEMENT_CACHE_SIZE', 64)
+        self.replicas: List[Replica] = []
+        self.replica_max_lag = getattr(config, 'DB_REPLICA_MAX_LAG_SECONDS', 5)
+        self.replica_check_interval = getattr(config, 'DB_REPLICA_CHECK_INTERVAL', 5)
+        self.sticky_seconds = getattr(config, 'DB_REPLICA_STICKY_SECONDS', 5)
+        self._replica_rr = itertools.count()
+        self._route_user = ContextVar(f'route_user_{id(self)}', default=None)
+        self._force_primary = ContextVar(f'force_primary_{id(self)}', default=False)
+        self._recent_writes: Dict[int, float] = {}
+        self._published_writes: Dict[int, float] = {}
+        self._recent_writes_lock = threading.Lock()
+        self._replica_monitor = None
+        self.slow_query_log = SlowQueryLog(
+            threshold_ms=getattr(config, 'SLOW_QUERY_THRESHOLD_MS', 200),
+            size=getattr(config, 'SLOW_QUERY_LOG_SIZE', 200),
+            explain=getattr(config, 'SLOW_QUERY_EXPLAIN', False)
+        )
+        # Pool được tạo ở lần đầu cần kết nối, không phải lúc khởi động: import
+        # app không chờ MySQL, và MySQL chết lúc boot chỉ làm các request đầu lỗi
+        self.replica_addresses = list(getattr(config, 'MYSQL_REPLICAS', []) or [])
+        self.connect_retry_seconds = getattr(config, 'DB_CONNECT_RETRY_SECONDS', 5)
+        self._pools_lock = threading.Lock()
+        self._pools_pid = os.getpid()
+        self._next_pool_attempt = 0.0
+        self._abandoned_pools = []
+        _managers.add(self)
+        if self.replica_addresses:
+            # Request kế tiếp của user có thể rơi vào worker khác: báo cho các worker đó
+            shared.subscribe('db_writes', self._on_remote_write)
+
+    def _ensure_pools(self):
+        """
+        Tạo pool primary/replica nếu chưa có. Lần tạo lỗi (MySQL chưa sẵn sàng)
+        được thử lại sau DB_CONNECT_RETRY_SECONDS; trong lúc chờ, get_connection
+        mở kết nối trực tiếp như khi không có pool.
+        """
+        if self.connection_pool is not None and len(self.replicas) == len(self.replica_addresses):
+            return
+        if time.monotonic() < self._next_pool_attempt:
+            return
+        with self._pools_lock:
+            if time.monotonic() < self._next_pool_attempt:
+                return
+            if self.connection_pool is None:
+                self._create_connection_pool()
+            if len(self.replicas) < len(self.replica_addresses):
+                self._create_replica_pools()
+            complete = self.connection_pool is not None and len(self.replicas) == len(self.replica_addresses)
+            self._next_pool_attempt = 0.0 if complete else time.monotonic() + self.connect_retry_seconds
+
+    def _after_fork(self):
+        """
+        Process con (worker gunicorn) không dùng lại pool của process cha: socket
+        của các kết nối đó đang được cha dùng chung. Giữ tham chiếu thay vì đóng,
+        vì đóng sẽ gửi COM_QUIT trên socket chung.
+        """
+        if self._pools_pid == os.getpid():
+            return
+        self._pools_pid = os.getpid()
+        self._abandoned_pools.extend(pool for pool in [self.connection_pool] + [r.pool for r in self.replicas] if pool)
+        self.connection_pool = None
+        self.replicas = []
+        self._next_pool_attempt = 0.0
+        self._pools_lock = threading.Lock()
+        self._recent_writes_lock = threading.Lock()
+        self._replica_monitor = None
+
     def _create_connection_pool(self):
        
         try:
             self.connection_pool = pooling.MySQLConnectionPool(
                 pool_name="scheduler_pool",
-                pool_size=5,
+                pool_size=getattr(self.config, 'DB_POOL_SIZE', 5),
                 host=self.config.MYSQL_HOST,
                 database=self.config.MYSQL_DB,
                 user=self.config.MYSQL_USER,
@@ -26,20 +458,51 @@ class DatabaseManager:
                 charset='utf8mb4',
                 collation='utf8mb4_unicode_ci',
                 autocommit=False,
-                pool_reset_session=True
+                # rowcount của UPDATE là số dòng khớp WHERE, kể cả khi giá trị không đổi
+                client_flags=[ClientFlag.FOUND_ROWS],
+                # Reset session sẽ hủy các prepared statement đã cache trên kết nối
+                pool_reset_session=not self.prepare_statements
             )
             logger.info("MySQL connection pool created successfully")
         except Error as e:
             logger.error(f"Error creating connection pool: {e}")
             self.connection_pool = None
+
+    def _create_replica_pools(self):
+        created = {replica.name for replica in self.replicas}
+        for index, address in enumerate(self.replica_addresses):
+            if address in created:
+                continue
+            host, _, port = address.partition(':')
+            try:
+                pool = pooling.MySQLConnectionPool(
+                    pool_name=f"scheduler_replica_{index}",
+                    pool_size=getattr(self.config, 'DB_REPLICA_POOL_SIZE', 5),
+                    host=host,
+                    database=self.config.MYSQL_DB,
+                    user=self.config.MYSQL_USER,
+                    password=self.config.MYSQL_PASSWORD,
+                    port=int(port or self.config.MYSQL_PORT),
+                    auth_plugin='mysql_native_password',
+                    charset='utf8mb4',
+                    collation='utf8mb4_unicode_ci',
+                    autocommit=False,
+                    client_flags=[ClientFlag.FOUND_ROWS],
+                    pool_reset_session=not self.prepare_statements
+                )
+                self.replicas.append(Replica(address, pool))
+                logger.info(f"MySQL replica pool created for {address}")
+            except Error as e:
+                logger.error(f"Error creating replica pool for {address}: {e}")
     
     @contextmanager
     def get_connection(self):
        
         connection = None
+        self._ensure_pools()
         try:
             if self.connection_pool:
-                connection = self.connection_pool.get_connection()
+                connection = self._checkout(self.connection_pool)
             else:
               
                 connection = mysql.connector.connect(
@@ -51,16 +514,273 @@ class DatabaseManager:
                     auth_plugin='mysql_native_password',
                     charset='utf8mb4',
                     collation='utf8mb4_unicode_ci',
-                    autocommit=False
+                    autocommit=False,
+                    client_flags=[ClientFlag.FOUND_ROWS]
                 )
             yield connection
         except Error as e:
             logger.error(f"Database connection error: {e}")
             raise
         finally:
-            if connection and connection.is_connected():
-                connection.close()
+            if connection:
+                self._release(connection)
+
+    def _checkout(self, pool):
+        wait_start = time.perf_counter()
+        connection = pool.get_connection()
+        wait_time = time.perf_counter() - wait_start
+        metrics.db_pool_wait.observe(value=wait_time)
+        profiling.add_time('db', wait_time)
+        return connection
+
+    def _release(self, connection):
+        if not connection.is_connected():
+            return
+        if not self._resets_session() and getattr(connection, 'in_transaction', False):
+            # Không có reset session: kết thúc transaction đọc còn mở để lần
+            # lấy kết nối sau không đọc snapshot cũ
+            connection.rollback()
+        connection.close()
+
+    def _resets_session(self) -> bool:
+        return self.connection_pool is None or not self.prepare_statements
+
+    # Định tuyến đọc sang replica
+
+    @contextmanager
+    def bind_user(self, user_id: Optional[int]):
+        """
+        Gắn user của request hiện tại: câu ghi trong khối đánh dấu user vừa ghi,
+        và câu đọc của user đó đi primary trong DB_REPLICA_STICKY_SECONDS sau đó
+        (read-your-writes).
+        """
+        token = self._route_user.set(user_id)
+        try:
+            yield
+        finally:
+            self._route_user.reset(token)
+
+    @contextmanager
+    def read_primary(self):
+        """Mọi câu đọc trong khối đi primary (job chạy ngay sau khi ghi, đối soát thống kê)."""
+        token = self._force_primary.set(True)
+        try:
+            yield
+        finally:
+            self._force_primary.reset(token)
+
+    def mark_written(self, user_id: Optional[int] = None):
+        user_id = self._route_user.get() if user_id is None else user_id
+        if user_id is None or not self.replicas:
+            return
+        now = time.monotonic()
+        self._remember_write(user_id, now)
+        # Nhiều câu ghi liên tiếp của cùng user chỉ cần một tin nhắn cho mỗi nửa cửa sổ sticky
+        published = self._published_writes.get(user_id)
+        if published is None or now - published > self.sticky_seconds / 2:
+            self._published_writes[user_id] = now
+            shared.publish('db_writes', str(user_id))
+
+    def _on_remote_write(self, message: str):
+        self._remember_write(int(message), time.monotonic())
+
+    def _remember_write(self, user_id: int, now: float):
+        with self._recent_writes_lock:
+            self._recent_writes[user_id] = now
+            if len(self._recent_writes) > 10000:
+                expired = [key for key, at in self._recent_writes.items() if now - at > self.sticky_seconds]
+                for key in expired:
+                    del self._recent_writes[key]
+                    self._published_writes.pop(key, None)
+
+    def _is_sticky(self, user_id: int) -> bool:
+        written_at = self._recent_writes.get(user_id)
+        return written_at is not None and time.monotonic() - written_at <= self.sticky_seconds
+
+    def _read_replica(self, statement: Statement) -> Optional[Replica]:
+        if self.replica_addresses:
+            self._ensure_pools()
+        if (not self.replicas or not statement.is_read or statement.primary_only
+                or self._force_primary.get() or self._unit_of_work.get() is not None):
+            return None
+        user_id = self._route_user.get()
+        if user_id is not None and self._is_sticky(user_id):
+            metrics.db_reads.inc('primary_sticky')
+            return None
+        stale_after = max(self.replica_check_interval * 3, 1)
+        candidates = [replica for replica in self.replicas if replica.available(self.replica_max_lag, stale_after)]
+        if not candidates:
+            metrics.db_reads.inc('primary_no_replica')
+            return None
+        return candidates[next(self._replica_rr) % len(candidates)]
+
+    @contextmanager
+    def _read_connection(self, statement: Statement):
+        """(kết nối, replica) cho một câu đọc; replica lỗi khi lấy kết nối thì dùng primary."""
+        replica = self._read_replica(statement)
+        connection = None
+        if replica is not None:
+            try:
+                connection = self._checkout(replica.pool)
+            except Error as e:
+                logger.warning(f"Replica {replica.name} unavailable, reading from primary: {e}")
+                replica.mark_down(e)
+                metrics.db_replica_fallbacks.inc('error')
+        if connection is None:
+            with self.get_connection() as connection:
+                metrics.db_reads.inc('primary')
+                yield connection, None
+            return
+        metrics.db_reads.inc('replica')
+        try:
+            yield connection, replica
+        finally:
+            self._release(connection)
+
+    def check_replicas(self) -> List[Dict]:
+        """Đo độ trễ của từng replica bằng SHOW REPLICA STATUS (MySQL < 8.0.22: SHOW SLAVE STATUS)."""
+        self._ensure_pools()
+        for replica in self.replicas:
+            try:
+                connection = self._checkout(replica.pool)
+            except Error as e:
+                replica.mark_down(e)
+                continue
+            cursor = connection.cursor(dictionary=True)
+            try:
+                try:
+                    cursor.execute("SHOW REPLICA STATUS")
+                except Error:
+                    cursor.execute("SHOW SLAVE STATUS")
+                row = cursor.fetchone()
+                cursor.fetchall()
+                lag = None
+                if row:
+                    lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+                if lag is None:
+                    # Không phải replica, hoặc luồng replication đang dừng
+                    replica.mark_down('replication is not running')
+                else:
+                    replica.lag = float(lag)
+                    replica.healthy = True
+                    replica.error = None
+            except Error as e:
+                replica.mark_down(e)
+            finally:
+                replica.checked_at = time.monotonic()
+                cursor.close()
+                self._release(connection)
+            if not replica.healthy:
+                logger.warning(f"Replica {replica.name} excluded from reads: {replica.error}")
+        return self.replica_status()
+
+    def replica_status(self) -> List[Dict]:
+        return [replica.status() for replica in self.replicas]
+
+    def check_connection(self) -> bool:
+        """SELECT 1 trên primary; dành cho health check nền, không gọi trong request."""
+        try:
+            with self.get_connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    cursor.execute("SELECT 1")
+                    cursor.fetchall()
+                finally:
+                    cursor.close()
+            return True
+        except Error:
+            return False
+
+    def pool_status(self) -> Dict:
+        pool = self.connection_pool
+        if pool is None:
+            return {'created': False}
+        # Hàng đợi kết nối rảnh của mysql-connector (không có API công khai)
+        idle = getattr(pool, '_cnx_queue', None)
+        return {
+            'created': True,
+            'size': getattr(pool, 'pool_size', None),
+            'idle': idle.qsize() if idle is not None else None
+        }
+
+    def start_replica_monitor(self):
+        if not self.replica_addresses or self._replica_monitor:
+            return
+
+        def run():
+            while True:
+                try:
+                    self.check_replicas()
+                except Exception as e:
+                    logger.error(f"Replica lag check error: {e}")
+                time.sleep(self.replica_check_interval)
+
+        self._replica_monitor = threading.Thread(target=run, name='replica-monitor', daemon=True)
+        self._replica_monitor.start()
     
+    @contextmanager
+    def transaction(self, savepoint: bool = True):
+        """
+        Unit of work: giữ một kết nối cho cả khối và commit một lần khi thoát,
+        rollback nếu có exception hoặc có câu lệnh lỗi. Gọi lồng nhau thì khối
+        trong trở thành savepoint của transaction ngoài; savepoint=False để
+        nhập thẳng vào transaction ngoài (tiết kiệm hai câu SAVEPOINT/RELEASE).
+
+            with db.transaction() as uow:
+                schedule_id = uow.insert(...)
+                model.get_schedule_by_id_with_user(schedule_id, user_id)  # cùng kết nối
+        """
+        current = self._unit_of_work.get()
+        if current is not None:
+            if not savepoint:
+                try:
+                    yield current
+                except Exception:
+                    current.rollback_only = True
+                    raise
+                return
+            with current.savepoint():
+                yield current
+            return
+
+        with self.get_connection() as connection:
+            uow = UnitOfWork(self, connection)
+            token = self._unit_of_work.set(uow)
+            try:
+                yield uow
+                if uow.rollback_only:
+                    connection.rollback()
+                    metrics.db_transactions.inc('rollback')
+                    logger.warning(f"Transaction rolled back after a failed statement ({uow.statements} statements)")
+                else:
+                    connection.commit()
+                    metrics.db_transactions.inc('commit')
+            except Exception:
+                connection.rollback()
+                metrics.db_transactions.inc('rollback')
+                raise
+            finally:
+                self._unit_of_work.reset(token)
+                metrics.db_transaction_statements.observe(value=uow.statements)
+
+        if not uow.rollback_only:
+            for callback in uow.on_commit:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"after_commit callback failed: {e}")
+
+    def after_commit(self, callback):
+        """Chạy callback sau khi transaction hiện tại commit; ngoài transaction thì chạy ngay."""
+        uow = self._unit_of_work.get()
+        if uow is None:
+            callback()
+        else:
+            uow.on_commit.append(callback)
+
+    def in_transaction(self) -> bool:
+        return self._unit_of_work.get() is not None
+
     def execute_query(self, query, params=None, fetch=True):
         """
         Execute SQL query
@@ -74,9 +794,17 @@ class DatabaseManager:
             For SELECT: list of dictionaries
             For INSERT: lastrowid or rowcount
             For UPDATE/DELETE: rowcount
+
+        Trong khối transaction(), câu lệnh chạy trên kết nối của transaction và không tự commit.
         """
+        uow = self._unit_of_work.get()
+        if uow is not None:
+            return self._execute_in(uow, query, params, fetch)
+
+        fingerprint, normalized = fingerprint_query(query)
         with self.get_connection() as connection:
             cursor = connection.cursor(dictionary=True)
+            started = time.perf_counter()
             try:
                 cursor.execute(query, params or ())
                 
@@ -87,52 +815,243 @@ class DatabaseManager:
                 if fetch and is_select:
                     result = cursor.fetchall()
                 else:
+                    self.mark_written()
                     
                     connection.commit()
                     
                    
                     if query_lower.startswith('insert'):
-                       
-                        try:
-                            cursor.execute("SELECT LAST_INSERT_ID() as id")
-                            last_id_result = cursor.fetchone()
-                            if last_id_result and last_id_result['id']:
-                                result = last_id_result['id']
-                            else:
-                                result = cursor.rowcount
-                        except:
-                            result = cursor.rowcount
+                        # lastrowid có sẵn trong gói OK, không cần SELECT LAST_INSERT_ID()
+                        result = cursor.lastrowid or cursor.rowcount
                     else:
                         result = cursor.rowcount
                 
+                rows = len(result) if isinstance(result, list) else cursor.rowcount
+                self._record_query(connection, fingerprint, normalized, query, params,
+                                   time.perf_counter() - started, rows)
                 return result
                 
             except Error as e:
                 connection.rollback()
+                metrics.db_query_errors.inc(fingerprint)
                 logger.error(f" Query execution error: {e}")
                 logger.error(f"Query: {query}")
                 logger.error(f"Params: {params}")
                 return None
             except Exception as e:
                 connection.rollback()
+                metrics.db_query_errors.inc(fingerprint)
                 logger.error(f"Unexpected error in execute_query: {e}")
                 return None
             finally:
                 cursor.close()
     
+    def fetch_all(self, statement: Statement, params=None):
+        """Chạy Statement kiểu READ, trả về list Record (None nếu lỗi)."""
+        return self._run_statement(statement, params, 'all')
+
+    def fetch_one(self, statement: Statement, params=None):
+        """Dòng đầu tiên (Record) hoặc None."""
+        return self._run_statement(statement, params, 'one')
+
+    def execute(self, statement: Statement, params=None):
+        """Chạy Statement WRITE/INSERT: trả về rowcount, hoặc id mới với INSERT; None nếu lỗi."""
+        return self._run_statement(statement, params, 'write')
+
+    def _run_statement(self, statement: Statement, params, fetch: str):
+        uow = self._unit_of_work.get()
+        if uow is not None:
+            try:
+                return uow.run(statement, params, fetch)
+            except Error as e:
+                uow.rollback_only = True
+                logger.error(f"Query execution error ({statement.name}): {e}")
+                logger.error(f"Params: {params}")
+                return None
+
+        if statement.is_read:
+            return self._read_statement(statement, params, fetch)
+
+        with self.get_connection() as connection:
+            try:
+                result = UnitOfWork(self, connection).run(statement, params, fetch)
+                connection.commit()
+                return result
+            except Error as e:
+                connection.rollback()
+                logger.error(f"Query execution error ({statement.name}): {e}")
+                logger.error(f"Params: {params}")
+                return None
+
+    def _read_statement(self, statement: Statement, params, fetch: str):
+        with self._read_connection(statement) as (connection, replica):
+            try:
+                result = UnitOfWork(self, connection).run(statement, params, fetch)
+                # Không thấy dòng trên replica: có thể dòng chưa replicate tới (VD: vừa đăng ký rồi đăng nhập)
+                if replica is None or result is not None:
+                    return result
+                metrics.db_replica_fallbacks.inc('miss')
+            except Error as e:
+                logger.error(f"Query execution error ({statement.name}): {e}")
+                logger.error(f"Params: {params}")
+                if replica is None:
+                    return None
+                replica.mark_down(e)
+                metrics.db_replica_fallbacks.inc('error')
+
+        with self.read_primary():
+            return self._read_statement(statement, params, fetch)
+
+    def iter_rows(self, keyset: Keyset, params=(), batch_size: int = 500):
+        """
+        Generator trả về từng Record, đọc theo trang keyset (statements.Keyset):
+        mỗi trang batch_size dòng là một câu truy vấn riêng và kết nối được trả
+        về pool ngay sau mỗi trang, nên client đọc response chậm không giữ kết
+        nối. Bộ nhớ chỉ giữ một trang dù kết quả có bao nhiêu dòng.
+
+        Các trang không đọc cùng một snapshot: dòng được sửa giữa hai trang có
+        thể thấy hoặc không, nhưng không dòng nào bị lặp hay bỏ sót khi khóa
+        (cột sắp xếp, id) của nó không đổi. Lỗi DB được ném ra
+        (mysql.connector.Error).
+        """
+        params = tuple(params)
+        rows = self._read_page(keyset.first, params + (batch_size,))
+        while rows:
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            rows = self._read_page(keyset.after, params + keyset.after_params(rows[-1]) + (batch_size,))
+
+    def _read_page(self, statement: Statement, params):
+        rows = self.fetch_all(statement, params)
+        if rows is None:
+            raise Error(msg=f"Cannot read {statement.name}")
+        return rows
+
+    def _statement_cursor(self, connection, statement: Statement):
+        """
+        (cursor, cached): cursor prepared lấy từ cache của kết nối, hoặc một cursor
+        tuple dùng một lần khi tắt prepared statement / không chạy qua pool.
+        """
+        if not self.prepare_statements or self.connection_pool is None:
+            return connection.cursor(), False
+
+        raw = getattr(connection, '_cnx', connection)
+        connection_id = getattr(raw, 'connection_id', None)
+        cache = getattr(raw, '_statement_cache', None)
+        if cache is None or cache.connection_id != connection_id:
+            # Session mới: các cursor cũ trỏ tới statement đã bị server hủy
+            cache = StatementCache(connection_id, self.statement_cache_size)
+            raw._statement_cache = cache
+
+        cursor = cache.get(statement)
+        if cursor is not None:
+            metrics.db_statement_cache.inc('hit')
+            return cursor, True
+        metrics.db_statement_cache.inc('miss')
+        cursor = connection.cursor(prepared=True)
+        cache.put(statement, cursor)
+        return cursor, True
+
+    def _evict_statement(self, connection, statement: Statement):
+        cache = getattr(getattr(connection, '_cnx', connection), '_statement_cache', None)
+        if cache is not None:
+            cache.discard(statement)
+
+    def _execute_in(self, uow: UnitOfWork, query, params, fetch):
+        query_lower = query.strip().lower()
+        try:
+            if fetch and (query_lower.startswith('select') or query_lower.startswith('show')):
+                return uow.fetchall(query, params)
+            if query_lower.startswith('insert'):
+                return uow.insert(query, params)
+            return uow.execute(query, params)
+        except Error as e:
+            uow.rollback_only = True
+            logger.error(f" Query execution error: {e}")
+            logger.error(f"Query: {query}")
+            logger.error(f"Params: {params}")
+            return None
+
+    def _record_query(self, connection, fingerprint, normalized, query, params, elapsed, rows):
+        metrics.db_query_duration.observe(fingerprint, normalized[:120], value=elapsed)
+        profiling.add_time('db', elapsed)
+
+        duration_ms = elapsed * 1000
+        if not self.slow_query_log.is_slow(duration_ms):
+            return
+
+        plan = None
+        if self.slow_query_log.should_explain(fingerprint):
+            plan = self._explain(connection, query, params)
+        self.slow_query_log.record(fingerprint, normalized, params, duration_ms, rows, plan)
+
+    def _explain(self, connection, query, params):
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(f"EXPLAIN {query}", params or ())
+            return cursor.fetchall()
+        except Error as e:
+            logger.error(f"EXPLAIN failed: {e}")
+            return None
+        finally:
+            cursor.close()
+
+    def execute_returning(self, statement, params, select, select_params, select_first=False):
+        """
+        Chạy một câu UPDATE/DELETE và một câu SELECT trong cùng transaction,
+        thay cho RETURNING mà MySQL không hỗ trợ.
+
+        select_first=False: đọc dòng sau khi ghi (UPDATE), chỉ khi có dòng bị ảnh hưởng.
+        select_first=True: khóa và đọc dòng trước khi ghi (DELETE); select nên có FOR UPDATE.
+
+        Returns:
+            (rowcount, row) với row là dict hoặc None; None nếu có lỗi
+        """
+        try:
+            with self.transaction(savepoint=False) as uow:
+                row = None
+                if select_first:
+                    row = uow.fetchone(select, select_params)
+                    if row is None:
+                        return 0, None
+
+                rowcount = uow.execute(statement, params)
+                if not select_first and rowcount:
+                    row = uow.fetchone(select, select_params)
+                return rowcount, row
+        except Error as e:
+            logger.error(f"Query execution error: {e}")
+            logger.error(f"Query: {statement}")
+            return None
+
     def execute_fetchall(self, query, params=None):
        
         return self.execute_query(query, params, fetch=True)
     
     def execute_fetchone(self, query, params=None):
         
+        uow = self._unit_of_work.get()
+        if uow is not None:
+            try:
+                return uow.fetchone(query, params)
+            except Error as e:
+                uow.rollback_only = True
+                logger.error(f"Query execution error: {e}")
+                return None
+
+        fingerprint, normalized = fingerprint_query(query)
         with self.get_connection() as connection:
             cursor = connection.cursor(dictionary=True)
+            started = time.perf_counter()
             try:
                 cursor.execute(query, params or ())
                 result = cursor.fetchone()
+                self._record_query(connection, fingerprint, normalized, query, params,
+                                   time.perf_counter() - started, 1 if result else 0)
                 return result
             except Error as e:
+                metrics.db_query_errors.inc(fingerprint)
                 logger.error(f"Query execution error: {e}")
                 return None
             finally:
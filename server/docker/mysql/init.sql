@@ -28,8 +28,23 @@ CREATE TABLE IF NOT EXISTS schedules (
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Token bị thu hồi (logout, refresh token đã dùng); jti NULL: mọi token của user cấp trước revoked_at.
+-- Thời gian lưu theo UTC; dòng hết hạn được server xóa định kỳ.
+CREATE TABLE IF NOT EXISTS token_revocations (
+    id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    user_id INT NOT NULL,
+    jti CHAR(32) NULL UNIQUE,
+    token_type ENUM('access', 'refresh') NULL,
+    revoked_at DATETIME(3) NOT NULL,
+    expires_at DATETIME(3) NOT NULL,
+
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 CREATE INDEX idx_schedules_user_id ON schedules(user_id);
 CREATE INDEX idx_schedules_start_time ON schedules(start_time);
+CREATE INDEX idx_schedules_user_start ON schedules(user_id, start_time);
 CREATE INDEX idx_schedules_status ON schedules(status);
 CREATE INDEX idx_schedules_category ON schedules(category);
 CREATE INDEX idx_users_email ON users(email);
+CREATE INDEX idx_token_revocations_expires ON token_revocations(expires_at);
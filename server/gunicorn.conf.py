@@ -0,0 +1,83 @@
+"""
+Cấu hình gunicorn cho production:
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Tải gồm hai loại request rất khác nhau: /api/chat chờ LLM vài giây (tới
+LLM_TIMEOUT), còn CRUD lịch trình chỉ vài mili giây. Worker gthread phục vụ
+mỗi request trên một thread, nên một request chat đang chờ LLM (chỉ chờ I/O,
+nhả GIL) không chặn các request CRUD khác của cùng worker:
+
+- workers: mặc định min(2 x CPU + 1, 8). Phần CPU (JSON, parse ngày giờ) chạy
+  song song giữa các process; nhiều hơn chỉ tốn thêm pool MySQL và RAM.
+- threads: mặc định 8 mỗi worker. Số request chat chạy đồng thời thực tế do
+  LLM_BATCH_MAX_INFLIGHT giới hạn; các thread còn lại dành cho CRUD.
+- DB_POOL_SIZE: pool của mysql-connector báo lỗi ngay khi hết kết nối chứ không
+  chờ, nên mặc định bằng số thread cộng phần cho các thread nền (job worker,
+  health check, đối soát thống kê); tối đa 32, giới hạn của mysql-connector.
+- timeout: với gthread đây là heartbeat của process worker, không phải thời
+  gian tối đa của một request, nên request chat chờ LLM lâu không bị kill.
+- preload_app: import app một lần trong master rồi fork, worker khởi động
+  nhanh và chia sẻ bộ nhớ copy-on-write. Không có kết nối nào bị chia sẻ: app
+  không mở kết nối lúc import, DatabaseManager và backend shared state bỏ kết
+  nối của process cha sau fork (os.register_at_fork).
+- FLASK_ENV mặc định production (DEBUG tắt) nếu không được đặt.
+- max_requests (+ jitter): thay worker định kỳ để giới hạn phân mảnh bộ nhớ,
+  các worker không khởi động lại cùng lúc.
+- METRICS_DIR: mỗi worker có registry metrics riêng; các worker ghi snapshot
+  vào thư mục này (mặc định trên tmpfs, riêng cho mỗi master) để một lần
+  scrape /metrics thấy mọi worker, phân biệt bằng nhãn worker. File của worker
+  đã thoát bị xóa trong child_exit.
+
+Tất cả chỉnh được qua biến môi trường GUNICORN_*.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS') or min(multiprocessing.cpu_count() * 2 + 1, 8))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+# Heartbeat ghi vào tmpfs, không bị chặn bởi disk I/O (đặc biệt trong container)
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+accesslog = '-'
+errorlog = '-'
+
+# Config đọc biến môi trường khi app được import (sau file này)
+os.environ.setdefault('FLASK_ENV', 'production')
+os.environ['GUNICORN_WORKERS'] = str(workers)
+os.environ.setdefault('DB_POOL_SIZE', str(min(threads + int(os.getenv('JOB_WORKERS', 2)) + 2, 32)))
+os.environ.setdefault('METRICS_DIR', os.path.join(worker_tmp_dir or tempfile.gettempdir(),
+                                                  f'scheduler-metrics-{os.getpid()}'))
+
+
+def on_starting(server):
+    # Snapshot còn sót từ lần chạy trước không thuộc worker nào của master này
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['METRICS_DIR'], exist_ok=True)
+
+
+def child_exit(server, worker):
+    try:
+        os.remove(os.path.join(os.environ['METRICS_DIR'], f'{worker.pid}.prom'))
+    except FileNotFoundError:
+        pass
+
+
+def on_exit(server):
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+
+
+def post_worker_init(worker):
+    # Worker đã nạp app (kể cả khi preload_app=False): khởi động thread nền của worker này
+    from wsgi import start_background_services
+    start_background_services()
+    worker.log.info(f"Worker {worker.pid} ready ({threads} threads)")
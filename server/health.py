@@ -0,0 +1,105 @@
+"""
+Kiểm tra sức khỏe chạy nền cho /readyz.
+
+Probe của orchestrator (Kubernetes, load balancer) gọi vài giây một lần trên
+mọi worker; nếu mỗi lần gọi đều chạy SELECT 1 và hỏi Ollama thì chính probe
+thành tải. HealthMonitor chạy các check trên một thread riêng mỗi
+HEALTH_CHECK_INTERVAL giây và lưu kết quả; /readyz chỉ đọc kết quả đã lưu.
+
+Check là hàm không tham số trả về dict có khóa 'ok' (cùng các thông tin chi
+tiết tùy ý); exception được ghi nhận là ok=False. Chỉ check critical quyết
+định ready: LLM chậm hay chết thì chat lỗi, nhưng CRUD lịch trình vẫn chạy.
+Kết quả cũ hơn 3 chu kỳ (thread kiểm tra bị treo/dừng) bị coi là lỗi.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+health_check_duration = metrics.registry.histogram(
+    'health_check_duration_seconds', 'Thời gian chạy từng health check nền', ('check',))
+
+
+class HealthMonitor:
+    def __init__(self, interval_seconds: float = 10.0):
+        self.interval = interval_seconds
+        self._checks: Dict[str, Tuple[Callable[[], Dict], bool]] = {}
+        self._results: Dict[str, Dict] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, name: str, check: Callable[[], Dict], critical: bool = True):
+        self._checks[name] = (check, critical)
+
+    def run_checks(self):
+        for name, (check, critical) in list(self._checks.items()):
+            started = time.perf_counter()
+            try:
+                result = dict(check())
+            except Exception as e:
+                result = {'ok': False, 'error': str(e)}
+            elapsed = time.perf_counter() - started
+            health_check_duration.observe(name, value=elapsed)
+            result['ok'] = bool(result.get('ok'))
+            result.update(critical=critical, duration_ms=round(elapsed * 1000, 1),
+                          checked_at=datetime.now().isoformat(timespec='seconds'))
+            with self._lock:
+                previous = self._results.get(name)
+                self._results[name] = result
+                self._checked_at[name] = time.monotonic()
+            if not result['ok'] and (previous is None or previous['ok']):
+                logger.warning(f"Health check {name} failing: {result.get('error', result)}")
+
+    def start(self):
+        if self._thread or not self._checks:
+            return
+        self._stop.clear()
+
+        def run():
+            while True:
+                try:
+                    self.run_checks()
+                except Exception as e:
+                    logger.error(f"Health monitor error: {e}")
+                if self._stop.wait(self.interval):
+                    break
+
+        self._thread = threading.Thread(target=run, name='health-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def snapshot(self) -> Tuple[bool, Dict[str, Dict]]:
+        """(ready, kết quả từng check); không chạy check nào."""
+        now = time.monotonic()
+        stale_after = max(self.interval * 3, 1)
+        with self._lock:
+            results = {name: dict(result) for name, result in self._results.items()}
+            checked_at = dict(self._checked_at)
+        ready = bool(self._checks)
+        for name, (_, critical) in self._checks.items():
+            result = results.get(name)
+            if result is None:
+                result = results[name] = {'ok': False, 'critical': critical, 'error': 'not checked yet'}
+            elif now - checked_at[name] > stale_after:
+                result.update(ok=False, stale=True)
+            result['age_seconds'] = round(now - checked_at[name], 1) if name in checked_at else None
+            if critical and not result['ok']:
+                ready = False
+        return ready, results
+
+
+health_monitor = HealthMonitor()
+
+metrics.registry.callback(
+    'health_check_ok', 'Kết quả health check nền gần nhất (1 = ok)', ('check',),
+    lambda: {(name,): int(result['ok']) for name, result in health_monitor.snapshot()[1].items()})
@@ -0,0 +1,376 @@
+"""
+Hàng đợi job chạy nền trong process cho các tác vụ phụ sau khi ghi dữ liệu
+(làm mới thống kê, làm nóng cache lịch tháng...), để request trả về ngay khi
+thao tác ghi chính đã commit.
+
+Hai kiểu lưu trữ:
+- memory: nhanh, mất job đang chờ khi process dừng
+- sqlite: ghi job xuống file SQLite cục bộ, job chưa xong được chạy lại khi khởi động.
+  Handler hiện có chỉ cập nhật trạng thái trong process (bộ đếm thống kê, cache
+  lịch tháng) nên job phải chạy ở đúng worker đã tạo nó: với nhiều worker
+  (GUNICORN_WORKERS > 1) configure() không dùng sqlite mà quay về memory.
+
+Job được thử lại tối đa max_attempts lần với thời gian chờ tăng dần. Có thể
+truyền dedupe_key để gộp các job trùng nhau còn đang chờ (VD: một lần làm mới
+thống kê cho mỗi user dù có nhiều thao tác ghi liên tiếp).
+"""
+import heapq
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    id: int
+    name: str
+    payload: Dict[str, Any]
+    attempts: int = 0
+    run_at: float = 0.0
+    dedupe_key: Optional[str] = None
+
+
+class MemoryJobStore:
+    def __init__(self):
+        self._heap = []
+        self._pending_keys = set()
+        self._ids = itertools.count(1)
+        self._condition = threading.Condition()
+
+    def put(self, name: str, payload: Dict, run_at: float, dedupe_key: Optional[str] = None) -> Optional[int]:
+        with self._condition:
+            if dedupe_key and dedupe_key in self._pending_keys:
+                return None
+            job = Job(next(self._ids), name, payload, 0, run_at, dedupe_key)
+            heapq.heappush(self._heap, (run_at, job.id, job))
+            if dedupe_key:
+                self._pending_keys.add(dedupe_key)
+            self._condition.notify()
+            return job.id
+
+    def claim(self, timeout: float) -> Optional[Job]:
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                now = time.time()
+                if self._heap and self._heap[0][0] <= now:
+                    job = heapq.heappop(self._heap)[2]
+                    # Khi job bắt đầu chạy, job cùng key mới được phép vào hàng đợi
+                    self._pending_keys.discard(job.dedupe_key)
+                    return job
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                wait = remaining if not self._heap else min(remaining, self._heap[0][0] - now)
+                self._condition.wait(wait)
+
+    def complete(self, job: Job):
+        pass
+
+    def retry(self, job: Job, run_at: float, error: str):
+        job.run_at = run_at
+        with self._condition:
+            heapq.heappush(self._heap, (run_at, job.id, job))
+            self._condition.notify()
+
+    def fail(self, job: Job, error: str):
+        pass
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._heap)
+
+    def wake(self):
+        with self._condition:
+            self._condition.notify_all()
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SQLiteJobStore:
+    """
+    Lưu job trong SQLite; mỗi thao tác mở kết nối riêng nên dùng được từ nhiều luồng.
+
+    Job đang chạy ghi lại process nhận nó (owner) và thời điểm nhận
+    (claimed_at). Job 'running' chỉ được đưa lại vào hàng đợi khi process đó
+    không còn sống, hoặc đã chạy quá claim_timeout giây (process bị treo), nên
+    khởi động thêm một process không làm job đang chạy ở nơi khác chạy hai lần.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 1.0, claim_timeout: float = 300.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.claim_timeout = claim_timeout
+        self._condition = threading.Condition()
+        self._next_recovery = 0.0
+        with self._transaction() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                run_at REAL NOT NULL,
+                dedupe_key TEXT,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                owner INTEGER,
+                claimed_at REAL
+            )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (('owner', 'INTEGER'), ('claimed_at', 'REAL')):
+                if column not in columns:  # file tạo bởi phiên bản trước
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_run_at ON jobs (status, run_at)")
+            self._recover(conn)
+
+    def _recover(self, conn):
+        """Đưa lại vào hàng đợi job 'running' của process đã chết hoặc đã quá claim_timeout."""
+        self._next_recovery = time.monotonic() + min(self.claim_timeout, 60.0)
+        owners = [row[0] for row in conn.execute("SELECT DISTINCT owner FROM jobs WHERE status = 'running'")]
+        dead = [owner for owner in owners if owner is None or not _process_alive(owner)]
+        placeholders = ','.join('?' * len(dead)) or 'NULL'
+        recovered = conn.execute(
+            "UPDATE jobs SET status = 'pending', owner = NULL, claimed_at = NULL "
+            f"WHERE status = 'running' AND (owner IS NULL OR owner IN ({placeholders}) OR claimed_at < ?)",
+            (*dead, time.time() - self.claim_timeout)
+        ).rowcount
+        if recovered:
+            logger.info(f"Recovered {recovered} interrupted jobs from {self.path}")
+
+    @contextmanager
+    def _transaction(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def put(self, name: str, payload: Dict, run_at: float, dedupe_key: Optional[str] = None) -> Optional[int]:
+        with self._transaction() as conn:
+            if dedupe_key:
+                exists = conn.execute(
+                    "SELECT 1 FROM jobs WHERE dedupe_key = ? AND status = 'pending' LIMIT 1", (dedupe_key,)
+                ).fetchone()
+                if exists:
+                    return None
+            job_id = conn.execute(
+                "INSERT INTO jobs (name, payload, run_at, dedupe_key, created_at) VALUES (?, ?, ?, ?, ?)",
+                (name, json.dumps(payload, default=str), run_at, dedupe_key, time.time())
+            ).lastrowid
+        with self._condition:
+            self._condition.notify()
+        return job_id
+
+    def claim(self, timeout: float) -> Optional[Job]:
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._transaction() as conn:
+                if time.monotonic() >= self._next_recovery:
+                    self._recover(conn)
+                row = conn.execute(
+                    "SELECT id, name, payload, attempts, run_at, dedupe_key FROM jobs "
+                    "WHERE status = 'pending' AND run_at <= ? ORDER BY run_at LIMIT 1",
+                    (time.time(),)
+                ).fetchone()
+                if row:
+                    conn.execute("UPDATE jobs SET status = 'running', owner = ?, claimed_at = ? WHERE id = ?",
+                                 (os.getpid(), time.time(), row[0]))
+            if row:
+                return Job(row[0], row[1], json.loads(row[2]), row[3], row[4], row[5])
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            with self._condition:
+                self._condition.wait(min(remaining, self.poll_interval))
+
+    def complete(self, job: Job):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job.id,))
+
+    def retry(self, job: Job, run_at: float, error: str):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'pending', owner = NULL, claimed_at = NULL, attempts = ?, run_at = ?, "
+                "last_error = ? WHERE id = ?",
+                (job.attempts, run_at, error[:1000], job.id)
+            )
+
+    def fail(self, job: Job, error: str):
+        # Giữ lại job lỗi để kiểm tra, không tự xóa
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                (job.attempts, error[:1000], job.id)
+            )
+
+    def pending(self) -> int:
+        with self._transaction() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'pending'").fetchone()[0]
+
+    def wake(self):
+        with self._condition:
+            self._condition.notify_all()
+
+
+jobs_processed = metrics.registry.counter(
+    'jobs_processed_total', 'Số job nền đã xử lý theo kết quả', ('job', 'outcome'))
+job_duration = metrics.registry.histogram(
+    'job_duration_seconds', 'Thời gian chạy job nền', ('job',))
+
+
+class JobQueue:
+    def __init__(self, store=None, workers: int = 2, max_attempts: int = 3, retry_delay: float = 2.0):
+        self.store = store or MemoryJobStore()
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._handlers: Dict[str, Callable[[Dict], Any]] = {}
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+
+    def register(self, name: str, func: Callable[[Dict], Any]):
+        self._handlers[name] = func
+        return func
+
+    def handler(self, name: str):
+        """Decorator đăng ký hàm xử lý cho một loại job."""
+        def decorator(func):
+            return self.register(name, func)
+        return decorator
+
+    def enqueue(self, name: str, payload: Optional[Dict] = None, delay: float = 0.0,
+                dedupe_key: Optional[str] = None) -> Optional[int]:
+        """Thêm job; trả về None nếu đã có job cùng dedupe_key đang chờ."""
+        if name not in self._handlers:
+            raise ValueError(f"No handler registered for job {name}")
+        return self.store.put(name, payload or {}, time.time() + delay, dedupe_key)
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'job-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Job queue started with {self.workers} workers ({type(self.store).__name__})")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self.store.wake()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_pending(self, limit: int = 100) -> int:
+        """Chạy đồng bộ các job đến hạn trong luồng hiện tại (dùng khi không bật worker)."""
+        count = 0
+        while count < limit:
+            job = self.store.claim(0)
+            if job is None:
+                break
+            self._execute(job)
+            count += 1
+        return count
+
+    def stats(self) -> Dict:
+        return {
+            'running': self.running,
+            'workers': len(self._threads),
+            'store': type(self.store).__name__,
+            'pending': self.store.pending(),
+            'handlers': sorted(self._handlers)
+        }
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                job = self.store.claim(timeout=1.0)
+            except Exception as e:
+                logger.error(f"Job store error: {e}")
+                self._stop.wait(1.0)
+                continue
+            if job is not None:
+                self._execute(job)
+
+    def _execute(self, job: Job):
+        func = self._handlers.get(job.name)
+        job.attempts += 1
+        started = time.perf_counter()
+        try:
+            if func is None:
+                raise LookupError(f"No handler registered for job {job.name}")
+            func(job.payload)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if job.attempts < self.max_attempts and func is not None:
+                delay = self.retry_delay * (2 ** (job.attempts - 1))
+                logger.warning(f"Job {job.name}#{job.id} failed (attempt {job.attempts}), retrying in {delay}s: {error}")
+                self.store.retry(job, time.time() + delay, error)
+                jobs_processed.inc(job.name, 'retry')
+            else:
+                logger.error(f"Job {job.name}#{job.id} failed permanently: {error}")
+                self.store.fail(job, error)
+                jobs_processed.inc(job.name, 'failed')
+            return
+        finally:
+            job_duration.observe(job.name, value=time.perf_counter() - started)
+
+        self.store.complete(job)
+        jobs_processed.inc(job.name, 'ok')
+
+
+job_queue = JobQueue()
+
+metrics.registry.callback('jobs_pending', 'Số job nền đang chờ', (),
+                          lambda: {(): job_queue.store.pending()})
+
+
+def configure(config):
+    """Chọn kiểu lưu trữ và số worker theo config; gọi trước start()."""
+    store_name = getattr(config, 'JOB_STORE', 'memory')
+    if store_name == 'sqlite' and getattr(config, 'WORKERS', 1) > 1:
+        # Worker khác nhận job thì chỉ cập nhật bộ đếm/cache của nó, worker đã ghi vẫn giữ dữ liệu cũ
+        logger.error("JOB_STORE=sqlite only supports a single worker process "
+                     f"(GUNICORN_WORKERS={config.WORKERS}); using the in-memory job store")
+        store_name = 'memory'
+    if store_name == 'sqlite':
+        job_queue.store = SQLiteJobStore(getattr(config, 'JOB_SQLITE_PATH', 'jobs.sqlite3'),
+                                         claim_timeout=getattr(config, 'JOB_CLAIM_TIMEOUT', 300))
+    else:
+        job_queue.store = MemoryJobStore()
+    job_queue.workers = getattr(config, 'JOB_WORKERS', 2)
+    job_queue.max_attempts = getattr(config, 'JOB_MAX_ATTEMPTS', 3)
@@ -0,0 +1,432 @@
+"""
+Các backend LLM dùng chung một giao diện cho PersonalAssistant.
+
+- ollama:    HTTP /api/generate của Ollama
+- openai:    server tương thích OpenAI /v1/completions (llama.cpp server, vLLM, LM Studio...)
+- llama_cpp: chạy model GGUF ngay trong process bằng llama-cpp-python (tùy chọn, chỉ cần CPU)
+- stub:      trả lời tất định từ rule, dùng cho benchmark và môi trường không có model
+
+Mỗi backend khai báo khả năng riêng (supports_batching, supports_streaming,
+max_batch_size) để lớp gọi quyết định có gom request hay stream hay không.
+"""
+import importlib.util
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OPTIONS = {
+    'temperature': 0.3,
+    'top_p': 0.9,
+    'max_tokens': 2000
+}
+
+
+class LLMError(Exception):
+    """Lỗi khi gọi backend; kind là connection_error | timeout_error | unknown_error."""
+
+    def __init__(self, message: str, kind: str = 'unknown_error'):
+        super().__init__(message)
+        self.kind = kind
+
+
+@dataclass
+class GenerationResult:
+    text: str
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    prompt_seconds: Optional[float] = None
+    generation_seconds: Optional[float] = None
+    raw: Dict[str, Any] = field(default_factory=dict)
+
+
+class LLMBackend:
+    name = 'base'
+    supports_batching = False
+    supports_streaming = False
+
+    def __init__(self, model: str, timeout: float = 300, max_batch_size: int = 1):
+        self.model = model
+        self.timeout = timeout
+        self.max_batch_size = max_batch_size if self.supports_batching else 1
+
+    def generate(self, prompt: str, options: Optional[Dict] = None) -> GenerationResult:
+        raise NotImplementedError
+
+    def generate_batch(self, prompts: List[str], options: Optional[Dict] = None) -> List[GenerationResult]:
+        """Mặc định gọi lần lượt; backend hỗ trợ batch thật sẽ ghi đè."""
+        return [self.generate(prompt, options) for prompt in prompts]
+
+    def stream(self, prompt: str, options: Optional[Dict] = None) -> Iterator[str]:
+        """Sinh từng đoạn văn bản; backend không hỗ trợ stream trả một đoạn duy nhất."""
+        yield self.generate(prompt, options).text
+
+    def health(self) -> bool:
+        return True
+
+    def close(self):
+        pass
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'backend': self.name,
+            'model': self.model,
+            'timeout': self.timeout,
+            'supports_batching': self.supports_batching,
+            'supports_streaming': self.supports_streaming,
+            'max_batch_size': self.max_batch_size
+        }
+
+    def _options(self, options: Optional[Dict]) -> Dict:
+        merged = dict(DEFAULT_OPTIONS)
+        merged.update(options or {})
+        return merged
+
+
+class _HTTPBackend(LLMBackend):
+    def __init__(self, base_url: str, model: str, timeout: float = 300, max_batch_size: int = 1):
+        super().__init__(model, timeout, max_batch_size)
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def _post(self, path: str, payload: Dict, stream: bool = False):
+        try:
+            response = self.session.post(f"{self.base_url}{path}", json=payload,
+                                         timeout=self.timeout, stream=stream)
+            response.raise_for_status()
+            return response
+        except requests.exceptions.ConnectionError as e:
+            raise LLMError(str(e), 'connection_error')
+        except requests.exceptions.Timeout as e:
+            raise LLMError(str(e), 'timeout_error')
+        except requests.exceptions.RequestException as e:
+            raise LLMError(str(e))
+
+    def close(self):
+        self.session.close()
+
+
+class OllamaBackend(_HTTPBackend):
+    """Ollama không có API batch; song song hóa dựa vào OLLAMA_NUM_PARALLEL phía server."""
+    name = 'ollama'
+    supports_streaming = True
+
+    def __init__(self, base_url: str, model: str, timeout: float = 300, max_batch_size: int = 1):
+        base_url = base_url.rstrip('/')
+        if base_url.endswith('/api/generate'):
+            base_url = base_url[:-len('/api/generate')]
+        super().__init__(base_url, model, timeout, max_batch_size)
+
+    def _payload(self, prompt: str, options: Optional[Dict], stream: bool) -> Dict:
+        return {
+            'model': self.model,
+            'prompt': prompt,
+            'stream': stream,
+            'options': self._options(options)
+        }
+
+    def generate(self, prompt: str, options: Optional[Dict] = None) -> GenerationResult:
+        result = self._post('/api/generate', self._payload(prompt, options, False)).json()
+        return GenerationResult(
+            text=result.get('response', '').strip(),
+            prompt_tokens=result.get('prompt_eval_count', 0),
+            output_tokens=result.get('eval_count', 0),
+            # Các trường *_duration của Ollama tính bằng nano giây
+            prompt_seconds=result['prompt_eval_duration'] / 1e9 if result.get('prompt_eval_duration') else None,
+            generation_seconds=result['eval_duration'] / 1e9 if result.get('eval_duration') else None,
+            raw=result
+        )
+
+    def stream(self, prompt: str, options: Optional[Dict] = None) -> Iterator[str]:
+        response = self._post('/api/generate', self._payload(prompt, options, True), stream=True)
+        with response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get('response'):
+                    yield chunk['response']
+                if chunk.get('done'):
+                    break
+
+    def health(self) -> bool:
+        try:
+            return self.session.get(f"{self.base_url}/api/tags", timeout=5).ok
+        except requests.RequestException:
+            return False
+
+
+class OpenAICompatibleBackend(_HTTPBackend):
+    """Endpoint /v1/completions nhận danh sách prompt nên gom batch được trong một request."""
+    name = 'openai'
+    supports_batching = True
+    supports_streaming = True
+
+    def __init__(self, base_url: str, model: str, timeout: float = 300, max_batch_size: int = 8,
+                 api_key: str = ''):
+        super().__init__(base_url, model, timeout, max_batch_size)
+        if api_key:
+            self.session.headers['Authorization'] = f"Bearer {api_key}"
+
+    def _payload(self, prompt, options: Optional[Dict], stream: bool) -> Dict:
+        options = self._options(options)
+        return {
+            'model': self.model,
+            'prompt': prompt,
+            'stream': stream,
+            'temperature': options['temperature'],
+            'top_p': options['top_p'],
+            'max_tokens': options['max_tokens']
+        }
+
+    def generate(self, prompt: str, options: Optional[Dict] = None) -> GenerationResult:
+        return self.generate_batch([prompt], options)[0]
+
+    def generate_batch(self, prompts: List[str], options: Optional[Dict] = None) -> List[GenerationResult]:
+        results = []
+        for start in range(0, len(prompts), self.max_batch_size):
+            chunk = prompts[start:start + self.max_batch_size]
+            body = self._post('/completions', self._payload(chunk, options, False)).json()
+            choices = sorted(body.get('choices', []), key=lambda choice: choice.get('index', 0))
+            if len(choices) != len(chunk):
+                raise LLMError(f"Expected {len(chunk)} choices, got {len(choices)}")
+
+            # usage là tổng cả batch nên chia đều cho từng prompt
+            usage = body.get('usage') or {}
+            for choice in choices:
+                results.append(GenerationResult(
+                    text=choice.get('text', '').strip(),
+                    prompt_tokens=usage.get('prompt_tokens', 0) // len(chunk),
+                    output_tokens=usage.get('completion_tokens', 0) // len(chunk),
+                    raw=choice
+                ))
+        return results
+
+    def stream(self, prompt: str, options: Optional[Dict] = None) -> Iterator[str]:
+        response = self._post('/completions', self._payload(prompt, options, True), stream=True)
+        with response:
+            for line in response.iter_lines():
+                if not line.startswith(b'data:'):
+                    continue
+                data = line[len(b'data:'):].strip()
+                if data == b'[DONE]':
+                    break
+                choices = json.loads(data).get('choices') or [{}]
+                if choices[0].get('text'):
+                    yield choices[0]['text']
+
+    def health(self) -> bool:
+        try:
+            return self.session.get(f"{self.base_url}/models", timeout=5).ok
+        except requests.RequestException:
+            return False
+
+
+class LlamaCppBackend(LLMBackend):
+    """
+    Chạy model GGUF trong process, không cần server riêng. Cần cài
+    llama-cpp-python; model chỉ được nạp ở lần gọi đầu tiên. Một instance
+    Llama không an toàn đa luồng nên các lời gọi được tuần tự hóa. timeout
+    tính cả thời gian chờ lượt lẫn thời gian sinh: quá hạn thì dừng sinh token
+    và ném LLMError timeout_error.
+    """
+    name = 'llama_cpp'
+    supports_streaming = True
+
+    def __init__(self, model_path: str, timeout: float = 300, n_threads: Optional[int] = None,
+                 n_ctx: int = 4096):
+        super().__init__(model_path, timeout)
+        self.model_path = model_path
+        self.n_threads = n_threads
+        self.n_ctx = n_ctx
+        self._llama = None
+        self._lock = threading.Lock()
+
+    def _get_llama(self):
+        # Chỉ gọi khi đang giữ self._lock: hai thread cùng nạp sẽ giữ hai bản model trong RAM
+        if self._llama is None:
+            try:
+                from llama_cpp import Llama
+            except ImportError:
+                raise LLMError('llama-cpp-python chưa được cài đặt (pip install llama-cpp-python)')
+            if not self.model_path:
+                raise LLMError('Chưa cấu hình LLAMA_CPP_MODEL_PATH')
+            logger.info(f"Loading llama.cpp model from {self.model_path}")
+            self._llama = Llama(model_path=self.model_path, n_ctx=self.n_ctx,
+                                n_threads=self.n_threads, verbose=False)
+        return self._llama
+
+    @contextmanager
+    def _turn(self):
+        """Giữ lượt dùng model; trả về deadline (perf_counter) của lời gọi."""
+        deadline = time.perf_counter() + self.timeout
+        if not self._lock.acquire(timeout=self.timeout):
+            raise LLMError(f'llama.cpp busy for more than {self.timeout}s', 'timeout_error')
+        try:
+            yield deadline
+        finally:
+            self._lock.release()
+
+    def _call(self, llama, prompt: str, options: Dict, deadline: float, stream: bool = False):
+        from llama_cpp import StoppingCriteriaList
+        return llama(prompt, max_tokens=options['max_tokens'], temperature=options['temperature'],
+                     top_p=options['top_p'], stream=stream,
+                     stopping_criteria=StoppingCriteriaList([lambda tokens, logits: time.perf_counter() > deadline]))
+
+    def _check_deadline(self, deadline: float):
+        if time.perf_counter() > deadline:
+            raise LLMError(f'llama.cpp generation exceeded {self.timeout}s', 'timeout_error')
+
+    def generate(self, prompt: str, options: Optional[Dict] = None) -> GenerationResult:
+        options = self._options(options)
+        with self._turn() as deadline:
+            llama = self._get_llama()
+            started = time.perf_counter()
+            result = self._call(llama, prompt, options, deadline)
+            elapsed = time.perf_counter() - started
+            self._check_deadline(deadline)
+
+        usage = result.get('usage') or {}
+        return GenerationResult(
+            text=result['choices'][0]['text'].strip(),
+            prompt_tokens=usage.get('prompt_tokens', 0),
+            output_tokens=usage.get('completion_tokens', 0),
+            generation_seconds=elapsed,
+            raw=result
+        )
+
+    def stream(self, prompt: str, options: Optional[Dict] = None) -> Iterator[str]:
+        options = self._options(options)
+        with self._turn() as deadline:
+            llama = self._get_llama()
+            for chunk in self._call(llama, prompt, options, deadline, stream=True):
+                text = chunk['choices'][0].get('text')
+                if text:
+                    yield text
+            self._check_deadline(deadline)
+
+    def health(self) -> bool:
+        """
+        Không nạp model ở đây: health check chạy ở thread nền và không được tranh
+        lượt nạp với request. Chưa nạp thì chỉ kiểm tra thư viện và file model.
+        """
+        if self._llama is not None:
+            return True
+        if importlib.util.find_spec('llama_cpp') is None:
+            return False
+        return bool(self.model_path) and os.path.isfile(self.model_path)
+
+
+class StubBackend(LLMBackend):
+    """
+    Backend tất định: suy intent từ rule trong slot_extraction, không cần model.
+    Dùng cho benchmark so sánh backend và cho môi trường dev không có GPU/Ollama.
+    """
+    name = 'stub'
+    supports_batching = True
+    supports_streaming = True
+
+    MESSAGE_PATTERN = re.compile(r'Tin nhắn cần phân tích: "(.*)"', re.DOTALL)
+
+    def __init__(self, model: str = 'stub', timeout: float = 300, max_batch_size: int = 32,
+                 latency_ms: float = 0.0, per_item_ms: float = 0.0, parallel: int = 0):
+        super().__init__(model, timeout, max_batch_size)
+        # Mô phỏng chi phí một lời gọi: latency_ms cố định + per_item_ms cho mỗi prompt trong batch,
+        # với tối đa `parallel` lời gọi chạy cùng lúc như một server model thật (0 = không giới hạn)
+        self.latency_ms = latency_ms
+        self.per_item_ms = per_item_ms
+        self._slots = threading.Semaphore(parallel) if parallel else None
+
+    def _respond(self, prompt: str) -> Dict[str, Any]:
+        import slot_extraction
+
+        match = self.MESSAGE_PATTERN.search(prompt)
+        message = match.group(1) if match else prompt
+        slots = slot_extraction.extract(message)
+        text = slot_extraction.normalize(message)
+
+        if not slots.is_schedule_related and slots.temporal is None:
+            return {'is_schedule_related': False, 'intent': 'conversation', 'confidence': 0.8,
+                    'response': 'Xin chào! Tôi có thể giúp gì cho bạn?'}
+
+        schedule_id = re.search(r'(?:lịch|id)\s*(\d+)', text)
+        if 'xóa' in slots.keywords or 'hủy' in text:
+            return {'is_schedule_related': True, 'intent': 'delete', 'confidence': 0.9,
+                    'schedule_id': int(schedule_id.group(1)) if schedule_id else None, 'event_keyword': ''}
+        if 'sửa' in slots.keywords or 'đổi' in text:
+            changed = ['datetime'] if slots.temporal and slots.temporal.is_explicit else []
+            return {'is_schedule_related': True, 'intent': 'update', 'confidence': 0.9,
+                    'schedule_id': int(schedule_id.group(1)) if schedule_id else None, 'schedule_data': {},
+                    'changed_fields': changed}
+        if 'xem' in slots.keywords or 'có gì' in text:
+            return {'is_schedule_related': True, 'intent': 'query', 'confidence': 0.9,
+                    'query_scope': slots.query_scope}
+        return {'is_schedule_related': True, 'intent': 'schedule', 'confidence': 0.9,
+                'schedule_data': {'event': message.strip()[:100]}}
+
+    def generate(self, prompt: str, options: Optional[Dict] = None) -> GenerationResult:
+        return self.generate_batch([prompt], options)[0]
+
+    def generate_batch(self, prompts: List[str], options: Optional[Dict] = None) -> List[GenerationResult]:
+        delay = self.latency_ms + self.per_item_ms * len(prompts)
+        if delay:
+            if self._slots:
+                with self._slots:
+                    time.sleep(delay / 1000.0)
+            else:
+                time.sleep(delay / 1000.0)
+        return [
+            GenerationResult(
+                text=json.dumps(self._respond(prompt), ensure_ascii=False),
+                prompt_tokens=len(prompt) // 4,
+                output_tokens=40
+            )
+            for prompt in prompts
+        ]
+
+    def stream(self, prompt: str, options: Optional[Dict] = None) -> Iterator[str]:
+        text = self.generate(prompt, options).text
+        for start in range(0, len(text), 16):
+            yield text[start:start + 16]
+
+
+BACKENDS = {
+    'ollama': OllamaBackend,
+    'openai': OpenAICompatibleBackend,
+    'llama_cpp': LlamaCppBackend,
+    'stub': StubBackend,
+}
+
+
+def create_backend(config, name: Optional[str] = None) -> LLMBackend:
+    """Tạo backend theo LLM_BACKEND trong config (mặc định ollama)."""
+    name = (name or getattr(config, 'LLM_BACKEND', 'ollama')).lower()
+    timeout = getattr(config, 'LLM_TIMEOUT', 300)
+    model = getattr(config, 'LLM_MODEL', None) or getattr(config, 'OLLAMA_MODEL', 'mistral')
+
+    if name == 'ollama':
+        return OllamaBackend(getattr(config, 'OLLAMA_URL', 'http://localhost:11434'), model, timeout)
+    if name == 'openai':
+        return OpenAICompatibleBackend(
+            getattr(config, 'OPENAI_BASE_URL', 'http://localhost:8080/v1'), model, timeout,
+            max_batch_size=getattr(config, 'LLM_MAX_BATCH_SIZE', 8),
+            api_key=getattr(config, 'OPENAI_API_KEY', '')
+        )
+    if name == 'llama_cpp':
+        return LlamaCppBackend(
+            getattr(config, 'LLAMA_CPP_MODEL_PATH', ''), timeout,
+            n_threads=getattr(config, 'LLAMA_CPP_THREADS', None) or None,
+            n_ctx=getattr(config, 'LLAMA_CPP_CONTEXT', 4096)
+        )
+    if name == 'stub':
+        return StubBackend(latency_ms=getattr(config, 'STUB_LATENCY_MS', 0.0))
+    raise ValueError(f"Unknown LLM backend: {name}")
@@ -0,0 +1,164 @@
+"""
+Gom các request phân tích intent đồng thời thành một lời gọi generate_batch.
+
+Mỗi lời gọi submit() nhận về một Future. Luồng gom đợi tối đa window_ms kể từ
+request đầu tiên (hoặc đến khi đủ max_batch_size) rồi gửi cả nhóm cho backend.
+Trong lúc một batch đang chạy, các request mới tiếp tục được gom cho batch sau,
+nên dưới tải cao kích thước batch tự tăng mà không cần cửa sổ dài.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+from llm_backends import GenerationResult, LLMBackend, LLMError
+
+logger = logging.getLogger(__name__)
+
+llm_batch_size = metrics.registry.histogram(
+    'llm_batch_size', 'Số request trong mỗi batch gửi tới LLM backend', ('backend',),
+    buckets=(1, 2, 4, 8, 16, 32, 64))
+
+_STOP = object()
+
+
+class MicroBatcher:
+    def __init__(self, backend: LLMBackend, window_ms: float = 10.0, max_batch_size: Optional[int] = None,
+                 max_inflight: int = 2):
+        self.backend = backend
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size or backend.max_batch_size)
+        self.max_inflight = max(1, max_inflight)
+
+        self.batches = 0
+        self.requests = 0
+        self.largest_batch = 0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._executor = None
+        # Giới hạn số batch chạy song song; luồng gom chờ ở đây khi backend đang bận
+        self._inflight = threading.Semaphore(self.max_inflight)
+
+    def submit(self, prompt: str, options: Optional[Dict] = None) -> Future:
+        self._ensure_started()
+        future = Future()
+        self._queue.put((prompt, options, future))
+        return future
+
+    def generate(self, prompt: str, options: Optional[Dict] = None,
+                 timeout: Optional[float] = None) -> GenerationResult:
+        """Bản đồng bộ của submit(), cùng giao diện với LLMBackend.generate."""
+        future = self.submit(prompt, options)
+        try:
+            return future.result(timeout or self.backend.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise LLMError('Batched generation timed out', 'timeout_error')
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'requests': self.requests,
+                'largest_batch': self.largest_batch,
+                'average_batch': round(self.requests / self.batches, 2) if self.batches else 0.0,
+                'window_ms': self.window * 1000,
+                'max_batch_size': self.max_batch_size,
+                'queued': self._queue.qsize()
+            }
+
+    def stop(self):
+        with self._lock:
+            thread, executor = self._thread, self._executor
+            self._thread = None
+        if thread:
+            self._queue.put(_STOP)
+            thread.join()
+        if executor:
+            executor.shutdown(wait=True)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_inflight,
+                                                    thread_name_prefix='llm-batch')
+                self._thread = threading.Thread(target=self._collect, name='llm-batcher', daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            stopping = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._inflight.acquire()
+            self._executor.submit(self._dispatch, batch)
+            if stopping:
+                return
+
+    def _dispatch(self, batch: List[Tuple[str, Optional[Dict], Future]]):
+        try:
+            # Chỉ gom các request có cùng options vào một lời gọi
+            groups = {}
+            for prompt, options, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                key = tuple(sorted((options or {}).items()))
+                groups.setdefault(key, (options, []))[1].append((prompt, future))
+
+            for options, items in groups.values():
+                self._record(len(items))
+                try:
+                    results = self.backend.generate_batch([prompt for prompt, _ in items], options)
+                except Exception as e:
+                    logger.error(f"Batched generation failed ({len(items)} requests): {e}")
+                    for _, future in items:
+                        future.set_exception(e)
+                    continue
+                for (_, future), result in zip(items, results):
+                    future.set_result(result)
+        finally:
+            self._inflight.release()
+
+    def _record(self, size: int):
+        llm_batch_size.observe(self.backend.name, value=size)
+        with self._lock:
+            self.batches += 1
+            self.requests += size
+            self.largest_batch = max(self.largest_batch, size)
+
+
+def create_batcher(config, backend: LLMBackend) -> Optional[MicroBatcher]:
+    """Chỉ bật khi LLM_BATCH_WINDOW_MS > 0 và backend hỗ trợ batch thật."""
+    window_ms = getattr(config, 'LLM_BATCH_WINDOW_MS', 0)
+    if window_ms <= 0 or not backend.supports_batching:
+        return None
+    return MicroBatcher(
+        backend,
+        window_ms=window_ms,
+        max_batch_size=getattr(config, 'LLM_MAX_BATCH_SIZE', None),
+        max_inflight=getattr(config, 'LLM_BATCH_MAX_INFLIGHT', 2)
+    )
@@ -0,0 +1,407 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _add_label(line: str, label: str) -> str:
+    # Tên metric không chứa khoảng trắng hay '{': ký tự nào gặp trước là ranh giới tên
+    space = line.index(' ')
+    brace = line.find('{', 0, space)
+    if brace >= 0:
+        return f'{line[:brace + 1]}{label},{line[brace + 1:]}'
+    return f'{line[:space]}{{{label}}}{line[space:]}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = list(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}')
+        return lines
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def set(self, *labelvalues, value: float):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = list(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}')
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Metric lấy giá trị qua callback lúc scrape, không tốn chi phí trên đường xử lý request."""
+
+    def __init__(self, name, documentation, labelnames, callback: Callable[[], Dict[Tuple, float]], kind: str = 'gauge'):
+        super().__init__(name, documentation, labelnames)
+        self._callback = callback
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        try:
+            values = self._callback()
+        except Exception as e:
+            logger.error(f"Metric callback {self.name} failed: {e}")
+            values = {}
+        for labelvalues, value in values.items():
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}')
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, *labelvalues, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # [đếm theo bucket..., bucket +Inf, tổng, số lần]
+                series = [0] * (len(self.buckets) + 1) + [0.0, 0]
+                self._series[labelvalues] = series
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = [(labelvalues, list(series)) for labelvalues, series in self._series.items()]
+        for labelvalues, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f'{self.name}_sum{labels} {_format_value(series[-2])}')
+            lines.append(f'{self.name}_count{labels} {series[-1]}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def callback(self, name, documentation, labelnames, callback, kind='gauge') -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, labelnames, callback, kind))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self, worker: Optional[str] = None) -> str:
+        """Định dạng text của Prometheus; worker: thêm nhãn worker vào mọi mẫu."""
+        with self._lock:
+            metrics = list(self._metrics)
+        label = f'worker="{_escape(worker)}"' if worker else ''
+        lines = []
+        for metric in metrics:
+            for line in metric.render():
+                lines.append(_add_label(line, label) if label and not line.startswith('#') else line)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class WorkerSnapshots:
+    """
+    Gộp metrics của mọi worker gunicorn vào một lần scrape. Mỗi worker ghi
+    bản render của registry (kèm nhãn worker=<pid>) vào METRICS_DIR mỗi
+    METRICS_FLUSH_SECONDS giây và ngay trước khi trả lời /metrics; worker nhận
+    scrape đọc file của các worker khác và gộp theo metric. Dữ liệu của worker
+    khác vì vậy trễ tối đa một chu kỳ ghi. File của worker đã thoát được
+    gunicorn.conf.py xóa (child_exit), file không được cập nhật quá 3 chu kỳ bị
+    bỏ qua và xóa.
+
+    Không đặt METRICS_DIR (một process): /metrics chỉ trả registry của process
+    đó, vẫn kèm nhãn worker.
+    """
+
+    def __init__(self):
+        self.directory = ''
+        self.interval = 5.0
+        self._thread = None
+        self._thread_pid = None
+        self._stop = threading.Event()
+
+    def path(self, pid: int) -> str:
+        return os.path.join(self.directory, f'{pid}.prom')
+
+    def write(self) -> str:
+        """Ghi snapshot của process hiện tại (ghi file tạm rồi rename, không ai đọc được nửa file)."""
+        text = registry.render(worker=str(os.getpid()))
+        if self.directory:
+            path = self.path(os.getpid())
+            with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(f'{path}.tmp', path)
+        return text
+
+    def remove(self, pid: int):
+        try:
+            os.remove(self.path(pid))
+        except FileNotFoundError:
+            pass
+
+    def collect(self) -> str:
+        own = self.write()
+        if not self.directory:
+            return own
+        texts = [own]
+        stale_before = time.time() - max(self.interval * 3, 30)
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.prom') or name == f'{os.getpid()}.prom':
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < stale_before:
+                    os.remove(path)
+                    continue
+                with open(path, encoding='utf-8') as f:
+                    texts.append(f.read())
+            except OSError:
+                continue  # worker vừa thoát hoặc đang thay file
+        return _merge(texts)
+
+    def start(self):
+        """Thread ghi snapshot định kỳ; một lần cho mỗi process, chỉ khi có METRICS_DIR."""
+        if not self.directory or self._thread_pid == os.getpid():
+            return
+        self._thread_pid = os.getpid()
+        os.makedirs(self.directory, exist_ok=True)
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(self.interval):
+                try:
+                    self.write()
+                except OSError as e:
+                    logger.error(f"Failed to write metrics snapshot: {e}")
+
+        self._thread = threading.Thread(target=run, name='metrics-snapshot', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+        self._thread_pid = None
+        if self.directory:
+            self.remove(os.getpid())
+
+
+def _merge(texts: List[str]) -> str:
+    """Gộp nhiều bản render theo metric: HELP/TYPE một lần, rồi mẫu của mọi worker."""
+    families: Dict[str, Tuple[List[str], List[str]]] = {}
+    for text in texts:
+        current = None
+        for line in text.splitlines():
+            if line.startswith('# HELP '):
+                name = line.split(' ', 3)[2]
+                current = families.get(name)
+                if current is None:
+                    current = families[name] = ([line], [])
+            elif line.startswith('# TYPE '):
+                if current is not None and len(current[0]) == 1:
+                    current[0].append(line)
+            elif line and current is not None:
+                current[1].append(line)
+    lines = []
+    for header, samples in families.values():
+        lines.extend(header)
+        lines.extend(samples)
+    return '\n'.join(lines) + '\n'
+
+
+snapshots = WorkerSnapshots()
+allowed_ips = {'127.0.0.1', '::1'}
+
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Thời gian xử lý request theo route',
+    ('route', 'method', 'status'))
+db_query_duration = registry.histogram(
+    'db_query_duration_seconds', 'Thời gian thực thi SQL theo fingerprint câu lệnh',
+    ('fingerprint', 'statement'))
+db_query_errors = registry.counter(
+    'db_query_errors_total', 'Số câu lệnh SQL lỗi theo fingerprint', ('fingerprint',))
+db_pool_wait = registry.histogram(
+    'db_pool_wait_seconds', 'Thời gian chờ lấy kết nối từ pool')
+db_statement_cache = registry.counter(
+    'db_statement_cache_total', 'Tra cứu cursor prepared trong cache của kết nối', ('result',))
+db_reads = registry.counter(
+    'db_reads_total', 'Câu đọc theo nơi chạy (replica, primary, primary_sticky, primary_no_replica)', ('target',))
+db_replica_fallbacks = registry.counter(
+    'db_replica_fallbacks_total', 'Câu đọc chạy lại trên primary sau khi replica lỗi hoặc không thấy dòng', ('reason',))
+db_transactions = registry.counter(
+    'db_transactions_total', 'Số transaction (unit of work) theo kết quả', ('outcome',))
+db_transaction_statements = registry.histogram(
+    'db_transaction_statements', 'Số câu lệnh SQL trong mỗi transaction',
+    buckets=(1, 2, 3, 5, 10, 25, 50, 100))
+llm_request_duration = registry.histogram(
+    'llm_request_duration_seconds', 'Tổng thời gian gọi LLM backend (phía client)', ('backend',),
+    buckets=LLM_BUCKETS)
+llm_prompt_eval_duration = registry.histogram(
+    'llm_prompt_eval_seconds', 'Thời gian backend xử lý prompt', ('backend',), buckets=LLM_BUCKETS)
+llm_generation_duration = registry.histogram(
+    'llm_generation_seconds', 'Thời gian backend sinh token', ('backend',), buckets=LLM_BUCKETS)
+llm_tokens = registry.counter(
+    'llm_tokens_total', 'Số token LLM xử lý', ('backend', 'phase'))
+
+_caches = {}
+
+
+def register_cache(name: str, cache):
+    """Đăng ký một TTLCache để xuất hit/miss/số entry trên /metrics."""
+    _caches[name] = cache
+
+
+def _collect_caches(read):
+    def collect():
+        return {(name,): read(cache) for name, cache in list(_caches.items())}
+    return collect
+
+
+registry.callback('cache_hits_total', 'Số lần cache hit', ('cache',),
+                  _collect_caches(lambda cache: cache.hits), kind='counter')
+registry.callback('cache_misses_total', 'Số lần cache miss', ('cache',),
+                  _collect_caches(lambda cache: cache.misses), kind='counter')
+registry.callback('cache_entries', 'Số entry hiện có trong cache', ('cache',),
+                  _collect_caches(len))
+
+
+def observe_llm_result(backend: str, result, elapsed: float):
+    """Ghi nhận thời gian và số token từ một llm_backends.GenerationResult."""
+    llm_request_duration.observe(backend, value=elapsed)
+    if result.prompt_seconds:
+        llm_prompt_eval_duration.observe(backend, value=result.prompt_seconds)
+    if result.generation_seconds:
+        llm_generation_duration.observe(backend, value=result.generation_seconds)
+    if result.prompt_tokens:
+        llm_tokens.inc(backend, 'prompt', amount=result.prompt_tokens)
+    if result.output_tokens:
+        llm_tokens.inc(backend, 'generation', amount=result.output_tokens)
+
+
+def configure(config):
+    """Đọc METRICS_* từ config; gọi lúc khởi động, trước khi fork worker."""
+    global allowed_ips
+    allowed_ips = {ip.strip() for ip in getattr(config, 'METRICS_ALLOWED_IPS', '').split(',') if ip.strip()}
+    snapshots.directory = getattr(config, 'METRICS_DIR', '')
+    snapshots.interval = getattr(config, 'METRICS_FLUSH_SECONDS', 5)
+
+
+def init_app(app, is_admin_request):
+    """
+    Gắn hook đo thời gian request và route /metrics vào Flask app. /metrics lộ
+    fingerprint SQL và tên route nên chỉ trả lời admin (X-Admin-Token) hoặc
+    địa chỉ trong METRICS_ALLOWED_IPS; địa chỉ là địa chỉ kết nối thật, không
+    đọc X-Forwarded-For.
+    """
+    from flask import Response, g, jsonify, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = getattr(g, '_metrics_start', None)
+        if start is None:
+            return response
+        labels = (request.url_rule.rule if request.url_rule else 'unmatched', request.method,
+                  str(response.status_code))
+        if response.is_streamed:
+            # Body stream (danh sách, xuất lịch) được ghi sau hook này: đo tới lúc gửi xong
+            response.call_on_close(lambda: http_request_duration.observe(*labels, value=time.perf_counter() - start))
+        else:
+            http_request_duration.observe(*labels, value=time.perf_counter() - start)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        if request.remote_addr not in allowed_ips and not is_admin_request():
+            return jsonify({'success': False, 'message': 'Không có quyền truy cập'}), 403
+        return Response(snapshots.collect(), content_type=CONTENT_TYPE)
@@ -1,8 +1,14 @@
 import logging
+from contextlib import closing
 from datetime import datetime, timedelta
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
+from typing import Iterator, List, Optional, Dict, Any
 import json
+from cache import schedule_versions
+from shared_state import shared
+from jobs import job_queue
+from stats import schedule_stats
+import statements
 
 logger = logging.getLogger(__name__)
 
@@ -33,24 +39,19 @@ class Schedule:
 
 
 class UserModel:
+    # Cột cho phép cập nhật qua update_user
+    UPDATABLE_FIELDS = ('email', 'fullname', 'password')
+
     def __init__(self, db_manager):
         self.db = db_manager
     
     def create_user(self, email: str, password: str, fullname: str = '') -> Optional[int]:
-        query = """
-        INSERT INTO users (email, password, fullname, created_at, updated_at)
-        VALUES (%s, %s, %s, %s, %s)
-        """
         now = datetime.now()
         
         logger.info(f"Creating user: {email}")
         
         try:
-            user_id = self.db.execute_query(
-                query, 
-                (email, password, fullname, now, now), 
-                fetch=False  
-            )
+            user_id = self.db.execute(statements.USER_INSERT, (email, password, fullname, now, now))
             
             if user_id:
                 logger.info(f"✓ User created with ID: {user_id}")
@@ -64,47 +65,68 @@ class UserModel:
             return None
     
     def get_user_by_id(self, user_id: int) -> Optional[User]:
-        query = "SELECT * FROM users WHERE id = %s"
-        
         try:
-            result = self.db.execute_query(query, (user_id,), fetch=True)
-            
-            if result and len(result) > 0:
-                row = result[0]
-                return User(
-                    id=row['id'],
-                    email=row['email'],
-                    password=row['password'],
-                    fullname=row.get('fullname', ''),
-                    created_at=row['created_at'],
-                    updated_at=row['updated_at']
-                )
+            return self._to_user(self.db.fetch_one(statements.USER_BY_ID, (user_id,)))
         except Exception as e:
             logger.error(f"Error getting user by id {user_id}: {e}")
         
         return None
     
+    def get_cached_user(self, user_id: int) -> Optional[User]:
+        """
+        Như get_user_by_id nhưng đọc qua cache dùng chung giữa các worker, cho
+        bước xác thực của mọi request. update_user xóa entry sau khi commit.
+        """
+        ttl = getattr(getattr(self.db, 'config', None), 'AUTH_USER_CACHE_SECONDS', 60)
+        if ttl <= 0:
+            return self.get_user_by_id(user_id)
+        cached = shared.get_json(self._cache_key(user_id))
+        if cached is not None:
+            return User(**dict(cached, created_at=datetime.fromisoformat(cached['created_at']),
+                               updated_at=datetime.fromisoformat(cached['updated_at'])))
+
+        user = self.get_user_by_id(user_id)
+        if user is not None:
+            shared.set_json(self._cache_key(user_id), dict(
+                vars(user), created_at=user.created_at.isoformat(), updated_at=user.updated_at.isoformat()), ttl)
+        return user
+
+    def update_user(self, user_id: int, update_data: Dict) -> bool:
+        fields = tuple(field for field in self.UPDATABLE_FIELDS if field in update_data)
+        if not fields:
+            return False
+        params = tuple(update_data[field] for field in fields) + (user_id,)
+        updated = self.db.execute(statements.user_update(fields), params)
+        if not updated:
+            logger.error(f"Error updating user {user_id}")
+            return False
+        self.db.after_commit(lambda: shared.delete(self._cache_key(user_id)))
+        return True
+
+    @staticmethod
+    def _cache_key(user_id: int) -> str:
+        return f'user:{user_id}'
+
     def get_user_by_email(self, email: str) -> Optional[User]:
-        query = "SELECT * FROM users WHERE email = %s"
-        
         try:
-            result = self.db.execute_query(query, (email,), fetch=True)
-            
-            if result and len(result) > 0:
-                row = result[0]
-                return User(
-                    id=row['id'],
-                    email=row['email'],
-                    password=row['password'],
-                    fullname=row.get('fullname', ''),
-                    created_at=row['created_at'],
-                    updated_at=row['updated_at']
-                )
+            return self._to_user(self.db.fetch_one(statements.USER_BY_EMAIL, (email,)))
         except Exception as e:
             logger.error(f"Error getting user by email {email}: {e}")
         
         return None
 
+    def _to_user(self, row) -> Optional[User]:
+        if row is None:
+            return None
+        return User(
+            id=row['id'],
+            email=row['email'],
+            password=row['password'],
+            fullname=row.get('fullname', ''),
+            created_at=row['created_at'],
+            updated_at=row['updated_at']
+        )
+
 
 class ScheduleModel:
     def __init__(self, db_manager):
@@ -132,13 +154,6 @@ class ScheduleModel:
             else:
                 end_time = None
             
-            query = """
-            INSERT INTO schedules 
-            (user_id, event, description, start_time, end_time, location, 
-             reminder_minutes, category, priority, status, created_at, updated_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
-            """
-            
             params = (
                 user_id,
                 event,
@@ -152,9 +167,17 @@ class ScheduleModel:
                 status
             )
             
-            result = self.db.execute_query(query, params)
+            result = self.db.execute(statements.SCHEDULE_INSERT, params)
+            if result is None:
+                # INSERT lỗi: không có dòng mới nên không đổi bộ đếm thống kê/phiên bản lịch
+                schedule_id = self._generate_temporary_id()
+                logger.error(f"Schedule insert failed, using fallback ID: {schedule_id}")
+                return schedule_id
             
-            if hasattr(result, 'lastrowid') and result.lastrowid:
+            if isinstance(result, int) and result:
+                # INSERT trả về lastrowid từ gói OK của server
+                schedule_id = result
+            elif hasattr(result, 'lastrowid') and result.lastrowid:
                 schedule_id = result.lastrowid
             else:
                 id_query = "SELECT LAST_INSERT_ID() as id"
@@ -164,6 +187,12 @@ class ScheduleModel:
                 else:
                     schedule_id = self._generate_temporary_id()
             
+            self._on_schedule_changed(user_id, None, {
+                'start_time': start_time,
+                'category': category,
+                'priority': priority,
+                'status': status
+            }, months=[start_time])
             logger.info(f"Schedule created with ID: {schedule_id}")
             return schedule_id
                     
@@ -173,72 +202,77 @@ class ScheduleModel:
             logger.info(f"Using fallback ID after error: {schedule_id}")
             return schedule_id
     
-    def update_schedule(self, schedule_id: int, update_data: Dict) -> bool:
-      
+    def update_schedule(self, schedule_id: int, update_data: Dict, user_id: Optional[int] = None) -> bool:
+        """Khi có user_id, chỉ cập nhật lịch trình thuộc user đó; False nếu không có dòng nào khớp."""
+        if user_id is not None:
+            try:
+                return self.update_owned_schedule(schedule_id, user_id, update_data) is not None
+            except Exception as e:
+                logger.error(f"Error updating schedule {schedule_id}: {e}")
+                return False
+
         try:
-            set_clauses = []
-            params = []
-            
-            for field, value in update_data.items():
-                if field in ['start_time', 'end_time'] and isinstance(value, str):
-                    value = datetime.fromisoformat(value.replace('Z', '+00:00'))
-                
-                set_clauses.append(f"{field} = %s")
-                params.append(value)
-            
+            fields, params = self._build_set_clause(update_data)
             params.append(schedule_id)
-            set_clause = ", ".join(set_clauses)
-            
-            query = f"UPDATE schedules SET {set_clause}, updated_at = NOW() WHERE id = %s"
-            
-            self.db.execute_query(query, params)
+            self.db.execute(statements.schedule_update(fields, owned=False), params)
             logger.info(f"Schedule {schedule_id} updated successfully")
             return True
         except Exception as e:
             logger.error(f"Error updating schedule {schedule_id}: {e}")
             return False
+
+    def update_owned_schedule(self, schedule_id: int, user_id: int, update_data: Dict) -> Optional[Dict]:
+        """
+        UPDATE ... WHERE id AND user_id rồi đọc lại dòng trong cùng transaction.
+
+        Returns:
+            Lịch trình sau khi cập nhật, hoặc None nếu không tồn tại / không thuộc user.
+            Lỗi DB được ném ra dưới dạng RuntimeError.
+        """
+        fields, params = self._build_set_clause(update_data)
+        params.extend([schedule_id, user_id])
+
+        deferred = self._defer_stats(user_id)
+        with self.db.transaction(savepoint=False):
+            # Đọc dòng cũ (nếu cần cho thống kê) và ghi trên cùng một kết nối
+            old_row = None if deferred else self._get_stat_row(schedule_id, user_id)
+            result = self.db.execute_returning(statements.schedule_update(fields), params,
+                                               statements.SCHEDULE_BY_ID_FOR_USER, (schedule_id, user_id))
+        if result is None:
+            raise RuntimeError(f"Cannot update schedule {schedule_id}")
+
+        rowcount, row = result
+        if not rowcount or row is None:
+            return None
+
+        self._on_schedule_changed(user_id, old_row, row if old_row else None, refresh_stats=deferred,
+                                  months=[row.get('start_time')])
+        logger.info(f"Schedule {schedule_id} updated successfully")
+        return self._format_schedule_row(row)
+
+    def _build_set_clause(self, update_data: Dict):
+        """(tuple tên cột, tham số) để lấy Statement UPDATE đã cache qua statements.schedule_update."""
+        fields = []
+        params = []
+
+        for field, value in update_data.items():
+            if field in ['start_time', 'end_time'] and isinstance(value, str):
+                value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+            fields.append(field)
+            params.append(value)
+
+        return tuple(fields), params
     
     def get_user_schedules(self, user_id: int, target_date: Optional[str] = None) -> List[Dict]:
        
         try:
             if target_date:
-                query = """
-                SELECT * FROM schedules 
-                WHERE user_id = %s AND DATE(start_time) = %s 
-                ORDER BY start_time ASC
-                """
-                params = (user_id, target_date)
+                result = self.db.fetch_all(statements.SCHEDULES_FOR_USER_ON_DATE, (user_id, target_date))
             else:
-                query = """
-                SELECT * FROM schedules 
-                WHERE user_id = %s 
-                ORDER BY start_time DESC
-                """
-                params = (user_id,)
-            
-            result = self.db.execute_query(query, params, fetch=True)
+                result = self.db.fetch_all(statements.SCHEDULES_FOR_USER, (user_id,))
             
-            schedules = []
-            if result:
-                for row in result:
-                    schedule = {
-                        'id': row['id'],
-                        'user_id': row['user_id'],
-                        'event': row['event'],
-                        'description': row.get('description', ''),
-                        'start_time': row['start_time'].isoformat() if row['start_time'] else None,
-                        'end_time': row['end_time'].isoformat() if row['end_time'] else None,
-                        'location': row.get('location'),
-                        'reminder_minutes': row.get('reminder_minutes'),
-                        'category': row.get('category', 'general'),
-                        'priority': row.get('priority', 'medium'),
-                        'status': row.get('status', 'scheduled'),
-                        'created_at': row['created_at'].isoformat() if row['created_at'] else None,
-                        'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None
-                    }
-                    schedules.append(schedule)
-            
-            return schedules
+            return [self._format_schedule_row(row) for row in result or []]
         except Exception as e:
             logger.error(f"Error getting user schedules: {e}")
             return []
@@ -246,27 +280,8 @@ class ScheduleModel:
     def get_schedule_by_id(self, schedule_id: int) -> Optional[Dict]:
         
         try:
-            query = "SELECT * FROM schedules WHERE id = %s"
-            result = self.db.execute_query(query, (schedule_id,), fetch=True)
-            
-            if result and len(result) > 0:
-                row = result[0]
-                return {
-                    'id': row['id'],
-                    'user_id': row['user_id'],
-                    'event': row['event'],
-                    'description': row.get('description', ''),
-                    'start_time': row['start_time'].isoformat() if row['start_time'] else None,
-                    'end_time': row['end_time'].isoformat() if row['end_time'] else None,
-                    'location': row.get('location'),
-                    'reminder_minutes': row.get('reminder_minutes'),
-                    'category': row.get('category', 'general'),
-                    'priority': row.get('priority', 'medium'),
-                    'status': row.get('status', 'scheduled'),
-                    'created_at': row['created_at'].isoformat() if row['created_at'] else None,
-                    'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None
-                }
-            return None
+            row = self.db.fetch_one(statements.SCHEDULE_BY_ID, (schedule_id,))
+            return self._format_schedule_row(row) if row else None
         except Exception as e:
             logger.error(f"Error getting schedule by ID: {e}")
             return None
@@ -274,128 +289,298 @@ class ScheduleModel:
     def get_schedule_by_id_with_user(self, schedule_id: int, user_id: int) -> Optional[Dict]:
        
         try:
-            query = "SELECT * FROM schedules WHERE id = %s AND user_id = %s"
-            result = self.db.execute_query(query, (schedule_id, user_id), fetch=True)
-            
-            if result and len(result) > 0:
-                row = result[0]
-                return {
-                    'id': row['id'],
-                    'user_id': row['user_id'],
-                    'event': row['event'],
-                    'description': row.get('description', ''),
-                    'start_time': row['start_time'].isoformat() if row['start_time'] else None,
-                    'end_time': row['end_time'].isoformat() if row['end_time'] else None,
-                    'location': row.get('location'),
-                    'reminder_minutes': row.get('reminder_minutes'),
-                    'category': row.get('category', 'general'),
-                    'priority': row.get('priority', 'medium'),
-                    'status': row.get('status', 'scheduled'),
-                    'created_at': row['created_at'].isoformat() if row['created_at'] else None,
-                    'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None
-                }
-            return None
+            row = self.db.fetch_one(statements.SCHEDULE_BY_ID_FOR_USER, (schedule_id, user_id))
+            return self._format_schedule_row(row) if row else None
         except Exception as e:
             logger.error(f"Error getting schedule by ID with user: {e}")
             return None
+
+    def iter_user_schedules(self, user_id: int, target_date: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Như get_user_schedules nhưng đọc dần từ DB (DatabaseManager.iter_rows),
+        dùng cho response stream. Lỗi DB được ném ra thay vì trả về list rỗng.
+        """
+        if target_date:
+            rows = self.db.iter_rows(statements.SCHEDULE_PAGES_FOR_USER_ON_DATE, (user_id, target_date))
+        else:
+            rows = self.db.iter_rows(statements.SCHEDULE_PAGES_FOR_USER, (user_id,))
+        return self._iter_formatted(rows)
+
+    def iter_schedules_in_range(self, user_id: int, start_date: str, end_date: str) -> Iterator[Dict]:
+        """Lịch trình có ngày bắt đầu trong [start_date, end_date], đọc dần từ DB."""
+        rows = self.db.iter_rows(statements.SCHEDULE_PAGES_IN_DATE_RANGE, (user_id, start_date, end_date))
+        return self._iter_formatted(rows)
+
+    def _iter_formatted(self, rows) -> Iterator[Dict]:
+        # close() lan xuống iter_rows để dừng đọc các trang còn lại khi client ngắt giữa chừng
+        with closing(rows):
+            for row in rows:
+                yield self._format_schedule_row(row)
+
+    def iter_export_rows(self, user_id: int) -> Iterator:
+        """Các dòng (Record) để xuất file, theo thứ tự thời gian, đọc dần từ DB."""
+        return self.db.iter_rows(statements.SCHEDULE_EXPORT_PAGES, (user_id,))
+
+    def create_schedules_bulk(self, user_id: int, rows: List[tuple]) -> int:
+        """
+        Thêm nhiều lịch trình bằng một câu INSERT multi-row trong một transaction.
+
+        rows: (event, description, start_time, end_time, location, reminder_minutes,
+        category, priority, status) theo thứ tự của statements.SCHEDULE_INSERT.
+        Lỗi DB được ném ra dưới dạng RuntimeError.
+        """
+        if not rows:
+            return 0
+        try:
+            with self.db.transaction(savepoint=False) as uow:
+                inserted = uow.executemany(statements.SCHEDULE_INSERT, [(user_id,) + row for row in rows])
+                self.db.after_commit(lambda: self._apply_bulk_change(user_id))
+        except Exception as e:
+            raise RuntimeError(f"Cannot import schedules: {e}") from e
+        return inserted
+
+    def _apply_bulk_change(self, user_id: int):
+        schedule_versions.bump(user_id)
+        if not schedule_stats.is_loaded(user_id):
+            return
+        # Áp từng dòng vào bộ đếm không đáng với hàng nghìn dòng; nạp lại một lần
+        if job_queue.running:
+            job_queue.enqueue('schedule.refresh_stats', {'user_id': user_id}, dedupe_key=f'stats:{user_id}')
+        else:
+            schedule_stats.forget(user_id)
+
+    def _format_schedule_row(self, row: Dict) -> Dict:
+        return {
+            'id': row['id'],
+            'user_id': row['user_id'],
+            'event': row['event'],
+            'description': row.get('description', ''),
+            'start_time': row['start_time'].isoformat() if row['start_time'] else None,
+            'end_time': row['end_time'].isoformat() if row['end_time'] else None,
+            'location': row.get('location'),
+            'reminder_minutes': row.get('reminder_minutes'),
+            'category': row.get('category', 'general'),
+            'priority': row.get('priority', 'medium'),
+            'status': row.get('status', 'scheduled'),
+            'created_at': row['created_at'].isoformat() if row['created_at'] else None,
+            'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None
+        }
     
     def get_upcoming_schedules(self, user_id: int, hours: int = 24) -> List[Dict]:
        
         try:
-            query = """
-            SELECT * FROM schedules 
-            WHERE user_id = %s 
-                AND start_time >= NOW()
-                AND start_time <= DATE_ADD(NOW(), INTERVAL %s HOUR)
-                AND status != 'cancelled'
-            ORDER BY start_time ASC
-            """
-            
-            params = (user_id, hours)
-            result = self.db.execute_query(query, params, fetch=True)
-            
-            schedules = []
-            if result:
-                for row in result:
-                    schedule = {
-                        'id': row['id'],
-                        'user_id': row['user_id'],
-                        'event': row['event'],
-                        'description': row.get('description', ''),
-                        'start_time': row['start_time'].isoformat() if row['start_time'] else None,
-                        'end_time': row['end_time'].isoformat() if row['end_time'] else None,
-                        'location': row.get('location'),
-                        'reminder_minutes': row.get('reminder_minutes'),
-                        'category': row.get('category', 'general'),
-                        'priority': row.get('priority', 'medium'),
-                        'status': row.get('status', 'scheduled'),
-                        'created_at': row['created_at'].isoformat() if row['created_at'] else None,
-                        'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None
-                    }
-                    schedules.append(schedule)
+            result = self.db.fetch_all(statements.SCHEDULES_UPCOMING, (user_id, hours))
             
-            return schedules
+            return [self._format_schedule_row(row) for row in result or []]
         except Exception as e:
             logger.error(f"Error getting upcoming schedules: {e}")
             return []
     
-    def delete_schedule(self, schedule_id: int) -> bool:
-       
+    def delete_schedule(self, schedule_id: int, user_id: Optional[int] = None) -> bool:
+        """Khi có user_id, chỉ xóa lịch trình thuộc user đó; False nếu không có dòng nào khớp."""
+        if user_id is not None:
+            try:
+                return self.delete_owned_schedule(schedule_id, user_id) is not None
+            except Exception as e:
+                logger.error(f"Error deleting schedule {schedule_id}: {e}")
+                return False
+
         try:
-            query = "DELETE FROM schedules WHERE id = %s"
-            self.db.execute_query(query, (schedule_id,))
+            self.db.execute(statements.SCHEDULE_DELETE, (schedule_id,))
             logger.info(f"Schedule {schedule_id} deleted successfully")
             return True
         except Exception as e:
             logger.error(f"Error deleting schedule {schedule_id}: {e}")
             return False
+
+    def delete_owned_schedule(self, schedule_id: int, user_id: int) -> Optional[Dict]:
+        """
+        Khóa và đọc dòng rồi DELETE ... WHERE id AND user_id trong cùng transaction.
+
+        Returns:
+            Lịch trình vừa xóa, hoặc None nếu không tồn tại / không thuộc user.
+            Lỗi DB được ném ra dưới dạng RuntimeError.
+        """
+        result = self.db.execute_returning(statements.SCHEDULE_DELETE_FOR_USER, (schedule_id, user_id),
+                                           statements.SCHEDULE_LOCK_FOR_USER, (schedule_id, user_id),
+                                           select_first=True)
+        if result is None:
+            raise RuntimeError(f"Cannot delete schedule {schedule_id}")
+
+        rowcount, row = result
+        if not rowcount or row is None:
+            return None
+
+        # Dòng đã xóa có đủ các cột thống kê nên không cần truy vấn thêm
+        self._on_schedule_changed(user_id, row, None)
+        logger.info(f"Schedule {schedule_id} deleted successfully")
+        return self._format_schedule_row(row)
     
     def get_schedules_by_cursor(self, user_id: int, date: str, limit: int = 10, direction: str = 'older') -> List[Dict]:
       
         try:
             if direction == 'older':
-                query = """
-                SELECT * FROM schedules 
-                WHERE user_id = %s AND DATE(start_time) = %s 
-                ORDER BY id DESC 
-                LIMIT %s
-                """
+                statement = statements.SCHEDULES_CURSOR_OLDER
             else: 
-                query = """
-                SELECT * FROM schedules 
-                WHERE user_id = %s AND DATE(start_time) = %s 
-                ORDER BY id ASC 
-                LIMIT %s
-                """
+                statement = statements.SCHEDULES_CURSOR_NEWER
             
-            params = (user_id, date, limit)
-            result = self.db.execute_query(query, params, fetch=True)
+            result = self.db.fetch_all(statement, (user_id, date, limit))
             
+            return [self._format_schedule_row(row) for row in result or []]
+        except Exception as e:
+            logger.error(f"Error getting schedules by cursor: {e}")
+            return []
+    
+    def get_calendar_schedules(self, user_id: int, range_start: datetime,
+                               range_end: datetime) -> Optional[List[Dict]]:
+        """
+        Lấy các trường mà lưới lịch tháng hiển thị trong khoảng [range_start, range_end);
+        None nếu DB lỗi (khác với tháng không có lịch nào).
+
+        So sánh trực tiếp trên start_time (không bọc DATE()) để MySQL dùng được
+        index (user_id, start_time).
+        """
+        try:
+            result = self.db.fetch_all(statements.CALENDAR_ITEMS, (user_id, range_start, range_end))
+            if result is None:
+                return None
+
             schedules = []
             if result:
                 for row in result:
-                    schedule = {
+                    schedules.append({
                         'id': row['id'],
-                        'user_id': row['user_id'],
                         'event': row['event'],
-                        'description': row.get('description', ''),
                         'start_time': row['start_time'].isoformat() if row['start_time'] else None,
                         'end_time': row['end_time'].isoformat() if row['end_time'] else None,
                         'location': row.get('location'),
                         'reminder_minutes': row.get('reminder_minutes'),
                         'category': row.get('category', 'general'),
                         'priority': row.get('priority', 'medium'),
-                        'status': row.get('status', 'scheduled'),
-                        'created_at': row['created_at'].isoformat() if row['created_at'] else None,
-                        'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None
-                    }
-                    schedules.append(schedule)
-            
+                        'status': row.get('status', 'scheduled')
+                    })
+
             return schedules
         except Exception as e:
-            logger.error(f"Error getting schedules by cursor: {e}")
-            return []
-    
+            logger.error(f"Error getting calendar schedules: {e}")
+            return None
+
+    def get_calendar_day_summary(self, user_id: int, range_start: datetime,
+                                 range_end: datetime) -> Optional[List[Dict]]:
+        """Tổng hợp theo ngày: số lịch trình và độ ưu tiên cao nhất; None nếu DB lỗi."""
+        try:
+            result = self.db.fetch_all(statements.CALENDAR_DAYS, (user_id, range_start, range_end))
+            if result is None:
+                return None
+
+            priorities = {3: 'high', 2: 'medium', 1: 'low'}
+            days = []
+            if result:
+                for row in result:
+                    days.append({
+                        'date': row['day'].isoformat() if hasattr(row['day'], 'isoformat') else str(row['day']),
+                        'count': int(row['count']),
+                        'highest_priority': priorities.get(int(row['priority_rank'] or 1), 'low')
+                    })
+
+            return days
+        except Exception as e:
+            logger.error(f"Error getting calendar day summary: {e}")
+            return None
+
+    def get_calendar_month(self, user_id: int, month_start: datetime, include_items: bool = True,
+                           include_summary: bool = False) -> Optional[Dict]:
+        """Payload lịch tháng; None nếu một phần không đọc được (không được cache kết quả này)."""
+        month_start = month_start.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        if month_start.month == 12:
+            month_end = month_start.replace(year=month_start.year + 1, month=1)
+        else:
+            month_end = month_start.replace(month=month_start.month + 1)
+
+        payload = {
+            'success': True,
+            'month': month_start.strftime('%Y-%m')
+        }
+
+        if include_items:
+            schedules = self.get_calendar_schedules(user_id, month_start, month_end)
+            if schedules is None:
+                return None
+            payload['schedules'] = schedules
+            payload['count'] = len(schedules)
+
+        if include_summary:
+            days = self.get_calendar_day_summary(user_id, month_start, month_end)
+            if days is None:
+                return None
+            payload['days'] = days
+
+        return payload
+
+    def get_schedule_stats(self, user_id: int, day_from: Optional[str] = None, day_to: Optional[str] = None) -> Optional[Dict]:
+        """Thống kê theo ngày/danh mục/ưu tiên/trạng thái từ bộ đếm trong bộ nhớ."""
+        if not schedule_stats.is_loaded(user_id):
+            # Bộ đếm được cộng dồn từ đây nên phải nạp từ primary, không từ replica đang trễ
+            with self.db.read_primary():
+                rows = self.get_schedule_stat_rows(user_id)
+            if rows is None:
+                return None
+            schedule_stats.load(user_id, rows)
+        return schedule_stats.get(user_id, day_from, day_to)
+
+    def get_schedule_stat_rows(self, user_id: int) -> Optional[List[Dict]]:
+        """Tính lại toàn bộ thống kê của user bằng một truy vấn GROUP BY."""
+        try:
+            return self.db.fetch_all(statements.SCHEDULE_STAT_ROWS, (user_id,))
+        except Exception as e:
+            logger.error(f"Error computing schedule stats: {e}")
+            return None
+
+    def _get_stat_row(self, schedule_id: int, user_id: Optional[int]) -> Optional[Dict]:
+        # Chỉ đọc dòng cũ khi bộ đếm của user đang được theo dõi
+        if user_id is None or not schedule_stats.is_loaded(user_id):
+            return None
+        return self.db.fetch_one(statements.SCHEDULE_STAT_ROW_LOCK, (schedule_id, user_id))
+
+    def refresh_schedule_stats(self, user_id: int):
+        """Nạp lại bộ đếm của user từ DB (chỉ khi bộ đếm đang được theo dõi)."""
+        if not schedule_stats.is_loaded(user_id):
+            return
+        rows = self.get_schedule_stat_rows(user_id)
+        if rows is None:
+            raise RuntimeError(f"Cannot load schedule stats for user {user_id}")
+        schedule_stats.load(user_id, rows)
+
+    def _defer_stats(self, user_id: Optional[int]) -> bool:
+        # Khi có job queue, bỏ truy vấn đọc dòng cũ và để job nạp lại bộ đếm sau khi ghi
+        return user_id is not None and job_queue.running and schedule_stats.is_loaded(user_id)
+
+    def _on_schedule_changed(self, user_id: int, old_row: Optional[Dict], new_row: Optional[Dict],
+                             refresh_stats: bool = False, months: Optional[List] = None):
+        # Chạy sau commit (ngay lập tức nếu không nằm trong transaction) để cache
+        # và job nền không bao giờ thấy dữ liệu chưa commit hoặc đã bị rollback
+        self.db.after_commit(lambda: self._apply_schedule_change(user_id, old_row, new_row, refresh_stats, months))
+
+    def _apply_schedule_change(self, user_id: int, old_row: Optional[Dict], new_row: Optional[Dict],
+                               refresh_stats: bool, months: Optional[List]):
+        schedule_versions.bump(user_id)
+        if refresh_stats:
+            job_queue.enqueue('schedule.refresh_stats', {'user_id': user_id}, dedupe_key=f'stats:{user_id}')
+        elif old_row or new_row:
+            schedule_stats.apply(user_id, old_row, new_row)
+
+        if job_queue.running:
+            warm = {datetime.now().strftime('%Y-%m')}
+            for value in months or []:
+                if isinstance(value, str):
+                    value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+                if value:
+                    warm.add(value.strftime('%Y-%m'))
+            for month in warm:
+                # Trễ một chút để gộp nhiều thao tác ghi liên tiếp thành một lần làm nóng
+                job_queue.enqueue('calendar.warm', {'user_id': user_id, 'month': month}, delay=0.5,
+                                  dedupe_key=f'calendar:{user_id}:{month}')
+
     def _generate_temporary_id(self) -> int:
         """Tạo ID tạm thời"""
         return int(datetime.now().timestamp() % 1000000) + 1
@@ -403,39 +588,12 @@ class ScheduleModel:
     def search_schedules(self, user_id: int, search_term: str) -> List[Dict]:
        
         try:
-            query = """
-            SELECT * FROM schedules 
-            WHERE user_id = %s 
-                AND (event LIKE %s OR description LIKE %s OR location LIKE %s)
-            ORDER BY start_time DESC
-            """
-            
             search_pattern = f"%{search_term}%"
             params = (user_id, search_pattern, search_pattern, search_pattern)
             
-            result = self.db.execute_query(query, params, fetch=True)
+            result = self.db.fetch_all(statements.SCHEDULES_SEARCH, params)
             
-            schedules = []
-            if result:
-                for row in result:
-                    schedule = {
-                        'id': row['id'],
-                        'user_id': row['user_id'],
-                        'event': row['event'],
-                        'description': row.get('description', ''),
-                        'start_time': row['start_time'].isoformat() if row['start_time'] else None,
-                        'end_time': row['end_time'].isoformat() if row['end_time'] else None,
-                        'location': row.get('location'),
-                        'reminder_minutes': row.get('reminder_minutes'),
-                        'category': row.get('category', 'general'),
-                        'priority': row.get('priority', 'medium'),
-                        'status': row.get('status', 'scheduled'),
-                        'created_at': row['created_at'].isoformat() if row['created_at'] else None,
-                        'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None
-                    }
-                    schedules.append(schedule)
-            
-            return schedules
+            return [self._format_schedule_row(row) for row in result or []]
         except Exception as e:
             logger.error(f"Error searching schedules: {e}")
             return []
\ No newline at end of file
@@ -0,0 +1,164 @@
+"""
+Băm và kiểm tra mật khẩu bằng scrypt (hashlib.scrypt) trên một pool giới hạn.
+
+Hash cũ là SHA-256 hex không salt; hash mới có dạng
+"scrypt$<n>$<r>$<p>$<salt base64>$<hash base64>" nên tham số cost đi kèm
+từng hash: tăng PASSWORD_SCRYPT_N không làm hỏng hash đã lưu, và verify()
+báo needs_rehash cho hash cũ hoặc hash có cost khác cấu hình hiện tại để
+login băm lại.
+
+Mỗi lần scrypt tốn vài chục ms CPU và 128 * n * r byte bộ nhớ (16 MiB với
+mặc định). Chạy thẳng trong thread request thì một loạt login đồng thời chiếm
+hết CPU và bộ nhớ của worker; ở đây mọi lần băm đi qua một pool
+PASSWORD_HASH_WORKERS thread (OpenSSL nhả GIL khi chạy scrypt, các thread
+request khác vẫn chạy) hoặc process (PASSWORD_HASH_POOL=process), và tối đa
+PASSWORD_HASH_MAX_PENDING lần băm chờ cùng lúc. Hàng đợi đầy thì
+PasswordHasherBusy: route trả 503 thay vì dồn request.
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+password_hash_duration = metrics.registry.histogram(
+    'password_hash_duration_seconds', 'Thời gian băm/kiểm tra mật khẩu, gồm cả thời gian chờ pool', ('op',))
+password_hash_rejected = metrics.registry.counter(
+    'password_hash_rejected_total', 'Lần băm mật khẩu bị từ chối vì pool đã đầy', ('op',))
+
+_SCHEME = 'scrypt'
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # maxmem mặc định của OpenSSL (32 MiB) không đủ khi n * r lớn
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                          maxmem=128 * r * (n + p + 2) + (1 << 20), dklen=32)
+
+
+def _encode(raw: bytes) -> str:
+    return base64.b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode(text: str) -> bytes:
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def _hash(password: str, n: int, r: int, p: int) -> str:
+    salt = secrets.token_bytes(16)
+    return f'{_SCHEME}${n}${r}${p}${_encode(salt)}${_encode(_scrypt(password, salt, n, r, p))}'
+
+
+def _verify(password: str, hashed: str) -> Tuple[bool, Optional[Tuple[int, int, int]]]:
+    """(đúng?, tham số scrypt của hash hoặc None nếu là SHA-256 cũ)."""
+    if hashed.startswith(_SCHEME + '$'):
+        _, n, r, p, salt, expected = hashed.split('$')
+        params = (int(n), int(r), int(p))
+        return hmac.compare_digest(_scrypt(password, _decode(salt), *params), _decode(expected)), params
+    legacy = hashlib.sha256(password.encode('utf-8')).hexdigest()
+    return hmac.compare_digest(legacy, hashed), None
+
+
+class PasswordHasher:
+    def __init__(self, n: int = 16384, r: int = 8, p: int = 1, workers: int = 2,
+                 max_pending: int = 32, pool: str = 'thread', wait_seconds: float = 5.0):
+        self.n, self.r, self.p = n, r, p
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pool = pool
+        self.wait_seconds = wait_seconds
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor: Optional[Executor] = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        # Để login với email không tồn tại tốn thời gian như email có thật
+        self._dummy_hash = None
+
+    def hash(self, password: str) -> str:
+        return self._run('hash', _hash, password, self.n, self.r, self.p)
+
+    def verify(self, password: str, hashed: str) -> Tuple[bool, bool]:
+        """(đúng?, cần băm lại với cấu hình hiện tại?)."""
+        if not hashed:
+            return False, False
+        try:
+            ok, params = self._run('verify', _verify, password, hashed)
+        except ValueError as e:
+            logger.error(f"Malformed password hash: {e}")
+            return False, False
+        return ok, ok and params != (self.n, self.r, self.p)
+
+    def burn(self, password: str):
+        """Chạy một lần verify vô ích khi không tìm thấy user."""
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash('')
+        self.verify(password, self._dummy_hash)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True)
+
+    def _run(self, op: str, func, *args):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.wait_seconds):
+            password_hash_rejected.inc(op)
+            raise PasswordHasherBusy(f'{self.max_pending} password hashes already pending')
+        try:
+            return self._get_executor().submit(func, *args).result()
+        finally:
+            self._slots.release()
+            password_hash_duration.observe(op, value=time.perf_counter() - started)
+
+    def _get_executor(self) -> Executor:
+        # Pool tạo ở lần dùng đầu tiên trong mỗi process: thread/process con không sống qua fork
+        if self._executor is not None and self._executor_pid == os.getpid():
+            return self._executor
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                if self.pool == 'process':
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='password-hash')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+
+hasher = PasswordHasher()
+
+
+def configure(config):
+    """Đọc PASSWORD_* từ config; gọi lúc khởi động."""
+    hasher.shutdown()
+    hasher.n = getattr(config, 'PASSWORD_SCRYPT_N', 16384)
+    hasher.r = getattr(config, 'PASSWORD_SCRYPT_R', 8)
+    hasher.p = getattr(config, 'PASSWORD_SCRYPT_P', 1)
+    hasher.workers = getattr(config, 'PASSWORD_HASH_WORKERS', 2)
+    hasher.max_pending = getattr(config, 'PASSWORD_HASH_MAX_PENDING', 32)
+    hasher.pool = getattr(config, 'PASSWORD_HASH_POOL', 'thread')
+    hasher._slots = threading.BoundedSemaphore(hasher.max_pending)
+    hasher._dummy_hash = None
+    logger.info(f"Password hashing: scrypt n={hasher.n} r={hasher.r} p={hasher.p}, "
+                f"{hasher.workers} {hasher.pool} workers")
+
+
+def hash_password(password: str) -> str:
+    return hasher.hash(password)
+
+
+def verify_password(password: str, hashed: str) -> Tuple[bool, bool]:
+    return hasher.verify(password, hashed)
@@ -0,0 +1,236 @@
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Các nhóm thời gian được đo riêng; phần còn lại tính là thời gian Python
+CATEGORIES = ('auth', 'db', 'ollama_http', 'json')
+
+_local = threading.local()
+
+
+class RequestProfile:
+    def __init__(self, route: str, method: str, reason: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.route = route
+        self.method = method
+        self.reason = reason
+        self.thread_id = threading.get_ident()
+        self.started = time.perf_counter()
+        self.timings = dict.fromkeys(CATEGORIES, 0.0)
+        self.stacks = Counter()
+        self.samples = 0
+
+    def summary(self, total: float, status: int) -> Dict:
+        measured = sum(self.timings.values())
+        breakdown = {name: round(value * 1000, 2) for name, value in self.timings.items()}
+        breakdown['python'] = round(max(total - measured, 0.0) * 1000, 2)
+        return {
+            'id': self.id,
+            'route': self.route,
+            'method': self.method,
+            'status': status,
+            'reason': self.reason,
+            'duration_ms': round(total * 1000, 2),
+            'breakdown_ms': breakdown,
+            'samples': self.samples,
+            'timestamp': datetime.now().isoformat()
+        }
+
+
+def current() -> Optional[RequestProfile]:
+    return getattr(_local, 'profile', None)
+
+
+def add_time(category: str, seconds: float):
+    """Cộng dồn thời gian cho request đang được profile; gần như không tốn gì khi không profile."""
+    profile = getattr(_local, 'profile', None)
+    if profile is not None:
+        profile.timings[category] = profile.timings.get(category, 0.0) + seconds
+
+
+class timed:
+    """
+    Context manager đo một đoạn code và cộng vào nhóm thời gian tương ứng.
+    Thời gian của các nhóm lồng bên trong (VD: truy vấn DB bên trong một nhóm khác)
+    được trừ ra để các nhóm không bị tính trùng.
+    """
+
+    __slots__ = ('category', 'started', 'inner_before')
+
+    def __init__(self, category: str):
+        self.category = category
+
+    def __enter__(self):
+        profile = getattr(_local, 'profile', None)
+        self.inner_before = sum(profile.timings.values()) if profile is not None else 0.0
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        profile = getattr(_local, 'profile', None)
+        if profile is not None:
+            inner = sum(profile.timings.values()) - self.inner_before
+            add_time(self.category, max(elapsed - inner, 0.0))
+        return False
+
+
+def _fold_stack(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', '?')
+        names.append(f"{module}:{code.co_name}")
+        frame = frame.f_back
+    names.reverse()
+    return ';'.join(names)
+
+
+class SamplingProfiler:
+    """
+    Profiler lấy mẫu: một thread nền đọc stack của các thread đang phục vụ
+    request được chọn theo chu kỳ interval. Request không được chọn không
+    chịu thêm chi phí nào.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, interval_ms: float = 5, buffer_size: int = 50, routes=None):
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000.0
+        self.routes = set(routes or ())
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._results = deque(maxlen=buffer_size)
+        self._stacks = {}
+        self._thread = None
+
+    def should_sample(self, route: Optional[str]) -> bool:
+        if self.sample_rate <= 0 or route not in self.routes:
+            return False
+        return random.random() < self.sample_rate
+
+    def start(self, route: str, method: str, reason: str) -> RequestProfile:
+        profile = RequestProfile(route, method, reason)
+        _local.profile = profile
+        with self._lock:
+            self._active[profile.thread_id] = profile
+        self._ensure_thread()
+        self._wakeup.set()
+        return profile
+
+    def finish(self, status: int) -> Optional[Dict]:
+        profile = getattr(_local, 'profile', None)
+        if profile is None:
+            return None
+        _local.profile = None
+        with self._lock:
+            self._active.pop(profile.thread_id, None)
+
+        summary = profile.summary(time.perf_counter() - profile.started, status)
+        with self._lock:
+            if len(self._results) == self._results.maxlen:
+                evicted = self._results[0]
+                self._stacks.pop(evicted['id'], None)
+            self._results.append(summary)
+            self._stacks[profile.id] = profile.stacks
+        return summary
+
+    def results(self, limit: int = None):
+        with self._lock:
+            results = list(self._results)
+        results.reverse()
+        return results[:limit] if limit else results
+
+    def folded_stacks(self, profile_id: str) -> Optional[str]:
+        """Stack dạng 'folded' (flamegraph.pl, speedscope): 'a;b;c <số mẫu>' mỗi dòng."""
+        with self._lock:
+            stacks = self._stacks.get(profile_id)
+        if stacks is None:
+            return None
+        return '\n'.join(f"{stack} {count}" for stack, count in stacks.most_common()) + '\n'
+
+    def _ensure_thread(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                active = dict(self._active)
+            if not active:
+                self._wakeup.clear()
+                self._wakeup.wait()
+                continue
+
+            frames = sys._current_frames()
+            for thread_id, profile in active.items():
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == own_id:
+                    continue
+                profile.stacks[_fold_stack(frame)] += 1
+                profile.samples += 1
+            del frames
+            time.sleep(self.interval)
+
+
+profiler = SamplingProfiler()
+
+
+def configure(config):
+    profiler.sample_rate = getattr(config, 'PROFILE_SAMPLE_RATE', 0.0)
+    profiler.interval = getattr(config, 'PROFILE_INTERVAL_MS', 5) / 1000.0
+    profiler.routes = set(getattr(config, 'PROFILE_ROUTES', ()))
+    profiler._results = deque(maxlen=getattr(config, 'PROFILE_BUFFER_SIZE', 50))
+
+
+def init_app(app, is_admin_request):
+    """
+    Gắn hook profile vào Flask app. Request được profile khi rơi vào mẫu ngẫu
+    nhiên của các route đã cấu hình, hoặc khi admin gửi header X-Profile: 1.
+    """
+    from flask import request
+    from flask.json.provider import DefaultJSONProvider
+
+    class TimedJSONProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            with timed('json'):
+                return super().dumps(obj, **kwargs)
+
+    app.json_provider_class = TimedJSONProvider
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def _start_profile():
+        route = request.url_rule.rule if request.url_rule else None
+        if request.headers.get('X-Profile') == '1' and is_admin_request():
+            profiler.start(route or request.path, request.method, 'admin')
+        elif profiler.should_sample(route):
+            profiler.start(route, request.method, 'sampled')
+
+    @app.after_request
+    def _finish_profile(response):
+        summary = profiler.finish(response.status_code)
+        if summary:
+            response.headers['X-Profile-Id'] = summary['id']
+            logger.info(f"Profiled {summary['method']} {summary['route']}: {summary['breakdown_ms']}")
+        return response
+
+    @app.teardown_request
+    def _discard_profile(exc):
+        # after_request không chạy khi view ném lỗi, tránh để profile treo trên thread
+        if current() is not None:
+            profiler.finish(500)
@@ -0,0 +1,183 @@
+"""
+Giới hạn tần suất request bằng token bucket, theo user và theo IP cho từng
+nhóm route:
+
+- chat: gọi LLM, chặt nhất để một user không chiếm hết Ollama
+- search: LIKE trên toàn bộ lịch trình của user
+- bulk: nhập/xuất file
+- auth: đăng nhập/đăng ký, chỉ theo IP (chống dò mật khẩu)
+- crud: các route lịch trình còn lại, rộng rãi
+
+Mỗi giới hạn viết dạng "số/đơn vị[:burst]", VD "10/minute:3" là trung bình
+10 request mỗi phút, dồn tối đa 3 request liền nhau; để trống để tắt. Bucket
+nằm trong process (RATE_LIMIT_STORE=memory, mỗi worker một bucket riêng) hoặc
+trên shared state (shared, dùng chung mọi worker; backend redis chạy bucket
+bằng một script nguyên tử). Mặc định là shared khi có nhiều worker, vì bucket
+riêng từng worker nhân giới hạn thực tế lên theo số worker. Mỗi request chỉ
+đụng tới một hoặc hai bucket, mỗi bucket O(1). Shared state lỗi thì cho
+request đi qua.
+
+Request bị chặn nhận 429 với header Retry-After.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+from flask import jsonify, request
+
+import metrics
+from shared_state import refill_token_bucket, shared
+
+logger = logging.getLogger(__name__)
+
+rate_limited = metrics.registry.counter(
+    'rate_limited_total', 'Request bị từ chối bởi rate limit', ('policy', 'scope'))
+
+_PERIODS = {'second': 1, 'sec': 1, 's': 1, 'minute': 60, 'min': 60, 'm': 60, 'hour': 3600, 'h': 3600}
+
+
+@dataclass(frozen=True)
+class Limit:
+    rate: float  # token mỗi giây
+    burst: float
+
+    @classmethod
+    def parse(cls, spec: str) -> Optional['Limit']:
+        """'10/minute:3' -> Limit(10/60, 3); burst mặc định bằng số request trong một đơn vị."""
+        spec = (spec or '').strip()
+        if not spec:
+            return None
+        amount, _, rest = spec.partition('/')
+        period, _, burst = rest.partition(':')
+        seconds = _PERIODS.get(period.strip().lower() or 'second')
+        if seconds is None:
+            raise ValueError(f"Unknown rate limit period in {spec!r}")
+        count = float(amount)
+        return cls(count / seconds, float(burst) if burst else max(1.0, count))
+
+
+@dataclass(frozen=True)
+class Policy:
+    name: str
+    per_user: Optional[Limit]
+    per_ip: Optional[Limit]
+
+
+class MemoryBuckets:
+    """Bucket trong process; giữ tối đa max_entries key, bỏ key lâu không dùng nhất."""
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._buckets: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit) -> Optional[Tuple[bool, float, float]]:
+        now = time.monotonic()
+        with self._lock:
+            state = self._buckets.get(key, (limit.burst, now))
+            tokens, allowed, retry_after = refill_token_bucket(state, limit.rate, limit.burst, now)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after, tokens
+
+
+class SharedBuckets:
+    def take(self, key: str, limit: Limit) -> Optional[Tuple[bool, float, float]]:
+        return shared.take_token(f'ratelimit:{key}', limit.rate, limit.burst)
+
+
+class RateLimiter:
+    def __init__(self):
+        self.enabled = False
+        self.policies: Dict[str, Policy] = {}
+        self.buckets = MemoryBuckets()
+        self.trusted_proxies = 0
+
+    def check(self, policy_name: str, user_id=None, ip: Optional[str] = None) -> Tuple[bool, float, Optional[float]]:
+        """(được phép?, số giây phải chờ, số token còn lại của bucket chặt nhất)."""
+        policy = self.policies.get(policy_name)
+        if not self.enabled or policy is None:
+            return True, 0.0, None
+        remaining = None
+        # Bucket user trước: request bị chặn theo user không tiêu token của IP, vốn dùng chung
+        # với các user khác sau cùng NAT/proxy
+        for scope, limit, subject in (('user', policy.per_user, user_id), ('ip', policy.per_ip, ip)):
+            if limit is None or subject is None:
+                continue
+            result = self.buckets.take(f'{policy.name}:{scope}:{subject}', limit)
+            if result is None:
+                continue
+            allowed, retry_after, tokens = result
+            if not allowed:
+                rate_limited.inc(policy.name, scope)
+                return False, retry_after, 0.0
+            remaining = tokens if remaining is None else min(remaining, tokens)
+        return True, 0.0, remaining
+
+    def client_ip(self, request) -> str:
+        """IP client; sau reverse proxy lấy từ X-Forwarded-For theo số proxy tin cậy."""
+        if self.trusted_proxies:
+            forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+            if len(forwarded) >= self.trusted_proxies:
+                return forwarded[-self.trusted_proxies]
+        return request.remote_addr or 'unknown'
+
+
+limiter = RateLimiter()
+
+
+def rate_limit(policy_name: str):
+    """
+    Decorator cho route; đặt dưới @token_required để có request.user_id:
+
+        @app.route('/api/chat', methods=['POST'])
+        @token_required
+        @rate_limit('chat')
+        def chat_endpoint(): ...
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not limiter.enabled:
+                return f(*args, **kwargs)
+            allowed, retry_after, _ = limiter.check(
+                policy_name, getattr(request, 'user_id', None), limiter.client_ip(request))
+            if not allowed:
+                seconds = max(1, math.ceil(retry_after))
+                response = jsonify({
+                    'success': False,
+                    'message': f'Quá nhiều yêu cầu, vui lòng thử lại sau {seconds} giây'
+                })
+                response.status_code = 429
+                response.headers['Retry-After'] = str(seconds)
+                return response
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+
+def configure(config):
+    """Đọc RATE_LIMIT_* từ config; gọi lúc khởi động."""
+    limiter.enabled = getattr(config, 'RATE_LIMIT_ENABLED', True)
+    limiter.trusted_proxies = getattr(config, 'RATE_LIMIT_TRUSTED_PROXIES', 0)
+    limiter.buckets = SharedBuckets() if getattr(config, 'RATE_LIMIT_STORE', 'memory') == 'shared' else MemoryBuckets()
+    limiter.policies = {}
+    for name, per_user, per_ip in getattr(config, 'RATE_LIMITS', ()):
+        limiter.policies[name] = Policy(name, Limit.parse(per_user), Limit.parse(per_ip))
+    workers = getattr(config, 'WORKERS', 1)
+    if limiter.enabled and workers > 1:
+        if isinstance(limiter.buckets, MemoryBuckets):
+            logger.warning(f"RATE_LIMIT_STORE=memory with {workers} workers: each worker has its own buckets, "
+                           f"so clients get up to {workers}x the configured limits")
+        elif shared.backend.name == 'memory':
+            logger.warning(f"Rate limit buckets are on SHARED_STATE_URL=memory:// with {workers} workers: "
+                           f"buckets are not shared, clients get up to {workers}x the configured limits")
+    logger.info(f"Rate limiting {'enabled' if limiter.enabled else 'disabled'} "
+                f"({type(limiter.buckets).__name__}, policies: {', '.join(limiter.policies)})")
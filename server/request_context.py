@@ -0,0 +1,26 @@
+"""
+Ngữ cảnh của một request đã xác thực, tạo trong token_required và truyền
+xuống PersonalAssistant.process_message.
+
+token_required chỉ giải mã access token (không đọc bảng users), nên ngữ
+cảnh chỉ mang user_id. Danh sách lịch trình của user chỉ được đọc một lần cho
+mỗi lượt chat rồi dùng chung cho prompt, truy vấn 'all' và xóa theo từ khóa.
+"""
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+
+@dataclass
+class RequestContext:
+    user_id: int
+    _schedules: Optional[List[Dict]] = field(default=None, repr=False)
+
+    def schedules(self, loader: Callable[[int], List[Dict]]) -> List[Dict]:
+        """Toàn bộ lịch trình của user, chỉ gọi loader ở lần đầu."""
+        if self._schedules is None:
+            self._schedules = loader(self.user_id)
+        return self._schedules
+
+    def invalidate_schedules(self):
+        """Gọi sau khi lượt chat ghi vào bảng schedules."""
+        self._schedules = None
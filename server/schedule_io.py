@@ -0,0 +1,537 @@
+"""
+Nhập/xuất lịch trình dạng iCalendar (.ics) và CSV.
+
+Hai chiều đều xử lý từng dòng để file lớn bao nhiêu cũng không phải nạp hết
+vào bộ nhớ:
+
+- Nhập: parse_ics/parse_csv đọc stream upload và trả về từng sự kiện,
+  ScheduleImporter kiểm tra từng sự kiện rồi ghi theo batch bằng một câu
+  INSERT multi-row (ScheduleModel.create_schedules_bulk). Mỗi batch là một
+  transaction, nên khi lỗi DB giữa chừng các batch trước vẫn được giữ lại.
+- Xuất: iter_ics/iter_csv nhận các dòng từ ScheduleModel.iter_export_rows và
+  sinh từng đoạn text cho streaming.text_response.
+
+Thời gian trong DB là giờ địa phương (DEFAULT_TIMEZONE, không kèm múi giờ).
+File .ics xuất ra dùng giờ UTC; khi nhập, giờ UTC hoặc có TZID được đổi về
+giờ địa phương, giờ "floating" giữ nguyên.
+"""
+import csv
+import io
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import temporal
+
+FORMATS = ('ics', 'csv')
+MIMETYPES = {'ics': 'text/calendar', 'csv': 'text/csv'}
+
+PRIORITIES = ('low', 'medium', 'high')
+STATUSES = ('pending', 'in_progress', 'completed', 'cancelled')
+CSV_COLUMNS = ('event', 'description', 'start_time', 'end_time', 'location', 'reminder_minutes',
+               'category', 'priority', 'status')
+
+# Giới hạn theo cột trong docker/mysql/init.sql
+MAX_EVENT_LENGTH = 255
+MAX_LOCATION_LENGTH = 500
+MAX_CATEGORY_LENGTH = 100
+
+EXPORT_CHUNK_SIZE = 200
+# Độ dài tối đa của một dòng (và một dòng .ics sau khi nối các dòng gập) khi nhập
+MAX_LINE_LENGTH = 65536
+
+_ICS_DURATION = re.compile(
+    r'^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+_ICS_UNESCAPE = re.compile(r'\\([\\;,nN])')
+_ICS_ESCAPE = re.compile(r'([\\;,])')
+
+
+def detect_format(explicit: Optional[str], filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """Định dạng từ tham số ?format=, đuôi file upload hoặc Content-Type."""
+    if explicit:
+        explicit = explicit.lower()
+        return explicit if explicit in FORMATS else None
+    if filename:
+        extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        if extension in FORMATS:
+            return extension
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    for name, mimetype in MIMETYPES.items():
+        if content_type == mimetype:
+            return name
+    return None
+
+
+def text_lines(stream, max_length: int = MAX_LINE_LENGTH) -> Iterator[str]:
+    """
+    Đọc stream nhị phân (file upload hoặc request.stream) theo dòng UTF-8, bỏ
+    BOM nếu có. Dòng dài quá max_length ký tự làm ValueError thay vì được đọc
+    hết vào bộ nhớ.
+    """
+    reader = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    number = 0
+    while True:
+        # +2 cho "\r\n": dòng dài đúng max_length vẫn được đọc trọn
+        line = reader.readline(max_length + 2)
+        if not line:
+            return
+        number += 1
+        if len(line.rstrip('\r\n')) > max_length:
+            raise ValueError(f'Dòng {number} dài quá {max_length} ký tự')
+        yield line
+
+
+# ---------------------------------------------------------------- nhập
+
+class ScheduleImporter:
+    """
+    Gom các sự kiện hợp lệ thành batch và ghi bằng ScheduleModel.create_schedules_bulk.
+    Sự kiện lỗi bị bỏ qua và được ghi vào báo cáo (tối đa max_errors lỗi).
+    """
+
+    def __init__(self, schedule_model, tz: Optional[tzinfo] = None, batch_size: int = 1000, max_errors: int = 50,
+                 max_line_length: int = MAX_LINE_LENGTH):
+        self.schedule_model = schedule_model
+        self.tz = tz or temporal.get_timezone()
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.max_line_length = max_line_length
+
+    def run(self, user_id: int, fmt: str, lines: Iterable[str]) -> Dict:
+        """
+        Returns:
+            {'imported', 'skipped', 'errors': [{'line', 'message'}]}
+        File hỏng giữa chừng (ValueError, gồm UnicodeDecodeError và dòng quá dài)
+        hoặc lỗi DB khi ghi một batch (RuntimeError) được ném ra sau khi các
+        batch trước đã commit; số dòng đã ghi nằm trong thuộc tính imported
+        của exception.
+        """
+        if fmt == 'ics':
+            entries, convert = parse_ics(lines, self.max_line_length), ics_to_schedule
+        else:
+            entries, convert = parse_csv(lines), csv_to_schedule
+
+        report = {'imported': 0, 'skipped': 0, 'errors': []}
+        batch: List[tuple] = []
+        try:
+            for line, raw in entries:
+                try:
+                    batch.append(validate(convert(raw, self.tz)))
+                except ValueError as e:
+                    report['skipped'] += 1
+                    if len(report['errors']) < self.max_errors:
+                        report['errors'].append({'line': line, 'message': str(e)})
+                    continue
+                if len(batch) >= self.batch_size:
+                    self._flush(user_id, batch, report)
+                    batch = []
+            self._flush(user_id, batch, report)
+        except Exception as e:
+            e.imported = report['imported']
+            raise
+        return report
+
+    def _flush(self, user_id: int, batch: List[tuple], report: Dict):
+        if not batch:
+            return
+        self.schedule_model.create_schedules_bulk(user_id, batch)
+        report['imported'] += len(batch)
+
+
+def validate(data: Dict) -> tuple:
+    """Kiểm tra một sự kiện đã chuyển đổi; trả về tham số cho INSERT (không gồm user_id)."""
+    event = (data.get('event') or '').strip()
+    if not event:
+        raise ValueError('Thiếu tên sự kiện')
+    if len(event) > MAX_EVENT_LENGTH:
+        raise ValueError(f'Tên sự kiện dài quá {MAX_EVENT_LENGTH} ký tự')
+
+    start_time = data.get('start_time')
+    if not isinstance(start_time, datetime):
+        raise ValueError('Thiếu thời gian bắt đầu')
+    end_time = data.get('end_time')
+    if end_time is not None and end_time < start_time:
+        raise ValueError('Thời gian kết thúc trước thời gian bắt đầu')
+
+    location = data.get('location') or None
+    if location and len(location) > MAX_LOCATION_LENGTH:
+        raise ValueError(f'Địa điểm dài quá {MAX_LOCATION_LENGTH} ký tự')
+
+    reminder = data.get('reminder_minutes')
+    if reminder is not None and reminder < 0:
+        raise ValueError('Thời gian nhắc trước không hợp lệ')
+
+    category = (data.get('category') or 'general').strip()[:MAX_CATEGORY_LENGTH] or 'general'
+    priority = (data.get('priority') or 'medium').lower()
+    if priority not in PRIORITIES:
+        raise ValueError(f'Độ ưu tiên không hợp lệ: {priority}')
+    status = (data.get('status') or 'pending').lower()
+    if status not in STATUSES:
+        raise ValueError(f'Trạng thái không hợp lệ: {status}')
+
+    return (event, data.get('description') or '', start_time, end_time, location, reminder,
+            category, priority, status)
+
+
+def _to_local(value: datetime, tz: tzinfo) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(tz).replace(tzinfo=None)
+
+
+# iCalendar (RFC 5545)
+
+def parse_ics(lines: Iterable[str], max_line_length: int = MAX_LINE_LENGTH) -> Iterator[Tuple[int, Dict]]:
+    """
+    Trả về (số dòng BEGIN:VEVENT, thuộc tính) cho mỗi VEVENT. Thuộc tính là
+    dict tên -> (params, value) của lần xuất hiện đầu tiên; TRIGGER của VALARM
+    đầu tiên được gộp vào dưới tên 'TRIGGER'. Dòng gập (bắt đầu bằng khoảng
+    trắng) được nối lại trước khi phân tích; dòng sau khi nối dài quá
+    max_line_length ký tự làm ValueError.
+    """
+    props = None
+    start_line = 0
+    nested: List[str] = []  # component con đang mở bên trong VEVENT (VALARM, ...)
+    for number, line in _unfold(lines, max_line_length):
+        name, params, value = _split_content_line(line)
+        if props is None:
+            if name == 'BEGIN' and value.upper() == 'VEVENT':
+                props, start_line, nested = {}, number, []
+            continue
+        if name == 'BEGIN':
+            nested.append(value.upper())
+        elif name == 'END':
+            if nested:
+                nested.pop()
+            else:
+                yield start_line, props
+                props = None
+        elif not nested:
+            props.setdefault(name, (params, value))
+        elif nested == ['VALARM'] and name == 'TRIGGER':
+            props.setdefault('TRIGGER', (params, value))
+
+
+def _unfold(lines: Iterable[str], max_length: int = MAX_LINE_LENGTH) -> Iterator[Tuple[int, str]]:
+    pending = None
+    pending_number = 0
+    for number, raw in enumerate(lines, 1):
+        line = raw.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and pending is not None:
+            if len(pending) + len(line) - 1 > max_length:
+                raise ValueError(f'Dòng {pending_number} (sau khi nối dòng gập) dài quá {max_length} ký tự')
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending_number, pending
+        pending, pending_number = line, number
+    if pending is not None:
+        yield pending_number, pending
+
+
+def _split_content_line(line: str) -> Tuple[str, Dict[str, str], str]:
+    # NAME;PARAM=a;PARAM="b:c":VALUE - dấu ':' trong giá trị param có thể nằm trong ngoặc kép
+    index = line.find(':')
+    if index < 0:
+        return '', {}, ''
+    quote = line.find('"', 0, index)
+    if quote >= 0:
+        index = _unquoted_colon(line, quote)
+        if index < 0:
+            return '', {}, ''
+    head, value = line[:index], line[index + 1:]
+    if ';' not in head:
+        return head.upper(), {}, value
+    parts = head.split(';')
+    params = {}
+    for part in parts[1:]:
+        key, _, param_value = part.partition('=')
+        params[key.upper()] = param_value.strip('"')
+    return parts[0].upper(), params, value
+
+
+def _unquoted_colon(line: str, start: int) -> int:
+    quoted = False
+    for index in range(start, len(line)):
+        char = line[index]
+        if char == '"':
+            quoted = not quoted
+        elif char == ':' and not quoted:
+            return index
+    return -1
+
+
+def ics_to_schedule(props: Dict, tz: tzinfo) -> Dict:
+    data = {
+        'event': _ics_text(props, 'SUMMARY'),
+        'description': _ics_text(props, 'DESCRIPTION'),
+        'location': _ics_text(props, 'LOCATION') or None,
+    }
+    if 'DTSTART' not in props:
+        raise ValueError('Thiếu DTSTART')
+    data['start_time'] = _ics_datetime(*props['DTSTART'], tz)
+    if 'DTEND' in props:
+        data['end_time'] = _ics_datetime(*props['DTEND'], tz)
+    elif 'DURATION' in props:
+        data['end_time'] = data['start_time'] + _ics_duration(props['DURATION'][1])
+
+    categories = _ics_text(props, 'CATEGORIES')
+    if categories:
+        data['category'] = categories.split(',')[0].strip()
+
+    if 'PRIORITY' in props:
+        data['priority'] = _ics_priority(props['PRIORITY'][1])
+
+    status = _ics_text(props, 'X-SCHEDULER-STATUS').lower()
+    if status in STATUSES:
+        data['status'] = status
+    elif _ics_text(props, 'STATUS').upper() == 'CANCELLED':
+        data['status'] = 'cancelled'
+
+    if 'TRIGGER' in props:
+        params, value = props['TRIGGER']
+        if params.get('VALUE', 'DURATION').upper() == 'DURATION' and params.get('RELATED', 'START').upper() == 'START':
+            offset = _ics_duration(value)
+            if offset <= timedelta(0):
+                data['reminder_minutes'] = int(-offset.total_seconds() // 60)
+    return data
+
+
+def _ics_text(props: Dict, name: str) -> str:
+    if name not in props:
+        return ''
+    return _ICS_UNESCAPE.sub(lambda m: '\n' if m.group(1) in 'nN' else m.group(1), props[name][1]).strip()
+
+
+def _ics_datetime(params: Dict, value: str, tz: tzinfo) -> datetime:
+    value = value.strip()
+    try:
+        if params.get('VALUE', '').upper() == 'DATE' or len(value) == 8:
+            return datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+        # YYYYMMDDTHHMMSS[Z]; cắt chuỗi thay cho strptime vì chạy cho mọi sự kiện
+        if len(value) not in (15, 16) or value[8] != 'T' or not value[:8].isdigit() or not value[9:15].isdigit():
+            raise ValueError(value)
+        parsed = datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                          int(value[9:11]), int(value[11:13]), int(value[13:15]))
+        if value.endswith('Z'):
+            return _to_local(parsed.replace(tzinfo=timezone.utc), tz)
+        if len(value) != 15:
+            raise ValueError(value)
+    except ValueError:
+        raise ValueError(f'Thời gian không hợp lệ: {value}') from None
+    if 'TZID' in params:
+        parsed = _to_local(parsed.replace(tzinfo=temporal.get_timezone(params['TZID'])), tz)
+    return parsed
+
+
+def _ics_duration(value: str) -> timedelta:
+    match = _ICS_DURATION.match(value.strip().upper())
+    if not match:
+        raise ValueError(f'Khoảng thời gian không hợp lệ: {value}')
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    delta = timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                      minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -delta if sign == '-' else delta
+
+
+def _ics_priority(value: str) -> str:
+    # RFC 5545: 1-4 cao, 5 trung bình, 6-9 thấp, 0 là không xác định
+    try:
+        level = int(value)
+    except ValueError:
+        raise ValueError(f'PRIORITY không hợp lệ: {value}') from None
+    if 1 <= level <= 4:
+        return 'high'
+    if level >= 6:
+        return 'low'
+    return 'medium'
+
+
+# CSV
+
+def parse_csv(lines: Iterable[str]) -> Iterator[Tuple[int, Dict]]:
+    """(số dòng, dict theo tên cột viết thường) cho mỗi dòng dữ liệu; dòng đầu là header."""
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [name.strip().lower() for name in header]
+    missing = [name for name in ('event', 'start_time') if name not in columns]
+    if missing:
+        raise ValueError(f"File CSV thiếu cột: {', '.join(missing)}")
+    try:
+        for values in reader:
+            if not any(value.strip() for value in values):
+                continue
+            yield reader.line_num, dict(zip(columns, values))
+    except csv.Error as e:  # VD: trường trong ngoặc kép không đóng, dài quá field_size_limit
+        raise ValueError(f'Dòng {reader.line_num}: {e}') from None
+
+
+def csv_to_schedule(row: Dict, tz: tzinfo) -> Dict:
+    data = {
+        'event': row.get('event', ''),
+        'description': row.get('description', ''),
+        'start_time': _csv_datetime(row.get('start_time'), tz),
+        'end_time': _csv_datetime(row.get('end_time'), tz),
+        'location': (row.get('location') or '').strip() or None,
+        'category': row.get('category'),
+        'priority': (row.get('priority') or '').strip() or None,
+        'status': (row.get('status') or '').strip() or None,
+    }
+    reminder = (row.get('reminder_minutes') or '').strip()
+    if reminder:
+        try:
+            data['reminder_minutes'] = int(reminder)
+        except ValueError:
+            raise ValueError(f'reminder_minutes không hợp lệ: {reminder}') from None
+    return data
+
+
+def _csv_datetime(value: Optional[str], tz: tzinfo) -> Optional[datetime]:
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        return _to_local(datetime.fromisoformat(value.replace('Z', '+00:00')), tz)
+    except ValueError:
+        raise ValueError(f'Thời gian không hợp lệ: {value}') from None
+
+
+# ---------------------------------------------------------------- xuất
+
+def iter_ics(rows: Iterable, tz: Optional[tzinfo] = None, calendar_name: str = 'Personal Scheduler') -> Iterator[str]:
+    """VCALENDAR với một VEVENT cho mỗi dòng, gom EXPORT_CHUNK_SIZE sự kiện mỗi đoạn."""
+    tz = tz or temporal.get_timezone()
+    header = _ics_lines([
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Personal Scheduler//Schedules//VI',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{_ics_escape(calendar_name)}',
+    ])
+    with _closing(rows):
+        # Header đi cùng batch đầu để đoạn đầu tiên đã chạm tới DB (xem streaming.text_response)
+        for chunk in _chunks(rows):
+            yield header + ''.join(_ics_event(row, tz) for row in chunk)
+            header = ''
+        yield header + _ics_lines(['END:VCALENDAR'])
+
+
+def _ics_event(row, tz: tzinfo) -> str:
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:schedule-{row['id']}@personal-scheduler",
+        f"DTSTAMP:{_ics_utc(row['updated_at'] or row['created_at'], tz)}",
+        f"DTSTART:{_ics_utc(row['start_time'], tz)}",
+    ]
+    if row['end_time']:
+        lines.append(f"DTEND:{_ics_utc(row['end_time'], tz)}")
+    lines.append(f"SUMMARY:{_ics_escape(row['event'])}")
+    if row['description']:
+        lines.append(f"DESCRIPTION:{_ics_escape(row['description'])}")
+    if row['location']:
+        lines.append(f"LOCATION:{_ics_escape(row['location'])}")
+    lines.append(f"CATEGORIES:{_ics_escape(row['category'])}")
+    lines.append(f"PRIORITY:{ {'high': 1, 'medium': 5, 'low': 9}.get(row['priority'], 0) }")
+    lines.append(f"STATUS:{'CANCELLED' if row['status'] == 'cancelled' else 'CONFIRMED'}")
+    lines.append(f"X-SCHEDULER-STATUS:{row['status']}")
+    if row['reminder_minutes'] is not None:
+        lines.extend([
+            'BEGIN:VALARM',
+            'ACTION:DISPLAY',
+            f"DESCRIPTION:{_ics_escape(row['event'])}",
+            f"TRIGGER:-PT{int(row['reminder_minutes'])}M",
+            'END:VALARM',
+        ])
+    lines.append('END:VEVENT')
+    return _ics_lines(lines)
+
+
+def _ics_utc(value: datetime, tz: tzinfo) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=tz)
+    value = value.astimezone(timezone.utc)
+    return (f'{value.year:04d}{value.month:02d}{value.day:02d}'
+            f'T{value.hour:02d}{value.minute:02d}{value.second:02d}Z')
+
+
+def _ics_escape(value: str) -> str:
+    return _ICS_ESCAPE.sub(r'\\\1', value or '').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def _ics_lines(lines: List[str]) -> str:
+    return ''.join(_ics_fold(line) + '\r\n' for line in lines)
+
+
+def _ics_fold(line: str) -> str:
+    # Dòng dài quá 75 octet được gập; không cắt giữa một ký tự UTF-8 nhiều byte
+    if len(line) <= 75 and line.isascii():
+        return line
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    limit = 75
+    while len(encoded) > limit:
+        cut = limit
+        while cut > 0 and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        limit = 74  # dòng tiếp theo có một khoảng trắng ở đầu
+    parts.append(encoded.decode('utf-8'))
+    return '\r\n '.join(parts)
+
+
+def iter_csv(rows: Iterable) -> Iterator[str]:
+    """CSV có header CSV_COLUMNS (thêm cột id), BOM ở đầu để Excel đọc đúng tiếng Việt."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(('id',) + CSV_COLUMNS)
+    header = '\ufeff' + _drain(buffer)
+    with _closing(rows):
+        for chunk in _chunks(rows):
+            for row in chunk:
+                writer.writerow((
+                    row['id'], row['event'], row['description'] or '',
+                    row['start_time'].isoformat() if row['start_time'] else '',
+                    row['end_time'].isoformat() if row['end_time'] else '',
+                    row['location'] or '',
+                    '' if row['reminder_minutes'] is None else row['reminder_minutes'],
+                    row['category'], row['priority'], row['status'],
+                ))
+            yield header + _drain(buffer)
+            header = ''
+        if header:
+            yield header
+
+
+def _drain(buffer: io.StringIO) -> str:
+    value = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return value
+
+
+@contextmanager
+def _closing(rows):
+    # Dừng đọc các trang còn lại của iter_rows khi response bị đóng giữa chừng
+    try:
+        yield
+    finally:
+        close = getattr(rows, 'close', None)
+        if close is not None:
+            close()
+
+
+def _chunks(rows: Iterable) -> Iterator[List]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
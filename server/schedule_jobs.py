@@ -0,0 +1,47 @@
+"""
+Các job nền chạy sau khi lịch trình thay đổi.
+
+- schedule.refresh_stats: nạp lại bộ đếm thống kê của user từ DB
+- calendar.warm: tính trước dữ liệu lịch tháng (biến thể mặc định của
+  /api/schedules/calendar) để request xem lịch sau khi ghi trúng cache
+"""
+import logging
+from datetime import datetime
+from typing import Dict
+
+from cache import calendar_cache, schedule_versions
+from jobs import job_queue
+
+logger = logging.getLogger(__name__)
+
+
+def calendar_cache_key(user_id: int, month_key: str, include_items: bool, include_summary: bool):
+    return (user_id, month_key, include_items, include_summary, schedule_versions.get(user_id))
+
+
+def register(db_manager):
+    """Đăng ký handler cho job_queue; gọi một lần khi khởi động app."""
+    from models import ScheduleModel
+
+    # Job chạy ngay sau khi ghi nên đọc từ primary, replica có thể chưa theo kịp
+
+    def refresh_stats(payload: Dict):
+        with db_manager.read_primary():
+            ScheduleModel(db_manager).refresh_schedule_stats(payload['user_id'])
+
+    def warm_calendar(payload: Dict):
+        user_id = payload['user_id']
+        month_start = datetime.strptime(payload['month'], '%Y-%m')
+        cache_key = calendar_cache_key(user_id, payload['month'], True, False)
+        if calendar_cache.get(cache_key) is not None:
+            return
+        with db_manager.read_primary():
+            calendar = ScheduleModel(db_manager).get_calendar_month(user_id, month_start)
+        if calendar is None:
+            raise RuntimeError(f"Cannot read calendar {payload['month']} for user {user_id}")
+        # Lịch có thể đã đổi trong lúc truy vấn; chỉ lưu nếu phiên bản còn khớp
+        if calendar_cache_key(user_id, payload['month'], True, False) == cache_key:
+            calendar_cache.set(cache_key, calendar)
+
+    job_queue.register('schedule.refresh_stats', refresh_stats)
+    job_queue.register('calendar.warm', warm_calendar)
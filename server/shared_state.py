@@ -0,0 +1,510 @@
+"""
+Trạng thái dùng chung giữa các worker (gunicorn nhiều process/nhiều host):
+cache key-value có TTL và pub/sub để phát sự kiện, VD: phiên bản lịch trình
+của user vừa đổi nên cache lịch tháng ở mọi worker đều phải bỏ qua.
+
+Hai backend:
+- memory: trong process, mặc định; đủ cho một worker duy nhất
+- redis: nói giao thức RESP qua socket nên dùng được với Redis, Valkey,
+  KeyDB... mà không cần thêm thư viện client
+
+Code gọi qua object `shared` của module, không dùng backend trực tiếp. Lỗi
+kết nối tới backend không làm hỏng request: đọc trả về giá trị mặc định, ghi
+bị bỏ qua, đều được ghi log và đếm trên /metrics. Tin nhắn pub/sub do chính
+process gửi không được giao lại cho nó (thay đổi đã được áp dụng tại chỗ).
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+shared_state_errors = metrics.registry.counter(
+    'shared_state_errors_total', 'Thao tác lên shared state lỗi (backend không kết nối được...)', ('op',))
+shared_state_messages = metrics.registry.counter(
+    'shared_state_messages_total', 'Tin nhắn pub/sub theo kênh và chiều', ('channel', 'direction'))
+
+
+class SharedStateError(Exception):
+    pass
+
+
+def refill_token_bucket(state: Tuple[float, float], rate: float, burst: float, now: float) -> Tuple[float, bool, float]:
+    """Token bucket: (số token còn lại, được phép?, số giây phải chờ nếu không)."""
+    tokens, updated_at = state
+    tokens = min(burst, tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= 1:
+        return tokens - 1, True, 0.0
+    return tokens, False, (1 - tokens) / rate
+
+
+# Cùng thuật toán với refill_token_bucket, chạy nguyên tử trên server. Số thực trả về dạng
+# chuỗi vì Lua number bị cắt thành integer trong reply.
+_TOKEN_BUCKET_SCRIPT = """
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local allowed, retry_after = 0, 0
+if tokens >= 1 then
+  tokens, allowed = tokens - 1, 1
+else
+  retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(retry_after), tostring(tokens)}
+""".strip()
+_TOKEN_BUCKET_SHA = hashlib.sha1(_TOKEN_BUCKET_SCRIPT.encode('utf-8')).hexdigest()
+
+
+class MemoryBackend:
+    name = 'memory'
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._data: Dict[str, tuple] = {}
+        self._subscribers: Dict[str, List[Callable[[str], None]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            if len(self._data) > self.max_entries:
+                self._evict_expired()
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            expires_at, value = self._data.get(key, (None, 0))
+            value = int(value) + 1
+            self._data[key] = (expires_at, str(value))
+            return value
+
+    def take_token(self, key: str, rate: float, burst: float, now: float) -> Tuple[bool, float, float]:
+        with self._lock:
+            _, state = self._data.get(key, (None, (burst, now)))
+            tokens, allowed, retry_after = refill_token_bucket(state, rate, burst, now)
+            self._data[key] = (time.monotonic() + burst / rate + 1, (tokens, now))
+            if len(self._data) > self.max_entries:
+                self._evict_expired()
+            return allowed, retry_after, tokens
+
+    def publish(self, channel: str, message: str) -> int:
+        handlers = list(self._subscribers.get(channel, ()))
+        for handler in handlers:
+            handler(message)
+        return len(handlers)
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]):
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(handler)
+
+    def ping(self) -> bool:
+        return True
+
+    def close(self):
+        pass
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._data.items() if expires_at is not None and expires_at < now]:
+            del self._data[key]
+        # Vẫn đầy (toàn key không hết hạn): bỏ các key cũ nhất theo thứ tự chèn
+        for key in list(self._data)[:max(0, len(self._data) - self.max_entries)]:
+            del self._data[key]
+
+
+class _RespConnection:
+    """Một kết nối RESP2: gửi lệnh dạng mảng bulk string, đọc reply."""
+
+    def __init__(self, host: str, port: int, timeout: Optional[float]):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+
+    def send(self, *args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        self.sock.sendall(b''.join(parts))
+
+    def read_reply(self):
+        line = self.reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError('connection closed by server')
+        kind, body = line[:1], line[1:-2]
+        if kind == b'+':
+            return body.decode('utf-8')
+        if kind == b'-':
+            raise SharedStateError(body.decode('utf-8', 'replace'))
+        if kind == b':':
+            return int(body)
+        if kind == b'$':
+            length = int(body)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError('connection closed by server')
+            return data[:-2].decode('utf-8')
+        if kind == b'*':
+            length = int(body)
+            return None if length < 0 else [self.read_reply() for _ in range(length)]
+        raise SharedStateError(f'unexpected reply: {line[:32]!r}')
+
+    def command(self, *args):
+        self.send(*args)
+        return self.read_reply()
+
+    def close(self):
+        # shutdown trước: đánh thức thread đang chặn trong read_reply, nếu không
+        # reader.close() sẽ chờ khóa của buffer mà thread đó đang giữ
+        for closer in (lambda: self.sock.shutdown(socket.SHUT_RDWR), self.reader.close, self.sock.close):
+            try:
+                closer()
+            except OSError:
+                pass
+
+
+# Một hook fork cho mọi RespBackend và SharedState còn sống (xem database._after_fork_in_child)
+_resp_backends: 'weakref.WeakSet[RespBackend]' = weakref.WeakSet()
+_states: 'weakref.WeakSet[SharedState]' = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    for backend in list(_resp_backends):
+        backend._after_fork()
+    # Worker fork từ master (preload_app) thừa hưởng origin của master: phải có
+    # origin riêng, nếu không tin nhắn giữa các worker bị bỏ qua như tin của chính mình
+    for state in list(_states):
+        state.origin = _new_origin()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class RespBackend:
+    """
+    Backend cho server nói giao thức Redis, URL dạng
+    redis://[:password@]host[:port][/db][?timeout=giây&pool_size=n].
+
+    Lệnh thường dùng một pool kết nối nhỏ; SUBSCRIBE chạy trên một kết nối
+    riêng với thread đọc tin nhắn, tự kết nối và đăng ký lại khi mất kết nối.
+    """
+    name = 'redis'
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        options = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.db = int(parsed.path.strip('/') or 0)
+        self.timeout = float(options.get('timeout', 1.0))
+        self._pool = queue.LifoQueue(maxsize=int(options.get('pool_size', 8)))
+        self._channels: Dict[str, List[Callable[[str], None]]] = {}
+        self._subscriber: Optional[_RespConnection] = None
+        self._subscriber_lock = threading.Lock()
+        self._listener = None
+        self._closed = threading.Event()
+        _resp_backends.add(self)
+
+    def _after_fork(self):
+        # Worker mới fork không dùng chung socket với process cha, và thread
+        # đọc tin nhắn của cha không tồn tại trong con: bỏ kết nối cũ (không
+        # đóng, để không cắt kết nối của cha) và subscribe lại
+        self._pool = queue.LifoQueue(maxsize=self._pool.maxsize)
+        self._subscriber = None
+        self._subscriber_lock = threading.Lock()
+        self._listener = None
+        if self._channels and not self._closed.is_set():
+            self._listener = threading.Thread(target=self._listen, name='shared-state-subscriber', daemon=True)
+            self._listener.start()
+
+    def _connect(self, timeout: Optional[float]) -> _RespConnection:
+        connection = _RespConnection(self.host, self.port, timeout)
+        try:
+            if self.password:
+                auth = (self.username, self.password) if self.username else (self.password,)
+                connection.command('AUTH', *auth)
+            if self.db:
+                connection.command('SELECT', self.db)
+        except Exception:
+            connection.close()
+            raise
+        return connection
+
+    @contextmanager
+    def _connection(self):
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = self._connect(self.timeout)
+        try:
+            yield connection
+        except BaseException:
+            # Reply có thể còn nằm dở trong socket: không trả kết nối này về pool
+            connection.close()
+            raise
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def _command(self, *args):
+        try:
+            with self._connection() as connection:
+                return connection.command(*args)
+        except (OSError, ConnectionError) as e:
+            raise SharedStateError(f'{self.host}:{self.port}: {e}') from e
+
+    def get(self, key: str) -> Optional[str]:
+        return self._command('GET', key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        if ttl:
+            self._command('SET', key, value, 'PX', max(1, int(ttl * 1000)))
+        else:
+            self._command('SET', key, value)
+
+    def delete(self, *keys: str) -> int:
+        return self._command('DEL', *keys) if keys else 0
+
+    def incr(self, key: str) -> int:
+        return self._command('INCR', key)
+
+    def publish(self, channel: str, message: str) -> int:
+        return self._command('PUBLISH', channel, message)
+
+    def take_token(self, key: str, rate: float, burst: float, now: float) -> Tuple[bool, float, float]:
+        args = (1, key, repr(rate), repr(burst), repr(now))
+        try:
+            reply = self._command('EVALSHA', _TOKEN_BUCKET_SHA, *args)
+        except SharedStateError as e:
+            if not str(e).startswith('NOSCRIPT'):
+                raise
+            reply = self._command('EVAL', _TOKEN_BUCKET_SCRIPT, *args)
+        return bool(reply[0]), float(reply[1]), float(reply[2])
+
+    def ping(self) -> bool:
+        return self._command('PING') == 'PONG'
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]):
+        with self._subscriber_lock:
+            new_channel = channel not in self._channels
+            self._channels.setdefault(channel, []).append(handler)
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='shared-state-subscriber', daemon=True)
+                self._listener.start()
+            elif new_channel and self._subscriber is not None:
+                try:
+                    self._subscriber.send('SUBSCRIBE', channel)
+                except OSError:
+                    # Thread đọc sẽ thấy kết nối hỏng và đăng ký lại toàn bộ kênh
+                    pass
+
+    def _listen(self):
+        backoff = 0.5
+        while not self._closed.is_set():
+            try:
+                with self._subscriber_lock:
+                    # Không timeout: thread nằm chờ tin nhắn, close() đóng socket để đánh thức
+                    self._subscriber = self._connect(None)
+                    self._subscriber.send('SUBSCRIBE', *self._channels)
+                backoff = 0.5
+                while True:
+                    reply = self._subscriber.read_reply()
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == 'message':
+                        for handler in list(self._channels.get(reply[1], ())):
+                            try:
+                                handler(reply[2])
+                            except Exception as e:
+                                logger.error(f"Shared state handler for {reply[1]} failed: {e}", exc_info=True)
+            except Exception as e:
+                if self._closed.is_set():
+                    break
+                shared_state_errors.inc('subscribe')
+                logger.warning(f"Shared state subscriber disconnected ({e}), retrying in {backoff:.1f}s")
+            finally:
+                if self._subscriber is not None:
+                    self._subscriber.close()
+                    self._subscriber = None
+            self._closed.wait(backoff)
+            backoff = min(backoff * 2, 10)
+
+    def close(self):
+        self._closed.set()
+        subscriber = self._subscriber
+        if subscriber is not None:
+            subscriber.close()
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def _new_origin() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+class SharedState:
+    def __init__(self, backend=None, prefix: str = 'scheduler:'):
+        self.backend = backend or MemoryBackend()
+        self.prefix = prefix
+        # Định danh process (đổi sau fork), để bỏ qua tin nhắn do chính mình publish
+        self.origin = _new_origin()
+        self._handlers: Dict[str, List[Callable[[str], None]]] = {}
+        _states.add(self)
+
+    def use(self, backend, prefix: Optional[str] = None):
+        """Đổi backend (lúc khởi động); các kênh đã subscribe được đăng ký lại trên backend mới."""
+        old, self.backend = self.backend, backend
+        if prefix is not None:
+            self.prefix = prefix
+        if old is backend:
+            return
+        for channel in self._handlers:
+            self.backend.subscribe(self.prefix + channel, self._dispatcher(channel))
+        old.close()
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        try:
+            value = self.backend.get(self.prefix + key)
+        except SharedStateError as e:
+            self._failed('get', e)
+            return default
+        return default if value is None else value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        try:
+            self.backend.set(self.prefix + key, value, ttl)
+            return True
+        except SharedStateError as e:
+            self._failed('set', e)
+            return False
+
+    def delete(self, *keys: str) -> bool:
+        try:
+            self.backend.delete(*(self.prefix + key for key in keys))
+            return True
+        except SharedStateError as e:
+            self._failed('delete', e)
+            return False
+
+    def incr(self, key: str) -> Optional[int]:
+        try:
+            return self.backend.incr(self.prefix + key)
+        except SharedStateError as e:
+            self._failed('incr', e)
+            return None
+
+    def get_json(self, key: str) -> Optional[Any]:
+        value = self.get(key)
+        if value is None:
+            return None
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+
+    def set_json(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        return self.set(key, json.dumps(value, separators=(',', ':'), default=str), ttl)
+
+    def publish(self, channel: str, message: str) -> bool:
+        try:
+            self.backend.publish(self.prefix + channel, f'{self.origin} {message}')
+            shared_state_messages.inc(channel, 'out')
+            return True
+        except SharedStateError as e:
+            self._failed('publish', e)
+            return False
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]):
+        """handler(message) chạy trên thread của backend cho tin nhắn từ process khác."""
+        first = channel not in self._handlers
+        self._handlers.setdefault(channel, []).append(handler)
+        if first:
+            self.backend.subscribe(self.prefix + channel, self._dispatcher(channel))
+
+    def take_token(self, key: str, rate: float, burst: float) -> Optional[Tuple[bool, float, float]]:
+        """
+        Lấy một token từ bucket key (nạp rate token/giây, tối đa burst):
+        (được phép?, số giây phải chờ, số token còn lại); None nếu backend lỗi.
+        """
+        try:
+            return self.backend.take_token(self.prefix + key, rate, burst, time.time())
+        except SharedStateError as e:
+            self._failed('take_token', e)
+            return None
+
+    def ping(self) -> bool:
+        try:
+            return self.backend.ping()
+        except SharedStateError as e:
+            self._failed('ping', e)
+            return False
+
+    def _dispatcher(self, channel: str) -> Callable[[str], None]:
+        def dispatch(raw: str):
+            origin, _, message = raw.partition(' ')
+            if origin == self.origin:
+                return
+            shared_state_messages.inc(channel, 'in')
+            for handler in list(self._handlers.get(channel, ())):
+                handler(message)
+        return dispatch
+
+    def _failed(self, op: str, error: Exception):
+        shared_state_errors.inc(op)
+        logger.warning(f"Shared state {op} failed ({self.backend.name}): {error}")
+
+
+shared = SharedState()
+
+
+def create_backend(url: str):
+    scheme = urlparse(url).scheme if url else 'memory'
+    if scheme in ('', 'memory'):
+        return MemoryBackend()
+    if scheme in ('redis', 'resp'):
+        return RespBackend(url)
+    raise ValueError(f"Unknown shared state backend: {url}")
+
+
+def configure(config):
+    """Chọn backend theo SHARED_STATE_URL; gọi lúc khởi động, trước khi nhận request."""
+    url = getattr(config, 'SHARED_STATE_URL', 'memory://')
+    shared.use(create_backend(url), getattr(config, 'SHARED_STATE_PREFIX', 'scheduler:'))
+    logger.info(f"Shared state backend: {shared.backend.name}")
@@ -0,0 +1,164 @@
+"""
+Trích xuất slot từ tin nhắn tiếng Việt bằng rule, một lượt quét.
+
+Văn bản được chuẩn hóa (NFC + lowercase) một lần, sau đó một automaton
+Aho-Corasick tìm mọi từ khóa (danh mục, độ ưu tiên, phạm vi truy vấn, từ
+khóa lịch trình) trong một lần duyệt. Số phút nhắc trước và biểu thức thời
+gian do các regex biên dịch sẵn trong temporal xử lý.
+"""
+import unicodedata
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterator, Optional, Tuple
+
+from temporal import REMINDER_PATTERN, TemporalExpression, parse_expression
+
+
+class KeywordAutomaton:
+    """Automaton Aho-Corasick: tìm mọi từ khóa xuất hiện trong văn bản trong O(n + số kết quả)."""
+
+    def __init__(self, keywords: Dict[str, Tuple]):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for keyword, payload in keywords.items():
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append((keyword, payload))
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def scan(self, text: str) -> Iterator[Tuple[int, str, Tuple]]:
+        """Sinh (vị trí bắt đầu, từ khóa, payload) cho mọi lần xuất hiện."""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                for keyword, payload in output[state]:
+                    yield index - len(keyword) + 1, keyword, payload
+
+
+# Thứ tự trong mỗi nhóm là thứ tự ưu tiên khi nhiều từ khóa cùng khớp
+CATEGORY_KEYWORDS = [
+    ('alarm', ['báo thức', 'thức dậy', 'dậy', 'alarm']),
+    ('meeting', ['họp', 'meeting', 'cuộc họp', 'hội họp']),
+    ('personal', ['cá nhân', 'riêng', 'personal']),
+    ('work', ['công việc', 'work', 'làm việc']),
+]
+PRIORITY_KEYWORDS = [
+    ('high', ['quan trọng', 'gấp', 'khẩn cấp', 'urgent', 'high']),
+    ('medium', ['bình thường', 'normal', 'trung bình', 'medium']),
+]
+QUERY_SCOPE_KEYWORDS = [
+    ('tomorrow', ['mai', 'ngày mai']),
+    ('today', ['hôm nay']),
+    ('week', ['tuần', 'tuần này']),
+]
+SCHEDULE_KEYWORDS = ['lịch', 'báo thức', 'nhắc', 'hẹn', 'sự kiện', 'cuộc họp', 'đặt', 'tạo', 'xem', 'xóa', 'sửa']
+
+
+def _build_automaton() -> KeywordAutomaton:
+    keywords = {}
+
+    def add(keyword, payload):
+        keywords.setdefault(keyword, [])
+        keywords[keyword].append(payload)
+
+    for rank, (category, words) in enumerate(CATEGORY_KEYWORDS):
+        for word in words:
+            add(word, ('category', category, rank))
+    for rank, (priority, words) in enumerate(PRIORITY_KEYWORDS):
+        for word in words:
+            add(word, ('priority', priority, rank))
+    for rank, (scope, words) in enumerate(QUERY_SCOPE_KEYWORDS):
+        for word in words:
+            add(word, ('query_scope', scope, rank))
+    for word in SCHEDULE_KEYWORDS:
+        add(word, ('schedule', True, 0))
+
+    return KeywordAutomaton({word: tuple(payloads) for word, payloads in keywords.items()})
+
+
+_AUTOMATON = _build_automaton()
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize('NFC', text or '').lower()
+
+
+@dataclass(frozen=True)
+class ExtractedSlots:
+    category: str = 'general'
+    priority: str = 'low'
+    query_scope: str = 'all'
+    is_schedule_related: bool = False
+    reminder_minutes: Optional[int] = None
+    temporal: Optional[TemporalExpression] = None
+    keywords: FrozenSet[str] = frozenset()
+
+    def resolve_datetime(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """Datetime bắt đầu theo biểu thức thời gian trong tin nhắn; None nếu không có."""
+        if self.temporal is None:
+            return None
+        resolved = self.temporal.resolve(now)
+        return resolved[0] if resolved else None
+
+
+@lru_cache(maxsize=1024)
+def _extract_cached(text: str) -> ExtractedSlots:
+    best = {}
+    keywords = set()
+    is_schedule_related = False
+
+    for start, keyword, payloads in _AUTOMATON.scan(text):
+        keywords.add(keyword)
+        for slot, value, rank in payloads:
+            if slot == 'schedule':
+                is_schedule_related = True
+            elif slot not in best or rank < best[slot][0]:
+                best[slot] = (rank, value)
+
+    reminder_minutes = None
+    match = REMINDER_PATTERN.search(text)
+    if match:
+        value = int(match.group(1) or match.group(3))
+        unit = match.group(2) or match.group(4)
+        reminder_minutes = value * 60 if unit in ('giờ', 'tiếng') else value
+
+    return ExtractedSlots(
+        category=best['category'][1] if 'category' in best else 'general',
+        priority=best['priority'][1] if 'priority' in best else 'low',
+        query_scope=best['query_scope'][1] if 'query_scope' in best else 'all',
+        is_schedule_related=is_schedule_related,
+        reminder_minutes=reminder_minutes,
+        temporal=parse_expression(text),
+        keywords=frozenset(keywords)
+    )
+
+
+def extract(message: str) -> ExtractedSlots:
+    """Trích mọi slot của tin nhắn. Kết quả được cache theo văn bản đã chuẩn hóa, không được sửa."""
+    return _extract_cached(normalize(message))
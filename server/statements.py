@@ -0,0 +1,222 @@
+"""
+Registry các câu SQL cố định của models.
+
+Mỗi Statement khai báo rõ kiểu (read/write/insert) nên DatabaseManager không
+phải đoán từ chuỗi SQL, và là một object duy nhất trong suốt tiến trình nên
+cursor prepared của mỗi kết nối nhận ra câu đã prepare chỉ bằng so sánh
+identity, không phải parse lại trên server.
+
+Câu READ chạy ngoài transaction có thể được DatabaseManager gửi sang replica;
+câu khóa dòng (FOR UPDATE) khai báo primary_only.
+
+Câu UPDATE có danh sách cột thay đổi được sinh qua schedule_update(), cũng
+được cache để mỗi tổ hợp cột chỉ có một Statement.
+
+Danh sách đọc dần (DatabaseManager.iter_rows) khai báo bằng register_keyset():
+một câu cho trang đầu và một câu cho các trang sau, phân trang theo khóa
+(cột sắp xếp, id) thay vì OFFSET.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Tuple
+import textwrap
+
+READ = 'read'
+WRITE = 'write'
+INSERT = 'insert'
+
+
+@dataclass(frozen=True, eq=False)
+class Statement:
+    name: str
+    sql: str
+    kind: str
+    # Câu đọc phải chạy trên primary (khóa dòng), không bao giờ gửi sang replica
+    primary_only: bool = False
+
+    @property
+    def is_read(self) -> bool:
+        return self.kind == READ
+
+
+REGISTRY: Dict[str, Statement] = {}
+
+
+def register(name: str, sql: str, kind: str, primary_only: bool = False) -> Statement:
+    if kind not in (READ, WRITE, INSERT):
+        raise ValueError(f"Unknown statement kind: {kind}")
+    if name in REGISTRY:
+        raise ValueError(f"Statement {name} is already registered")
+    statement = Statement(name, textwrap.dedent(sql).strip(), kind, primary_only)
+    REGISTRY[name] = statement
+    return statement
+
+
+def get(name: str) -> Statement:
+    return REGISTRY[name]
+
+
+@dataclass(frozen=True, eq=False)
+class Keyset:
+    """Câu đọc theo trang: first(params..., limit), after(params..., khóa dòng cuối..., limit)."""
+    first: Statement
+    after: Statement
+    column: str
+
+    def after_params(self, row) -> Tuple:
+        return (row[self.column], row[self.column], row['id'])
+
+
+def register_keyset(name: str, sql: str, column: str = 'start_time', descending: bool = False) -> Keyset:
+    """sql là SELECT ... WHERE ... không có ORDER BY/LIMIT; thứ tự là (column, id)."""
+    direction, op = ('DESC', '<') if descending else ('ASC', '>')
+    base = textwrap.dedent(sql).strip()
+    order = f"ORDER BY {column} {direction}, id {direction}\nLIMIT %s"
+    after = f"AND ({column} {op} %s OR ({column} = %s AND id {op} %s))"
+    return Keyset(register(name, f"{base}\n{order}", READ),
+                  register(f'{name}_after', f"{base}\n{after}\n{order}", READ),
+                  column)
+
+
+# users
+USER_BY_ID = register('user_by_id', "SELECT * FROM users WHERE id = %s", READ)
+USER_BY_EMAIL = register('user_by_email', "SELECT * FROM users WHERE email = %s", READ)
+USER_INSERT = register('user_insert', """
+    INSERT INTO users (email, password, fullname, created_at, updated_at)
+    VALUES (%s, %s, %s, %s, %s)
+""", INSERT)
+
+# token_revocations: jti NULL = thu hồi mọi token của user cấp trước revoked_at
+TOKEN_REVOKE = register('token_revoke', """
+    INSERT IGNORE INTO token_revocations (user_id, jti, token_type, revoked_at, expires_at)
+    VALUES (%s, %s, %s, %s, %s)
+""", WRITE)
+TOKEN_REVOCATIONS_SINCE = register('token_revocations_since', """
+    SELECT id, user_id, jti, revoked_at, expires_at
+    FROM token_revocations
+    WHERE id > %s AND expires_at > %s AND (jti IS NULL OR token_type = 'access')
+    ORDER BY id ASC
+""", READ)
+TOKEN_USER_CUTOFF = register('token_user_cutoff', """
+    SELECT MAX(revoked_at) AS revoked_at
+    FROM token_revocations
+    WHERE user_id = %s AND jti IS NULL
+""", READ, primary_only=True)
+TOKEN_REVOCATIONS_PURGE = register(
+    'token_revocations_purge', "DELETE FROM token_revocations WHERE expires_at < %s LIMIT 1000", WRITE)
+
+# schedules
+SCHEDULE_INSERT = register('schedule_insert', """
+    INSERT INTO schedules
+    (user_id, event, description, start_time, end_time, location,
+     reminder_minutes, category, priority, status, created_at, updated_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+""", INSERT)
+SCHEDULE_BY_ID = register('schedule_by_id', "SELECT * FROM schedules WHERE id = %s", READ)
+SCHEDULE_BY_ID_FOR_USER = register(
+    'schedule_by_id_for_user', "SELECT * FROM schedules WHERE id = %s AND user_id = %s", READ)
+SCHEDULE_LOCK_FOR_USER = register(
+    'schedule_lock_for_user', "SELECT * FROM schedules WHERE id = %s AND user_id = %s FOR UPDATE", READ,
+    primary_only=True)
+SCHEDULE_STAT_ROW_LOCK = register('schedule_stat_row_lock', """
+    SELECT start_time, category, priority, status
+    FROM schedules WHERE id = %s AND user_id = %s FOR UPDATE
+""", READ, primary_only=True)
+SCHEDULE_DELETE = register('schedule_delete', "DELETE FROM schedules WHERE id = %s", WRITE)
+SCHEDULE_DELETE_FOR_USER = register(
+    'schedule_delete_for_user', "DELETE FROM schedules WHERE id = %s AND user_id = %s", WRITE)
+
+SCHEDULES_FOR_USER = register('schedules_for_user', """
+    SELECT * FROM schedules
+    WHERE user_id = %s
+    ORDER BY start_time DESC
+""", READ)
+SCHEDULES_FOR_USER_ON_DATE = register('schedules_for_user_on_date', """
+    SELECT * FROM schedules
+    WHERE user_id = %s AND DATE(start_time) = %s
+    ORDER BY start_time ASC
+""", READ)
+SCHEDULE_PAGES_FOR_USER = register_keyset('schedule_pages_for_user', """
+    SELECT * FROM schedules
+    WHERE user_id = %s
+""", descending=True)
+SCHEDULE_PAGES_FOR_USER_ON_DATE = register_keyset('schedule_pages_for_user_on_date', """
+    SELECT * FROM schedules
+    WHERE user_id = %s AND DATE(start_time) = %s
+""")
+SCHEDULE_PAGES_IN_DATE_RANGE = register_keyset('schedule_pages_in_date_range', """
+    SELECT * FROM schedules
+    WHERE user_id = %s
+    AND DATE(start_time) BETWEEN %s AND %s
+""")
+SCHEDULES_UPCOMING = register('schedules_upcoming', """
+    SELECT * FROM schedules
+    WHERE user_id = %s
+        AND start_time >= NOW()
+        AND start_time <= DATE_ADD(NOW(), INTERVAL %s HOUR)
+        AND status != 'cancelled'
+    ORDER BY start_time ASC
+""", READ)
+SCHEDULES_CURSOR_OLDER = register('schedules_cursor_older', """
+    SELECT * FROM schedules
+    WHERE user_id = %s AND DATE(start_time) = %s
+    ORDER BY id DESC
+    LIMIT %s
+""", READ)
+SCHEDULES_CURSOR_NEWER = register('schedules_cursor_newer', """
+    SELECT * FROM schedules
+    WHERE user_id = %s AND DATE(start_time) = %s
+    ORDER BY id ASC
+    LIMIT %s
+""", READ)
+SCHEDULE_EXPORT_PAGES = register_keyset('schedule_export_pages', """
+    SELECT id, event, description, start_time, end_time, location, reminder_minutes,
+           category, priority, status, created_at, updated_at
+    FROM schedules
+    WHERE user_id = %s
+""")
+SCHEDULES_SEARCH = register('schedules_search', """
+    SELECT * FROM schedules
+    WHERE user_id = %s
+        AND (event LIKE %s OR description LIKE %s OR location LIKE %s)
+    ORDER BY start_time DESC
+""", READ)
+CALENDAR_ITEMS = register('calendar_items', """
+    SELECT id, event, start_time, end_time, location, reminder_minutes,
+           category, priority, status
+    FROM schedules
+    WHERE user_id = %s AND start_time >= %s AND start_time < %s
+    ORDER BY start_time ASC
+""", READ)
+CALENDAR_DAYS = register('calendar_days', """
+    SELECT DATE(start_time) AS day,
+           COUNT(*) AS count,
+           MAX(CASE priority WHEN 'high' THEN 3 WHEN 'medium' THEN 2 ELSE 1 END) AS priority_rank
+    FROM schedules
+    WHERE user_id = %s AND start_time >= %s AND start_time < %s
+    GROUP BY DATE(start_time)
+    ORDER BY day ASC
+""", READ)
+SCHEDULE_STAT_ROWS = register('schedule_stat_rows', """
+    SELECT DATE(start_time) AS start_time, category, priority, status, COUNT(*) AS count
+    FROM schedules
+    WHERE user_id = %s
+    GROUP BY DATE(start_time), category, priority, status
+""", READ)
+
+
+@lru_cache(maxsize=16)
+def user_update(fields: Tuple[str, ...]) -> Statement:
+    """UPDATE users cho đúng tập cột fields (email, fullname, password)."""
+    set_clause = ", ".join(f"{field} = %s" for field in fields)
+    return Statement(f"user_update[{','.join(fields)}]",
+                     f"UPDATE users SET {set_clause}, updated_at = NOW() WHERE id = %s", WRITE)
+
+
+@lru_cache(maxsize=128)
+def schedule_update(fields: Tuple[str, ...], owned: bool = True) -> Statement:
+    """UPDATE schedules cho đúng tập cột fields (tên cột do code quyết định, không lấy từ input)."""
+    set_clause = ", ".join(f"{field} = %s" for field in fields)
+    where = "id = %s AND user_id = %s" if owned else "id = %s"
+    return Statement(f"schedule_update[{','.join(fields)}]{'' if owned else ':any'}",
+                     f"UPDATE schedules SET {set_clause}, updated_at = NOW() WHERE {where}", WRITE)
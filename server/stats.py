@@ -0,0 +1,157 @@
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional
+import logging
+
+from cache import schedule_versions
+
+logger = logging.getLogger(__name__)
+
+
+class _UserCounters:
+    def __init__(self):
+        self.total = 0
+        self.by_day = Counter()
+        self.by_category = Counter()
+        self.by_priority = Counter()
+        self.by_status = Counter()
+
+    def add(self, row: Dict, delta: int):
+        self.total += delta
+        day = _day_key(row.get('start_time'))
+        if day:
+            self.by_day[day] += delta
+            if self.by_day[day] <= 0:
+                del self.by_day[day]
+        for field, counter in (('category', self.by_category),
+                               ('priority', self.by_priority),
+                               ('status', self.by_status)):
+            key = row.get(field)
+            if key is None:
+                continue
+            counter[key] += delta
+            if counter[key] <= 0:
+                del counter[key]
+
+    def snapshot(self, day_from: Optional[str] = None, day_to: Optional[str] = None) -> Dict:
+        by_day = self.by_day
+        if day_from or day_to:
+            by_day = {
+                day: count for day, count in by_day.items()
+                if (not day_from or day >= day_from) and (not day_to or day <= day_to)
+            }
+        return {
+            'total': self.total,
+            'by_day': dict(sorted(by_day.items())),
+            'by_category': dict(self.by_category),
+            'by_priority': dict(self.by_priority),
+            'by_status': dict(self.by_status)
+        }
+
+
+def _day_key(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return value[:10]
+    if hasattr(value, 'date'):
+        return value.date().isoformat()
+    return str(value)[:10]
+
+
+class ScheduleStats:
+    """
+    Bộ đếm thống kê lịch trình theo user, cập nhật tăng dần trên mỗi lần
+    tạo/sửa/xóa. Bộ đếm của user chỉ được nạp (tính lại toàn bộ từ DB) ở lần
+    đọc đầu tiên; job đối soát định kỳ tính lại để sửa sai lệch.
+
+    Bộ đếm nằm trong từng worker: thao tác ghi ở worker khác không đi qua
+    apply() của worker này, nên khi kênh 'schedule_versions' báo lịch trình
+    của user đổi ở worker khác thì bộ đếm của user bị bỏ và nạp lại ở lần đọc
+    sau.
+    """
+
+    def __init__(self):
+        self._users = {}
+        self._lock = threading.Lock()
+        self._reconciler = None
+        self._stop = threading.Event()
+
+    def is_loaded(self, user_id: int) -> bool:
+        return user_id in self._users
+
+    def load(self, user_id: int, rows):
+        """Nạp bộ đếm từ các dòng đã gom nhóm (day, category, priority, status, count)."""
+        counters = _UserCounters()
+        for row in rows:
+            counters.add(row, int(row.get('count', 1)))
+        with self._lock:
+            self._users[user_id] = counters
+        return counters
+
+    def get(self, user_id: int, day_from: Optional[str] = None, day_to: Optional[str] = None) -> Optional[Dict]:
+        with self._lock:
+            counters = self._users.get(user_id)
+            if counters is None:
+                return None
+            return counters.snapshot(day_from, day_to)
+
+    def apply(self, user_id: int, old_row: Optional[Dict], new_row: Optional[Dict]):
+        with self._lock:
+            counters = self._users.get(user_id)
+            if counters is None:
+                return
+            if old_row:
+                counters.add(old_row, -1)
+            if new_row:
+                counters.add(new_row, 1)
+
+    def forget(self, user_id: int):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def loaded_users(self):
+        with self._lock:
+            return list(self._users.keys())
+
+    def reconcile(self, schedule_model) -> int:
+        """Tính lại bộ đếm cho mọi user đã nạp, trả về số user bị lệch."""
+        drifted = 0
+        for user_id in self.loaded_users():
+            before = self.get(user_id)
+            with schedule_model.db.read_primary():
+                rows = schedule_model.get_schedule_stat_rows(user_id)
+            if rows is None:
+                continue
+            after = self.load(user_id, rows).snapshot()
+            if before != after:
+                drifted += 1
+                logger.warning(f"Schedule stats drift corrected for user {user_id}")
+        return drifted
+
+    def start_reconciler(self, schedule_model, interval_seconds: float):
+        if self._reconciler or interval_seconds <= 0:
+            return
+
+        def run():
+            while not self._stop.wait(interval_seconds):
+                try:
+                    drifted = self.reconcile(schedule_model)
+                    logger.info(f"Schedule stats reconciled, {drifted} user(s) drifted")
+                except Exception as e:
+                    logger.error(f"Schedule stats reconciliation error: {e}")
+
+        self._reconciler = threading.Thread(target=run, name='schedule-stats-reconciler', daemon=True)
+        self._reconciler.start()
+
+    def stop_reconciler(self):
+        self._stop.set()
+        self._reconciler = None
+
+
+schedule_stats = ScheduleStats()
+schedule_versions.on_remote_change(schedule_stats.forget)
@@ -0,0 +1,85 @@
+"""
+Response được ghi dần thay cho dựng toàn bộ body trong bộ nhớ.
+
+- list_response: JSON dạng {"success": true, "<key>": [...], "count": N},
+  encode theo từng batch phần tử
+- text_response: các đoạn text có sẵn (VD: file .ics/.csv khi xuất lịch)
+
+Phần đầu tiên được đọc trước khi trả Response, nên lỗi truy vấn vẫn đi qua
+nhánh except của route (500 JSON như cũ). Lỗi xảy ra sau khi đã gửi header
+không đổi được mã lỗi nữa: list_response đóng mảng và kết thúc bằng
+"truncated": true cùng "error", body vẫn là JSON hợp lệ và client biết danh
+sách chưa đầy đủ; text_response chỉ có thể ghi log và cắt response.
+
+Các phần sau được đọc khi WSGI server lặp body, lúc route (và các khối
+with của nó như db_manager.bind_user) đã kết thúc. Mỗi lần đọc nguồn chạy
+trong bản sao context lấy lúc tạo Response, nên trang sau vẫn gắn user của
+request như trang đầu: cùng quy tắc primary/replica, không đọc dữ liệu cũ hơn.
+"""
+import contextvars
+import itertools
+import logging
+from typing import Dict, Iterable, Optional
+
+from flask import Response, current_app
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+STREAM_ERROR = 'Lỗi khi đọc dữ liệu, danh sách chưa đầy đủ'
+
+
+def list_response(items: Iterable, key: str, batch_size: int = DEFAULT_BATCH_SIZE) -> Response:
+    items = iter(items)
+    # Generator chạy ngoài app context nên lấy encoder của app ngay bây giờ;
+    # separators gọn như jsonify khi không bật debug
+    encode = current_app.json.dumps
+
+    def dumps(batch):
+        # Một lần encode cho cả batch rồi bỏ cặp [] ngoài cùng
+        return encode(batch, separators=(',', ':'))[1:-1]
+
+    context = contextvars.copy_context()
+    first = list(itertools.islice(items, batch_size))
+
+    def generate():
+        count = 0
+        batch = first
+        yield f'{{"success":true,"{key}":['
+        try:
+            while batch:
+                chunk = dumps(batch)
+                yield f',{chunk}' if count else chunk
+                count += len(batch)
+                batch = context.run(list, itertools.islice(items, batch_size))
+        except Exception as e:
+            logger.error(f"Streaming '{key}' failed after {count} items: {e}")
+            yield f'],"count":{count},"truncated":true,"error":{encode(STREAM_ERROR)}}}'
+            return
+        yield f'],"count":{count}}}'
+
+    return _closing_response(Response(generate(), mimetype='application/json'), items, context)
+
+
+def text_response(chunks: Iterable[str], mimetype: str, headers: Optional[Dict] = None) -> Response:
+    chunks = iter(chunks)
+    context = contextvars.copy_context()
+    first = next(chunks, '')
+
+    def generate():
+        yield first
+        while True:
+            chunk = context.run(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    return _closing_response(Response(generate(), mimetype=mimetype, headers=headers), chunks, context)
+
+
+def _closing_response(response: Response, source, context: contextvars.Context) -> Response:
+    close = getattr(source, 'close', None)
+    if close is not None:
+        # Chạy cả khi body không được đọc (HEAD, client ngắt kết nối)
+        response.call_on_close(lambda: context.run(close))
+    return response
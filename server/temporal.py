@@ -0,0 +1,325 @@
+"""
+Phân tích biểu thức thời gian tiếng Việt bằng rule, không cần LLM.
+
+parse_expression() chỉ phụ thuộc vào văn bản (cache được), còn
+TemporalExpression.resolve() ghép biểu thức với thời điểm hiện tại theo múi
+giờ của người dùng để ra datetime cụ thể.
+
+Hỗ trợ:
+- ngày tương đối: hôm nay, mai, ngày mốt, ngày kia, hôm qua, "3 ngày nữa", "sau 2 tuần"
+- khoảng tương đối: "2 tiếng nữa", "sau 30 phút"
+- thứ trong tuần: "thứ 6", "thứ sáu", "chủ nhật", "thứ 2 tuần sau"
+- ngày tuyệt đối: 20/10, 20-10-2026, "ngày 20 tháng 10", "ngày 20"
+- giờ: 9h, 9h30, 14:30, "2 giờ chiều", "8 giờ rưỡi", "9 giờ kém 15", buổi (sáng/trưa/chiều/tối/đêm)
+- khoảng giờ: "từ 9h đến 11h", "14:00-15:30"
+"""
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+    ZoneInfoNotFoundError = Exception
+
+DEFAULT_TIMEZONE = 'Asia/Ho_Chi_Minh'
+
+# Việt Nam không có giờ mùa hè nên offset cố định là đủ khi máy thiếu tzdata
+_FALLBACK_OFFSETS = {'Asia/Ho_Chi_Minh': 7, 'Asia/Saigon': 7, 'UTC': 0}
+
+RELATIVE_DAY_KEYWORDS = {
+    'hôm nay': 0,
+    'bữa nay': 0,
+    'ngày mai': 1,
+    'mai': 1,
+    'ngày mốt': 2,
+    'ngày kia': 2,
+    'mốt': 2,
+    'hôm qua': -1,
+}
+PERIOD_KEYWORDS = {
+    'sáng': 'morning',
+    'trưa': 'noon',
+    'chiều': 'afternoon',
+    'tối': 'evening',
+    'đêm': 'night',
+}
+# Giờ mặc định khi chỉ có buổi mà không có giờ cụ thể
+PERIOD_DEFAULT_HOUR = {'morning': 8, 'noon': 12, 'afternoon': 14, 'evening': 19, 'night': 21}
+# Giờ mặc định khi chỉ có ngày (không phải hôm nay) mà không có giờ/buổi
+DEFAULT_HOUR = 9
+WEEKDAY_NAMES = {'hai': 0, 'ba': 1, 'tư': 2, 'năm': 3, 'sáu': 4, 'bảy': 5}
+
+REMINDER_PATTERN = re.compile(
+    r'(?:nhắc\s+)?trước\s+(\d+)\s+(phút|giờ|tiếng)|(\d+)\s+(phút|giờ|tiếng)\s+trước'
+)
+OFFSET_PATTERN = re.compile(
+    r'(?:sau\s+)?(\d+)\s*(phút|giờ|tiếng|ngày|tuần)\s+nữa|sau\s+(\d+)\s*(phút|giờ|tiếng|ngày|tuần)(?!\s+trước)'
+)
+RELATIVE_DAY_PATTERN = re.compile(
+    r'(?<!\w)(' + '|'.join(sorted(RELATIVE_DAY_KEYWORDS, key=len, reverse=True)) + r')(?!\w)'
+)
+PERIOD_PATTERN = re.compile(r'(?<!\w)(sáng|trưa|chiều|tối|đêm)(\s+nay)?(?!\w)')
+WEEKDAY_PATTERN = re.compile(
+    r'(?<!\w)(?:thứ\s*(?:([2-7])|(hai|ba|tư|năm|sáu|bảy))|chủ\s*nhật|cn)(?!\w)'
+    r'(?:\s+(tuần\s+(?:sau|tới|này)))?'
+)
+NEXT_WEEK_PATTERN = re.compile(r'(?<!\w)tuần\s+(?:sau|tới)(?!\w)')
+NUMERIC_DATE_PATTERN = re.compile(
+    r'(?<![\d:/-])(\d{1,2})\s*[/-]\s*(\d{1,2})(?:\s*[/-]\s*(\d{4}|\d{2}))?(?![\d:/-])'
+)
+WORDED_DATE_PATTERN = re.compile(
+    r'(?<!\w)ngày\s+(\d{1,2})(?:\s+tháng\s+(\d{1,2})(?:\s+năm\s+(\d{4}))?)?(?![\d/-])'
+)
+TIME_PATTERN = re.compile(
+    r'(?<![\d/])(\d{1,2})\s*(?:(?:h|giờ|g|:)\s*(\d{1,2})?\s*(?:phút|p)?|(?=\s*(?:sáng|trưa|chiều|tối|đêm)))'
+    r'(\s*rưỡi|\s*kém\s*(\d{1,2}))?(?![\d/])'
+)
+# Cho phép buổi giữa giờ đầu và dấu nối: "3h chiều đến 5h"
+RANGE_SEPARATOR_PATTERN = re.compile(r'\s*(?:(?:sáng|trưa|chiều|tối|đêm)\s*)?(?:-|–|đến|tới)\s*')
+
+
+def get_timezone(name: Optional[str] = None) -> tzinfo:
+    name = name or DEFAULT_TIMEZONE
+    if ZoneInfo is not None:
+        try:
+            return ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    return timezone(timedelta(hours=_FALLBACK_OFFSETS.get(name, 7)), name)
+
+
+def now_in(tz: Optional[tzinfo] = None) -> datetime:
+    """Thời điểm hiện tại theo múi giờ tz, đã bỏ giây để so sánh với giờ người dùng nói."""
+    return datetime.now(tz or get_timezone()).replace(second=0, microsecond=0)
+
+
+@dataclass(frozen=True)
+class TemporalExpression:
+    day_offset: Optional[int] = None
+    weekday: Optional[int] = None
+    week_offset: int = 0
+    day: Optional[int] = None
+    month: Optional[int] = None
+    year: Optional[int] = None
+    hour: Optional[int] = None
+    minute: Optional[int] = None
+    period: Optional[str] = None
+    end_hour: Optional[int] = None
+    end_minute: Optional[int] = None
+    offset_minutes: Optional[int] = None
+
+    @property
+    def has_date(self) -> bool:
+        return self.day_offset is not None or self.weekday is not None or self.day is not None
+
+    @property
+    def has_time(self) -> bool:
+        return self.hour is not None or self.period is not None or self.offset_minutes is not None
+
+    @property
+    def is_explicit(self) -> bool:
+        """Có ngày, giờ hoặc khoảng thời gian cụ thể; chỉ một từ chỉ buổi ("ăn tối") thì không."""
+        return self.has_date or self.hour is not None or self.offset_minutes is not None
+
+    def resolve(self, now: Optional[datetime] = None) -> Optional[Tuple[datetime, Optional[datetime]]]:
+        """Trả về (start, end) cùng tzinfo với now; end là None nếu không có khoảng giờ."""
+        now = now or now_in()
+
+        if self.offset_minutes is not None and not self.has_date and self.hour is None:
+            return now + timedelta(minutes=self.offset_minutes), None
+
+        target_date = self._resolve_date(now)
+        if target_date is None:
+            return None
+
+        hour, minute = self.hour, self.minute or 0
+        if hour is None:
+            if self.period:
+                hour = PERIOD_DEFAULT_HOUR[self.period]
+            elif target_date == now.date():
+                hour, minute = now.hour + 1, 0
+            else:
+                hour = DEFAULT_HOUR
+        else:
+            hour = _apply_period(hour, self.period)
+
+        start = _combine(target_date, hour, minute, now.tzinfo)
+
+        # "9h" không kèm ngày mà đã qua trong hôm nay thì hiểu là ngày mai
+        if not self.has_date and start <= now:
+            start += timedelta(days=1)
+
+        end = None
+        if self.end_hour is not None:
+            end = _combine(start.date(), _apply_period(self.end_hour, self.period), self.end_minute or 0, now.tzinfo)
+            if end <= start and self.end_hour < 12:
+                end += timedelta(hours=12)
+            if end <= start:
+                end += timedelta(days=1)
+        return start, end
+
+    def _resolve_date(self, now: datetime) -> Optional[date]:
+        today = now.date()
+
+        if self.day is not None:
+            month = self.month or today.month
+            year = self.year or today.year
+            try:
+                target = date(year, month, self.day)
+            except ValueError:
+                return None
+            if self.year is None and target < today:
+                # "ngày 5" khi đã qua ngày 5 tháng này là tháng sau, "5/1" đã qua là năm sau
+                try:
+                    target = date(year + 1, month, self.day) if self.month else _add_month(target)
+                except ValueError:
+                    return None
+            return target
+
+        if self.weekday is not None:
+            if self.week_offset:
+                monday = today - timedelta(days=today.weekday()) + timedelta(weeks=self.week_offset)
+                return monday + timedelta(days=self.weekday)
+            return today + timedelta(days=(self.weekday - today.weekday()) % 7)
+
+        offset = self.day_offset or 0
+        if self.offset_minutes is not None:
+            offset += self.offset_minutes // (24 * 60)
+        return today + timedelta(days=offset)
+
+
+def _apply_period(hour: int, period: Optional[str]) -> int:
+    if period in ('afternoon', 'evening') and hour < 12:
+        return hour + 12
+    if period == 'night' and 6 <= hour <= 12:
+        # "12h đêm" là 0h của ngày hôm sau; _combine chuyển giờ 24 sang ngày kế tiếp
+        return hour + 12
+    if period == 'noon' and hour < 6:
+        return hour + 12
+    return hour
+
+
+def _combine(target_date: date, hour: int, minute: int, tz: Optional[tzinfo]) -> datetime:
+    extra_days, hour = divmod(hour, 24)
+    return datetime.combine(target_date + timedelta(days=extra_days), time(hour, minute), tz)
+
+
+def _add_month(value: date) -> date:
+    if value.month == 12:
+        return value.replace(year=value.year + 1, month=1)
+    return value.replace(month=value.month + 1)
+
+
+def _overlaps(start: int, end: int, spans: List[Tuple[int, int]]) -> bool:
+    return any(start < span_end and span_start < end for span_start, span_end in spans)
+
+
+def _parse_time(match) -> Optional[Tuple[int, int]]:
+    hour = int(match.group(1))
+    minute = int(match.group(2)) if match.group(2) else 0
+    if hour > 24 or minute > 59:
+        return None
+    suffix = match.group(3) or ''
+    if 'rưỡi' in suffix:
+        minute = 30
+    elif match.group(4):
+        before = int(match.group(4))
+        if not 0 < before < 60:
+            return None
+        hour, minute = hour - 1, 60 - before
+    return hour, minute
+
+
+@lru_cache(maxsize=1024)
+def parse_expression(text: str) -> Optional[TemporalExpression]:
+    """Phân tích văn bản đã chuẩn hóa (NFC + lowercase); None nếu không có thông tin thời gian."""
+    fields = {}
+    # Các đoạn đã dùng (nhắc trước, "2 tiếng nữa", ngày) không được đọc lại thành giờ
+    used: List[Tuple[int, int]] = [m.span() for m in REMINDER_PATTERN.finditer(text)]
+
+    for match in OFFSET_PATTERN.finditer(text):
+        if _overlaps(*match.span(), used):
+            continue
+        value = int(match.group(1) or match.group(3))
+        unit = match.group(2) or match.group(4)
+        if unit == 'phút':
+            fields['offset_minutes'] = value
+        elif unit in ('giờ', 'tiếng'):
+            fields['offset_minutes'] = value * 60
+        elif unit == 'ngày':
+            fields['day_offset'] = value
+        else:
+            fields['day_offset'] = value * 7
+        used.append(match.span())
+        break
+
+    for pattern in (NUMERIC_DATE_PATTERN, WORDED_DATE_PATTERN):
+        for match in pattern.finditer(text):
+            if _overlaps(*match.span(), used):
+                continue
+            day = int(match.group(1))
+            month = int(match.group(2)) if match.group(2) else None
+            if not 1 <= day <= 31 or (month is not None and not 1 <= month <= 12):
+                continue
+            fields['day'], fields['month'] = day, month
+            if match.group(3):
+                year = int(match.group(3))
+                fields['year'] = year + 2000 if year < 100 else year
+            used.append(match.span())
+            break
+        if 'day' in fields:
+            break
+
+    if 'day' not in fields:
+        match = WEEKDAY_PATTERN.search(text)
+        if match:
+            if match.group(1):
+                fields['weekday'] = int(match.group(1)) - 2
+            elif match.group(2):
+                fields['weekday'] = WEEKDAY_NAMES[match.group(2)]
+            else:
+                fields['weekday'] = 6
+            if match.group(3) and 'này' not in match.group(3):
+                fields['week_offset'] = 1
+            used.append(match.span())
+        elif NEXT_WEEK_PATTERN.search(text) and 'day_offset' not in fields:
+            fields['weekday'], fields['week_offset'] = 0, 1
+
+    if 'day' not in fields and 'weekday' not in fields and 'day_offset' not in fields:
+        # Ưu tiên cụm dài nhất ("ngày mai" hơn "mai") nhờ thứ tự trong regex, sau đó là cụm xuất hiện trước
+        match = RELATIVE_DAY_PATTERN.search(text)
+        if match:
+            fields['day_offset'] = RELATIVE_DAY_KEYWORDS[match.group(1)]
+
+    match = PERIOD_PATTERN.search(text)
+    if match:
+        fields['period'] = PERIOD_KEYWORDS[match.group(1)]
+        if match.group(2) and not any(key in fields for key in ('day', 'weekday', 'day_offset')):
+            fields['day_offset'] = 0
+
+    times = [m for m in TIME_PATTERN.finditer(text) if not _overlaps(*m.span(), used)]
+    for index, match in enumerate(times):
+        parsed = _parse_time(match)
+        if parsed is None:
+            continue
+        fields['hour'], fields['minute'] = parsed
+        if index + 1 < len(times):
+            following = times[index + 1]
+            if RANGE_SEPARATOR_PATTERN.fullmatch(text[match.end():following.start()]):
+                parsed_end = _parse_time(following)
+                if parsed_end:
+                    fields['end_hour'], fields['end_minute'] = parsed_end
+        break
+
+    if not fields:
+        return None
+    return TemporalExpression(**fields)
+
+
+def format_datetime(value: datetime) -> str:
+    """Định dạng lưu DB: giờ địa phương không kèm múi giờ."""
+    return value.strftime('%Y-%m-%d %H:%M:%S')
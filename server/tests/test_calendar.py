@@ -0,0 +1,83 @@
+"""
+GET /api/schedules/calendar khi DB lỗi, không cần MySQL.
+
+    python -m pytest tests/test_calendar.py
+
+App thật với DB giả: fetch_all trả None (như DatabaseManager khi truy vấn
+lỗi) cho tới khi `down` được tắt. Lỗi đọc phải trả 500 và không được cache
+thành một tháng trống.
+"""
+import contextlib
+import logging
+import os
+from datetime import datetime
+
+import pytest
+
+import app as app_module
+import ratelimit
+from cache import calendar_cache
+from tokens import token_service
+
+MONTH = '2026-01'
+
+
+class CalendarDB:
+    def __init__(self):
+        self.down = True
+        self.reads = 0
+
+    def fetch_all(self, statement, params=None):
+        self.reads += 1
+        if self.down:
+            return None
+        if statement.name == 'calendar_days':
+            return [{'day': datetime(2026, 1, 5).date(), 'count': 1, 'priority_rank': 2}]
+        return [{'id': 1, 'event': 'Họp nhóm', 'start_time': datetime(2026, 1, 5, 9), 'end_time': None,
+                 'location': None, 'reminder_minutes': None, 'category': 'meeting', 'priority': 'medium',
+                 'status': 'pending'}]
+
+    def bind_user(self, user_id):
+        return contextlib.nullcontext()
+
+
+@pytest.fixture
+def client():
+    logging.disable(logging.CRITICAL)
+    app_module.create_app(start_background=False)
+    app_module._background_pid = os.getpid()  # không chạy job queue/health monitor cho DB giả
+    ratelimit.limiter.enabled = False
+    previous, app_module.db_manager = app_module.db_manager, CalendarDB()
+    calendar_cache.clear()
+    yield app_module.app.test_client()
+    app_module.db_manager = previous
+    logging.disable(logging.NOTSET)
+
+
+def get_month(client, summary=False):
+    headers = {'Authorization': f"Bearer {token_service.issue(1)['access_token']}"}
+    return client.get(f"/api/schedules/calendar?month={MONTH}&summary={'true' if summary else 'false'}",
+                      headers=headers)
+
+
+@pytest.mark.parametrize('summary', [False, True])
+def test_failed_read_is_an_error_and_not_cached(client, summary):
+    db = app_module.db_manager
+    response = get_month(client, summary)
+    assert response.status_code == 500
+    assert response.get_json()['success'] is False
+
+    db.down = False
+    response = get_month(client, summary)
+    assert response.status_code == 200
+    assert response.get_json()['count'] == 1
+    if summary:
+        assert response.get_json()['days'][0]['count'] == 1
+
+
+def test_successful_read_is_cached(client):
+    app_module.db_manager.down = False
+    get_month(client)
+    reads = app_module.db_manager.reads
+    assert get_month(client).status_code == 200
+    assert app_module.db_manager.reads == reads
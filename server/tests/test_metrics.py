@@ -0,0 +1,52 @@
+"""
+Histogram thời gian request của metrics.init_app với response thường và response stream.
+
+    python -m pytest tests/test_metrics.py
+"""
+import time
+
+import pytest
+from flask import Flask, Response
+
+import metrics
+
+
+def duration_sum(route: str) -> float:
+    prefix = f'http_request_duration_seconds_sum{{route="{route}"'
+    lines = [line for line in metrics.registry.render().splitlines() if line.startswith(prefix)]
+    return sum(float(line.rsplit(' ', 1)[1]) for line in lines)
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    metrics.init_app(app, lambda: False)
+
+    @app.route('/test-metrics/plain')
+    def plain():
+        return 'ok'
+
+    @app.route('/test-metrics/stream')
+    def stream():
+        def generate():
+            yield '['
+            time.sleep(0.2)
+            yield ']'
+        return Response(generate(), mimetype='application/json')
+
+    return app.test_client()
+
+
+def test_streamed_response_is_observed_until_the_body_is_sent(client):
+    before = duration_sum('/test-metrics/stream')
+    response = client.get('/test-metrics/stream')
+    assert duration_sum('/test-metrics/stream') == before
+    response.get_data()
+    response.close()
+    assert duration_sum('/test-metrics/stream') - before >= 0.2
+
+
+def test_plain_response_is_observed_in_after_request(client):
+    before = duration_sum('/test-metrics/plain')
+    client.get('/test-metrics/plain')
+    assert duration_sum('/test-metrics/plain') > before
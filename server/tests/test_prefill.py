@@ -0,0 +1,77 @@
+"""
+Giá trị rule điền trước (thời gian, nhắc trước) trong kết quả intent, không cần LLM.
+
+    python -m pytest tests/test_prefill.py
+
+Backend stub trả intent suy từ từ khóa; mốc thời gian cố định là thứ Hai
+2026-01-05 10:00.
+"""
+from datetime import datetime
+
+import pytest
+
+from ai_assistant import PersonalAssistant
+from config import config
+import llm_backends
+
+ANCHOR = datetime(2026, 1, 5, 10, 0)
+
+
+@pytest.fixture(scope='module')
+def assistant():
+    assistant = PersonalAssistant(config['default'], None)
+    assistant.llm = llm_backends.StubBackend()
+    assistant.batcher = None
+    return assistant
+
+
+def analyze(assistant, message):
+    now = ANCHOR.replace(tzinfo=assistant.timezone)
+    prefilled = assistant._prefill_schedule_fields(message, now)
+    prompt = assistant._create_intent_analysis_prompt(message, 1, [], prefilled, now)
+    parsed = assistant._parse_ollama_response(assistant.llm.generate(prompt).text, message)
+    return assistant._merge_prefilled_fields(parsed, prefilled)
+
+
+def test_period_word_alone_is_not_prefilled(assistant):
+    now = ANCHOR.replace(tzinfo=assistant.timezone)
+    assert 'datetime' not in assistant._prefill_schedule_fields('đổi tên lịch 5 thành ăn tối với gia đình', now)
+
+
+def test_period_word_with_date_is_prefilled(assistant):
+    now = ANCHOR.replace(tzinfo=assistant.timezone)
+    prefilled = assistant._prefill_schedule_fields('ăn tối với gia đình ngày mai', now)
+    assert prefilled['datetime'] == '2026-01-06 19:00:00'
+
+
+def test_rename_does_not_move_the_schedule(assistant):
+    data = analyze(assistant, 'đổi tên lịch 5 thành ăn tối với gia đình')
+    assert data['intent'] == 'update'
+    assert 'datetime' not in data['schedule_data']
+    assert 'prefilled_fields' not in data
+
+
+def test_update_with_new_time_uses_the_prefilled_time(assistant):
+    data = analyze(assistant, 'sửa lịch 15 thành 10h sáng thứ 6')
+    assert data['intent'] == 'update'
+    assert data['schedule_data']['datetime'] == '2026-01-09 10:00:00'
+
+
+@pytest.mark.parametrize('llm_output, expected', [
+    ({'schedule_data': {'event': 'ăn tối'}}, {'event': 'ăn tối'}),
+    ({'schedule_data': {}, 'changed_fields': ['reminder_minutes']}, {'reminder_minutes': 15}),
+    ({'schedule_data': {}, 'changed_fields': ['datetime']},
+     {'datetime': '2026-01-06 09:00:00', 'end_time': '2026-01-06 10:00:00'}),
+    ({'schedule_data': {}, 'changed_fields': 'datetime'}, {}),
+])
+def test_update_only_takes_fields_the_llm_marked_as_changed(assistant, llm_output, expected):
+    prefilled = {'datetime': '2026-01-06 09:00:00', 'end_time': '2026-01-06 10:00:00', 'reminder_minutes': 15}
+    data = assistant._merge_prefilled_fields(dict(llm_output, intent='update'), prefilled)
+    assert data['schedule_data'] == expected
+
+
+def test_new_schedule_always_takes_prefilled_fields(assistant):
+    data = analyze(assistant, 'nhắc tôi họp lúc 9h sáng mai trước 15 phút')
+    assert data['intent'] == 'schedule'
+    assert data['schedule_data']['datetime'] == '2026-01-06 09:00:00'
+    assert data['schedule_data']['reminder_minutes'] == 15
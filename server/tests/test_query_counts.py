@@ -0,0 +1,105 @@
+"""
+Ngân sách số câu SQL mà một lượt chat chạy cho từng intent, không cần MySQL.
+
+    python -m pytest tests/test_query_counts.py
+
+PersonalAssistant dùng StubBackend và một DB giả chỉ ghi lại các câu lệnh.
+token_required chỉ giải mã access token, không truy vấn DB, nên các con số
+là toàn bộ truy vấn của lượt chat. transactions đếm số lần lấy kết nối
+(mỗi lần là một round trip tới pool); sửa/xóa chạy câu ghi và câu đọc dòng
+trong cùng một transaction.
+"""
+import contextlib
+import logging
+from datetime import datetime
+
+import pytest
+
+from benchmarks import corpus
+from ai_assistant import PersonalAssistant
+from config import config
+from database import fingerprint_query
+from request_context import RequestContext
+import llm_backends
+
+# (tin nhắn, loại phản hồi mong đợi, số câu SQL tối đa, số transaction tối đa)
+BUDGETS = [
+    ('chào bạn', 'general_conversation', 1, 1),
+    ('xem lịch', 'schedule_list', 1, 1),
+    ('mai có gì', 'schedule_list', 2, 2),
+    ('nhắc tôi họp lúc 9h sáng mai trước 15 phút', 'schedule_created', 2, 2),
+    ('sửa lịch 15 thành 10h sáng thứ 6', 'schedule_updated', 3, 2),
+    ('xóa lịch 12', 'schedule_deleted', 3, 2),
+]
+
+
+class CountingDB:
+    """Thay DatabaseManager: ghi lại câu lệnh và trả về dữ liệu từ corpus."""
+
+    def __init__(self, schedules):
+        self.rows = [
+            dict(row, **{key: datetime.fromisoformat(row[key])
+                         for key in ('start_time', 'end_time', 'created_at', 'updated_at')})
+            for row in schedules
+        ]
+        self.statements = []
+        self.transactions = 0
+
+    def execute_query(self, query, params=None, fetch=True):
+        self.transactions += 1
+        self.statements.append(fingerprint_query(query)[1])
+        statement = query.strip().lower()
+        if statement.startswith('select'):
+            return list(self.rows)
+        if statement.startswith('insert'):
+            return len(self.rows) + 1
+        return 1
+
+    def fetch_all(self, statement, params=None):
+        return self.execute_query(statement.sql, params)
+
+    def fetch_one(self, statement, params=None):
+        rows = self.execute_query(statement.sql, params)
+        return rows[0] if rows else None
+
+    def execute(self, statement, params=None):
+        return self.execute_query(statement.sql, params, fetch=False)
+
+    def after_commit(self, callback):
+        callback()
+
+    def transaction(self, savepoint=True):
+        return contextlib.nullcontext(self)
+
+    def execute_returning(self, statement, params, select, select_params, select_first=False):
+        self.transactions += 1
+        queries = [select, statement] if select_first else [statement, select]
+        self.statements.extend(fingerprint_query(query.sql)[1] for query in queries)
+        return 1, self.rows[0] if self.rows else None
+
+
+@pytest.fixture
+def db():
+    return CountingDB(corpus.make_schedules(20))
+
+
+@pytest.fixture
+def assistant(db):
+    logging.disable(logging.WARNING)
+    assistant = PersonalAssistant(config['default'], db)
+    assistant.llm = llm_backends.StubBackend()
+    assistant.batcher = None
+    yield assistant
+    logging.disable(logging.NOTSET)
+
+
+@pytest.mark.parametrize('message,response_type,max_queries,max_transactions', BUDGETS,
+                         ids=[budget[1] for budget in BUDGETS])
+def test_chat_query_budget(assistant, db, message, response_type, max_queries, max_transactions):
+    response = assistant.process_message(RequestContext(1), message)
+
+    assert response.get('success'), response.get('message')
+    assert response.get('type') == response_type
+    statements = '\n'.join(db.statements)
+    assert len(db.statements) <= max_queries, f"{len(db.statements)} statements:\n{statements}"
+    assert db.transactions <= max_transactions, f"{db.transactions} transactions:\n{statements}"
@@ -0,0 +1,275 @@
+"""
+Định tuyến đọc primary/replica của DatabaseManager, không cần MySQL.
+
+    python -m pytest tests/test_replica_routing.py
+
+Một primary và hai replica giả: mỗi "server" có bảng schedules riêng trong bộ
+nhớ, replica chỉ thấy dữ liệu đã được sao chép (replicate()) và báo độ trễ
+qua SHOW REPLICA STATUS. Mỗi test kiểm tra câu đọc thực sự chạy trên server nào.
+"""
+import copy
+import logging
+import time
+
+import pytest
+from flask import Flask
+from mysql.connector import Error
+
+from config import config
+from database import DatabaseManager
+from models import ScheduleModel, UserModel
+import statements
+import streaming
+
+_ROW = {'id': 1, 'user_id': 1, 'event': 'họp', 'description': '', 'start_time': None, 'end_time': None,
+        'location': None, 'reminder_minutes': None, 'category': 'general', 'priority': 'medium',
+        'status': 'pending', 'created_at': None, 'updated_at': None}
+
+
+class FakeServer:
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = {}
+        self.lag = 0
+        self.down = False
+        self.reads = 0
+        self.writes = 0
+
+
+class FakeCursor:
+    def __init__(self, server: FakeServer, dictionary=False):
+        self.server = server
+        self.dictionary = dictionary
+        self.rowcount = 0
+        self.lastrowid = None
+        self.column_names = tuple(_ROW)
+        self._rows = []
+
+    def execute(self, query, params=None):
+        statement = query.strip().upper()
+        if statement.startswith('SHOW REPLICA STATUS'):
+            self.column_names = ('Seconds_Behind_Source',)
+            self._rows = [{'Seconds_Behind_Source': self.server.lag}]
+            return
+        if statement.startswith('SELECT'):
+            self.server.reads += 1
+            if 'FROM USERS' in statement:
+                self._rows = [dict(_ROW, email='a@example.com', password='x', fullname='A')] \
+                    if self.server.rows else []
+                self.column_names = tuple(self._rows[0]) if self._rows else ()
+            elif 'WHERE ID = %S' in statement:
+                row = self.server.rows.get(params[0])
+                self._rows = [dict(row)] if row else []
+            else:
+                self._rows = [dict(row) for row in self.server.rows.values()]
+                if statement.endswith('LIMIT %S'):
+                    # Trang keyset theo id giảm dần (start_time của các dòng giả đều như nhau)
+                    self._rows.sort(key=lambda row: row['id'], reverse=True)
+                    if 'ID < %S' in statement:
+                        self._rows = [row for row in self._rows if row['id'] < params[-2]]
+                    self._rows = self._rows[:params[-1]]
+            self.rowcount = len(self._rows)
+            return
+        self.server.writes += 1
+        new_id = max(self.server.rows, default=0) + 1
+        self.server.rows[new_id] = dict(_ROW, id=new_id)
+        self.lastrowid = new_id
+        self.rowcount = 1
+
+    def _shape(self, rows):
+        return rows if self.dictionary else [tuple(row.values()) for row in rows]
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return self._shape(rows)
+
+    def fetchone(self):
+        rows = self.fetchall()
+        return rows[0] if rows else None
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return self._shape(rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, server: FakeServer):
+        self.server = server
+        self.connection_id = 1
+        self.in_transaction = False
+
+    def cursor(self, dictionary=False, **kwargs):
+        return FakeCursor(self.server, dictionary)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, server: FakeServer):
+        self.server = server
+
+    def get_connection(self):
+        if self.server.down:
+            raise Error(msg=f'{self.server.name} is down')
+        return FakeConnection(self.server)
+
+
+class StandInDatabaseManager(DatabaseManager):
+    def __init__(self, primary: FakeServer, replicas):
+        self.servers = (primary, replicas)
+        stand_in = copy.copy(config['default'])
+        stand_in.MYSQL_REPLICAS = [server.name for server in replicas]
+        stand_in.DB_REPLICA_STICKY_SECONDS = 0.2
+        stand_in.SLOW_QUERY_THRESHOLD_MS = float('inf')
+        super().__init__(stand_in)
+
+    def _create_connection_pool(self):
+        self.connection_pool = FakePool(self.servers[0])
+
+    def _create_replica_pools(self):
+        from database import Replica
+        self.replicas = [Replica(server.name, FakePool(server)) for server in self.servers[1]]
+
+
+class Cluster:
+    def __init__(self):
+        self.primary = FakeServer('primary')
+        self.replica_a, self.replica_b = FakeServer('replica-a'), FakeServer('replica-b')
+        self.servers = (self.primary, self.replica_a, self.replica_b)
+        self.db = StandInDatabaseManager(self.primary, [self.replica_a, self.replica_b])
+        self.schedules = ScheduleModel(self.db)
+        self.users = UserModel(self.db)
+
+    def replicate(self):
+        for replica in (self.replica_a, self.replica_b):
+            replica.rows = copy.deepcopy(self.primary.rows)
+
+    def reads_on(self, action):
+        """Tên các server đã nhận câu đọc trong lúc chạy action."""
+        before = [server.reads for server in self.servers]
+        action()
+        return sorted(server.name for server, count in zip(self.servers, before) if server.reads > count)
+
+    def write_as(self, user_id: int):
+        with self.db.bind_user(user_id):
+            self.schedules.create_schedule(user_id, {'event': 'họp', 'start_time': '2026-01-05T10:00:00'})
+
+
+@pytest.fixture
+def cluster():
+    logging.disable(logging.WARNING)
+    yield Cluster()
+    logging.disable(logging.NOTSET)
+
+
+@pytest.fixture
+def checked(cluster):
+    """Cluster đã qua một lần kiểm tra độ trễ: mọi replica khỏe."""
+    cluster.db.check_replicas()
+    return cluster
+
+
+def list_twice(cluster):
+    return lambda: (cluster.schedules.get_user_schedules(1), cluster.schedules.get_user_schedules(1))
+
+
+def test_reads_go_to_primary_before_first_lag_check(cluster):
+    assert cluster.reads_on(lambda: cluster.schedules.get_user_schedules(1)) == ['primary']
+
+
+def test_healthy_replicas_round_robin(checked):
+    assert checked.reads_on(list_twice(checked)) == ['replica-a', 'replica-b']
+
+
+def test_read_your_writes_right_after_a_write(checked):
+    checked.write_as(1)
+    with checked.db.bind_user(1):
+        assert checked.reads_on(lambda: checked.schedules.get_user_schedules(1)) == ['primary']
+
+
+def test_another_user_is_not_sticky(checked):
+    checked.write_as(1)
+    with checked.db.bind_user(2):
+        reads = checked.reads_on(lambda: checked.schedules.get_user_schedules(2))
+    assert reads in (['replica-a'], ['replica-b'])
+
+
+def test_sticky_window_expires(checked):
+    checked.write_as(1)
+    time.sleep(0.25)
+    checked.replicate()
+    with checked.db.bind_user(1):
+        reads = checked.reads_on(lambda: checked.schedules.get_user_schedules(1))
+    assert reads in (['replica-a'], ['replica-b'])
+
+
+def test_point_lookup_missing_on_replica_retries_primary(checked):
+    checked.primary.rows[99] = dict(_ROW, id=99)
+    reads = checked.reads_on(lambda: checked.schedules.get_schedule_by_id(99))
+    assert reads == ['primary', 'replica-a']
+
+
+def test_user_lookup_found_on_replica(checked):
+    checked.write_as(1)
+    checked.replicate()
+    reads = checked.reads_on(lambda: checked.users.get_user_by_email('a@example.com'))
+    assert reads in (['replica-a'], ['replica-b'])
+
+
+def test_reads_inside_a_transaction_use_primary(checked):
+    with checked.db.transaction():
+        assert checked.reads_on(lambda: checked.schedules.get_user_schedules(1)) == ['primary']
+
+
+def test_read_primary_forces_primary(checked):
+    with checked.db.read_primary():
+        assert checked.reads_on(lambda: checked.schedules.get_user_schedules(1)) == ['primary']
+
+
+def test_listing_stream_goes_to_a_replica(checked):
+    reads = checked.reads_on(lambda: list(checked.schedules.iter_user_schedules(1)))
+    assert reads in (['replica-a'], ['replica-b'])
+
+
+def test_streamed_pages_keep_the_user_binding(checked):
+    for _ in range(5):
+        checked.write_as(1)
+    checked.replicate()
+    checked.write_as(1)
+    with Flask(__name__).app_context():
+        with checked.db.bind_user(1):
+            rows = (dict(row) for row in checked.db.iter_rows(statements.SCHEDULE_PAGES_FOR_USER, (1,), batch_size=2))
+            response = streaming.list_response(rows, 'schedules', batch_size=2)
+        # Body được đọc sau khi route đã ra khỏi bind_user, như khi WSGI server gửi response
+        reads = checked.reads_on(lambda: response.get_data())
+    assert reads == ['primary']
+    assert response.get_json()['count'] == 6
+
+
+def test_lagging_replica_is_skipped(checked):
+    checked.replica_a.lag = 30
+    checked.db.check_replicas()
+    assert checked.reads_on(list_twice(checked)) == ['replica-b']
+
+
+def test_replica_down_falls_back_to_primary_until_next_check(checked):
+    checked.replica_a.lag = 30
+    checked.db.check_replicas()
+    checked.replica_b.down = True
+    assert checked.reads_on(lambda: checked.schedules.get_user_schedules(1)) == ['primary']
+    assert checked.reads_on(lambda: checked.schedules.get_user_schedules(1)) == ['primary']
+    status = {replica['name']: replica for replica in checked.db.replica_status()}
+    assert not status['replica-b']['healthy'] and 'down' in status['replica-b']['error']
@@ -0,0 +1,61 @@
+"""
+Bộ đếm thống kê và phiên bản lịch chỉ đổi khi câu ghi thực sự thành công, không cần MySQL.
+
+    python -m pytest tests/test_schedule_changes.py
+
+DB giả trả None cho câu ghi khi `down` (như DatabaseManager khi truy vấn lỗi)
+và chạy callback after_commit ngay như khi không nằm trong transaction.
+"""
+import logging
+
+import pytest
+
+from cache import schedule_versions
+from models import ScheduleModel
+from stats import schedule_stats
+
+USER_ID = 9001
+SCHEDULE = {'event': 'họp', 'start_time': '2026-01-05T10:00:00', 'category': 'meeting'}
+
+
+class WriteDB:
+    def __init__(self):
+        self.down = False
+        self.next_id = 100
+
+    def execute(self, statement, params=None):
+        if self.down:
+            return None
+        self.next_id += 1
+        return self.next_id
+
+    def execute_query(self, query, params=None, fetch=True):
+        # LAST_INSERT_ID() trên một kết nối khác của pool
+        return [{'id': 0}]
+
+    def after_commit(self, callback):
+        callback()
+
+
+@pytest.fixture
+def schedules():
+    logging.disable(logging.CRITICAL)
+    schedule_stats.load(USER_ID, [])
+    yield ScheduleModel(WriteDB())
+    schedule_stats.forget(USER_ID)
+    logging.disable(logging.NOTSET)
+
+
+def test_failed_insert_leaves_stats_and_version_alone(schedules):
+    schedules.db.down = True
+    version = schedule_versions.get(USER_ID)
+    schedules.create_schedule(USER_ID, SCHEDULE)
+    assert schedule_versions.get(USER_ID) == version
+    assert schedule_stats.get(USER_ID)['total'] == 0
+
+
+def test_successful_insert_updates_stats_and_version(schedules):
+    version = schedule_versions.get(USER_ID)
+    assert schedules.create_schedule(USER_ID, SCHEDULE) == 101
+    assert schedule_versions.get(USER_ID) > version
+    assert schedule_stats.get(USER_ID)['total'] == 1
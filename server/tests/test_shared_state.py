@@ -0,0 +1,83 @@
+"""
+Pub/sub của SharedState giữa các process fork từ cùng một process cha (như
+worker gunicorn với preload_app), không cần Redis.
+
+    python -m pytest tests/test_shared_state.py
+
+PipeBackend thay backend redis: publish ghi tin nhắn vào một pipe dùng chung
+giữa cha và con, deliver() đọc một tin nhắn và giao cho các kênh đã subscribe
+ở process gọi nó.
+"""
+import os
+
+import pytest
+
+from shared_state import SharedState
+
+
+class PipeBackend:
+    name = 'pipe'
+
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+        self._channels = {}
+
+    def subscribe(self, channel, callback):
+        self._channels.setdefault(channel, []).append(callback)
+
+    def publish(self, channel, message):
+        os.write(self.write_fd, f'{channel}\t{message}\n'.encode())
+
+    def deliver(self):
+        line = b''
+        while not line.endswith(b'\n'):
+            line += os.read(self.read_fd, 1)
+        channel, _, message = line.decode().rstrip('\n').partition('\t')
+        for callback in self._channels.get(channel, ()):
+            callback(message)
+
+    def close(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+def _in_child(action):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            action()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+
+@pytest.fixture
+def state():
+    backend = PipeBackend()
+    yield SharedState(backend, 'test:')
+    backend.close()
+
+
+def test_forked_child_gets_its_own_origin(state):
+    read_fd, write_fd = os.pipe()
+    _in_child(lambda: os.write(write_fd, state.origin.encode()))
+    child_origin = os.read(read_fd, 64).decode()
+    os.close(read_fd)
+    os.close(write_fd)
+    assert child_origin and child_origin != state.origin
+
+
+def test_message_from_forked_child_reaches_parent(state):
+    received = []
+    state.subscribe('events', received.append)
+    _in_child(lambda: state.publish('events', 'from child'))
+    state.backend.deliver()
+    assert received == ['from child']
+
+
+def test_own_messages_are_not_delivered(state):
+    received = []
+    state.subscribe('events', received.append)
+    state.publish('events', 'from parent')
+    state.backend.deliver()
+    assert received == []
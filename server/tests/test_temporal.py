@@ -0,0 +1,41 @@
+"""
+Parser thời gian temporal.py với mốc cố định corpus.TEMPORAL_ANCHOR (thứ Hai 2026-01-05 10:00).
+
+    python -m pytest tests/test_temporal.py
+"""
+import pytest
+
+from benchmarks import corpus
+import temporal
+
+NOW = corpus.TEMPORAL_ANCHOR.replace(tzinfo=temporal.get_timezone())
+
+
+def resolve(text):
+    expression = temporal.parse_expression(text)
+    return expression.resolve(NOW) if expression else None
+
+
+@pytest.mark.parametrize('text, start, end', corpus.TEMPORAL_CASES)
+def test_corpus_case(text, start, end):
+    resolved_start, resolved_end = resolve(text)
+    assert temporal.format_datetime(resolved_start) == start
+    if end is not None:
+        assert resolved_end is not None and temporal.format_datetime(resolved_end) == end
+
+
+@pytest.mark.parametrize('text, start, end', [
+    ('đặt lịch 3h chiều đến 5h', '2026-01-05 15:00:00', '2026-01-05 17:00:00'),
+    ('họp 9h sáng - 11h mai', '2026-01-06 09:00:00', '2026-01-06 11:00:00'),
+    ('trực 8h tối tới 2h', '2026-01-05 20:00:00', '2026-01-06 02:00:00'),
+])
+def test_range_with_period_before_separator(text, start, end):
+    resolved_start, resolved_end = resolve(text)
+    assert temporal.format_datetime(resolved_start) == start
+    assert resolved_end is not None and temporal.format_datetime(resolved_end) == end
+
+
+@pytest.mark.parametrize('text', ['họp 9 giờ kém 60', 'họp 9 giờ kém 75', 'họp 9 giờ kém 0'])
+def test_out_of_range_minutes_before_the_hour_are_not_a_time(text):
+    expression = temporal.parse_expression(text)
+    assert expression is None or expression.hour is None
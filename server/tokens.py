@@ -0,0 +1,256 @@
+"""
+Access token ngắn hạn, refresh token dài hạn và danh sách thu hồi trong bộ nhớ.
+
+Access token (JWT_ACCESS_TOKEN_MINUTES, mặc định 15 phút) được token_required
+kiểm tra hoàn toàn trong process: chữ ký, hạn, rồi tra bộ thu hồi bằng hai
+phép tra dict O(1), không truy vấn DB. Refresh token (JWT_REFRESH_TOKEN_DAYS)
+chỉ dùng ở /api/auth/refresh; mỗi lần dùng bị thu hồi và đổi sang cặp mới
+(rotation), và được kiểm tra với DB vì route này hiếm.
+
+Bảng token_revocations là nguồn gốc:
+- dòng có jti: thu hồi một token (logout, refresh token đã dùng)
+- dòng jti NULL: thu hồi mọi token của user cấp trước revoked_at (đổi mật khẩu)
+
+Bộ nhớ chỉ giữ những gì access token còn sống có thể chạm tới: jti của access
+token bị thu hồi cho tới khi token hết hạn, và mốc thu hồi theo user trong một
+vòng đời access token. Với vài nghìn logout mỗi 15 phút thì một set Python
+đủ nhỏ, không cần Bloom filter (và không có false positive). Thu hồi ở worker
+này được áp dụng ngay tại chỗ và phát qua shared state (kênh
+'token_revocations') tới worker khác; mỗi TOKEN_REVOCATION_SYNC_SECONDS mỗi
+worker đọc thêm các dòng mới từ DB, phòng khi mất tin nhắn hoặc worker vừa
+khởi động. Id AUTO_INCREMENT được cấp lúc INSERT chứ không phải lúc commit,
+nên dòng id nhỏ có thể commit sau dòng id lớn; mỗi lần đồng bộ đọc lại một cửa
+sổ id phía sau mốc đã đọc để không bỏ sót dòng đó.
+"""
+import logging
+import math
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import jwt
+
+import metrics
+import statements
+from shared_state import shared
+
+logger = logging.getLogger(__name__)
+
+tokens_revoked_rejected = metrics.registry.counter(
+    'tokens_revoked_rejected_total', 'Token bị từ chối vì đã thu hồi', ('type',))
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+
+class TokenRevoked(jwt.InvalidTokenError):
+    pass
+
+
+def _now_ms() -> float:
+    # Làm tròn xuống mili giây như DATETIME(3): token cấp sau mốc thu hồi không bị so nhầm
+    return math.floor(time.time() * 1000) / 1000
+
+
+def _to_datetime(timestamp: float) -> datetime:
+    # DATETIME(3) theo UTC, không phụ thuộc time_zone của MySQL
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+def _to_timestamp(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class RevocationSet:
+    channel = 'token_revocations'
+    # Số id đọc lại phía sau mốc đã đọc mỗi lần đồng bộ (dòng commit không theo thứ tự id)
+    id_window = 1000
+
+    def __init__(self, state=shared):
+        self.state = state
+        self._tokens: Dict[str, float] = {}      # jti -> exp của access token
+        self._cutoffs: Dict[int, float] = {}     # user_id -> token cấp trước mốc này bị thu hồi
+        self._cutoff_ttl = 900.0
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self.synced_at: Optional[float] = None
+        state.subscribe(self.channel, self._on_message)
+
+    def is_revoked(self, claims: Dict) -> bool:
+        if claims.get('jti') in self._tokens:
+            return True
+        cutoff = self._cutoffs.get(claims.get('user_id'))
+        return cutoff is not None and claims.get('iat', 0) < cutoff
+
+    def add_token(self, jti: str, expires_at: float, publish: bool = True):
+        with self._lock:
+            self._tokens[jti] = expires_at
+        if publish:
+            self.state.publish(self.channel, f'jti:{jti}:{expires_at}')
+
+    def add_cutoff(self, user_id: int, revoked_at: float, publish: bool = True):
+        with self._lock:
+            self._cutoffs[user_id] = max(revoked_at, self._cutoffs.get(user_id, 0.0))
+        if publish:
+            self.state.publish(self.channel, f'user:{user_id}:{revoked_at}')
+
+    def sync(self, db):
+        """Đọc các dòng thu hồi mới từ DB (lần đầu: mọi dòng còn hiệu lực); đọc lại dòng đã có không đổi gì."""
+        now = time.time()
+        since = max(0, self._last_id - self.id_window)
+        rows = db.fetch_all(statements.TOKEN_REVOCATIONS_SINCE, (since, _to_datetime(now)))
+        if rows is None:
+            raise RuntimeError('could not read token_revocations')
+        for row in rows:
+            if row['jti'] is None:
+                self.add_cutoff(row['user_id'], _to_timestamp(row['revoked_at']), publish=False)
+            else:
+                self.add_token(row['jti'], _to_timestamp(row['expires_at']), publish=False)
+            self._last_id = max(self._last_id, row['id'])
+        self.prune(now)
+        self.synced_at = now
+        return len(rows)
+
+    def prune(self, now: float):
+        with self._lock:
+            self._tokens = {jti: exp for jti, exp in self._tokens.items() if exp > now}
+            self._cutoffs = {user_id: cutoff for user_id, cutoff in self._cutoffs.items()
+                             if cutoff + self._cutoff_ttl > now}
+
+    def size(self) -> Dict[str, int]:
+        return {'tokens': len(self._tokens), 'users': len(self._cutoffs)}
+
+    def _on_message(self, message: str):
+        try:
+            kind, subject, value = message.rsplit(':', 2)
+            if kind == 'jti':
+                self.add_token(subject, float(value), publish=False)
+            elif kind == 'user':
+                self.add_cutoff(int(subject), float(value), publish=False)
+        except ValueError:
+            logger.warning(f"Ignoring malformed token revocation message: {message!r}")
+
+
+class TokenService:
+    def __init__(self):
+        self.secret = 'your-secret-key-change-in-production'
+        self.access_seconds = 900.0
+        self.refresh_seconds = 30 * 86400.0
+        self.sync_interval = 30.0
+        self.revocations = RevocationSet()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def issue(self, user_id: int) -> Dict:
+        """Cặp token mới; 'token' giữ lại cho client cũ đọc access token từ khóa này."""
+        now = _now_ms()
+        access = self._encode(user_id, ACCESS, now, self.access_seconds)
+        return {
+            'token': access,
+            'access_token': access,
+            'refresh_token': self._encode(user_id, REFRESH, now, self.refresh_seconds),
+            'token_type': 'bearer',
+            'expires_in': int(self.access_seconds)
+        }
+
+    def decode(self, token: str, token_type: str = ACCESS) -> Dict:
+        """Claims của token hợp lệ; ném jwt.ExpiredSignatureError / jwt.InvalidTokenError / TokenRevoked."""
+        claims = jwt.decode(token, self.secret, algorithms=["HS256"])
+        if claims.get('type') != token_type or 'jti' not in claims:
+            raise jwt.InvalidTokenError(f'not a valid {token_type} token')
+        if self.revocations.is_revoked(claims):
+            tokens_revoked_rejected.inc(token_type)
+            raise TokenRevoked('token has been revoked')
+        return claims
+
+    def refresh(self, db, refresh_token: str) -> Optional[Dict]:
+        """
+        Đổi refresh token lấy cặp mới và thu hồi refresh token cũ. Mỗi refresh
+        token chỉ dùng được một lần: INSERT IGNORE trên jti (UNIQUE) quyết định
+        request nào thắng khi hai request dùng cùng một token. Trả về None nếu
+        DB lỗi.
+        """
+        claims = self.decode(refresh_token, REFRESH)
+        user_id = claims['user_id']
+        row = db.fetch_one(statements.TOKEN_USER_CUTOFF, (user_id,))
+        if row is None:
+            return None
+        if row['revoked_at'] is not None and claims['iat'] < _to_timestamp(row['revoked_at']):
+            tokens_revoked_rejected.inc(REFRESH)
+            raise TokenRevoked('token has been revoked')
+        claimed = db.execute(statements.TOKEN_REVOKE, (
+            user_id, claims['jti'], REFRESH, _to_datetime(time.time()), _to_datetime(claims['exp'])))
+        if claimed is None:
+            return None
+        if claimed == 0:
+            tokens_revoked_rejected.inc(REFRESH)
+            raise TokenRevoked('refresh token has already been used')
+        return self.issue(user_id)
+
+    def revoke(self, db, claims: Dict) -> bool:
+        """Thu hồi một token (logout)."""
+        saved = db.execute(statements.TOKEN_REVOKE, (
+            claims['user_id'], claims['jti'], claims['type'], _to_datetime(time.time()),
+            _to_datetime(claims['exp'])))
+        if claims['type'] == ACCESS:
+            self.revocations.add_token(claims['jti'], claims['exp'])
+        return saved is not None
+
+    def revoke_user(self, db, user_id: int) -> bool:
+        """Thu hồi mọi token của user cấp trước thời điểm này (đổi mật khẩu)."""
+        now = _now_ms()
+        saved = db.execute(statements.TOKEN_REVOKE, (
+            user_id, None, None, _to_datetime(now), _to_datetime(now + self.refresh_seconds)))
+        self.revocations.add_cutoff(user_id, now)
+        return saved is not None
+
+    def start_sync(self, db):
+        """Thread nền đồng bộ bộ thu hồi từ DB; một lần cho mỗi process."""
+        if self._thread:
+            return
+        self._stop.clear()
+
+        def run():
+            next_purge = 0.0
+            while True:
+                try:
+                    self.revocations.sync(db)
+                    if time.monotonic() >= next_purge:
+                        db.execute(statements.TOKEN_REVOCATIONS_PURGE, (_to_datetime(time.time()),))
+                        next_purge = time.monotonic() + 3600
+                except Exception as e:
+                    logger.error(f"Token revocation sync error: {e}")
+                if self._stop.wait(self.sync_interval):
+                    break
+
+        self._thread = threading.Thread(target=run, name='token-revocation-sync', daemon=True)
+        self._thread.start()
+
+    def stop_sync(self):
+        self._stop.set()
+        self._thread = None
+
+    def _encode(self, user_id: int, token_type: str, now: float, lifetime: float) -> str:
+        # iat tới mili giây: token cấp ngay sau khi đổi mật khẩu vẫn mới hơn mốc thu hồi
+        payload = {'user_id': user_id, 'type': token_type, 'jti': uuid.uuid4().hex,
+                   'iat': now, 'exp': int(now + lifetime)}
+        token = jwt.encode(payload, self.secret, algorithm="HS256")
+        return token.decode('utf-8') if isinstance(token, bytes) else token
+
+
+token_service = TokenService()
+
+metrics.registry.callback(
+    'token_revocations', 'Số mục trong bộ thu hồi token của process', ('kind',),
+    lambda: {(kind,): count for kind, count in token_service.revocations.size().items()})
+
+
+def configure(config):
+    """Đọc JWT_* và TOKEN_REVOCATION_SYNC_SECONDS từ config; gọi lúc khởi động."""
+    token_service.secret = config.JWT_SECRET_KEY
+    token_service.access_seconds = config.JWT_ACCESS_TOKEN_EXPIRES.total_seconds()
+    token_service.refresh_seconds = config.JWT_REFRESH_TOKEN_EXPIRES.total_seconds()
+    token_service.sync_interval = getattr(config, 'TOKEN_REVOCATION_SYNC_SECONDS', 30)
+    token_service.revocations._cutoff_ttl = token_service.access_seconds
@@ -0,0 +1,20 @@
+"""
+Entry point cho server WSGI production:
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Module này chỉ dùng cho server production nên cấu hình mặc định là
+'production' (DEBUG tắt) khi FLASK_ENV không được đặt.
+
+Thread nền (job queue, đối soát thống kê, theo dõi replica) không được khởi
+động ở đây vì với preload_app module này được import trong process master rồi
+mới fork; mỗi worker tự khởi động chúng trong hook post_worker_init của
+gunicorn.conf.py (server khác: ở request đầu tiên của worker).
+"""
+import os
+
+from app import create_app, start_background_services
+
+application = create_app(os.getenv('FLASK_ENV', 'production'), start_background=False)
+
+__all__ = ['application', 'start_background_services']